@@ -6,10 +6,11 @@ from openpyxl.worksheet.worksheet import Worksheet
 # Это должно помочь Pylance понять тип, совместимый с _CellOrMergedCell
 from openpyxl.cell.cell import Cell as OpenPyxlCell
 # Для аннотаций типов
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Hashable
 import logging
 import json
 import re
+from openpyxl.utils import get_column_letter, coordinate_to_tuple
 
 # Импортируем logger из utils
 # ИСПРАВЛЕНО: Импорт теперь из backend.utils
@@ -149,6 +150,71 @@ def _serialize_style(cell: OpenPyxlCell | Any) -> Dict[str, Any]:
     return style_dict
 
 
+# --- НОВОЕ: Кэш сериализации стилей по записи стиля ячейки ---
+
+# Маркер отсутствующей записи кэша (None - допустимое значение: пустой стиль)
+_STYLE_CACHE_MISSING = object()
+
+
+def _style_cache_key(cell: OpenPyxlCell | Any) -> Optional[Hashable]:
+    """
+    Ключ записи стиля ячейки в пределах книги или None, если ячейка его не имеет.
+    Ячейка полного режима хранит StyleArray - индексы шрифта, заливки, границ, формата,
+    защиты и выравнивания в списках книги; ячейка read_only - индекс StyleArray (_style_id).
+    """
+    style_id = getattr(cell, '_style_id', None)
+    if style_id is not None:
+        return style_id
+    style_array = getattr(cell, '_style', None)
+    if style_array is not None:
+        return tuple(style_array)
+    return None
+
+
+def _style_json(cell: OpenPyxlCell | Any) -> Optional[str]:
+    """JSON стиля ячейки с отсортированными ключами (ключ группировки стилей) или None, если стиль пуст."""
+    style_dict = _serialize_style(cell)
+    return json.dumps(style_dict, sort_keys=True) if style_dict else None
+
+
+class StyleSerializationCache:
+    """
+    Мемоизация сериализации стилей ячеек одной книги openpyxl.
+
+    Ячейки книги ссылаются на небольшое число общих записей стиля, поэтому каждый
+    различный стиль обходится _serialize_style и переводится в JSON один раз,
+    а ячейки с тем же стилем получают ту же строку (её хэш Python тоже вычисляется один раз).
+    Индексы стилей разных книг не совпадают: кэш создаётся на каждую открытую книгу.
+    """
+
+    def __init__(self):
+        self._json_by_key: Dict[Hashable, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        """Число различных записей стиля, встреченных в книге."""
+        return len(self._json_by_key)
+
+    def style_json(self, cell: OpenPyxlCell | Any) -> Optional[str]:
+        """
+        JSON стиля ячейки (как json.dumps(_serialize_style(cell), sort_keys=True)).
+
+        Args:
+            cell: Ячейка openpyxl (Cell, MergedCell или ReadOnlyCell).
+
+        Returns:
+            Optional[str]: Строка JSON или None, если стиль пуст.
+        """
+        key = _style_cache_key(cell)
+        if key is None:
+            return _style_json(cell)
+        style_json = self._json_by_key.get(key, _STYLE_CACHE_MISSING)
+        if style_json is _STYLE_CACHE_MISSING:
+            style_json = self._json_by_key[key] = _style_json(cell)
+        return style_json
+
+# --- КОНЕЦ НОВОГО ---
+
+
 def _serialize_chart(chart_obj) -> Dict[str, Any]:
     """
     Сериализует объект диаграммы openpyxl.
@@ -366,6 +432,8 @@ def analyze_excel_file(file_path: str) -> Dict[str, Any]:
             "file_path": file_path,
             "sheets": []
         }
+        # Стили сериализуются один раз на каждую запись стиля книги
+        style_cache = StyleSerializationCache()
 
         # Итерируемся по всем листам в книге
         for sheet_name in workbook.sheetnames:
@@ -391,8 +459,10 @@ def analyze_excel_file(file_path: str) -> Dict[str, Any]:
                         data_item = {
                             "cell_address": cell.coordinate,
                             "value": cell.value,
-                            # "value_type": type(cell.value).__name__ # Может быть полезно
                         }
+                        if cell.data_type == 'e':
+                            # Ошибки Excel ('#DIV/0!' и т.п.) хранятся кодом, см. storage/cell_values.py
+                            data_item["value_type"] = "error"
                         sheet_data["raw_data"].append(data_item)
 
             # --- 2. Извлечение формул ---
@@ -411,47 +481,25 @@ def analyze_excel_file(file_path: str) -> Dict[str, Any]:
 
             # --- 3. Извлечение стилей ---
             logger.debug(f"Извлечение и группировка стилей с листа '{sheet_name}'...")
-            # Простой подход: для каждой ячейки сохраняем её стиль.
-            # Более сложный (эффективный): группировать ячейки с одинаковыми стилями в диапазоны.
-            # Пока используем простой подход для MVP.
-
-            # Словарь для хранения уникальных стилей и их диапазонов
-            style_ranges_map: Dict[str, List[str]] = {} # ключ - сериализованный стиль, значение - список адресов
+            # Ячейки с одинаковым стилем объединяются в прямоугольные диапазоны (A1:F5000),
+            # поэтому на лист приходится одна запись на диапазон, а не на каждую ячейку.
+            compactor = StyleRangeCompactor()
 
             for row in sheet.iter_rows(values_only=False):
                 for cell in row:
-                    # Проверяем, есть ли у ячейки не-дефолтный стиль
-                    # Это можно сделать, сравнивая с дефолтным стилем, но проще сериализовать всегда
-                    # и потом в storage/styles.py решать, нужно ли его сохранять.
-
-                    # --- ИСПРАВЛЕНИЕ: Передаем cell в _serialize_style, аннотированную как OpenPyxlCell | Any ---
-                    # iter_rows возвращает _CellOrMergedCell. Pylance должен принять OpenPyxlCell | Any.
-                    style_dict = _serialize_style(cell)
-                    # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
-                    if style_dict: # Если стиль не пустой
-                        style_json = json.dumps(style_dict, sort_keys=True) # Сериализуем в JSON и сортируем ключи для надежного хеширования
-                        coord = cell.coordinate
-
-                        if style_json in style_ranges_map:
-                            style_ranges_map[style_json].append(coord)
-                        else:
-                            style_ranges_map[style_json] = [coord]
-
-            # Преобразуем карту стилей в формат, ожидаемый storage
-            for style_json, cell_addresses in style_ranges_map.items():
-                # Для упрощения, будем создавать отдельную запись для каждой ячейки
-                # В будущем можно реализовать группировку в диапазоны (A1:A10, B1:D1 и т.д.)
-                # Это требует сложной логики группировки.
-                for address in cell_addresses:
-                     sheet_data["styles"].append({
-                         "range_address": address, # Пока каждая ячейка отдельно
-                         "style_attributes": style_json # Строка JSON
-                     })
-                # TODO: Реализовать группировку адресов в диапазоны
-                # sheet_data["styles"].append({
-                #     "range_address": _group_addresses(cell_addresses), # Функция группировки
-                #     "style_attributes": style_json # Строка JSON
-                # })
+                    # JSON с отсортированными ключами - ключ группировки; каждый различный стиль
+                    # книги сериализуется один раз (style_cache)
+                    style_json = style_cache.style_json(cell)
+                    if style_json: # Если стиль не пустой
+                        compactor.add(style_json, cell.row, cell.column)
+
+            # Преобразуем диапазоны в формат, ожидаемый storage
+            for style_json, range_address in compactor.finish():
+                sheet_data["styles"].append({
+                    "range_address": range_address,
+                    "style_attributes": style_json # Строка JSON
+                })
+            logger.debug(f"Стили листа '{sheet_name}' сгруппированы в {len(sheet_data['styles'])} диапазонов.")
 
 
             # --- 4. Извлечение диаграмм ---
@@ -508,16 +556,136 @@ def analyze_excel_file(file_path: str) -> Dict[str, Any]:
         # В реальном приложении лучше поднимать пользовательское исключение
         raise # Повторно поднимаем исключение для обработки выше
 
-# --- Функция для группировки адресов ячеек в диапазоны (заглушка) ---
-# def _group_addresses(addresses: List[str]) -> str:
-#     """
-#     Группирует список адресов ячеек в строку диапазонов.
-#     Например: ['A1', 'A2', 'A3', 'B1'] -> 'A1:A3 B1'
-#     Это сложная задача, требующая алгоритмов.
-#     """
-#     # TODO: Реализовать алгоритм группировки
-#     # Пока возвращаем объединение через пробел
-#     return " ".join(addresses)
+# --- Группировка ячеек с одинаковым стилем в диапазоны ---
+
+def _range_address(row_start: int, col_start: int, row_end: int, col_end: int) -> str:
+    """Формирует адрес диапазона Excel ('A1' для одной ячейки, иначе 'A1:F50'). Координаты 1-based."""
+    start = f"{get_column_letter(col_start)}{row_start}"
+    if row_start == row_end and col_start == col_end:
+        return start
+    return f"{start}:{get_column_letter(col_end)}{row_end}"
+
+
+class StyleRangeCompactor:
+    """
+    Объединяет ячейки с одинаковым ключом стиля в прямоугольные диапазоны.
+
+    Ячейки подаются в порядке строк (row-major), как их выдаёт iter_rows.
+    В каждой строке ячейки одного стиля склеиваются в непрерывные отрезки столбцов,
+    а отрезки с теми же границами в соседних строках продолжают открытый прямоугольник.
+    Памяти требуется только на открытые прямоугольники и готовый результат,
+    поэтому компактор можно использовать при чтении листа частями.
+    """
+
+    def __init__(self):
+        self._row: Optional[int] = None
+        # Столбцы текущей строки по ключам стиля
+        self._row_cells: Dict[Hashable, List[int]] = {}
+        # Открытые прямоугольники: ключ стиля -> {(col_start, col_end): [row_start, row_end]}
+        self._open: Dict[Hashable, Dict[Tuple[int, int], List[int]]] = {}
+        self._closed: List[Tuple[Hashable, int, int, int, int]] = []
+
+    def add(self, style_key: Hashable, row: int, col: int):
+        """
+        Добавляет ячейку со стилем.
+
+        Args:
+            style_key (Hashable): Ключ стиля (например, JSON атрибутов).
+            row (int): Номер строки (1-based).
+            col (int): Номер столбца (1-based).
+
+        Raises:
+            ValueError: Если ячейки подаются не в порядке строк.
+        """
+        if row != self._row:
+            if self._row is not None:
+                if row < self._row:
+                    raise ValueError(f"Ячейки должны подаваться в порядке строк: строка {row} после {self._row}.")
+                self._finish_row()
+            self._row = row
+        self._row_cells.setdefault(style_key, []).append(col)
+
+    def _finish_row(self):
+        row = self._row
+        for style_key in set(self._open) | set(self._row_cells):
+            open_rects = self._open.pop(style_key, {})
+            continued: Dict[Tuple[int, int], List[int]] = {}
+            for run in self._column_runs(self._row_cells.get(style_key, [])):
+                rect = open_rects.pop(run, None)
+                if rect is None or rect[1] != row - 1:
+                    if rect is not None:
+                        self._closed.append((style_key, rect[0], run[0], rect[1], run[1]))
+                    rect = [row, row]
+                else:
+                    rect[1] = row
+                continued[run] = rect
+            # Не продолженные в этой строке прямоугольники закрываются
+            for (col_start, col_end), (row_start, row_end) in open_rects.items():
+                self._closed.append((style_key, row_start, col_start, row_end, col_end))
+            if continued:
+                self._open[style_key] = continued
+        self._row_cells = {}
+
+    @staticmethod
+    def _column_runs(cols: List[int]) -> List[Tuple[int, int]]:
+        """Разбивает номера столбцов на непрерывные отрезки [(col_start, col_end), ...]."""
+        runs: List[Tuple[int, int]] = []
+        if not cols:
+            return runs
+        cols = sorted(cols)
+        run_start = prev = cols[0]
+        for col in cols[1:]:
+            if col != prev + 1:
+                runs.append((run_start, prev))
+                run_start = col
+            prev = col
+        runs.append((run_start, prev))
+        return runs
+
+    def pop_closed(self) -> List[Tuple[Hashable, str]]:
+        """
+        Возвращает и забывает уже закрытые диапазоны (для сохранения листа частями).
+
+        Returns:
+            List[Tuple[Hashable, str]]: Пары (ключ стиля, адрес диапазона).
+        """
+        closed = [(key, _range_address(r0, c0, r1, c1)) for key, r0, c0, r1, c1 in self._closed]
+        self._closed = []
+        return closed
+
+    def finish(self) -> List[Tuple[Hashable, str]]:
+        """
+        Закрывает все открытые диапазоны и возвращает оставшийся результат.
+
+        Returns:
+            List[Tuple[Hashable, str]]: Пары (ключ стиля, адрес диапазона).
+        """
+        if self._row is not None:
+            self._finish_row()
+        for style_key, open_rects in self._open.items():
+            for (col_start, col_end), (row_start, row_end) in open_rects.items():
+                self._closed.append((style_key, row_start, col_start, row_end, col_end))
+        self._open = {}
+        self._row = None
+        return self.pop_closed()
+
+
+def _group_addresses(addresses: List[str]) -> List[str]:
+    """
+    Группирует список адресов ячеек в прямоугольные диапазоны (отрезки строк,
+    продолженные вниз, см. StyleRangeCompactor).
+    Например: ['A1', 'B1', 'A2', 'B2', 'A3'] -> ['A1:B2', 'A3'].
+
+    Args:
+        addresses (List[str]): Адреса ячеек в любом порядке.
+
+    Returns:
+        List[str]: Адреса диапазонов.
+    """
+    compactor = StyleRangeCompactor()
+    for row, col in sorted(set(coordinate_to_tuple(address) for address in addresses)):
+        compactor.add(None, row, col)
+    return [range_address for _, range_address in compactor.finish()]
 
 # Пример использования (если файл запускается напрямую)
 if __name__ == "__main__":
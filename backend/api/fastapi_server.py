@@ -19,6 +19,8 @@ from pathlib import Path
 
 from core.app_controller import create_app_controller
 from utils.logger import get_logger
+from utils.progress import ProgressChannel, ProgressEventLog
+from importer.workbook_probe import probe_workbook
 
 # Получаем логгер для этого модуля
 logger = get_logger(__name__)
@@ -51,6 +53,7 @@ class ExportResponse(BaseModel):
     success: bool
     message: str
     exported_file_path: Optional[str] = None
+    progress: Optional[List[Dict[str, Any]]] = None # События прогресса (ProgressEvent.to_dict())
 
 
 class SheetsResponse(BaseModel):
@@ -58,6 +61,20 @@ class SheetsResponse(BaseModel):
     sheets: List[str]
 
 
+class ProbeResponse(BaseModel):
+    """Модель для ответа на запрос осмотра Excel-файла (без загрузки книги)."""
+    sheets: List[Dict[str, Any]] # SheetProbe.to_dict() для каждого листа
+    total_estimated_cells: int
+    shared_strings_count: int
+    cell_styles_count: int
+    has_pivots: bool
+    has_charts: bool
+    has_vba: bool
+    has_external_links: bool
+    has_formulas: bool
+    elapsed_ms: float
+
+
 # --- Создание экземпляра FastAPI ---
 
 app = FastAPI(
@@ -93,10 +110,11 @@ async def api_analyze(request: AnalyzeRequest):
         success = app_controller.analyze_excel_file(request.excel_file_path, options=request.options or {})
 
         if success:
-            # Попробуем получить список листов после анализа
+            # Список листов берём из осмотра файла: книга повторно не загружается
             # TODO: Реализовать метод в AppController для получения списка листов проекта
             # sheets_list = app_controller.get_project_sheet_names() # Предполагаемый метод
-            sheets_list = [] # Заглушка
+            probe = probe_workbook(request.excel_file_path)
+            sheets_list = probe.sheetnames if probe else []
             logger.info("Анализ успешно завершён.")
             return AnalyzeResponse(success=True, message="Анализ завершён", sheets=sheets_list)
         else:
@@ -133,11 +151,21 @@ async def api_export(request: ExportRequest):
         # --- Вызов логики экспорта через AppController ---
         # TODO: Реализовать вызов app_controller.export_results с переданными параметрами
         logger.debug(f"Вызов AppController для экспорта типа {request.export_type}")
-        success = app_controller.export_results(export_type=request.export_type, output_path=request.output_path)
+        progress_log = ProgressEventLog()
+        success = app_controller.export_results(
+            export_type=request.export_type,
+            output_path=request.output_path,
+            progress_callback=ProgressChannel(progress_log),
+        )
 
         if success:
             logger.info("Экспорт успешно завершён.")
-            return ExportResponse(success=True, message="Экспорт завершён", exported_file_path=request.output_path)
+            return ExportResponse(
+                success=True,
+                message="Экспорт завершён",
+                exported_file_path=request.output_path,
+                progress=progress_log.events,
+            )
         else:
             logger.error("Ошибка при экспорте через AppController.")
             raise HTTPException(status_code=500, detail="Ошибка экспорта")
@@ -185,6 +213,21 @@ async def api_get_sheets(project_path: str):
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка сервера: {e}")
 
 
+@app.get("/api/probe", response_model=ProbeResponse)
+async def api_probe(excel_file_path: str):
+    """Быстрый осмотр Excel-файла: листы, оценка размеров и признаки содержимого без загрузки книги."""
+    logger.info(f"Получен запрос на осмотр файла: {excel_file_path}")
+    if not Path(excel_file_path).is_file():
+        raise HTTPException(status_code=404, detail=f"Файл не найден: {excel_file_path}")
+    probe = probe_workbook(excel_file_path)
+    if probe is None:
+        raise HTTPException(status_code=400, detail="Файл не является книгой .xlsx/.xlsm или повреждён")
+    info = probe.to_dict()
+    info.pop("file_path")
+    info.pop("file_size")
+    return ProbeResponse(**info)
+
+
 # --- Функция для запуска сервера ---
 
 def run_server(host: str = "127.0.0.1", port: int = 8000):
@@ -11,6 +11,7 @@ from PySide6.QtCore import QThread, Signal
 # Импортируем AppController
 from backend.core.app_controller import create_app_controller
 from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressChannel, ProgressEvent
 
 logger = get_logger(__name__)
 
@@ -20,6 +21,7 @@ class ExportWorker(QThread):
     """
     finished = Signal(bool, str)  # (успех/ошибка, сообщение)
     progress = Signal(int, str)   # (значение, сообщение) - если AppController будет передавать прогресс
+    progress_event = Signal(dict) # Структурированное событие прогресса (ProgressEvent.to_dict())
 
     def __init__(self, app_controller, output_path, progress_callback: Optional[Callable[[int, str], None]] = None):
         """
@@ -45,14 +47,14 @@ class ExportWorker(QThread):
         try:
             logger.info(f"Начало экспорта в файл {self.output_path} в потоке {id(QThread.currentThread())}")
 
-            # --- НОВОЕ: Создаём функцию-обёртку для прогресса ---
-            def internal_progress_callback(value, message):
-                # Эмитим сигнал для внутреннего использования (например, в MainWindow)
-                self.progress.emit(value, message)
-                # Если передан внешний callback, вызываем его
+            # Канал прогресса: сигналы Qt и, если передан, внешний callback
+            def emit_progress(event: ProgressEvent):
+                message = event.display_message()
+                self.progress.emit(event.percent, message)
+                self.progress_event.emit(event.to_dict())
                 if self.progress_callback:
-                    self.progress_callback(value, message)
-            # --- КОНЕЦ НОВОГО ---
+                    self.progress_callback(event.percent, message)
+            internal_progress_callback = ProgressChannel(emit_progress)
 
             # --- ИЗМЕНЕНО: Логика вызова метода AppController для экспорта ---
             # Используем правильный метод export_results
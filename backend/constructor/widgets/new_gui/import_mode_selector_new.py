@@ -35,6 +35,10 @@ class ImportModeSelector(QGroupBox):
         # 'raw_fast_pandas', # <-- УДАЛЁН: Режим больше не поддерживается
         'raw_values_only_openpyxl', # <-- НОВЫЙ РЕЖИМ
         'chunks_openpyxl',
+        'raw_parallel', # Значения и формулы, листы разбираются параллельно
+        'raw_incremental', # Повторный импорт: записываются только изменения
+        'all_streaming', # Потоково, прерванный импорт продолжается
+        'raw_with_values', # Формулы и их сохранённые результаты за один разбор
         'auto'  # <-- НОВЫЙ РЕЖИМ
     ]
 
@@ -48,7 +52,11 @@ class ImportModeSelector(QGroupBox):
         # "Быстрый только данные - pandas", # <-- УДАЛЕНА: Метка для удалённого режима
         "Только значения (результаты формул) - openpyxl", # <-- НОВАЯ МЕТКА
         "Частями - openpyxl (Экспериментальный)",
-        "Авто (Данные-Pandas, Стили/OpenPyxl, Диаграммы/OpenPyxl, Формулы/OpenPyxl)" # <-- НОВАЯ МЕТКА
+        "Данные и формулы - параллельно по листам",
+        "Данные и формулы - только изменения (повторный импорт)",
+        "Всё - потоково, с продолжением после сбоя",
+        "Данные, формулы и их результаты - за один проход",
+        "Авто - способ выбирается по размеру и содержимому книги"
     ]
 
     # Словарь для удобства получения метки по ключу (если понадобится)
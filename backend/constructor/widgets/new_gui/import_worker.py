@@ -11,6 +11,7 @@ from PySide6.QtCore import QThread, Signal
 # Импортируем AppController
 from backend.core.app_controller import create_app_controller
 from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressChannel, ProgressEvent
 
 logger = get_logger(__name__)
 
@@ -20,6 +21,7 @@ class ImportWorker(QThread):
     """
     finished = Signal(bool, str)  # (успех/ошибка, сообщение)
     progress = Signal(int, str)   # (значение, сообщение) - если AppController будет передавать прогресс
+    progress_event = Signal(dict) # Структурированное событие прогресса (ProgressEvent.to_dict(): скорость, ETA и т.д.)
 
     def __init__(self, app_controller, file_path: str, import_mode_key: str, selective_options: Optional[Dict[str, Any]] = None): # <-- ИЗМЕНЕНО: добавлен selective_options
         """
@@ -57,11 +59,12 @@ class ImportWorker(QThread):
         try:
             logger.info(f"Начало импорта (режим: {self.import_mode_key}) для файла {self.file_path} в потоке {id(QThread.currentThread())}")
 
-            # --- НОВОЕ: Создаём функцию-обёртку для прогресса ---
-            def internal_progress_callback(value, message):
-                # Эмитим сигнал для внутреннего использования (например, в MainWindow)
-                self.progress.emit(value, message)
-            # --- КОНЕЦ НОВОГО ---
+            # Канал прогресса: вызывается импортёрами как progress_callback(value, message)
+            # и принимает структурированные события ProgressReporter
+            def emit_progress(event: ProgressEvent):
+                self.progress.emit(event.percent, event.display_message())
+                self.progress_event.emit(event.to_dict())
+            internal_progress_callback = ProgressChannel(emit_progress)
 
             # --- ИЗМЕНЕНО: Определение метода AppController через сопоставление ---
             # Определяем метод AppController на основе типа и режима
@@ -83,6 +86,10 @@ class ImportWorker(QThread):
                 # ('all', 'fast_pandas'): 'import_all_data_from_excel_fast', # <-- УДАЛЁН: Режим больше не поддерживается
                 # ('all', 'fast'): 'import_all_data_from_excel_fast', # <-- УДАЛЁН: Режим больше не поддерживается
                 ('all', 'in_chunks'): 'import_all_data_from_excel_chunks',
+                ('raw', 'parallel'): 'import_raw_data_parallel_from_excel', # Листы разбираются в пуле процессов
+                ('raw', 'incremental'): 'import_incremental_from_excel', # Запись только изменённых ячеек
+                ('all', 'streaming'): 'import_streaming_data_from_excel', # Потоково, с продолжением после сбоя
+                ('raw', 'with_values'): 'import_formulas_with_values_from_excel', # Формулы и их результаты за один разбор
                 # --- НОВОЕ: Добавлено сопоставление для 'auto' ---
                 ('auto', ''): 'import_auto_data_from_excel', # <-- Режим 'auto' не требует дополнительного режима
                 # ----------------------------------------------
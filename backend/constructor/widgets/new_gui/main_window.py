@@ -108,6 +108,8 @@ from .export_worker import ExportWorker
 from backend.utils.logger import get_logger
 # --- НОВЫЙ ИМПОРТ ---
 from backend.importer.xlwings_importer import import_all_from_excel_xlwings
+from backend.importer.workbook_probe import probe_workbook
+from backend.utils.progress import ProgressChannel, ProgressEvent
 
 logger = get_logger(__name__)
 
@@ -119,6 +121,8 @@ class XlImportThread(QThread):
     """
     # Сигнал прогресса: (процент, сообщение)
     progress = Signal(int, str)
+    # Структурированное событие прогресса (ProgressEvent.to_dict())
+    progress_event = Signal(dict)
     # Сигнал завершения: (успех, сообщение)
     finished = Signal(bool, str)
 
@@ -138,7 +142,7 @@ class XlImportThread(QThread):
         """
         from backend.storage.base import ProjectDBStorage
         storage = ProjectDBStorage(self.db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"XlImportThread: Не удалось подключиться к БД проекта {self.db_path}.")
             self.finished.emit(False, f"Не удалось подключиться к БД: {self.db_path}")
             return
@@ -148,7 +152,7 @@ class XlImportThread(QThread):
             success = import_all_from_excel_xlwings(
                 storage,
                 self.file_path,
-                progress_callback=self._on_progress
+                progress_callback=ProgressChannel(self._on_progress)
             )
             if success:
                 self.finished.emit(True, "Импорт завершён успешно.")
@@ -158,13 +162,15 @@ class XlImportThread(QThread):
             logger.error(f"Ошибка в потоке xlwings-импорта: {e}", exc_info=True)
             self.finished.emit(False, f"Ошибка: {e}")
         finally:
-            storage.disconnect()
+            # Освобождаем соединение пула, закреплённое за этим потоком
+            storage.release_thread_connections()
 
-    def _on_progress(self, percent: int, message: str):
+    def _on_progress(self, event: ProgressEvent):
         """
-        Callback для обновления прогресса.
+        Подписчик канала прогресса: события импортёра уже ограничены по частоте.
         """
-        self.progress.emit(percent, message)
+        self.progress.emit(event.percent, event.display_message())
+        self.progress_event.emit(event.to_dict())
 # --- КОНЕЦ НОВОГО ---
 
 
@@ -465,9 +471,14 @@ class MainWindow(QMainWindow):
                     logger.warning(f"Не удалось определить метод импорта из ключа '{import_mode_key}'. Используется 'openpyxl' по умолчанию.")
 
                 # 2. Получаем список листов
+                # Для .xlsx/.xlsm достаточно осмотра ZIP-пакета: книга не загружается, Excel не запускается
                 available_sheet_names = []
+                probe = probe_workbook(str(file_path))
                 try:
-                    if import_method == 'openpyxl':
+                    if probe is not None:
+                        available_sheet_names = probe.sheetnames
+                        logger.debug(f"Получен список листов (осмотр книги, {probe.elapsed_ms:.1f} мс): {available_sheet_names}")
+                    elif import_method == 'openpyxl':
                         import openpyxl
                         logger.debug(f"Открытие файла '{file_path}' через openpyxl (read_only=True) для получения списка листов...")
                         # --- НОВОЕ: Обработка ошибки Nested.from_tree ---
@@ -15,6 +15,9 @@ from PySide6.QtGui import QFont, QColor, QBrush, QTextOption
 # Импортируем AppController
 from backend.core.app_controller import create_app_controller
 from backend.utils.logger import get_logger
+from backend.storage.cell_values import format_cell_value_for_display
+from backend.utils.range_map import RangeMap
+from backend.utils.row_block_cache import RowBlockCache
 
 logger = get_logger(__name__)
 
@@ -35,11 +38,11 @@ class DBTableModel(QAbstractTableModel):
         super().__init__(parent)
         self.app_controller = app_controller
         self.sheet_name = sheet_name
-        self._data: List[List[Any]] = []  # Список списков: строки x колонки
+        self._cells: Optional[RowBlockCache] = None # Значения ячеек, читаемые блоками строк по запросу
         self._headers: List[str] = []     # Заголовки колонок (A, B, C...)
-        self._row_headers: List[str] = [] # Заголовки строк (1, 2, 3...)
-        self._styles: Dict[tuple, Dict[str, Any]] = {} # Стили ячеек: {(row, col): {'font': ..., 'bg_color': ...}}
+        self._styles: RangeMap = RangeMap(prefer_last=True) # Стили ячеек по диапазонам: get((row, col)) -> {'font': ..., 'bg_color': ...}
         self._merged_cells: List[tuple] = [] # Объединённые ячейки: [(top_row, left_col, bottom_row, right_col), ...]
+        self._formula_values: Dict[tuple, Any] = {} # Сохранённые результаты формул: (row, col) -> значение
         self.max_row = 0
         self.max_column = 0
         self._load_data_from_controller()
@@ -50,10 +53,6 @@ class DBTableModel(QAbstractTableModel):
         """
         logger.info(f"Загрузка данных для листа '{self.sheet_name}' через AppController.")
         try:
-            # Получаем "сырые" данные из AppController
-            raw_data_list, _ = self.app_controller.get_sheet_data(self.sheet_name)
-            # logger.debug(f"Получены raw_data: {raw_data_list}")
-
             # Получаем ID листа для загрузки стилей и объединений
             sheet_id = self._get_sheet_id_by_name(self.sheet_name)
             if sheet_id is None:
@@ -67,64 +66,36 @@ class DBTableModel(QAbstractTableModel):
             stored_max_column = sheet_metadata.get('max_column', 0)
             logger.debug(f"Метаданные листа '{self.sheet_name}': stored_max_row={stored_max_row}, stored_max_column={stored_max_column}")
 
-            # Вычисляем максимальные row/col из raw_data_list, чтобы убедиться, что модель охватывает все данные
-            calculated_max_row = -1
-            calculated_max_column = -1
-            if raw_data_list:
-                for item in raw_data_list:
-                    cell_addr = item.get('cell_address', '')
-                    if cell_addr:
-                        try:
-                            row, col = self._xl_cell_to_row_col(cell_addr)
-                            if row > calculated_max_row:
-                                calculated_max_row = row
-                            if col > calculated_max_column:
-                                calculated_max_column = col
-                        except ValueError as ve:
-                            logger.warning(f"Ошибка преобразования адреса ячейки '{cell_addr}' из raw_data: {ve}")
-            logger.debug(f"Вычисленные из raw_data максимальные индексы: calculated_max_row={calculated_max_row}, calculated_max_column={calculated_max_column}")
+            # Границы заполненной области, чтобы модель охватывала все данные; сами ячейки не читаются
+            extent = self.app_controller.get_sheet_extent(self.sheet_name)
+            # extent - это (max_row, max_col) 1-based; None - на листе нет ячеек
+            calculated_max_row, calculated_max_column = (extent[0] - 1, extent[1] - 1) if extent else (-1, -1)
+            logger.debug(f"Границы листа: calculated_max_row={calculated_max_row}, calculated_max_column={calculated_max_column}")
 
             # Используем максимум из сохранённых и вычисленных значений
             self.max_row = max(stored_max_row, calculated_max_row)
             self.max_column = max(stored_max_column, calculated_max_column)
             logger.info(f"Окончательные размеры модели для '{self.sheet_name}': max_row={self.max_row}, max_column={self.max_column}")
 
-            # Если данные есть, но max_row/max_column отрицательны (например, raw_data_list пуст или только с ошибками)
-            # устанавливаем их в 0, чтобы избежать отрицательных индексов.
+            # Если лист пуст, max_row/max_column отрицательны - устанавливаем их в 0,
+            # чтобы избежать отрицательных индексов.
             if self.max_row < 0:
                 self.max_row = 0
             if self.max_column < 0:
                 self.max_column = 0
 
-            # Инициализируем пустую таблицу размером (max_row + 1) x (max_column + 1)
-            # +1 потому что max_row/max_column - это индексы (0-based), а размер - количество элементов
-            self._data = [[None for _ in range(self.max_column + 1)] for _ in range(self.max_row + 1)]
+            # Значения ячеек читаются блоками строк только для видимого окна (см. RowBlockCache)
+            self._cells = RowBlockCache(
+                lambda row_start, row_end: [
+                    (row - 1, col - 1, value)
+                    for row, col, value in self.app_controller.load_sheet_cells(self.sheet_name, row_start + 1, row_end + 1)
+                ]
+            )
             self._headers = [self._index_to_column_name(i) for i in range(self.max_column + 1)]
-            self._row_headers = [str(i + 1) for i in range(self.max_row + 1)]
-            logger.debug(f"Модель инициализирована. Размеры _data: {len(self._data)}x{len(self._data[0]) if self._data else 0}")
-            logger.debug(f"Размеры _headers: {len(self._headers)}, _row_headers: {len(self._row_headers)}")
-
-            # Заполняем таблицу данными из raw_data_list
-            filled_cells_count = 0
-            for item in raw_data_list:
-                cell_addr = item.get('cell_address', '')
-                value = item.get('value', '')
-                # logger.debug(f"Обработка ячейки {cell_addr} со значением {value}")
-
-                if cell_addr:
-                    try:
-                        row, col = self._xl_cell_to_row_col(cell_addr)
-                        # Проверяем, попадает ли ячейка в инициализированные границы
-                        # (на случай, если calculated_max_* был больше stored_max_*)
-                        if 0 <= row < len(self._data) and 0 <= col < len(self._data[0]):
-                            self._data[row][col] = value
-                            filled_cells_count += 1
-                            # logger.debug(f"Значение {value} записано в ({row}, {col})")
-                        else:
-                             logger.warning(f"Ячейка {cell_addr} ({row}, {col}) вне инициализированных границ модели ({len(self._data)}, {len(self._data[0])}). Пропущена.")
-                    except ValueError as ve:
-                        logger.error(f"Ошибка преобразования адреса ячейки '{cell_addr}' при заполнении _data: {ve}")
-            logger.info(f"Заполнено {filled_cells_count} ячеек в модели для листа '{self.sheet_name}'.")
+            logger.debug(f"Модель инициализирована. Размеры: {self.max_row + 1}x{self.max_column + 1}")
+
+            # Результаты формул, сохранённые в файле, показываются вместо текста формулы
+            self._load_formula_values_from_controller()
 
             # Загружаем стили и объединения
             self._load_styles_from_controller(sheet_id)
@@ -216,6 +187,24 @@ class DBTableModel(QAbstractTableModel):
             return None
 
 
+    def _load_formula_values_from_controller(self):
+        """
+        Загружает сохранённые результаты формул (импорт формул с результатами).
+        Результат показывается только для ячеек, в которых по-прежнему записана формула (см. data()).
+        """
+        self._formula_values = {}
+        get_values = getattr(self.app_controller, 'get_sheet_formula_values', None)
+        if get_values is None:
+            return
+        for cell_addr, value in get_values(self.sheet_name).items():
+            try:
+                row, col = self._xl_cell_to_row_col(cell_addr)
+            except ValueError:
+                continue
+            if 0 <= row <= self.max_row and 0 <= col <= self.max_column:
+                self._formula_values[(row, col)] = value
+        logger.debug(f"Загружено {len(self._formula_values)} результатов формул для листа '{self.sheet_name}'.")
+
     def _load_styles_from_controller(self, sheet_id: int):
         """
         Загружает стили ячеек из AppController.
@@ -224,47 +213,44 @@ class DBTableModel(QAbstractTableModel):
         try:
             # --- ИСПРАВЛЕНО: Обработка отсутствия метода AppController ---
             # Проверяем, существует ли метод перед вызовом
-            if not hasattr(self.app_controller, 'load_sheet_styles'):
-                logger.warning(f"AppController не имеет метода 'load_sheet_styles'. Загрузка стилей пропущена для листа ID {sheet_id}.")
-                self._styles = {} # Убедимся, что стили пусты
+            if not hasattr(self.app_controller, 'load_sheet_style_refs'):
+                logger.warning(f"AppController не имеет метода 'load_sheet_style_refs'. Загрузка стилей пропущена для листа ID {sheet_id}.")
+                self._styles = RangeMap(prefer_last=True) # Убедимся, что стили пусты
                 return
 
-            # Вызываем метод AppController для загрузки стилей для конкретного листа
-            # AppController.load_sheet_styles(sheet_id) должен возвращать список
-            # [{'range_address': 'A1:B2', 'style_attributes': '{\"font\": {...}, \"fill\": {...}}'}, ...]
-            styles_list = self.app_controller.load_sheet_styles(sheet_id)
-            logger.debug(f"Получены стили из AppController: {styles_list}")
+            # AppController.load_sheet_style_refs(sheet_id) возвращает словарь стилей и ссылки на них:
+            # {'styles': {style_id: '{"font": {...}, "fill": {...}}'}, 'ranges': [('A1:B2', style_id), ...]}
+            style_refs = self.app_controller.load_sheet_style_refs(sheet_id)
+            logger.debug(f"Получено {len(style_refs['ranges'])} ссылок на {len(style_refs['styles'])} стилей из AppController.")
 
-            # Очищаем старые стили
-            self._styles = {}
+            # Очищаем старые стили. Диапазоны хранятся целиком (без разворачивания по ячейкам);
+            # при пересечении диапазонов принимаем стиль из последнего обработанного диапазона.
+            self._styles = RangeMap(prefer_last=True)
+
+            # JSON каждого стиля разбирается один раз; ячейки одного стиля разделяют один словарь атрибутов
+            parsed_styles: Dict[int, Dict[str, Any]] = {}
+            for style_id, style_attrs_json in style_refs['styles'].items():
+                try:
+                    parsed_styles[style_id] = json.loads(style_attrs_json)
+                except json.JSONDecodeError as je:
+                    logger.error(f"Ошибка разбора JSON стиля ID {style_id}: {je}")
 
             # Преобразуем полученные стили в формат self._styles
-            for style_item in styles_list:
-                range_addr = style_item.get('range_address', '')
-                style_attrs_json = style_item.get('style_attributes', '{}')
-                if range_addr and style_attrs_json:
+            for range_addr, style_id in style_refs['ranges']:
+                style_attrs = parsed_styles.get(style_id)
+                if range_addr and style_attrs is not None:
                     try:
-                        style_attrs = json.loads(style_attrs_json)
-                        # logger.debug(f"Десериализованные атрибуты стиля для {range_addr}: {style_attrs}")
                         # Преобразовать range_addr в координаты (row_start, col_start, row_end, col_end)
                         row_start, col_start, row_end, col_end = self._xl_range_to_coords(range_addr)
-                        # Заполнить self._styles для каждой ячейки в диапазоне
-                        for r in range(row_start, row_end + 1):
-                            for c in range(col_start, col_end + 1):
-                                # Если ячейка уже имеет стиль, текущая логика перезаписывает его.
-                                # В реальных сценариях диапазоны могут пересекаться, и нужно решать, какой стиль приоритетнее.
-                                # Для MVP/простоты принимаем стиль из последнего обработанного диапазона.
-                                self._styles[(r, c)] = style_attrs
-                    except json.JSONDecodeError as je:
-                        logger.error(f"Ошибка разбора JSON стиля для диапазона {range_addr}: {je}")
+                        self._styles.add(row_start, col_start, row_end, col_end, style_attrs)
                     except ValueError as ve: # Ошибка от _xl_range_to_coords
                         logger.error(f"Ошибка преобразования диапазона {range_addr}: {ve}")
             logger.info(f"Стили для листа ID {sheet_id} загружены в модель.")
 
         except AttributeError as ae:
             # Перехватываем конкретное исключение AttributeError, если оно возникло не на hasattr, а при вызове
-            logger.error(f"AppController не имеет метода 'load_sheet_styles' (AttributeError): {ae}")
-            self._styles = {} # Убедимся, что стили пусты
+            logger.error(f"AppController не имеет метода 'load_sheet_style_refs' (AttributeError): {ae}")
+            self._styles = RangeMap(prefer_last=True) # Убедимся, что стили пусты
         except Exception as e:
             logger.error(f"Ошибка при загрузке стилей для листа ID {sheet_id}: {e}", exc_info=True)
 
@@ -369,13 +355,13 @@ class DBTableModel(QAbstractTableModel):
         """Возвращает количество строк."""
         if parent.isValid():
             return 0
-        return len(self._data)
+        return self.max_row + 1 if self._cells is not None else 0
 
     def columnCount(self, parent: Union[QModelIndex, QPersistentModelIndex] = QModelIndex()) -> int: # <-- Изменено
         """Возвращает количество столбцов."""
         if parent.isValid():
             return 0
-        return len(self._data[0]) if self._data else 0
+        return self.max_column + 1 if self._cells is not None else 0
 
     def data(self, index: Union[QModelIndex, QPersistentModelIndex], role: int = Qt.ItemDataRole.DisplayRole) -> Any: # <-- Изменено
         """Возвращает данные для указанной ячейки и роли."""
@@ -385,16 +371,19 @@ class DBTableModel(QAbstractTableModel):
         row = index.row()
         col = index.column()
 
-        if row >= len(self._data) or col >= len(self._data[0]):
+        if self._cells is None or row > self.max_row or col > self.max_column:
             return None
 
         if role == Qt.ItemDataRole.DisplayRole:
-            value = self._data[row][col]
-            # Возвращаем строковое представление значения
-            return str(value) if value is not None else ""
+            value = self._cells.get(row, col)
+            # Для формулы с сохранённым результатом показываем результат (без пересчёта)
+            if isinstance(value, str) and value.startswith('=') and (row, col) in self._formula_values:
+                value = self._formula_values[(row, col)]
+            # Значения хранятся в родных типах; в строку (дата 'DD.MM.YYYY' и т.п.) переводим только для отображения
+            return format_cell_value_for_display(value)
         elif role == Qt.ItemDataRole.EditRole:
             # Для редактирования возвращаем "сырое" значение
-            return self._data[row][col]
+            return self._cells.get(row, col)
         elif role == Qt.ItemDataRole.BackgroundRole:
             # Вернуть QBrush для фона ячейки на основе стиля
             style = self._styles.get((row, col), {})
@@ -467,8 +456,9 @@ class DBTableModel(QAbstractTableModel):
             if 0 <= section < len(self._headers):
                 return self._headers[section]
         elif orientation == Qt.Orientation.Vertical:
-            if 0 <= section < len(self._row_headers):
-                return self._row_headers[section]
+            # Заголовки строк не хранятся: на листе может быть миллион строк
+            if 0 <= section <= self.max_row and self._cells is not None:
+                return str(section + 1)
         return None
 
     def setData(self, index: Union[QModelIndex, QPersistentModelIndex], value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool: # <-- Изменено
@@ -481,7 +471,7 @@ class DBTableModel(QAbstractTableModel):
         # 2. Преобразовать index.row(), index.column() в адрес ячейки Excel (e.g., 'A1')
         # 3. Вызвать метод AppController для обновления значения ячейки
         #    app_controller.update_cell_value(self.sheet_name, cell_address, value)
-        # 4. Обновить внутреннее состояние модели (self._data)
+        # 4. Обновить внутреннее состояние модели (self._cells)
         # 5. Вызвать self.dataChanged.emit() для уведомления представления
         #    self.dataChanged.emit(index, index, [role])
         # logger.debug(f"Попытка установки данных в ячейку ({index.row()}, {index.column()}) значение {value}")
@@ -490,7 +480,7 @@ class DBTableModel(QAbstractTableModel):
 
         row = index.row()
         col = index.column()
-        if row >= len(self._data) or col >= len(self._data[0]):
+        if self._cells is None or row > self.max_row or col > self.max_column:
             return False
 
         cell_address = self._index_to_cell_address(row, col)
@@ -498,8 +488,9 @@ class DBTableModel(QAbstractTableModel):
             # Вызов AppController для обновления ячейки
             success = self.app_controller.update_cell_value(self.sheet_name, cell_address, value)
             if success:
-                # Обновляем локальное состояние модели
-                self._data[row][col] = value
+                # Обновляем локальное состояние модели; сохранённый результат прежней формулы больше не актуален
+                self._cells.set(row, col, value)
+                self._formula_values.pop((row, col), None)
                 # Уведомляем представление об изменении
                 self.dataChanged.emit(index, index, [role])
                 logger.info(f"Ячейка {cell_address} обновлена через AppController.")
@@ -574,34 +565,24 @@ class DBTableModel(QAbstractTableModel):
             return
 
         # --- Обновление внутреннего представления модели ---
-        # Увеличиваем размеры _data, если нужно
-        if new_max_row > self.max_row or new_max_column > self.max_column:
-            # Увеличиваем количество строк
-            current_row_count = len(self._data)
-            if new_max_row + 1 > current_row_count:
-                for _ in range(new_max_row + 1 - current_row_count):
-                    self._data.append([None for _ in range(self.max_column + 1)])
-            # Увеличиваем количество столбцов в каждой строке
-            current_col_count = len(self._data[0]) if self._data else 0
-            if new_max_column + 1 > current_col_count:
-                for row in self._data:
-                    row.extend([None for _ in range(new_max_column + 1 - current_col_count)])
+        # Увеличиваем размеры модели, если нужно
+        size_changed = new_max_row > self.max_row or new_max_column > self.max_column
+        if size_changed:
             # Обновляем max_ переменные
             self.max_row = new_max_row
             self.max_column = new_max_column
             # Обновляем заголовки
             self._headers = [self._index_to_column_name(i) for i in range(self.max_column + 1)]
-            self._row_headers = [str(i + 1) for i in range(self.max_row + 1)]
             logger.info(f"Размеры модели увеличены до ({self.max_row + 1}, {self.max_column + 1}).")
 
-        # Заполняем _data новыми значениями
-        for r_idx, row_data in enumerate(parsed_data):
-            for c_idx, cell_value in enumerate(row_data):
-                abs_row = start_row + r_idx
-                abs_col = start_col + c_idx
-                if 0 <= abs_row < len(self._data) and 0 <= abs_col < len(self._data[0]):
-                    self._data[abs_row][abs_col] = cell_value
-                    logger.debug(f"Значение '{cell_value}' вставлено в модель в ячейку ({abs_row}, {abs_col})")
+        # Заполняем загруженные блоки новыми значениями (остальные прочитают их из БД)
+        if self._cells is not None:
+            for r_idx, row_data in enumerate(parsed_data):
+                for c_idx, cell_value in enumerate(row_data):
+                    abs_row = start_row + r_idx
+                    abs_col = start_col + c_idx
+                    self._cells.set(abs_row, abs_col, cell_value)
+                    self._formula_values.pop((abs_row, abs_col), None)
 
         # Уведомляем QTableView об изменениях
         # layoutChanged.emit() говорит представлению, что структура данных (размеры) могла измениться.
@@ -612,7 +593,7 @@ class DBTableModel(QAbstractTableModel):
         # self.dataChanged.emit(top_left, bottom_right, [Qt.DisplayRole])
         # self.layoutChanged.emit() # Это может быть избыточно, если мы точно знаем, что изменили только данные.
         # Более точный способ - уведомить только об изменении данных, если размеры не менялись.
-        # Но так как размеры *могут* измениться, и мы обновляем _data/_headers/_row_headers,
+        # Но так как размеры *могут* измениться, и мы обновляем max_row/max_column/_headers,
         # layoutChanged.emit() более безопасен, чтобы QTableView пересчитал размеры.
         # Однако, layoutChanged может быть ресурсоемким. Попробуем с dataChanged и проверим.
         # Если вставка за пределы текущего размера не отображается сразу, добавим layoutChanged.
@@ -622,7 +603,7 @@ class DBTableModel(QAbstractTableModel):
         self.dataChanged.emit(top_left, bottom_right, [Qt.ItemDataRole.DisplayRole])
 
         # Если размеры таблицы изменились, вызываем layoutChanged.
-        if new_max_row > self.max_row or new_max_column > self.max_column:
+        if size_changed:
              self.layoutChanged.emit()
         # Или, если мы точно уверены, что размеры могли измениться, всегда вызываем layoutChanged.
         # self.layoutChanged.emit() # Это более консервативный подход.
@@ -487,7 +487,7 @@ class TableEditorWidget(QWidget):
                  # Если нет выделения, копируем все загруженные данные из модели
                  # Это зависит от того, как организована модель. Метод get_current_sheet_name() есть.
                  # Но как получить *все* данные из модели TableModel?
-                 # TableModel хранит self._display_data. Но TableModel не предоставляет прямого метода
+                 # TableModel читает ячейки блоками по запросу (RowBlockCache) и не предоставляет прямого метода
                  # для получения всех данных в "сыром" виде. Нужно адаптировать.
                  # Пока используем выделение. Если выделения нет, копируем пустую строку или выводим сообщение.
                  logger.info("Нет выделения. Копирование отменено.")
@@ -14,6 +14,8 @@ from PySide6.QtGui import QFont, QColor, QBrush, QTextOption
 # Импортируем AppController
 from backend.core.app_controller import create_app_controller
 from backend.utils.logger import get_logger
+from backend.storage.cell_values import format_cell_value_for_display
+from backend.utils.row_block_cache import RowBlockCache
 
 logger = get_logger(__name__)
 
@@ -86,9 +88,8 @@ class TableModel(QAbstractTableModel):
         self._sheet_name: Optional[str] = None
         
         # Данные листа
-        self._display_data: List[List[Any]] = []  # Список списков: строки x колонки
-        self._headers: List[str] = []              # Заголовки колонок (A, B, C...)
-        self._row_headers: List[str] = []          # Заголовки строк (1, 2, 3...)
+        self._cells: Optional[RowBlockCache] = None  # Значения ячеек, читаемые блоками строк по запросу
+        self._headers: List[str] = []                # Заголовки колонок (A, B, C...)
         
         # Метаданные листа
         self._max_row = 0
@@ -115,49 +116,12 @@ class TableModel(QAbstractTableModel):
                 self.modelReset.emit() # Уведомить представление о сбросе модели
                 return
 
-            # Получаем "сырые" данные и редактируемые данные из AppController
-            # raw_data_list - это [{'cell_address': 'A1', 'value': '...', 'value_type': '...'}, ...]
-            # editable_data - это {'data': [...], 'styles': [...], 'formulas': [...]}
-            
-            # raw_data_list, editable_data = self.app_controller.get_sheet_data(sheet_name)
-            # Для упрощения, пока используем только raw_data_list
-            # editable_data может быть использован позже для стилей и формул
-            
-            # Получаем только "сырые" данные
-            raw_data_list = self.app_controller.get_sheet_raw_data(sheet_name)
-            
-            if raw_data_list is None:
-                logger.warning(f"Не удалось получить данные для листа '{sheet_name}'.")
-                self._clear_data()
-                self._sheet_name = sheet_name
-                self.modelReset.emit()
-                return
-                
-            logger.debug(f"Получены raw_data для листа '{sheet_name}': {len(raw_data_list) if raw_data_list else 0} записей.")
-
-            # --- Получение метаданных листа ---
-            # Предполагаем, что AppController предоставляет метод для получения метаданных
-            # Например, через self.app_controller.storage.load_sheet_metadata(sheet_name)
-            # Или через специальный метод в AppController
-            # Пока используем заглушку или получим из raw_data
-            
-            # Вычисляем максимальные row/col из raw_data_list
-            calculated_max_row = -1
-            calculated_max_column = -1
-            if raw_data_list:
-                for item in raw_data_list:
-                    cell_addr = item.get('cell_address', '')
-                    if cell_addr:
-                        try:
-                            row, col = _xl_cell_to_row_col(cell_addr)
-                            if row > calculated_max_row:
-                                calculated_max_row = row
-                            if col > calculated_max_column:
-                                calculated_max_column = col
-                        except ValueError as ve:
-                            logger.warning(f"Ошибка преобразования адреса ячейки '{cell_addr}' из raw_data: {ve}")
-
-            logger.debug(f"Вычисленные из raw_data максимальные индексы: calculated_max_row={calculated_max_row}, calculated_max_column={calculated_max_column}")
+            # Размер модели берётся из границ заполненной области, а значения ячеек
+            # читаются блоками строк только для видимого окна (см. RowBlockCache)
+            extent = self.app_controller.get_sheet_extent(sheet_name)
+            # extent - это (max_row, max_col) 1-based; None - на листе нет ячеек
+            calculated_max_row, calculated_max_column = (extent[0] - 1, extent[1] - 1) if extent else (-1, -1)
+            logger.debug(f"Границы листа '{sheet_name}': calculated_max_row={calculated_max_row}, calculated_max_column={calculated_max_column}")
 
             # Используем вычисленные значения или минимальные значения по умолчанию
             self._max_row = max(calculated_max_row, MIN_DISPLAY_ROWS - 1)
@@ -165,38 +129,15 @@ class TableModel(QAbstractTableModel):
             
             logger.info(f"Окончательные размеры модели для '{sheet_name}': max_row={self._max_row}, max_column={self._max_column}")
 
-            # --- Инициализация структуры данных ---
-            # Создаем пустую таблицу размером (max_row + 1) x (max_column + 1)
-            # +1 потому что max_row/max_column - это индексы (0-based), а размер - количество элементов
             self.beginResetModel() # Начинаем сброс модели
             try:
-                self._display_data = [[None for _ in range(self._max_column + 1)] for _ in range(self._max_row + 1)]
+                self._cells = RowBlockCache(
+                    lambda row_start, row_end: [
+                        (row - 1, col - 1, value)
+                        for row, col, value in self.app_controller.load_sheet_cells(sheet_name, row_start + 1, row_end + 1)
+                    ]
+                )
                 self._headers = [_index_to_column_name(i) for i in range(self._max_column + 1)]
-                self._row_headers = [str(i + 1) for i in range(self._max_row + 1)]
-                
-                logger.debug(f"Модель инициализирована. Размеры _display_data: {len(self._display_data)}x{len(self._display_data[0]) if self._display_data else 0}")
-                logger.debug(f"Размеры _headers: {len(self._headers)}, _row_headers: {len(self._row_headers)}")
-
-                # --- Заполнение таблицы данными из raw_data_list ---
-                filled_cells_count = 0
-                for item in raw_data_list:
-                    cell_addr = item.get('cell_address', '')
-                    value = item.get('value', '')
-                    
-                    if cell_addr:
-                        try:
-                            row, col = _xl_cell_to_row_col(cell_addr)
-                            # Проверяем, попадает ли ячейка в инициализированные границы
-                            if 0 <= row < len(self._display_data) and 0 <= col < len(self._display_data[0]):
-                                self._display_data[row][col] = value
-                                filled_cells_count += 1
-                                logger.debug(f"Значение {value} записано в ({row}, {col})")
-                            else:
-                                 logger.warning(f"Ячейка {cell_addr} ({row}, {col}) вне инициализированных границ модели ({len(self._display_data)}, {len(self._display_data[0])}). Пропущена.")
-                        except ValueError as ve:
-                            logger.error(f"Ошибка преобразования адреса ячейки '{cell_addr}' при заполнении _display_data: {ve}")
-                            
-                logger.info(f"Заполнено {filled_cells_count} ячеек в модели для листа '{sheet_name}'.")
                 
                 self._sheet_name = sheet_name
                 
@@ -213,9 +154,8 @@ class TableModel(QAbstractTableModel):
 
     def _clear_data(self):
         """Очищает внутренние данные модели."""
-        self._display_data = []
+        self._cells = None
         self._headers = []
-        self._row_headers = []
         self._max_row = 0
         self._max_column = 0
         self._styles = {}
@@ -225,15 +165,15 @@ class TableModel(QAbstractTableModel):
         """Возвращает количество строк."""
         if parent.isValid():
             return 0
-        # Возвращаем количество строк в данных или минимальное значение
-        return len(self._display_data) if self._display_data else 0
+        # Возвращаем количество строк загруженного листа
+        return self._max_row + 1 if self._cells is not None else 0
 
     def columnCount(self, parent: Union[QModelIndex, QPersistentModelIndex] = QModelIndex()) -> int:
         """Возвращает количество столбцов."""
         if parent.isValid():
             return 0
-        # Возвращаем количество столбцов в данных или минимальное значение
-        return len(self._display_data[0]) if self._display_data else 0
+        # Возвращаем количество столбцов загруженного листа
+        return self._max_column + 1 if self._cells is not None else 0
 
     def data(self, index: Union[QModelIndex, QPersistentModelIndex], role: int = Qt.ItemDataRole.DisplayRole) -> Any:
         """Возвращает данные для указанной ячейки и роли."""
@@ -243,16 +183,16 @@ class TableModel(QAbstractTableModel):
         row = index.row()
         col = index.column()
 
-        if row >= len(self._display_data) or col >= len(self._display_data[0]):
+        if self._cells is None or row > self._max_row or col > self._max_column:
             return None
 
         if role == Qt.ItemDataRole.DisplayRole:
-            value = self._display_data[row][col]
-            # Возвращаем строковое представление значения
-            return str(value) if value is not None else ""
+            value = self._cells.get(row, col)
+            # Значения хранятся в родных типах; в строку (дата 'DD.MM.YYYY' и т.п.) переводим только для отображения
+            return format_cell_value_for_display(value)
         elif role == Qt.ItemDataRole.EditRole:
             # Для редактирования возвращаем "сырое" значение
-            return self._display_data[row][col]
+            return self._cells.get(row, col)
         # elif role == Qt.ItemDataRole.BackgroundRole:
         #     # Вернуть QBrush для фона ячейки на основе стиля
         #     # Пока не реализовано
@@ -283,7 +223,7 @@ class TableModel(QAbstractTableModel):
 
         row = index.row()
         col = index.column()
-        if row >= len(self._display_data) or col >= len(self._display_data[0]):
+        if self._cells is None or row > self._max_row or col > self._max_column:
             return False
 
         cell_address = f"{_index_to_column_name(col)}{row + 1}"
@@ -298,7 +238,7 @@ class TableModel(QAbstractTableModel):
             success = self.app_controller.update_cell_value(self._sheet_name, cell_address, value)
             if success:
                 # Обновляем локальное состояние модели
-                self._display_data[row][col] = value
+                self._cells.set(row, col, value)
                 # Уведомляем представление об изменении
                 self.dataChanged.emit(index, index, [role])
                 logger.info(f"Ячейка {cell_address} обновлена через AppController и модель.")
@@ -327,8 +267,9 @@ class TableModel(QAbstractTableModel):
             if 0 <= section < len(self._headers):
                 return self._headers[section]
         elif orientation == Qt.Orientation.Vertical:
-            if 0 <= section < len(self._row_headers):
-                return self._row_headers[section]
+            # Заголовки строк не хранятся: на листе может быть миллион строк
+            if 0 <= section <= self._max_row and self._cells is not None:
+                return str(section + 1)
         return None
 
     # --- Дополнительные методы для работы с моделью ---
@@ -347,8 +288,8 @@ class TableModel(QAbstractTableModel):
         Returns:
             Any: Значение ячейки или None, если индексы вне диапазона.
         """
-        if 0 <= row < len(self._display_data) and 0 <= col < len(self._display_data[0]):
-            return self._display_data[row][col]
+        if self._cells is not None and 0 <= row <= self._max_row and 0 <= col <= self._max_column:
+            return self._cells.get(row, col)
         return None
         
     def get_cell_address(self, row: int, col: int) -> str:
@@ -0,0 +1,304 @@
+# backend/core/adaptive_chunks.py
+"""
+Адаптивный размер частей (чанков) при импорте по строкам.
+
+Раньше все импортёры читали лист частями по 50 строк. Для узкого листа (3-5 столбцов)
+это слишком мелкие транзакции, для широкого (сотни столбцов) - слишком крупные.
+AdaptiveChunkSizer выбирает число строк в части так, чтобы в ней было около
+target_cells ячеек, а затем подстраивает размер по измеренной пропускной способности:
+
+* размер увеличивается, пока растёт число ячеек в секунду;
+* если рост прекратился, возвращается лучший размер, который периодически перепроверяется;
+* часть, обрабатывавшаяся дольше max_latency секунд, уменьшается вдвое;
+* при нехватке памяти (RSS процесса выше memory_limit_mb) размер уменьшается вдвое
+  и не растёт, пока давление не спадёт.
+
+Явная опция 'chunk_size_rows' отключает адаптацию (фиксированный размер, как раньше).
+
+Пример:
+    sizer = chunk_sizer_from_options(f"'{sheet_name}'", sheet.max_column, options, max_cells=...)
+    while start_row <= total_rows:
+        end_row = min(start_row + sizer.rows - 1, total_rows)
+        ...
+        sizer.record(end_row - start_row + 1, cells_in_chunk)
+    record_chunk_stats(sizer, options)
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Размер части без адаптации (прежнее значение по умолчанию)
+DEFAULT_CHUNK_ROWS = 50
+# Целевое число ячеек в части (в одной транзакции записи) для начального размера
+DEFAULT_TARGET_CELLS = 2_000
+# Часть, обработка которой дольше этого времени, уменьшается (сек.)
+DEFAULT_MAX_CHUNK_LATENCY = 1.0
+# Нижняя граница размера части в ячейках
+_MIN_CHUNK_CELLS = 200
+# Множитель увеличения размера части при пробе
+_GROWTH_FACTOR = 2
+# Относительный прирост пропускной способности, который считается улучшением
+_IMPROVEMENT_TOLERANCE = 0.05
+# Через сколько частей стабильного размера повторяется проба увеличения
+_PROBE_INTERVAL = 8
+# Части с меньшим числом ячеек слишком шумные для замера
+_MIN_MEASURED_CELLS = 100
+
+
+def _process_rss_mb() -> Optional[float]:
+    """
+    Текущий объём резидентной памяти процесса в мегабайтах.
+    Используется psutil, если установлен, иначе /proc/self/statm (Linux).
+
+    Returns:
+        Optional[float]: RSS в МБ или None, если определить не удалось.
+    """
+    try:
+        import psutil  # type: ignore[import-not-found]
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.debug(f"psutil не смог определить RSS процесса: {e}")
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class AdaptiveChunkSizer:
+    """
+    Размер части (в строках) для одного листа.
+
+    Парсер читает текущий размер из rows перед каждой частью, писатель после записи
+    вызывает record(). Время части - интервал между соседними вызовами record(),
+    поэтому в конвейере (import_pipeline) замеряется пропускная способность
+    самой медленной стадии.
+    """
+
+    def __init__(
+        self,
+        columns: Optional[int],
+        label: str = "",
+        target_cells: int = DEFAULT_TARGET_CELLS,
+        fixed_rows: Optional[int] = None,
+        max_cells: Optional[int] = None,
+        max_latency: float = DEFAULT_MAX_CHUNK_LATENCY,
+        memory_limit_mb: Optional[float] = None,
+    ):
+        """
+        Args:
+            columns (Optional[int]): Ширина листа (sheet.max_column).
+            label (str): Имя для логов и сводки.
+            target_cells (int): Целевое число ячеек в части для начального размера.
+            fixed_rows (Optional[int]): Фиксированный размер части; отключает адаптацию.
+            max_cells (Optional[int]): Верхняя граница части в ячейках (бюджет памяти).
+            max_latency (float): Максимальное время обработки одной части (сек.).
+            memory_limit_mb (Optional[float]): Лимит RSS процесса; выше него части уменьшаются.
+        """
+        self.label = label
+        self.columns = max(1, int(columns or 1))
+        self.adaptive = fixed_rows is None
+        self.max_latency = max_latency
+        self.memory_limit_mb = memory_limit_mb
+
+        self.min_rows = max(1, _MIN_CHUNK_CELLS // self.columns)
+        max_cells = max_cells or max(target_cells, _MIN_CHUNK_CELLS) * 64
+        self.max_rows = max(self.min_rows, max_cells // self.columns)
+        if self.adaptive:
+            self.rows = self._clamp(target_cells // self.columns)
+        else:
+            self.rows = max(1, int(fixed_rows))
+        self.initial_rows = self.rows
+
+        # Лучший замеренный размер и его пропускная способность (ячеек/сек)
+        self._best_rows: Optional[int] = None
+        self._best_throughput = 0.0
+        self._growing = True
+        self._stable_chunks = 0
+        self._under_pressure = False
+        self._last_time = time.perf_counter()
+
+        self.chunks = 0
+        self.total_rows = 0
+        self.total_cells = 0
+        self.total_seconds = 0.0
+        # Смены размера: {'chunk', 'rows', 'reason'}
+        self.history: List[Dict[str, Any]] = [{"chunk": 0, "rows": self.rows, "reason": "initial"}]
+
+    def _clamp(self, rows: int) -> int:
+        return max(self.min_rows, min(self.max_rows, int(rows)))
+
+    def _resize(self, rows: int, reason: str):
+        rows = self._clamp(rows)
+        if rows == self.rows:
+            return
+        logger.debug(f"Размер части {self.label}: {self.rows} -> {rows} строк ({reason}).")
+        self.rows = rows
+        self.history.append({"chunk": self.chunks, "rows": rows, "reason": reason})
+
+    def _memory_pressure(self) -> bool:
+        if not self.memory_limit_mb:
+            return False
+        rss_mb = _process_rss_mb()
+        return rss_mb is not None and rss_mb > self.memory_limit_mb
+
+    def record(self, rows: int, cells: Optional[int] = None):
+        """
+        Учитывает обработанную часть и выбирает размер следующей.
+
+        Args:
+            rows (int): Число строк в части.
+            cells (Optional[int]): Число записанных (непустых) ячеек части;
+                None - все ячейки части (rows * columns), если просматривается каждая ячейка.
+        """
+        if cells is None:
+            cells = rows * self.columns
+        now = time.perf_counter()
+        elapsed = now - self._last_time
+        self._last_time = now
+        self.chunks += 1
+        self.total_rows += rows
+        self.total_cells += cells
+        self.total_seconds += elapsed
+        if not self.adaptive:
+            return
+
+        if self._memory_pressure():
+            self._under_pressure = True
+            self._growing = False
+            self._resize(self.rows // 2, "memory")
+            return
+        if self._under_pressure:
+            # Давление спало: снова пробуем увеличивать размер от текущего
+            self._under_pressure = False
+            self._best_rows = None
+            self._growing = True
+
+        if elapsed > self.max_latency and rows > self.min_rows:
+            # Слишком долгая транзакция: уменьшаем и не поднимаемся выше
+            self.max_rows = max(self.min_rows, rows // 2)
+            self._best_rows = None
+            self._growing = False
+            self._resize(rows // 2, "latency")
+            return
+
+        # Размер решений меняют только замеры части текущего размера
+        # (в конвейере парсер успевает подготовить части прежнего размера)
+        if rows != self.rows or cells < _MIN_MEASURED_CELLS or elapsed <= 0:
+            return
+        throughput = cells / elapsed
+
+        if self._growing:
+            if self._best_rows is None or throughput > self._best_throughput * (1 + _IMPROVEMENT_TOLERANCE):
+                self._best_rows = rows
+                self._best_throughput = throughput
+                if rows >= self.max_rows:
+                    self._growing = False
+                    self._stable_chunks = 0
+                else:
+                    self._resize(rows * _GROWTH_FACTOR, "throughput")
+            else:
+                # Увеличение не дало прироста: возвращаемся к лучшему размеру
+                self._growing = False
+                self._stable_chunks = 0
+                self._resize(self._best_rows, "best")
+            return
+
+        self._stable_chunks += 1
+        if self._stable_chunks >= _PROBE_INTERVAL and self.rows < self.max_rows:
+            # Условия могли измениться (кэш, размер строк): перепроверяем увеличение
+            self._best_rows = rows
+            self._best_throughput = throughput
+            self._growing = True
+            self._resize(rows * _GROWTH_FACTOR, "probe")
+
+    def stats(self) -> Dict[str, Any]:
+        """Сводка выбранных размеров и пропускной способности (для сводки импорта)."""
+        sizes = [entry["rows"] for entry in self.history]
+        return {
+            "label": self.label,
+            "adaptive": self.adaptive,
+            "columns": self.columns,
+            "initial_rows": self.initial_rows,
+            "final_rows": self.rows,
+            "min_rows_used": min(sizes),
+            "max_rows_used": max(sizes),
+            "chunks": self.chunks,
+            "rows": self.total_rows,
+            "cells": self.total_cells,
+            "seconds": round(self.total_seconds, 3),
+            "cells_per_second": round(self.total_cells / self.total_seconds) if self.total_seconds > 0 else None,
+            "history": list(self.history),
+        }
+
+    def summary(self) -> str:
+        """Однострочная сводка для лога."""
+        stats = self.stats()
+        mode = "адаптивно" if self.adaptive else "фиксированно"
+        return (
+            f"Части {self.label} ({mode}, {stats['columns']} столбцов): {stats['chunks']} частей, "
+            f"размер {stats['initial_rows']} -> {stats['final_rows']} строк "
+            f"(от {stats['min_rows_used']} до {stats['max_rows_used']}), "
+            f"{stats['cells']} ячеек за {stats['seconds']:.2f} с."
+        )
+
+
+def chunk_sizer_from_options(
+    label: str,
+    columns: Optional[int],
+    options: Optional[Dict[str, Any]],
+    max_cells: Optional[int] = None,
+) -> AdaptiveChunkSizer:
+    """
+    Создаёт AdaptiveChunkSizer по опциям импорта.
+
+    Опции:
+        'chunk_size_rows': int      - фиксированный размер части (адаптация отключается);
+        'adaptive_chunks': bool     - False - фиксированные части по DEFAULT_CHUNK_ROWS строк;
+        'chunk_target_cells': int   - целевое число ячеек в части (по умолчанию DEFAULT_TARGET_CELLS);
+        'chunk_max_latency': float  - максимальное время одной части, сек.;
+        'memory_limit_mb': int      - лимит RSS процесса, выше которого части уменьшаются.
+
+    Args:
+        label (str): Имя для логов (обычно имя листа).
+        columns (Optional[int]): Ширина листа.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+        max_cells (Optional[int]): Верхняя граница части в ячейках.
+
+    Returns:
+        AdaptiveChunkSizer: Экземпляр для одного листа.
+    """
+    options = options or {}
+    fixed_rows = options.get('chunk_size_rows')
+    if not fixed_rows and options.get('adaptive_chunks') is False:
+        fixed_rows = DEFAULT_CHUNK_ROWS
+    return AdaptiveChunkSizer(
+        columns,
+        label=label,
+        target_cells=int(options.get('chunk_target_cells') or DEFAULT_TARGET_CELLS),
+        fixed_rows=int(fixed_rows) if fixed_rows else None,
+        max_cells=max_cells,
+        max_latency=float(options.get('chunk_max_latency') or DEFAULT_MAX_CHUNK_LATENCY),
+        memory_limit_mb=options.get('memory_limit_mb'),
+    )
+
+
+def record_chunk_stats(sizer: AdaptiveChunkSizer, options: Optional[Dict[str, Any]]):
+    """
+    Пишет выбранные размеры частей в лог и, если вызывающая сторона передала список
+    options['chunk_stats'], добавляет в него sizer.stats().
+    """
+    logger.info(sizer.summary())
+    sink = (options or {}).get('chunk_stats')
+    if isinstance(sink, list):
+        sink.append(sizer.stats())
+
+# Дополнительные функции выбора размера частей (если потребуются) могут быть добавлены здесь
@@ -207,9 +207,9 @@ class AppController:
 
         logger.info(f"AppController: Запуск импорта всех данных из {file_path} через app_controller_data_import.py (БД: {target_db_path}).")
 
-        # Создаём временное соединение с БД
+        # Хранилище работает через пул соединений (писатель сериализуется между потоками)
         storage = ProjectDBStorage(target_db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"AppController: Не удалось подключиться к БД проекта {target_db_path}.")
             return False
 
@@ -224,8 +224,192 @@ class AppController:
             logger.error(f"AppController: Ошибка при импорте всех данных из '{file_path}': {e}", exc_info=True)
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"AppController: Соединение с БД {target_db_path} закрыто после импорта.")
+            storage.release_thread_connections()
+            logger.debug(f"AppController: Соединение потока с БД {target_db_path} освобождено после импорта.")
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Параллельный импорт значений и формул по листам ---
+    def import_raw_data_parallel_from_excel(self, file_path: str, db_path: Optional[str] = None, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Импортирует значения и формулы, разбирая листы параллельно в пуле процессов.
+        Запись в БД выполняет один писатель (см. backend/core/parallel_import.py).
+
+        Args:
+            file_path (str): Путь к Excel-файлу для импорта.
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],  # Список имён листов для импорта.
+                    'max_workers': int,   # Число процессов разбора.
+                    'batch_cells': int,   # Размер пакета ячеек.
+                    'queue_size': int,    # Ёмкость очереди пакетов.
+                    'values_only': bool,  # Импортировать результаты формул вместо формул.
+                }
+
+        Returns:
+            bool: True, если импорт успешен, иначе False.
+        """
+        if not self.storage:
+            logger.error("Проект не загружен. Невозможно выполнить импорт.")
+            return False
+
+        target_db_path = db_path or self.project_db_path
+        logger.info(f"AppController: Запуск параллельного импорта из {file_path} (БД: {target_db_path}).")
+
+        storage = ProjectDBStorage(target_db_path)
+        if not storage.check_connection():
+            logger.error(f"AppController: Не удалось подключиться к БД проекта {target_db_path}.")
+            return False
+
+        try:
+            from backend.core.parallel_import import import_sheets_in_parallel
+            return import_sheets_in_parallel(storage, file_path, options, progress_callback)
+        except Exception as e:
+            logger.error(f"AppController: Ошибка при параллельном импорте из '{file_path}': {e}", exc_info=True)
+            return False
+        finally:
+            storage.release_thread_connections()
+            logger.debug(f"AppController: Соединение потока с БД {target_db_path} освобождено после импорта.")
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Инкрементальный повторный импорт ---
+    def import_incremental_from_excel(self, file_path: str, db_path: Optional[str] = None, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Повторно импортирует значения и формулы, записывая только изменившиеся ячейки
+        (сравнение по отпечаткам блоков строк, см. app_controller_data_import.import_incremental_from_excel).
+
+        Args:
+            file_path (str): Путь к Excel-файлу для импорта.
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],    # Список имён листов для импорта.
+                    'change_summary': dict, # Словарь, в который записывается сводка изменений.
+                }
+
+        Returns:
+            bool: True, если импорт успешен, иначе False.
+        """
+        if not self.storage:
+            logger.error("Проект не загружен. Невозможно выполнить импорт.")
+            return False
+
+        target_db_path = db_path or self.project_db_path
+        logger.info(f"AppController: Запуск инкрементального импорта из {file_path} (БД: {target_db_path}).")
+
+        storage = ProjectDBStorage(target_db_path)
+        if not storage.check_connection():
+            logger.error(f"AppController: Не удалось подключиться к БД проекта {target_db_path}.")
+            return False
+
+        try:
+            from backend.core.app_controller_data_import import import_incremental_from_excel
+            return import_incremental_from_excel(storage, file_path, options, progress_callback)
+        except Exception as e:
+            logger.error(f"AppController: Ошибка при инкрементальном импорте из '{file_path}': {e}", exc_info=True)
+            return False
+        finally:
+            storage.release_thread_connections()
+            logger.debug(f"AppController: Соединение потока с БД {target_db_path} освобождено после импорта.")
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Импорт формул с сохранёнными результатами ---
+    def import_formulas_with_values_from_excel(self, file_path: str, db_path: Optional[str] = None, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Импортирует значения, формулы и сохранённые результаты формул за один разбор листа.
+        Делегирует ImportManager.
+
+        Args:
+            file_path (str): Путь к Excel-файлу для импорта.
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],  # Список имён листов для импорта.
+                }
+
+        Returns:
+            bool: True, если импорт успешен, иначе False.
+        """
+        if not self.storage:
+            logger.error("Проект не загружен. Невозможно выполнить импорт.")
+            return False
+
+        target_db_path = db_path or self.project_db_path
+        logger.info(f"AppController: Делегирование импорта формул с результатами из {file_path} (БД: {target_db_path}) ImportManager.")
+        return self.import_manager.perform_import_formulas_with_values(file_path, target_db_path, progress_callback, options)
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Потоковый импорт с контрольными точками ---
+    def import_streaming_data_from_excel(self, file_path: str, db_path: Optional[str] = None, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Импортирует значения, формулы и стили потоково (openpyxl read_only); прерванный
+        импорт того же файла продолжается с последней зафиксированной части.
+        Делегирует ImportManager.
+
+        Args:
+            file_path (str): Путь к Excel-файлу для импорта.
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],  # Список имён листов для импорта.
+                    'resume': bool,       # Продолжить прерванный импорт (по умолчанию True)
+                }
+
+        Returns:
+            bool: True, если импорт успешен, иначе False.
+        """
+        if not self.storage:
+            logger.error("Проект не загружен. Невозможно выполнить импорт.")
+            return False
+
+        target_db_path = db_path or self.project_db_path
+        logger.info(f"AppController: Делегирование потокового импорта из {file_path} (БД: {target_db_path}) ImportManager.")
+        return self.import_manager.perform_import_streaming(file_path, target_db_path, progress_callback, options)
+
+    def get_import_checkpoint(self, db_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает контрольную точку прерванного потокового импорта (или None).
+
+        Args:
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+        """
+        target_db_path = db_path or self.project_db_path
+        if not target_db_path:
+            return None
+        return self.import_manager.get_import_checkpoint(target_db_path)
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Автоматический выбор способа импорта ---
+    def import_auto_data_from_excel(self, file_path: str, db_path: Optional[str] = None, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Импортирует книгу способом, выбранным по её осмотру (размер, оформление, формулы,
+        диаграммы, свободная память, число ядер). Делегирует ImportManager.
+
+        Args:
+            file_path (str): Путь к Excel-файлу для импорта.
+            db_path (Optional[str]): Путь к БД проекта. Если None, используется self.project_db_path.
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],     # Список имён листов для импорта.
+                    'memory_limit_mb': int,  # Лимит памяти импорта.
+                    'import_plan': dict,     # Словарь, в который записывается выбранный план.
+                }
+
+        Returns:
+            bool: True, если импорт успешен, иначе False.
+        """
+        if not self.storage:
+            logger.error("Проект не загружен. Невозможно выполнить импорт.")
+            return False
+
+        target_db_path = db_path or self.project_db_path
+        logger.info(f"AppController: Делегирование автоматического импорта из {file_path} (БД: {target_db_path}) ImportManager.")
+        return self.import_manager.perform_import_auto(file_path, target_db_path, progress_callback, options)
     # --- КОНЕЦ НОВОГО ---
 
     # --- НОВОЕ: Методы для импорта "только" по типам, делегирующие ImportManager ---
@@ -460,6 +644,22 @@ class AppController:
         """Получает "сырые" данные листа (включая формулы, стили и т.д.)."""
         return self.data_manager.get_sheet_raw_data(sheet_name)
 
+    def get_sheet_extent(self, sheet_name: str) -> Optional[Tuple[int, int]]:
+        """Получает границы заполненной области листа (max_row, max_col)."""
+        return self.data_manager.get_sheet_extent(sheet_name)
+
+    def load_sheet_cells(self, sheet_name: str, row0: int, row1: int, col0: int = 1, col1: Optional[int] = None) -> List[Tuple[int, int, Any]]:
+        """Загружает значения ячеек диапазона листа (row, col, value)."""
+        return self.data_manager.load_sheet_cells(sheet_name, row0, row1, col0, col1)
+
+    def get_sheet_formula_values(self, sheet_name: str) -> Dict[str, Any]:
+        """Получает сохранённые результаты формул листа {адрес: значение}."""
+        return self.data_manager.get_sheet_formula_values(sheet_name)
+
+    def recalculate_formulas(self, sheet_names: Optional[List[str]] = None, progress_callback: Optional[Callable[..., None]] = None) -> Optional[Dict[str, Any]]:
+        """Пересчитывает формулы листов (по умолчанию всех) и сохраняет результаты."""
+        return self.data_manager.recalculate_formulas(sheet_names, progress_callback)
+
     def update_sheet_cell_in_project(self, sheet_name: str, row_index: int, column_name: str, new_value: str) -> bool:
         """Обновляет значение ячейки в проекте."""
         return self.data_manager.update_sheet_cell_in_project(sheet_name, row_index, column_name, new_value)
@@ -472,6 +672,21 @@ class AppController:
         """Получает историю редактирования."""
         return self.data_manager.get_edit_history(sheet_name, limit)
 
+    def load_sheet_style_refs(self, sheet_id: int) -> Dict[str, Any]:
+        """
+        Получает стили листа: словарь стилей {style_id: JSON} и ссылки [(range_address, style_id), ...].
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Dict[str, Any]: {'styles': {...}, 'ranges': [...]}. Пустые коллекции, если проект не загружен.
+        """
+        if not self.storage:
+            logger.error("Нет подключения к БД для загрузки стилей листа.")
+            return {"styles": {}, "ranges": []}
+        return self.storage.load_sheet_style_refs(sheet_id)
+
     def get_sheet_names(self) -> List[str]:
         """
         Получает список имен листов из текущего проекта.
@@ -479,15 +694,17 @@ class AppController:
         Returns:
             List[str]: Список имен листов. Возвращает пустой список в случае ошибки или отсутствия подключения.
         """
-        if not self.storage or not self.storage.connection:
+        if not self.storage:
             logger.error("Нет подключения к БД для получения списка листов.")
             return []
 
         try:
-            cursor = self.storage.connection.cursor()
-            # Используем правильное имя столбца 'name' из таблицы 'sheets'
-            cursor.execute("SELECT name FROM sheets ORDER BY name;")
-            rows = cursor.fetchall()
+            # Соединение только для чтения текущего потока из пула
+            with self.storage.get_read_connection() as conn:
+                cursor = conn.cursor()
+                # Используем правильное имя столбца 'name' из таблицы 'sheets'
+                cursor.execute("SELECT name FROM sheets ORDER BY name;")
+                rows = cursor.fetchall()
             sheet_names = [row[0] for row in rows]
             logger.info(f"Получено {len(sheet_names)} имен листов из БД.")
             return sheet_names
@@ -13,7 +13,8 @@
 
 import logging
 import os
-from typing import Dict, Any, List, Optional, Union
+import functools
+from typing import Callable, Dict, Any, List, Optional, Union
 import openpyxl
 from openpyxl.worksheet.worksheet import Worksheet
 import pandas as pd
@@ -23,13 +24,21 @@ from openpyxl.utils import get_column_letter
 
 # Импортируем logger из utils
 from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressReporter
 
 # Импортируем функции из analyzer
 # Исправлено: Импорт из правильного модуля и с правильными именами
-from backend.analyzer.logic_documentation import _serialize_style, _serialize_chart
+from backend.analyzer.logic_documentation import _serialize_chart, StyleRangeCompactor, StyleSerializationCache
 
 # Импортируем ProjectDBStorage
 from backend.storage.base import ProjectDBStorage
+from backend.storage.cells import row_col_to_address
+from backend.importer.xlsx_fast_reader import FastXlsxReader, UnsupportedXlsxFeature, SUPPORTED_EXTENSIONS as FAST_READER_EXTENSIONS, iter_sheet_cells_openpyxl
+from backend.storage.cell_values import encode_cell_value
+from backend.storage.fingerprints import SOURCE_BLOCK, block_of_row, fingerprint_block
+from backend.core.import_pipeline import pipeline_from_options, record_pipeline_stats
+from backend.core.import_checkpoints import ImportCheckpoint
+from backend.core.adaptive_chunks import chunk_sizer_from_options, record_chunk_stats
 
 logger = get_logger(__name__)
 
@@ -55,8 +64,47 @@ logger = get_logger(__name__)
 #         return None
 
 
+# --- НОВОЕ: Массовая запись в одной транзакции ---
+
+class _ImportFailed(Exception):
+    """Функция импорта вернула False: сессия массовой записи откатывается."""
+
+
+def _in_bulk_session(import_func):
+    """
+    Декоратор для функций импорта: выполняет импорт внутри storage.bulk_session().
+    Функции storage больше не делают commit после каждой части - вся запись идёт
+    в одной транзакции с периодическими SAVEPOINT и фиксируется один раз в конце.
+    Вложенные вызовы (например, import_all_data_from_excel -> import_raw_data_from_excel)
+    используют уже открытую сессию. Дополнительные аргументы (progress_callback) передаются как есть.
+    Функции импорта сообщают об ошибке возвратом False, а не исключением, поэтому при False
+    внешняя сессия откатывается, а не фиксирует частично записанные данные (потоковый импорт
+    фиксирует каждую часть сам через flush_bulk_session и теряет только незавершённую).
+    """
+    @functools.wraps(import_func)
+    def wrapper(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None, *args, **kwargs) -> bool:
+        if not storage or storage._active_bulk_session() is not None:
+            return import_func(storage, file_path, options, *args, **kwargs)
+        try:
+            with storage.bulk_session():
+                if not import_func(storage, file_path, options, *args, **kwargs):
+                    raise _ImportFailed()
+        except _ImportFailed:
+            return False
+        return True
+    return wrapper
+
+
+def _pair_batch_size(batch) -> int:
+    """Число элементов пакета (значения, формулы, ...) для счётчиков конвейера импорта."""
+    return len(batch[0]) + len(batch[1])
+
+# --- КОНЕЦ НОВОГО ---
+
+
 # --- Функции для импорта "всё" по типам ---
 
+@_in_bulk_session
 def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует только "сырые" данные (значения ячеек) из Excel-файла в БД проекта.
@@ -68,8 +116,11 @@ def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, option
         file_path (str): Путь к Excel-файлу для импорта.
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
-                'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
+                'sheets': List[str],    # Список имён листов для импорта. Если пуст, все.
+                'fast_reader': bool,    # Быстрое чтение XML листа без openpyxl (по умолчанию True)
+                'pipeline': bool        # Разбор в фоновом потоке параллельно с записью (по умолчанию - при > 1 ядре),
+                                        # см. backend/core/import_pipeline.py
             }
 
     Returns:
@@ -85,6 +136,12 @@ def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, option
 
     logger.info(f"Начало импорта 'сырых' данных из Excel-файла: {file_path}")
 
+    # Быстрый путь: XML листа без объектов ячеек openpyxl (при неподдерживаемых элементах - openpyxl)
+    fast_result = _try_fast_reader(storage, file_path, options, value_source='formula', import_formulas=False)
+    if fast_result is not None:
+        logger.info(f"Импорт из '{file_path}' выполнен через быстрое чтение XML.")
+        return fast_result
+
     try:
         # --- НОВОЕ: Обработка ошибки Nested.from_tree ---
         try:
@@ -125,7 +182,7 @@ def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, option
 
             sheet: Worksheet = workbook[sheet_name]
             total_rows = sheet.max_row
-            chunk_size = options.get('chunk_size_rows', 50) if options else 50 # <-- ИЗМЕНЕНО С 100 НА 50
+            sizer = _row_chunk_sizer(sheet_name, sheet, options)
             
             # Исправление: Обработка случая, когда лист пуст (max_row возвращает None)
             if total_rows is None:
@@ -133,29 +190,44 @@ def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, option
                 total_rows = 0
                 # Цикл while ниже не выполнится, так как start_row (1) > total_rows (0)
 
-            start_row = 1 # openpyxl использует 1-based индексацию
-            while start_row <= total_rows:
-                end_row = min(start_row + chunk_size - 1, total_rows)
-                logger.debug(f"Обработка строки {start_row} - {end_row} (чанк).")
-
-                raw_data_list = []
-                # Используем iter_rows с указанием min_row и max_row для "части"
-                for row in sheet.iter_rows(min_row=start_row, max_row=end_row, values_only=False):
-                    for cell in row:
-                        if cell.value is not None or cell.data_type == 'f':
-                            data_item = {
-                                "cell_address": cell.coordinate,
-                                "value": cell.value,
-                            }
-                            raw_data_list.append(data_item)
-
+            def iter_chunks(sheet=sheet, total_rows=total_rows, sizer=sizer):
+                start_row = 1 # openpyxl использует 1-based индексацию
+                while start_row <= total_rows:
+                    # Размер читается перед каждой частью: писатель подстраивает его по замерам
+                    end_row = min(start_row + sizer.rows - 1, total_rows)
+                    logger.debug(f"Обработка строки {start_row} - {end_row} (чанк).")
+
+                    raw_data_list = []
+                    # Используем iter_rows с указанием min_row и max_row для "части"
+                    for row in sheet.iter_rows(min_row=start_row, max_row=end_row, values_only=False):
+                        for cell in row:
+                            if cell.value is not None or cell.data_type == 'f':
+                                data_item = {
+                                    "cell_address": cell.coordinate,
+                                    "value": cell.value,
+                                }
+                                if cell.data_type == 'e':
+                                    data_item["value_type"] = "error"
+                                raw_data_list.append(data_item)
+                    yield start_row, end_row, raw_data_list
+
+                    start_row = end_row + 1 # Переходим к следующей части
+
+            def write(chunk, sheet_name=sheet_name, sizer=sizer) -> bool:
+                start_row, end_row, raw_data_list = chunk
                 if not storage.save_sheet_raw_data(sheet_name, raw_data_list):
                     logger.error(f"Не удалось сохранить 'сырые данные' для листа '{sheet_name}' (часть строки {start_row}-{end_row}).")
                     return False
-
                 logger.debug(f"Сохранена часть данных с {start_row} по {end_row} для листа '{sheet_name}'.")
+                sizer.record(end_row - start_row + 1, len(raw_data_list))
+                return True
 
-                start_row = end_row + 1 # Переходим к следующей части
+            # Обход ячеек идёт в фоновом потоке, пока текущий поток пишет предыдущую часть
+            pipeline = pipeline_from_options(f"'{sheet_name}' (openpyxl)", options)
+            if not pipeline.run(iter_chunks(), write, count=lambda chunk: len(chunk[2])):
+                return False
+            record_pipeline_stats(pipeline, options)
+            record_chunk_stats(sizer, options)
 
         logger.info(f"Импорт 'сырых' данных из '{file_path}' завершён.")
         return True
@@ -163,6 +235,7 @@ def import_raw_data_from_excel(storage: ProjectDBStorage, file_path: str, option
     except Exception as e:
         logger.error(f"Ошибка при импорте 'сырых' данных из файла '{file_path}': {e}", exc_info=True)
         return False
+@_in_bulk_session
 def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует только "сырые" значения (результаты формул и значения ячеек) из Excel-файла в БД проекта.
@@ -174,8 +247,9 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
         file_path (str): Путь к Excel-файлу для импорта.
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
-                'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
+                'sheets': List[str],    # Список имён листов для импорта. Если пуст, все.
+                'fast_reader': bool     # Быстрое чтение XML листа без openpyxl (по умолчанию True)
             }
 
     Returns:
@@ -191,6 +265,12 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
 
     logger.info(f"Начало импорта 'сырых' значений (только результаты) из Excel-файла: {file_path}")
 
+    # Быстрый путь: XML листа без объектов ячеек openpyxl (при неподдерживаемых элементах - openpyxl)
+    fast_result = _try_fast_reader(storage, file_path, options, value_source='cached', import_formulas=False)
+    if fast_result is not None:
+        logger.info(f"Импорт из '{file_path}' выполнен через быстрое чтение XML.")
+        return fast_result
+
     try:
         # --- НОВОЕ: Обработка ошибки Nested.from_tree ---
         try:
@@ -232,7 +312,7 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
 
             sheet: Worksheet = workbook[sheet_name]
             total_rows = sheet.max_row
-            chunk_size = options.get('chunk_size_rows', 50) if options else 50 # <-- ИЗМЕНЕНО С 100 НА 50
+            sizer = _row_chunk_sizer(sheet_name, sheet, options)
             
             # Исправление: Обработка случая, когда лист пуст (max_row возвращает None)
             if total_rows is None:
@@ -242,7 +322,7 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
 
             start_row = 1 # openpyxl использует 1-based индексацию
             while start_row <= total_rows:
-                end_row = min(start_row + chunk_size - 1, total_rows)
+                end_row = min(start_row + sizer.rows - 1, total_rows)
                 logger.debug(f"Обработка строки {start_row} - {end_row} (чанк).")
 
                 raw_data_list = []
@@ -255,6 +335,8 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
                                 "cell_address": cell.coordinate,
                                 "value": cell.value, # <-- Это будет результат или значение
                             }
+                            if cell.data_type == 'e':
+                                data_item["value_type"] = "error"
                             raw_data_list.append(data_item)
 
                 if not storage.save_sheet_raw_data(sheet_name, raw_data_list):
@@ -262,8 +344,10 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
                     return False
 
                 logger.debug(f"Сохранена часть данных с {start_row} по {end_row} для листа '{sheet_name}'.")
+                sizer.record(end_row - start_row + 1, len(raw_data_list))
 
                 start_row = end_row + 1 # Переходим к следующей части
+            record_chunk_stats(sizer, options)
 
         logger.info(f"Импорт 'сырых' значений (только результаты) из '{file_path}' завершён.")
         return True
@@ -274,6 +358,7 @@ def import_raw_values_only_from_excel(storage: ProjectDBStorage, file_path: str,
 
 # --- ПЕРВАЯ НЕПРАВИЛЬНАЯ ФУНКЦИЯ import_styles_from_excel УДАЛЕНА ---
 
+@_in_bulk_session
 def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует только стили из Excel-файла в БД проекта.
@@ -284,7 +369,7 @@ def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options:
         file_path (str): Путь к Excel-файлу для импорта.
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
             }
 
@@ -321,8 +406,8 @@ def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options:
 
         # Явно приводим элементы к str для устранения ошибки Pylance
         sheets_to_import: List[str] = [str(name) for name in sheets_to_import_orig]
-
-        import json
+        # Каждая запись стиля книги сериализуется один раз для всех листов
+        style_cache = StyleSerializationCache()
 
         for sheet_name_orig in sheets_to_import:
             # Убедимся, что имя листа - строка
@@ -343,7 +428,7 @@ def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options:
 
             sheet: Worksheet = workbook[sheet_name]
             total_rows = sheet.max_row
-            chunk_size = options.get('chunk_size_rows', 50) if options else 50 # <-- ИЗМЕНЕНО С 100 НА 50
+            sizer = _row_chunk_sizer(sheet_name, sheet, options)
             
             # Исправление: Обработка случая, когда лист пуст (max_row возвращает None)
             if total_rows is None:
@@ -351,42 +436,37 @@ def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options:
                 total_rows = 0
                 # Цикл while ниже не выполнится, так как start_row (1) > total_rows (0)
 
+            # Ячейки одного стиля объединяются в прямоугольные диапазоны по всему листу
+            # (диапазон может продолжаться через границы частей), сохранение - одним пакетом на лист.
+            compactor = StyleRangeCompactor()
+
             start_row = 1 # openpyxl использует 1-based индексацию
             while start_row <= total_rows:
-                end_row = min(start_row + chunk_size - 1, total_rows)
+                end_row = min(start_row + sizer.rows - 1, total_rows)
                 logger.debug(f"Обработка строки {start_row} - {end_row} для стилей (чанк).")
 
-                style_ranges_map: Dict[str, List[str]] = {}
-
                 # Используем iter_rows с указанием min_row и max_row для "части"
                 for row in sheet.iter_rows(min_row=start_row, max_row=end_row, values_only=False):
                     for cell in row:
-                        style_dict = _serialize_style(cell)
-                        if style_dict:
-                            style_json = json.dumps(style_dict, sort_keys=True)
-                            coord = cell.coordinate
-
-                            if style_json in style_ranges_map:
-                                style_ranges_map[style_json].append(coord)
-                            else:
-                                style_ranges_map[style_json] = [coord]
-
-                styles_to_save = []
-                for style_json, cell_addresses in style_ranges_map.items():
-                    for address in cell_addresses:
-                        styles_to_save.append({
-                            "range_address": address,
-                            "style_attributes": style_json
-                        })
-
-                if not storage.save_sheet_styles(sheet_id, styles_to_save):
-                    logger.error(f"Не удалось сохранить стили для листа '{sheet_name}' (часть строки {start_row}-{end_row}).")
-                    return False
+                        style_json = style_cache.style_json(cell)
+                        if style_json:
+                            compactor.add(style_json, cell.row, cell.column)
 
-                logger.debug(f"Сохранена часть стилей с {start_row} по {end_row} для листа '{sheet_name}'.")
+                logger.debug(f"Обработана часть стилей с {start_row} по {end_row} для листа '{sheet_name}'.")
+                sizer.record(end_row - start_row + 1) # просматривается каждая ячейка части
 
                 start_row = end_row + 1 # Переходим к следующей части
 
+            styles_to_save = [
+                {"range_address": range_address, "style_attributes": style_json}
+                for style_json, range_address in compactor.finish()
+            ]
+            if not storage.save_sheet_styles(sheet_id, styles_to_save):
+                logger.error(f"Не удалось сохранить стили для листа '{sheet_name}'.")
+                return False
+            logger.debug(f"Сохранено {len(styles_to_save)} диапазонов стилей для листа '{sheet_name}'.")
+            record_chunk_stats(sizer, options)
+
         logger.info(f"Импорт стилей из '{file_path}' завершён.")
         return True
 
@@ -394,6 +474,7 @@ def import_styles_from_excel(storage: ProjectDBStorage, file_path: str, options:
         logger.error(f"Ошибка при импорте стилей из файла '{file_path}': {e}", exc_info=True)
         return False
 
+@_in_bulk_session
 def import_charts_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует только диаграммы из Excel-файла в БД проекта.
@@ -490,6 +571,7 @@ def import_charts_from_excel(storage: ProjectDBStorage, file_path: str, options:
         logger.error(f"Ошибка при импорте диаграмм из файла '{file_path}': {e}", exc_info=True)
         return False
 
+@_in_bulk_session
 def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует только формулы из Excel-файла в БД проекта.
@@ -500,8 +582,9 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
         file_path (str): Путь к Excel-файлу для импорта.
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
-                'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
+                'sheets': List[str],    # Список имён листов для импорта. Если пуст, все.
+                'fast_reader': bool     # Быстрое чтение XML листа без openpyxl (по умолчанию True)
             }
 
     Returns:
@@ -517,6 +600,12 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
 
     logger.info(f"Начало импорта формул из Excel-файла: {file_path}")
 
+    # Быстрый путь: XML листа без объектов ячеек openpyxl (при неподдерживаемых элементах - openpyxl)
+    fast_result = _try_fast_reader(storage, file_path, options, value_source=None, import_formulas=True)
+    if fast_result is not None:
+        logger.info(f"Импорт из '{file_path}' выполнен через быстрое чтение XML.")
+        return fast_result
+
     try:
         # --- НОВОЕ: Обработка ошибки Nested.from_tree ---
         try:
@@ -557,7 +646,7 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
 
             sheet: Worksheet = workbook[sheet_name]
             total_rows = sheet.max_row
-            chunk_size = options.get('chunk_size_rows', 50) if options else 50 # <-- ИЗМЕНЕНО С 100 НА 50
+            sizer = _row_chunk_sizer(sheet_name, sheet, options)
             
             # Исправление: Обработка случая, когда лист пуст (max_row возвращает None)
             if total_rows is None:
@@ -565,9 +654,15 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
                 total_rows = 0
                 # Цикл while ниже не выполнится, так как start_row (1) > total_rows (0)
 
+            # Старые формулы листа удаляются один раз, части ниже дописываются (replace=False).
+            # Раньше каждая часть удаляла формулы предыдущих частей и сохранялась только последняя.
+            if not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+                return False
+
             start_row = 1 # openpyxl использует 1-based индексацию
             while start_row <= total_rows:
-                end_row = min(start_row + chunk_size - 1, total_rows)
+                end_row = min(start_row + sizer.rows - 1, total_rows)
                 logger.debug(f"Обработка строки {start_row} - {end_row} для формул (чанк).")
 
                 formulas_list = []
@@ -581,13 +676,16 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
                                  "formula": cell.value # Сохраняем формулу как есть, включая '='
                              })
 
-                if not storage.save_sheet_formulas(sheet_id, formulas_list):
+                if not storage.save_sheet_formulas(sheet_id, formulas_list, replace=False):
                     logger.error(f"Не удалось сохранить формулы для листа '{sheet_name}' (часть строки {start_row}-{end_row}).")
                     return False
 
                 logger.debug(f"Сохранена часть формул с {start_row} по {end_row} для листа '{sheet_name}'.")
+                # Формулы ищутся во всех ячейках части: замеряется просмотр, а не число найденных формул
+                sizer.record(end_row - start_row + 1)
 
                 start_row = end_row + 1 # Переходим к следующей части
+            record_chunk_stats(sizer, options)
 
         logger.info(f"Импорт формул из '{file_path}' завершён.")
         return True
@@ -597,6 +695,948 @@ def import_formulas_from_excel(storage: ProjectDBStorage, file_path: str, option
         return False
 
 
+# --- НОВОЕ: Импорт всех типов данных за один проход по книге ---
+
+def _load_workbook_for_import(file_path: str) -> Optional[openpyxl.Workbook]:
+    """
+    Открывает книгу для импорта (data_only=False, формулы как строки).
+
+    Args:
+        file_path (str): Путь к Excel-файлу.
+
+    Returns:
+        Optional[openpyxl.Workbook]: Книга или None, если файл содержит
+        неподдерживаемые openpyxl структуры (ошибка Nested.from_tree).
+    """
+    try:
+        return openpyxl.load_workbook(file_path, data_only=False)
+    except TypeError as e:
+        if "Nested.from_tree() missing 1 required positional argument: 'node'" in str(e):
+            logger.error(f"Ошибка openpyxl при открытии файла '{file_path}': {e}")
+            logger.warning("Файл может содержать неподдерживаемые структуры (например, pivot-таблицы). Импорт прерван.")
+            return None
+        raise
+
+
+def _import_sheet_single_pass(
+    storage: ProjectDBStorage,
+    sheet: Worksheet,
+    sheet_id: int,
+    options: Optional[Dict[str, Any]] = None,
+    style_cache: Optional[StyleSerializationCache] = None
+) -> bool:
+    """
+    Импортирует лист за один проход по ячейкам: значения, формулы и стили
+    собираются из одних и тех же объектов ячеек, затем сохраняются объединённые
+    ячейки и диаграммы листа.
+
+    Значения и формулы записываются частями, размер которых подбирает AdaptiveChunkSizer
+    (или задаёт опция 'chunk_size_rows'), стили - одним пакетом сжатых диапазонов после прохода по листу.
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта (внутри открытой bulk_session).
+        sheet (Worksheet): Лист openpyxl.
+        sheet_id (int): ID листа в БД.
+        options (Optional[Dict[str, Any]]): Опции импорта (размер частей, 'chunk_stats').
+        style_cache (Optional[StyleSerializationCache]): Кэш стилей книги (общий для её листов).
+
+    Returns:
+        bool: True, если лист импортирован успешно, иначе False.
+    """
+    sheet_name = sheet.title
+    total_rows = sheet.max_row or 0
+    if style_cache is None:
+        style_cache = StyleSerializationCache()
+
+    # Формулы листа удаляются один раз, части дописываются
+    if not storage.save_sheet_formulas(sheet_id, [], replace=True):
+        logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+        return False
+
+    compactor = StyleRangeCompactor()
+    values_count = formulas_count = 0
+    sizer = _row_chunk_sizer(sheet_name, sheet, options)
+
+    start_row = 1 # openpyxl использует 1-based индексацию
+    while start_row <= total_rows:
+        end_row = min(start_row + sizer.rows - 1, total_rows)
+
+        raw_data_list = []
+        formulas_list = []
+        for row in sheet.iter_rows(min_row=start_row, max_row=end_row, values_only=False):
+            for cell in row:
+                value = cell.value
+                if value is not None or cell.data_type == 'f':
+                    data_item = {"cell_address": cell.coordinate, "value": value}
+                    if cell.data_type == 'e':
+                        data_item["value_type"] = "error"
+                    raw_data_list.append(data_item)
+                    if isinstance(value, str) and value.startswith('='):
+                        formulas_list.append({"cell_address": cell.coordinate, "formula": value})
+
+                style_json = style_cache.style_json(cell)
+                if style_json:
+                    compactor.add(style_json, cell.row, cell.column)
+
+        if not storage.save_sheet_raw_data(sheet_name, raw_data_list):
+            logger.error(f"Не удалось сохранить 'сырые данные' для листа '{sheet_name}' (часть строки {start_row}-{end_row}).")
+            return False
+        if formulas_list and not storage.save_sheet_formulas(sheet_id, formulas_list, replace=False):
+            logger.error(f"Не удалось сохранить формулы для листа '{sheet_name}' (часть строки {start_row}-{end_row}).")
+            return False
+        values_count += len(raw_data_list)
+        formulas_count += len(formulas_list)
+        sizer.record(end_row - start_row + 1) # просматривается каждая ячейка части (стили)
+
+        start_row = end_row + 1 # Переходим к следующей части
+    record_chunk_stats(sizer, options)
+
+    styles_to_save = [
+        {"range_address": range_address, "style_attributes": style_json}
+        for style_json, range_address in compactor.finish()
+    ]
+    if not storage.save_sheet_styles(sheet_id, styles_to_save):
+        logger.error(f"Не удалось сохранить стили для листа '{sheet_name}'.")
+        return False
+
+    merged_ranges = [str(merged_range) for merged_range in sheet.merged_cells.ranges]
+    if not storage.save_sheet_merged_cells(sheet_id, merged_ranges):
+        logger.error(f"Не удалось сохранить объединённые ячейки для листа '{sheet_name}'.")
+        return False
+
+    charts_list = []
+    try:
+        for chart_obj in sheet._charts: # type: ignore[attr-defined]
+            chart_data = _serialize_chart(chart_obj)
+            if chart_data:
+                charts_list.append({"chart_data": chart_data})
+    except AttributeError as ae:
+        logger.warning(f"Не удалось получить доступ к диаграммам листа '{sheet_name}' через _charts: {ae}")
+    if not storage.save_sheet_charts(sheet_id, charts_list):
+        logger.error(f"Не удалось сохранить диаграммы для листа '{sheet_name}' (ID: {sheet_id}).")
+        return False
+
+    logger.info(
+        f"Лист '{sheet_name}' импортирован за один проход: {values_count} значений, {formulas_count} формул, "
+        f"{len(styles_to_save)} диапазонов стилей, {len(merged_ranges)} объединений, {len(charts_list)} диаграмм."
+    )
+    return True
+
+
+def _import_all_single_pass(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Импортирует все типы данных, открывая книгу один раз и проходя каждый лист один раз
+    (вместо отдельного открытия и обхода книги импортёрами данных, стилей, диаграмм и формул).
+    Вызывается внутри bulk_session: вся запись идёт в одной транзакции.
+
+    Args:
+        storage (ProjectDBStorage): Экземпляр ProjectDBStorage для сохранения данных.
+        file_path (str): Путь к Excel-файлу для импорта.
+        options (Optional[Dict[str, Any]]): Опции импорта ('chunk_size_rows', 'sheets').
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+    """
+    try:
+        workbook = _load_workbook_for_import(file_path)
+        if workbook is None:
+            return False
+        logger.debug(f"Книга '{file_path}' успешно открыта.")
+
+        sheets_to_import: List[str] = [str(name) for name in (options.get('sheets', []) if options else [])]
+        if not sheets_to_import:
+            sheets_to_import = list(workbook.sheetnames)
+        style_cache = StyleSerializationCache()
+
+        for sheet_name in sheets_to_import:
+            if sheet_name not in workbook.sheetnames:
+                logger.warning(f"Лист '{sheet_name}' не найден в файле '{file_path}'. Пропущен.")
+                continue
+
+            logger.info(f"Импорт всех данных с листа: {sheet_name}")
+            # Предполагаем project_id = 1 для MVP
+            sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+            if sheet_id is None:
+                logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'. Пропущен.")
+                return False
+
+            if not _import_sheet_single_pass(storage, workbook[sheet_name], sheet_id, options, style_cache):
+                return False
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Ошибка при импорте всех данных из файла '{file_path}': {e}", exc_info=True)
+        return False
+
+# --- КОНЕЦ НОВОГО ---
+
+
+# --- НОВОЕ: Потоковый импорт (openpyxl read_only) с ограничением памяти ---
+
+# Файлы, для которых оценка памяти полного режима openpyxl превышает лимит, импортируются потоково
+DEFAULT_MEMORY_LIMIT_MB = 512
+# Во сколько раз объекты ячеек openpyxl (полный режим) больше XML листа (оценка по замерам)
+_FULL_MODE_MEMORY_FACTOR = 12
+# Оценка памяти на одну ячейку в буфере части (словарь значения + формула + накладные расходы)
+_STREAM_BYTES_PER_CELL = 400
+# Доля лимита памяти, отводимая под буфер одной части
+_STREAM_CHUNK_MEMORY_SHARE = 0.25
+_MIN_STREAM_CHUNK_CELLS = 1_000
+# Имя задания потокового импорта в контрольных точках (project_metadata)
+STREAMING_CHECKPOINT_JOB = "streaming"
+
+
+def estimate_full_load_memory_mb(file_path: str) -> Optional[float]:
+    """
+    Оценивает память, которую займёт книга, открытая openpyxl в полном режиме:
+    несжатый размер XML листов и общих строк, умноженный на эмпирический коэффициент.
+    Книга не открывается - читается только оглавление ZIP-архива.
+
+    Args:
+        file_path (str): Путь к .xlsx/.xlsm файлу.
+
+    Returns:
+        Optional[float]: Оценка в мегабайтах или None, если файл не является ZIP-архивом.
+    """
+    import zipfile
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            xml_bytes = sum(
+                info.file_size for info in archive.infolist()
+                if info.filename.startswith("xl/worksheets/") or info.filename == "xl/sharedStrings.xml"
+            )
+    except (zipfile.BadZipFile, OSError) as e:
+        logger.debug(f"Не удалось прочитать оглавление '{file_path}' как ZIP: {e}")
+        return None
+    return xml_bytes * _FULL_MODE_MEMORY_FACTOR / (1024 * 1024)
+
+
+def should_use_streaming_import(file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Определяет, нужно ли импортировать файл потоково (read_only).
+
+    Явная опция options['streaming'] имеет приоритет; иначе потоковый режим выбирается,
+    если оценка памяти полного режима превышает options['memory_limit_mb']
+    (по умолчанию DEFAULT_MEMORY_LIMIT_MB).
+
+    Args:
+        file_path (str): Путь к Excel-файлу.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+
+    Returns:
+        bool: True, если следует использовать потоковый импорт.
+    """
+    options = options or {}
+    if options.get('streaming') is not None:
+        return bool(options['streaming'])
+    estimated_mb = estimate_full_load_memory_mb(file_path)
+    if estimated_mb is None:
+        return False
+    memory_limit_mb = options.get('memory_limit_mb') or DEFAULT_MEMORY_LIMIT_MB
+    use_streaming = estimated_mb > memory_limit_mb
+    logger.info(
+        f"Оценка памяти полного режима для '{file_path}': {estimated_mb:.0f} МБ "
+        f"(лимит {memory_limit_mb} МБ) -> {'потоковый' if use_streaming else 'полный'} импорт."
+    )
+    return use_streaming
+
+
+def _stream_chunk_cells(options: Optional[Dict[str, Any]]) -> int:
+    """Максимальное число ячеек в одной части потокового импорта по лимиту памяти."""
+    options = options or {}
+    if options.get('chunk_size_cells'):
+        return int(options['chunk_size_cells'])
+    memory_limit_mb = options.get('memory_limit_mb') or DEFAULT_MEMORY_LIMIT_MB
+    budget = memory_limit_mb * 1024 * 1024 * _STREAM_CHUNK_MEMORY_SHARE
+    return max(_MIN_STREAM_CHUNK_CELLS, int(budget // _STREAM_BYTES_PER_CELL))
+
+
+def _row_chunk_sizer(sheet_name: str, sheet, options: Optional[Dict[str, Any]]):
+    """
+    Подбор размера частей по строкам для листа openpyxl: начальный размер - по ширине
+    листа, верхняя граница - по тому же бюджету памяти, что и у частей потокового импорта.
+    """
+    return chunk_sizer_from_options(f"'{sheet_name}'", sheet.max_column, options, max_cells=_stream_chunk_cells(options))
+
+
+def _style_ranges(pairs) -> List[Dict[str, Any]]:
+    """Диапазоны компактора стилей [(style_json, range_address)] в формате save_sheet_styles."""
+    return [{"range_address": range_address, "style_attributes": style_json} for style_json, range_address in pairs]
+
+
+def _iter_stream_chunks(
+    sheet,
+    chunk_cells: int,
+    compactor: Optional[StyleRangeCompactor],
+    min_row: int = 1,
+    close_styles_per_chunk: bool = False,
+    style_cache: Optional[StyleSerializationCache] = None
+):
+    """
+    Генератор частей листа read_only: (raw_data_list, formulas_list, styles_list, last_row).
+    Строки читаются из XML по мере обхода, в памяти держится только текущая часть
+    (и открытые диапазоны стилей компактора).
+
+    Args:
+        sheet: Лист openpyxl в режиме read_only.
+        chunk_cells (int): Максимальное число непустых ячеек в части.
+        compactor (Optional[StyleRangeCompactor]): Компактор стилей или None (стили не импортируются).
+        min_row (int): Первая читаемая строка (продолжение с контрольной точки).
+        close_styles_per_chunk (bool): Закрывать диапазоны стилей на границе части, чтобы часть
+            вместе со своими стилями была самодостаточной (для контрольных точек). Иначе часть
+            несёт только уже закрытые диапазоны, а открытые отдаются последней частью.
+        style_cache (Optional[StyleSerializationCache]): Кэш стилей книги (общий для её листов).
+    """
+    if style_cache is None:
+        style_cache = StyleSerializationCache()
+    raw_data_list: List[Dict[str, Any]] = []
+    formulas_list: List[Dict[str, str]] = []
+    row_index = min_row - 1
+    for row_index, row in enumerate(sheet.iter_rows(min_row=min_row, values_only=False), start=min_row):
+        for cell in row:
+            # EmptyCell (отсутствует в XML) не имеет ни значения, ни стиля
+            if getattr(cell, 'coordinate', None) is None:
+                continue
+            value = cell.value
+            if value is not None or cell.data_type == 'f':
+                data_item = {"cell_address": cell.coordinate, "value": value}
+                if cell.data_type == 'e':
+                    data_item["value_type"] = "error"
+                raw_data_list.append(data_item)
+                if isinstance(value, str) and value.startswith('='):
+                    formulas_list.append({"cell_address": cell.coordinate, "formula": value})
+            if compactor is not None:
+                style_json = style_cache.style_json(cell)
+                if style_json:
+                    compactor.add(style_json, cell.row, cell.column)
+        # Граница части - только между строками: компактор требует порядка строк
+        if len(raw_data_list) >= chunk_cells:
+            styles_list: List[Dict[str, Any]] = []
+            if compactor is not None:
+                styles_list = _style_ranges(compactor.finish() if close_styles_per_chunk else compactor.pop_closed())
+            yield raw_data_list, formulas_list, styles_list, row_index
+            raw_data_list, formulas_list = [], []
+    styles_list = _style_ranges(compactor.finish()) if compactor is not None else []
+    if raw_data_list or formulas_list or styles_list:
+        yield raw_data_list, formulas_list, styles_list, row_index
+
+
+@_in_bulk_session
+def import_streaming_data_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Импортирует значения, формулы и стили в потоковом режиме openpyxl (read_only=True).
+    Пиковая память пропорциональна размеру части, а не книги.
+
+    Объединённые ячейки и диаграммы в режиме read_only openpyxl недоступны и не импортируются.
+
+    Args:
+        storage (ProjectDBStorage): Экземпляр ProjectDBStorage для сохранения данных.
+        file_path (str): Путь к Excel-файлу для импорта.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+            {
+                'sheets': List[str],       # Список имён листов для импорта. Если пуст, все.
+                'memory_limit_mb': int,    # Лимит памяти, определяет размер части (по умолчанию 512)
+                'chunk_size_cells': int,   # Явный размер части в ячейках (вместо расчёта по лимиту)
+                'import_styles': bool,     # Импортировать стили (по умолчанию True)
+                'pipeline': bool,            # Чтение в фоновом потоке параллельно с записью (по умолчанию - при > 1 ядре)
+                'pipeline_queue_size': int,  # Ёмкость очереди частей между чтением и записью (по умолчанию 4)
+                'pipeline_stats': list,      # Если передан список, в него добавляются счётчики стадий по листам
+                'checkpoints': bool,         # Сохранять контрольную точку после каждой части (по умолчанию True)
+                'resume': bool               # Продолжить прерванный импорт того же файла (по умолчанию True)
+            }
+
+    Контрольная точка (ImportCheckpoint, задание 'streaming') сохраняется в project_metadata
+    вместе с каждой частью, и транзакция фиксируется: после сбоя повторный вызов с тем же
+    файлом пропускает завершённые листы и продолжает текущий со строки после последней
+    записанной части. Диапазоны стилей при этом замыкаются на границах частей.
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+    """
+    if not storage:
+        logger.error("Экземпляр ProjectDBStorage не предоставлен. Невозможно выполнить импорт.")
+        return False
+
+    if not os.path.exists(file_path):
+        logger.error(f"Excel-файл для импорта не найден: {file_path}")
+        return False
+
+    options = options or {}
+    chunk_cells = _stream_chunk_cells(options)
+    import_styles = options.get('import_styles', True)
+    logger.info(f"Начало потокового импорта из Excel-файла: {file_path} (часть до {chunk_cells} ячеек).")
+
+    workbook = None
+    try:
+        checkpoint: Optional[ImportCheckpoint] = None
+        if options.get('checkpoints', True):
+            checkpoint = ImportCheckpoint(storage, STREAMING_CHECKPOINT_JOB, file_path)
+            if options.get('resume', True) and checkpoint.load():
+                logger.info(f"Потоковый импорт '{file_path}' продолжается с контрольной точки.")
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=False)
+        style_cache = StyleSerializationCache()
+
+        sheets_to_import: List[str] = [str(name) for name in options.get('sheets', [])]
+        if not sheets_to_import:
+            sheets_to_import = list(workbook.sheetnames)
+
+        for sheet_name in sheets_to_import:
+            if sheet_name not in workbook.sheetnames:
+                logger.warning(f"Лист '{sheet_name}' не найден в файле '{file_path}'. Пропущен.")
+                continue
+
+            if checkpoint is not None and checkpoint.is_sheet_done(sheet_name):
+                logger.info(f"Лист '{sheet_name}' уже импортирован (контрольная точка). Пропущен.")
+                continue
+
+            resume_row = checkpoint.resume_row(sheet_name) if checkpoint is not None else 0
+            logger.info(f"Потоковый импорт листа: {sheet_name}" + (f" (со строки {resume_row + 1})" if resume_row else ""))
+            # Предполагаем project_id = 1 для MVP
+            sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+            if sheet_id is None:
+                logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'. Пропущен.")
+                return False
+            # При продолжении формулы и стили уже записанных частей сохраняются
+            if not resume_row:
+                if not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                    logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+                    return False
+                if import_styles and not storage.save_sheet_styles(sheet_id, [], replace=True):
+                    logger.error(f"Не удалось очистить стили листа '{sheet_name}' перед импортом.")
+                    return False
+
+            compactor = StyleRangeCompactor() if import_styles else None
+            counts = {"values": 0, "formulas": 0}
+
+            def write(batch, sheet_name=sheet_name, sheet_id=sheet_id) -> bool:
+                raw_data_list, formulas_list, styles_list, last_row = batch
+                if raw_data_list and not storage.save_sheet_raw_data(sheet_name, raw_data_list):
+                    logger.error(f"Не удалось сохранить 'сырые данные' для листа '{sheet_name}' (после {counts['values']} ячеек).")
+                    return False
+                if formulas_list and not storage.save_sheet_formulas(sheet_id, formulas_list, replace=False):
+                    logger.error(f"Не удалось сохранить формулы для листа '{sheet_name}' (после {counts['values']} ячеек).")
+                    return False
+                if styles_list and not storage.save_sheet_styles(sheet_id, styles_list, replace=False):
+                    logger.error(f"Не удалось сохранить стили для листа '{sheet_name}' (после {counts['values']} ячеек).")
+                    return False
+                if checkpoint is not None and not checkpoint.commit_chunk(sheet_name, last_row):
+                    logger.error(f"Не удалось сохранить контрольную точку листа '{sheet_name}' (строка {last_row}).")
+                    return False
+                counts["values"] += len(raw_data_list)
+                counts["formulas"] += len(formulas_list)
+                return True
+
+            # Чтение строк openpyxl идёт в фоновом потоке, пока текущий поток пишет предыдущую часть;
+            # диапазоны стилей передаются вместе с частями.
+            # Лимит памяти делится между всеми частями в работе (очередь + чтение + запись)
+            pipeline = pipeline_from_options(f"'{sheet_name}' (read_only)", options)
+            batch_cells = pipeline.split_budget(chunk_cells, _MIN_STREAM_CHUNK_CELLS)
+            chunks = _iter_stream_chunks(
+                workbook[sheet_name], batch_cells, compactor,
+                min_row=resume_row + 1, close_styles_per_chunk=checkpoint is not None, style_cache=style_cache
+            )
+            if not pipeline.run(chunks, write, count=_pair_batch_size):
+                return False
+            record_pipeline_stats(pipeline, options)
+            if checkpoint is not None and not checkpoint.sheet_done(sheet_name):
+                logger.error(f"Не удалось отметить лист '{sheet_name}' в контрольной точке.")
+                return False
+
+            logger.info(f"Лист '{sheet_name}' импортирован потоково: {counts['values']} значений, {counts['formulas']} формул.")
+
+        if checkpoint is not None:
+            checkpoint.clear()
+        logger.warning("Потоковый импорт: объединённые ячейки и диаграммы не импортируются (недоступны в режиме read_only).")
+        logger.info(f"Потоковый импорт из '{file_path}' завершён.")
+        return True
+
+    except Exception as e:
+        logger.error(f"Ошибка при потоковом импорте из файла '{file_path}': {e}", exc_info=True)
+        return False
+    finally:
+        # В режиме read_only книга держит открытым архив до явного закрытия
+        if workbook is not None:
+            workbook.close()
+
+# --- КОНЕЦ НОВОГО ---
+
+
+# --- НОВОЕ: Быстрый путь через разбор XML листа (без объектов ячеек openpyxl) ---
+
+def _can_use_fast_reader(file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """Быстрый путь включён по умолчанию для .xlsx/.xlsm; отключается options['fast_reader'] = False."""
+    if options and not options.get('fast_reader', True):
+        return False
+    return os.path.splitext(file_path)[1].lower() in FAST_READER_EXTENSIONS
+
+
+def _iter_fast_reader_batches(
+    reader: FastXlsxReader,
+    sheet_name: str,
+    value_source: Optional[str],
+    import_formulas: bool,
+    chunk_cells: int,
+    cached_values: bool = False
+):
+    """
+    Генератор пакетов листа для _import_with_fast_reader: (cells, formulas),
+    cells - [(row, col, value, value_type)], formulas - [{'cell_address', 'formula'}]
+    (с cached_values - ещё 'cached_value' и для ошибок 'cached_value_type').
+    """
+    cells_batch: List[tuple] = []
+    formulas_batch: List[Dict[str, Any]] = []
+    for row, col, value, formula in reader.iter_cells(sheet_name):
+        if value_source == 'formula' and formula is not None:
+            cells_batch.append((row, col, formula, None))
+        elif value_source is not None and value is not None:
+            cells_batch.append((row, col, value, "error" if (row, col) in reader.error_cells else None))
+        if import_formulas and formula is not None:
+            formula_item = {"cell_address": row_col_to_address(row, col), "formula": formula}
+            if cached_values and value is not None:
+                # <f> и <v> одной ячейки разобраны за один проход
+                formula_item["cached_value"] = value
+                if (row, col) in reader.error_cells:
+                    formula_item["cached_value_type"] = "error"
+            formulas_batch.append(formula_item)
+        if len(cells_batch) + len(formulas_batch) >= chunk_cells:
+            yield cells_batch, formulas_batch
+            cells_batch, formulas_batch = [], []
+    if cells_batch or formulas_batch:
+        yield cells_batch, formulas_batch
+
+
+def _import_with_fast_reader(
+    storage: ProjectDBStorage,
+    file_path: str,
+    options: Optional[Dict[str, Any]],
+    value_source: Optional[str],
+    import_formulas: bool,
+    cached_values: bool = False
+) -> bool:
+    """
+    Импортирует значения и/или формулы через FastXlsxReader: кортежи (row, col, value, formula)
+    пишутся в хранилище без построения адресов ячеек (адрес строится только для формул).
+    Вся запись выполняется в одном write_batch: если книга содержит неподдерживаемые
+    элементы, изменения откатываются и исключение передаётся вызывающей стороне
+    для перехода на openpyxl.
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта (внутри открытой bulk_session).
+        file_path (str): Путь к Excel-файлу.
+        options (Optional[Dict[str, Any]]): Опции импорта ('sheets', 'memory_limit_mb', 'chunk_size_cells').
+        value_source (Optional[str]): Что сохранять значением ячейки с формулой:
+            'formula' - текст формулы (как openpyxl с data_only=False),
+            'cached' - сохранённый в файле результат (как data_only=True),
+            None - значения не импортируются.
+        import_formulas (bool): Сохранять формулы в таблицу 'formulas'.
+        cached_values (bool): Сохранять вместе с формулой её результат из файла.
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+
+    Raises:
+        UnsupportedXlsxFeature: Книгу нужно читать через openpyxl.
+    """
+    options = options or {}
+    chunk_cells = _stream_chunk_cells(options)
+
+    with FastXlsxReader(file_path) as reader, storage.write_batch():
+        sheets_to_import: List[str] = [str(name) for name in options.get('sheets', [])] or reader.sheetnames
+
+        for sheet_name in sheets_to_import:
+            if sheet_name not in reader.sheetnames:
+                logger.warning(f"Лист '{sheet_name}' не найден в файле '{file_path}'. Пропущен.")
+                continue
+
+            # Предполагаем project_id = 1 для MVP
+            sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+            if sheet_id is None:
+                logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'. Пропущен.")
+                return False
+            if import_formulas and not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+                return False
+
+            counts = {"values": 0, "formulas": 0}
+
+            def write(batch, sheet_id=sheet_id) -> bool:
+                cells_batch, formulas_batch = batch
+                if cells_batch and not storage.save_sheet_cells(sheet_id, cells_batch):
+                    return False
+                if formulas_batch and not storage.save_sheet_formulas(sheet_id, formulas_batch, replace=False):
+                    return False
+                counts["values"] += len(cells_batch)
+                counts["formulas"] += len(formulas_batch)
+                return True
+
+            # Разбор XML идёт в фоновом потоке, пока текущий поток пишет предыдущий пакет
+            pipeline = pipeline_from_options(f"'{sheet_name}' (XML)", options)
+            batch_cells = pipeline.split_budget(chunk_cells, _MIN_STREAM_CHUNK_CELLS)
+            batches = _iter_fast_reader_batches(reader, sheet_name, value_source, import_formulas, batch_cells, cached_values)
+            if not pipeline.run(batches, write, count=_pair_batch_size):
+                return False
+            record_pipeline_stats(pipeline, options)
+            logger.info(f"Лист '{sheet_name}' прочитан из XML: {counts['values']} значений, {counts['formulas']} формул.")
+
+    return True
+
+
+def _try_fast_reader(
+    storage: ProjectDBStorage,
+    file_path: str,
+    options: Optional[Dict[str, Any]],
+    value_source: Optional[str],
+    import_formulas: bool,
+    cached_values: bool = False
+) -> Optional[bool]:
+    """
+    Пытается выполнить импорт быстрым путём.
+
+    Returns:
+        Optional[bool]: Результат импорта или None, если нужно импортировать через openpyxl.
+    """
+    if not _can_use_fast_reader(file_path, options):
+        return None
+    try:
+        return _import_with_fast_reader(storage, file_path, options, value_source, import_formulas, cached_values)
+    except UnsupportedXlsxFeature as e:
+        logger.info(f"Быстрое чтение XML недоступно: {e} Используется openpyxl.")
+    except Exception as e:
+        logger.warning(f"Ошибка быстрого чтения XML '{file_path}': {e}. Используется openpyxl.", exc_info=True)
+    return None
+
+# --- КОНЕЦ НОВОГО ---
+
+
+# --- НОВОЕ: Импорт формул вместе с сохранёнными результатами ---
+
+def _iter_dual_value_chunks(formula_sheet, value_sheet, chunk_cells: int):
+    """
+    Генератор частей листа для запасного пути openpyxl: (cells, formulas), как _iter_fast_reader_batches
+    с value_source='formula' и cached_values=True. Листы одной книги, открытой в режиме read_only
+    с data_only=False и data_only=True, обходятся синхронно: ячейки в строках совпадают.
+    """
+    cells_batch: List[tuple] = []
+    formulas_batch: List[Dict[str, Any]] = []
+    for formula_row, value_row in zip(formula_sheet.iter_rows(values_only=False), value_sheet.iter_rows(values_only=False)):
+        for cell, value_cell in zip(formula_row, value_row):
+            if getattr(cell, 'coordinate', None) is None or cell.value is None:
+                continue
+            if cell.data_type != 'f':
+                cells_batch.append((cell.row, cell.column, cell.value, "error" if cell.data_type == 'e' else None))
+                continue
+            formula = cell.value if isinstance(cell.value, str) else getattr(cell.value, 'text', str(cell.value))
+            cells_batch.append((cell.row, cell.column, formula, None))
+            formula_item = {"cell_address": cell.coordinate, "formula": formula}
+            if value_cell.value is not None:
+                formula_item["cached_value"] = value_cell.value
+                if value_cell.data_type == 'e':
+                    formula_item["cached_value_type"] = "error"
+            formulas_batch.append(formula_item)
+        if len(cells_batch) + len(formulas_batch) >= chunk_cells:
+            yield cells_batch, formulas_batch
+            cells_batch, formulas_batch = [], []
+    if cells_batch or formulas_batch:
+        yield cells_batch, formulas_batch
+
+
+def _import_formulas_with_values_openpyxl(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]]) -> bool:
+    """
+    Запасной путь import_formulas_with_values_from_excel через openpyxl read_only
+    (книга разбирается дважды: формулы и сохранённые результаты).
+    """
+    options = options or {}
+    chunk_cells = _stream_chunk_cells(options)
+    formula_workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=False)
+    value_workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets_to_import: List[str] = [str(name) for name in options.get('sheets', [])] or list(formula_workbook.sheetnames)
+        for sheet_name in sheets_to_import:
+            if sheet_name not in formula_workbook.sheetnames:
+                logger.warning(f"Лист '{sheet_name}' не найден в файле '{file_path}'. Пропущен.")
+                continue
+
+            # Предполагаем project_id = 1 для MVP
+            sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+            if sheet_id is None:
+                logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'. Пропущен.")
+                return False
+            if not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+                return False
+
+            batches = _iter_dual_value_chunks(formula_workbook[sheet_name], value_workbook[sheet_name], chunk_cells)
+            for cells_batch, formulas_batch in batches:
+                if cells_batch and not storage.save_sheet_cells(sheet_id, cells_batch):
+                    logger.error(f"Не удалось сохранить значения листа '{sheet_name}'.")
+                    return False
+                if formulas_batch and not storage.save_sheet_formulas(sheet_id, formulas_batch, replace=False):
+                    logger.error(f"Не удалось сохранить формулы листа '{sheet_name}'.")
+                    return False
+        return True
+    finally:
+        formula_workbook.close()
+        value_workbook.close()
+
+
+@_in_bulk_session
+def import_formulas_with_values_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Импортирует значения, формулы и сохранённые в файле результаты формул за один разбор XML листа:
+    у каждой ячейки читаются и <f>, и <v>. Значение ячейки с формулой - текст формулы
+    (как import_raw_data_from_excel), результат хранится рядом с формулой в таблице 'formulas'
+    (storage.load_sheet_formula_values), поэтому GUI показывает его без пересчёта.
+    Заменяет пару import_raw_data_from_excel + import_raw_values_only_from_excel (две загрузки книги).
+
+    Args:
+        storage (ProjectDBStorage): Экземпляр ProjectDBStorage для сохранения данных.
+        file_path (str): Путь к Excel-файлу для импорта.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+            {
+                'sheets': List[str],      # Список имён листов для импорта. Если пуст, все.
+                'fast_reader': bool,      # Быстрое чтение XML листа (по умолчанию True); иначе openpyxl read_only
+                'chunk_size_cells': int,  # Размер пакета записи в ячейках
+                'pipeline': bool          # Разбор в фоновом потоке параллельно с записью (по умолчанию - при > 1 ядре)
+            }
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+    """
+    if not storage:
+        logger.error("Экземпляр ProjectDBStorage не предоставлен. Невозможно выполнить импорт.")
+        return False
+
+    if not os.path.exists(file_path):
+        logger.error(f"Excel-файл для импорта не найден: {file_path}")
+        return False
+
+    logger.info(f"Начало импорта формул с результатами из Excel-файла: {file_path}")
+
+    fast_result = _try_fast_reader(storage, file_path, options, value_source='formula', import_formulas=True, cached_values=True)
+    if fast_result is not None:
+        logger.info(f"Импорт формул с результатами из '{file_path}' выполнен через быстрое чтение XML.")
+        return fast_result
+
+    try:
+        with storage.write_batch():
+            result = _import_formulas_with_values_openpyxl(storage, file_path, options)
+        logger.info(f"Импорт формул с результатами из '{file_path}' {'завершён' if result else 'не удался'} (openpyxl).")
+        return result
+    except Exception as e:
+        logger.error(f"Ошибка при импорте формул с результатами из файла '{file_path}': {e}", exc_info=True)
+        return False
+
+# --- КОНЕЦ НОВОГО ---
+
+
+# --- НОВОЕ: Инкрементальный повторный импорт по отпечаткам блоков ---
+
+_CHANGE_COUNTERS = (
+    "cells_inserted", "cells_updated", "cells_deleted",
+    "formulas_inserted", "formulas_updated", "formulas_deleted",
+)
+
+
+def _reimport_sheet_blocks(storage: ProjectDBStorage, sheet_id: int, cell_source, stored_fingerprints: Dict[int, str]) -> Optional[Dict[str, Any]]:
+    """
+    Сравнивает блоки листа с сохранёнными отпечатками и применяет изменения только к несовпавшим.
+    Содержимое ячеек совпадает с import_raw_data_from_excel + import_formulas_from_excel:
+    значение ячейки с формулой - текст формулы.
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта.
+        sheet_id (int): ID листа в БД.
+        cell_source: Итератор (row, col, value, formula, is_error) в порядке строк.
+        stored_fingerprints (Dict[int, str]): Сохранённые отпечатки листа.
+
+    Returns:
+        Optional[Dict[str, Any]]: {'fingerprints': новые отпечатки блоков, 'blocks': число блоков,
+            'blocks_changed': число изменённых блоков, счётчики _CHANGE_COUNTERS} или None при ошибке.
+    """
+    result: Dict[str, Any] = {"fingerprints": {}, "blocks": 0, "blocks_changed": 0}
+    result.update(dict.fromkeys(_CHANGE_COUNTERS, 0))
+    # Формулы в БД адресуются строкой - загружаются один раз на лист, только если есть изменения
+    stored_formulas: Optional[Dict[int, Dict[tuple, str]]] = None
+
+    def apply(block: int, block_cells: Dict[tuple, tuple], block_formulas: Dict[tuple, str]) -> bool:
+        nonlocal stored_formulas
+        if stored_formulas is None:
+            stored_formulas = storage.load_sheet_formulas_by_block(sheet_id)
+        changes = storage.apply_block_changes(sheet_id, block, block_cells, block_formulas, stored_formulas.get(block, {}))
+        if changes is None:
+            return False
+        result["blocks_changed"] += 1
+        for key in _CHANGE_COUNTERS:
+            result[key] += changes[key]
+        return True
+
+    current_block = -1
+    entries: List[tuple] = []
+    block_cells: Dict[tuple, tuple] = {}
+    block_formulas: Dict[tuple, str] = {}
+
+    def finish_block() -> bool:
+        fingerprint = fingerprint_block(entries)
+        result["fingerprints"][current_block] = fingerprint
+        result["blocks"] += 1
+        if stored_fingerprints.get(current_block) == fingerprint:
+            return True
+        return apply(current_block, block_cells, block_formulas)
+
+    for row, col, value, formula, is_error in cell_source:
+        block = block_of_row(row)
+        if block != current_block:
+            if block < current_block:
+                # ECMA-376 требует возрастающего порядка строк; иначе блок нельзя закрыть по ходу чтения
+                raise ValueError(f"Строки листа идут не по возрастанию (строка {row} после блока {current_block}).")
+            if entries and not finish_block():
+                return None
+            current_block = block
+            entries, block_cells, block_formulas = [], {}, {}
+        stored_value = formula if formula is not None else value
+        if stored_value is None:
+            continue
+        encoded = encode_cell_value(stored_value, "error" if is_error else None)
+        entries.append((row, col, encoded[0], encoded[1], formula))
+        block_cells[(row, col)] = encoded
+        if formula is not None:
+            block_formulas[(row, col)] = formula
+    if entries and not finish_block():
+        return None
+
+    # Блоки, которых больше нет в файле: по сохранённым отпечаткам, а если отпечатки
+    # были сброшены записью в обход этого импорта - по фактическому содержимому БД
+    removed = set(stored_fingerprints) - {SOURCE_BLOCK}
+    if SOURCE_BLOCK not in stored_fingerprints:
+        if stored_formulas is None:
+            stored_formulas = storage.load_sheet_formulas_by_block(sheet_id)
+        removed |= storage.load_sheet_cell_blocks(sheet_id) | set(stored_formulas)
+    for block in sorted(removed - set(result["fingerprints"])):
+        if not apply(block, {}, {}):
+            return None
+    return result
+
+
+@_in_bulk_session
+def import_incremental_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None, progress_callback: Optional[Callable[..., None]] = None) -> bool:
+    """
+    Повторный импорт значений и формул с записью только изменённых ячеек.
+
+    Лист, XML которого в файле не изменился (CRC частей книги совпадает с сохранённым), не
+    разбирается. Изменённый лист разбирается целиком, но сравнивается с БД по блокам
+    строк (storage/fingerprints.py): для блоков с совпавшим хэшем запись не выполняется,
+    в остальных применяются только вставки, обновления и удаления ячеек и формул.
+    Первый импорт листа сохраняет отпечатки; содержимое БД совпадает с результатом
+    import_raw_data_from_excel + import_formulas_from_excel.
+
+    Стили, объединённые ячейки и диаграммы не сравниваются и не импортируются.
+
+    Args:
+        storage (ProjectDBStorage): Экземпляр ProjectDBStorage для сохранения данных.
+        file_path (str): Путь к .xlsx/.xlsm файлу.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+            {
+                'sheets': List[str],       # Список имён листов для импорта. Если пуст, все.
+                'change_summary': dict     # Если передан словарь, в него записывается сводка изменений
+            }
+        progress_callback (Optional[Callable[..., None]]): progress_callback(percent, message)
+            или ProgressChannel; этап прогресса - лист.
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+    """
+    if not storage:
+        logger.error("Экземпляр ProjectDBStorage не предоставлен. Невозможно выполнить импорт.")
+        return False
+
+    if not os.path.exists(file_path):
+        logger.error(f"Excel-файл для импорта не найден: {file_path}")
+        return False
+
+    options = options or {}
+    summary: Dict[str, Any] = {"sheets_unchanged": [], "sheets_changed": [], "blocks": 0, "blocks_changed": 0}
+    summary.update(dict.fromkeys(_CHANGE_COUNTERS, 0))
+    logger.info(f"Начало инкрементального импорта из Excel-файла: {file_path}")
+    reporter = ProgressReporter(progress_callback, job="incremental")
+    reporter.start(f"Инкрементальный импорт из {os.path.basename(file_path)}")
+
+    try:
+        with FastXlsxReader(file_path) as reader:
+            sheets_to_import: List[str] = [str(name) for name in options.get('sheets', [])] or reader.sheetnames
+            share = 100 / max(len(sheets_to_import), 1)
+
+            for index, sheet_name in enumerate(sheets_to_import):
+                if sheet_name not in reader.sheetnames:
+                    logger.warning(f"Лист '{sheet_name}' не найден в файле '{file_path}'. Пропущен.")
+                    continue
+                reporter.stage(f"Лист '{sheet_name}'", percent_range=(index * share, (index + 1) * share))
+
+                # Предполагаем project_id = 1 для MVP
+                sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+                if sheet_id is None:
+                    logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'.")
+                    reporter.finish(False, f"Не удалось импортировать лист '{sheet_name}'")
+                    return False
+
+                stored_fingerprints = storage.load_sheet_fingerprints(sheet_id)
+                source_fingerprint = reader.sheet_source_fingerprint(sheet_name)
+                if stored_fingerprints.get(SOURCE_BLOCK) == source_fingerprint:
+                    logger.info(f"Лист '{sheet_name}' не изменился с прошлого импорта. Пропущен.")
+                    summary["sheets_unchanged"].append(sheet_name)
+                    continue
+
+                try:
+                    with storage.write_batch():
+                        sheet_result = _reimport_sheet_blocks(storage, sheet_id, reader.iter_cells_flagged(sheet_name), stored_fingerprints)
+                except UnsupportedXlsxFeature as e:
+                    # Изменения листа откатаны write_batch; лист сравнивается заново по данным openpyxl
+                    logger.info(f"Быстрое чтение листа '{sheet_name}' недоступно: {e} Используется openpyxl.")
+                    with storage.write_batch():
+                        sheet_result = _reimport_sheet_blocks(storage, sheet_id, iter_sheet_cells_openpyxl(file_path, sheet_name), stored_fingerprints)
+                if sheet_result is None:
+                    logger.error(f"Не удалось применить изменения листа '{sheet_name}'.")
+                    reporter.finish(False, f"Не удалось импортировать лист '{sheet_name}'")
+                    return False
+
+                sheet_fingerprints = sheet_result["fingerprints"]
+                sheet_fingerprints[SOURCE_BLOCK] = source_fingerprint
+                if not storage.save_sheet_fingerprints(sheet_id, sheet_fingerprints):
+                    logger.error(f"Не удалось сохранить отпечатки листа '{sheet_name}'.")
+                    reporter.finish(False, f"Не удалось импортировать лист '{sheet_name}'")
+                    return False
+
+                summary["sheets_changed"].append(sheet_name)
+                for key in ("blocks", "blocks_changed") + _CHANGE_COUNTERS:
+                    summary[key] += sheet_result[key]
+                logger.info(
+                    f"Лист '{sheet_name}': изменено блоков {sheet_result['blocks_changed']} из {sheet_result['blocks']}; "
+                    + ", ".join(f"{key}={sheet_result[key]}" for key in _CHANGE_COUNTERS)
+                )
+
+    except UnsupportedXlsxFeature as e:
+        logger.error(f"Инкрементальный импорт недоступен для '{file_path}': {e}")
+        reporter.finish(False, "Инкрементальный импорт недоступен")
+        return False
+    except Exception as e:
+        logger.error(f"Ошибка при инкрементальном импорте из файла '{file_path}': {e}", exc_info=True)
+        reporter.finish(False, "Ошибка импорта")
+        return False
+
+    logger.info(
+        f"Инкрементальный импорт из '{file_path}' завершён: листов без изменений {len(summary['sheets_unchanged'])}, "
+        f"изменённых {len(summary['sheets_changed'])}, изменено блоков {summary['blocks_changed']} из {summary['blocks']}; "
+        + ", ".join(f"{key}={summary[key]}" for key in _CHANGE_COUNTERS)
+    )
+    if isinstance(options.get('change_summary'), dict):
+        options['change_summary'].update(summary)
+    reporter.finish(True, f"Импорт завершён: изменено листов {len(summary['sheets_changed'])} из {len(sheets_to_import)}")
+    return True
+
+# --- КОНЕЦ НОВОГО ---
+
+
 # --- Функции для импорта "выборочно" по типам ---
 
 # Заглушка для выборочного импорта. Реализация будет аналогична полному импорту,
@@ -614,7 +1654,7 @@ def import_raw_data_from_excel_selective(storage: ProjectDBStorage, file_path: s
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
                 'sheets': List[str],     # Список имён листов для импорта.
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 # Другие опции в будущем...
             }
 
@@ -635,7 +1675,7 @@ def import_styles_from_excel_selective(storage: ProjectDBStorage, file_path: str
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
                 'sheets': List[str],     # Список имён листов для импорта.
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 # Другие опции в будущем...
             }
 
@@ -673,7 +1713,7 @@ def import_formulas_from_excel_selective(storage: ProjectDBStorage, file_path: s
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
                 'sheets': List[str],     # Список имён листов для импорта.
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 # Другие опции в будущем...
             }
 
@@ -682,10 +1722,11 @@ def import_formulas_from_excel_selective(storage: ProjectDBStorage, file_path: s
     """
     logger.info(f"Начало выборочного импорта 'формул' из '{file_path}' с опциями {options}.")
     return import_formulas_from_excel(storage, file_path, options)
+@_in_bulk_session
 def import_all_data_from_excel_selective(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
     Импортирует все типы данных выборочно из Excel-файла.
-    Использует чанкирование через обновлённые функции импорта "всё".
+    Книга открывается один раз, каждый лист обходится один раз (см. _import_all_single_pass).
 
     Args:
         storage (ProjectDBStorage): Экземпляр ProjectDBStorage для сохранения данных.
@@ -693,7 +1734,7 @@ def import_all_data_from_excel_selective(storage: ProjectDBStorage, file_path: s
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
                 'sheets': List[str],     # Список имён листов для импорта.
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 # 'chunk_size_charts': int, # Количество диаграмм в одной части (по умолчанию len(all_charts_on_sheet))
                 # Другие опции в будущем...
             }
@@ -703,14 +1744,16 @@ def import_all_data_from_excel_selective(storage: ProjectDBStorage, file_path: s
     """
     logger.info(f"Начало выборочного импорта всех данных из '{file_path}' с опциями {options}.")
 
-    # Вызываем каждую функцию импорта "всё" с теми же options
-    # Они сами обработают options['sheets']
-    success_raw = import_raw_data_from_excel_selective(storage, file_path, options)
-    success_styles = import_styles_from_excel_selective(storage, file_path, options)
-    success_charts = import_charts_from_excel_selective(storage, file_path, options)
-    success_formulas = import_formulas_from_excel_selective(storage, file_path, options)
+    if not storage:
+        logger.error("Экземпляр ProjectDBStorage не предоставлен. Невозможно выполнить импорт.")
+        return False
+
+    if not os.path.exists(file_path):
+        logger.error(f"Excel-файл для импорта не найден: {file_path}")
+        return False
 
-    overall_success = success_raw and success_styles and success_charts and success_formulas
+    # Один проход по книге; фильтр options['sheets'] применяется внутри
+    overall_success = _import_all_single_pass(storage, file_path, options)
 
     if overall_success:
         logger.info(f"Выборочный импорт всех данных из '{file_path}' завершён успешно.")
@@ -736,7 +1779,7 @@ def import_raw_data_from_excel_in_chunks(storage: ProjectDBStorage, file_path: s
         file_path (str): Путь к Excel-файлу для импорта.
         chunk_options (Dict[str, Any]): Опции для разбиения на части.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
             }
 
@@ -783,19 +1826,23 @@ def import_all_data_from_excel_chunks(storage: ProjectDBStorage, file_path: str,
 
 # --- ОБНОВЛЕНИЕ ФУНКЦИИ ИМПОРТА ВСЕГО ---
 
+@_in_bulk_session
 def import_all_data_from_excel(storage: ProjectDBStorage, file_path: str, options: Optional[Dict[str, Any]] = None) -> bool:
     """
-    Импортирует все поддерживаемые типы данных (сырые, стили, диаграммы, формулы) из Excel-файла.
-    Использует чанкирование через обновлённые функции импорта "всё".
+    Импортирует все поддерживаемые типы данных (сырые, стили, диаграммы, формулы,
+    объединённые ячейки) из Excel-файла.
+    Книга открывается один раз, каждый лист обходится один раз (см. _import_all_single_pass).
 
     Args:
         storage: Экземпляр ProjectDBStorage для сохранения данных.
         file_path (str): Путь к Excel-файлу для импорта.
         options (Optional[Dict[str, Any]]): Опции импорта.
             {
-                'chunk_size_rows': int, # Количество строк в одной части (по умолчанию 50)
+                'chunk_size_rows': int, # Фиксированное число строк в части (по умолчанию подбирается адаптивно)
                 'chunk_size_charts': int, # Количество диаграмм в одной части (по умолчанию len(all_charts_on_sheet))
-                'sheets': List[str]     # Список имён листов для импорта. Если пуст, все.
+                'sheets': List[str],    # Список имён листов для импорта. Если пуст, все.
+                'streaming': bool,      # Принудительно включить/выключить потоковый режим (read_only)
+                'memory_limit_mb': int  # Лимит памяти; при превышении оценки выбирается потоковый режим
             }
 
     Returns:
@@ -811,13 +1858,12 @@ def import_all_data_from_excel(storage: ProjectDBStorage, file_path: str, option
 
     logger.info(f"Начало импорта всех данных из Excel-файла: {file_path}")
 
-    # Вызываем каждую функцию импорта "всё" с одинаковыми options
-    success_raw = import_raw_data_from_excel(storage, file_path, options)
-    success_styles = import_styles_from_excel(storage, file_path, options)
-    success_charts = import_charts_from_excel(storage, file_path, options)
-    success_formulas = import_formulas_from_excel(storage, file_path, options)
-
-    overall_success = success_raw and success_styles and success_charts and success_formulas
+    if should_use_streaming_import(file_path, options):
+        # Большие файлы: память пропорциональна части, а не книге
+        overall_success = import_streaming_data_from_excel(storage, file_path, options)
+    else:
+        # Книга открывается и обходится один раз для всех типов данных
+        overall_success = _import_all_single_pass(storage, file_path, options)
 
     if overall_success:
         logger.info(f"Импорт всех данных из '{file_path}' завершён успешно.")
@@ -4,6 +4,7 @@ import logging
 from typing import Dict, Any, Optional, Callable # <-- Добавлен Callable
 from backend.analyzer.logic_documentation import analyze_excel_file as run_analysis
 from backend.storage.base import ProjectDBStorage # <-- Импортируем ProjectDBStorage
+from backend.exceptions.app_exceptions import StorageError
 from backend.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -23,7 +24,7 @@ class AnalysisManager:
     def perform_analysis(self, file_path: str, db_path: str, options: Optional[Dict[str, Any]] = None, progress_callback: Optional[Callable[[int, str], None]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен db_path
         """
         Выполняет анализ Excel-файла и сохраняет результаты в БД проекта.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу для анализа.
@@ -36,7 +37,7 @@ class AnalysisManager:
         """
         # Создаём ProjectDBStorage с указанным db_path ВНУТРИ текущего потока
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"AnalysisManager: Не удалось подключиться к БД проекта {db_path} в потоке {id(__import__('threading').current_thread())}.")
             return False
 
@@ -56,47 +57,45 @@ class AnalysisManager:
             total_sheets = len(sheets_data)
             processed_sheets = 0
 
-            for sheet_info in sheets_data:
-                sheet_name = sheet_info["name"]
-                raw_data = sheet_info["raw_data"]
-                formulas = sheet_info["formulas"]
-                styles = sheet_info["styles"]
-                charts = sheet_info["charts"]
-                merged_cells = sheet_info["merged_cells"]
-                max_row = sheet_info.get("max_row")
-                max_col = sheet_info.get("max_column")
-
-                logger.debug(f"Обработка листа: {sheet_name}")
-
-                # Сохранение информации о листе
-                sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name, max_row=max_row, max_column=max_col)
-                if sheet_id is None:
-                    logger.error(f"Не удалось получить sheet_id для {sheet_name}. Прерывание анализа.")
-                    return False
-
-                # Сохранение данных
-                if not storage.save_sheet_raw_data(sheet_name, raw_data):
-                    logger.error(f"Ошибка сохранения raw_data для {sheet_name}")
-                    return False
-                if not storage.save_sheet_formulas(sheet_id, formulas):
-                    logger.error(f"Ошибка сохранения формул для {sheet_name}")
-                    return False
-                if not storage.save_sheet_styles(sheet_id, styles):
-                    logger.error(f"Ошибка сохранения стилей для {sheet_name}")
-                    return False
-                if not storage.save_sheet_charts(sheet_id, charts):
-                    logger.error(f"Ошибка сохранения диаграмм для {sheet_name}")
-                    return False
-                if not storage.save_sheet_merged_cells(sheet_id, merged_cells):
-                    logger.error(f"Ошибка сохранения объединенных ячеек для {sheet_name}")
-                    return False
-
-                processed_sheets += 1
-                # --- НОВОЕ: Обновление прогресса при обработке листа ---
-                if progress_callback and total_sheets > 0:
-                    progress_percent = int((processed_sheets / total_sheets) * 100)
-                    progress_callback(progress_percent, f"Обработан лист {processed_sheets} из {total_sheets}...")
-                # --- КОНЕЦ НОВОГО ---
+            # Вся запись результатов идёт в одной транзакции (один commit в конце)
+            with storage.bulk_session():
+                for sheet_info in sheets_data:
+                    sheet_name = sheet_info["name"]
+                    raw_data = sheet_info["raw_data"]
+                    formulas = sheet_info["formulas"]
+                    styles = sheet_info["styles"]
+                    charts = sheet_info["charts"]
+                    merged_cells = sheet_info["merged_cells"]
+                    max_row = sheet_info.get("max_row")
+                    max_col = sheet_info.get("max_column")
+
+                    logger.debug(f"Обработка листа: {sheet_name}")
+
+                    # Сохранение информации о листе
+                    sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name, max_row=max_row, max_column=max_col)
+                    if sheet_id is None:
+                        raise StorageError(f"Не удалось получить sheet_id для {sheet_name}. Прерывание анализа.")
+
+                    # Сохранение данных листа одним пакетом (SAVEPOINT).
+                    # Ошибка прерывает анализ и откатывает всю транзакцию сессии.
+                    with storage.write_batch():
+                        if not storage.save_sheet_raw_data(sheet_name, raw_data):
+                            raise StorageError(f"Ошибка сохранения raw_data для {sheet_name}")
+                        if not storage.save_sheet_formulas(sheet_id, formulas):
+                            raise StorageError(f"Ошибка сохранения формул для {sheet_name}")
+                        if not storage.save_sheet_styles(sheet_id, styles):
+                            raise StorageError(f"Ошибка сохранения стилей для {sheet_name}")
+                        if not storage.save_sheet_charts(sheet_id, charts):
+                            raise StorageError(f"Ошибка сохранения диаграмм для {sheet_name}")
+                        if not storage.save_sheet_merged_cells(sheet_id, merged_cells):
+                            raise StorageError(f"Ошибка сохранения объединенных ячеек для {sheet_name}")
+
+                    processed_sheets += 1
+                    # --- НОВОЕ: Обновление прогресса при обработке листа ---
+                    if progress_callback and total_sheets > 0:
+                        progress_percent = int((processed_sheets / total_sheets) * 100)
+                        progress_callback(progress_percent, f"Обработан лист {processed_sheets} из {total_sheets}...")
+                    # --- КОНЕЦ НОВОГО ---
 
             # --- НОВОЕ: Обновление прогресса в конце ---
             if progress_callback:
@@ -106,6 +105,11 @@ class AnalysisManager:
             logger.info(f"AnalysisManager: Анализ файла {file_path} завершен успешно.")
             return True
 
+        except StorageError as e:
+            logger.error(f"AnalysisManager: {e}")
+            if progress_callback:
+                progress_callback(0, f"Ошибка сохранения результатов анализа: {e}")
+            return False
         except Exception as e:
             logger.error(f"AnalysisManager: Ошибка при анализе файла {file_path}: {e}", exc_info=True)
             # --- НОВОЕ: Обновление прогресса при ошибке ---
@@ -115,5 +119,5 @@ class AnalysisManager:
             return False
         finally:
             # 3. Закрытие соединения с БД в текущем потоке
-            storage.disconnect()
-            logger.debug(f"AnalysisManager: Соединение с БД {db_path} закрыто в потоке {id(__import__('threading').current_thread())}.")
+            storage.release_thread_connections()
+            logger.debug(f"AnalysisManager: Соединение с БД {db_path} освобождено в потоке {id(__import__('threading').current_thread())}.")
@@ -5,7 +5,7 @@
 """
 import logging
 import sys # <-- Добавлен импорт sys
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import sqlite3  # Для аннотаций типов, если нужно
 
 # Импортируем AppController из родительского пакета core для аннотаций типов и доступа к storage
@@ -13,12 +13,24 @@ from ..app_controller import AppController
 
 # Импортируем ProjectDBStorage
 from backend.storage.base import ProjectDBStorage # <-- ИСПРАВЛЕНО: было from src.storage.base
+from backend.storage.cells import address_to_row_col, row_col_to_address
+from backend.storage.cell_values import parse_input_value
+from backend.core.formula_engine import FormulaEngine
+from backend.core.formula_graph import FormulaDependencyGraph
 
 # Импортируем logger из utils
 from backend.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+
+def _formula_text(value: Any) -> Optional[str]:
+    """Текст формулы, если в ячейку введена формула ('=...'), иначе None."""
+    if isinstance(value, str) and len(value) > 1 and value.startswith("="):
+        return value
+    return None
+
+
 class DataManager:
     """
     Класс для управления данными листа.
@@ -103,32 +115,18 @@ class DataManager:
                 # Возвращаем структуру с пустыми данными
                 return {"column_names": [], "rows": []}
 
-            # Загружаем редактируемые данные
-            editable_data_list = storage.load_sheet_editable_data(sheet_id, sheet_name)
-            # Загружаем "сырые" данные как резервный источник
-            raw_data_list = storage.load_sheet_raw_data(sheet_name)
-
-            # Создаем словари для быстрого доступа к данным
-            editable_dict = {(item["cell_address"]): item["value"] for item in editable_data_list}
-            raw_dict = {(item["cell_address"]): item["value"] for item in raw_data_list}
+            # Редактируемые и "сырые" данные хранятся в одной таблице 'cells',
+            # поэтому достаточно одного чтения диапазона с числовыми row/col (1-based).
+            cells = storage.load_cells(sheet_id, columns=("row", "col", "value"))
 
-            # Объединяем адреса из обоих источников
-            all_addresses = set(editable_dict.keys()).union(set(raw_dict.keys()))
-
-            # Парсим адреса и находим max_row, max_col
             max_row = -1
             max_col = -1
             cell_values = {}
-            for addr in all_addresses:
-                col_part = "".join(filter(str.isalpha, addr)).upper()
-                row_part = "".join(filter(str.isdigit, addr))
-                if row_part and col_part:
-                    row_idx = int(row_part) - 1  # 0-based
-                    col_idx = self._column_letter_to_index(col_part)
-                    max_row = max(max_row, row_idx)
-                    max_col = max(max_col, col_idx)
-                    # Приоритет у редактируемых данных
-                    cell_values[(row_idx, col_idx)] = editable_dict.get(addr, raw_dict[addr])
+            for row, col, value in cells:
+                row_idx, col_idx = row - 1, col - 1  # 0-based
+                max_row = max(max_row, row_idx)
+                max_col = max(max_col, col_idx)
+                cell_values[(row_idx, col_idx)] = value
 
             # Генерируем имена столбцов на основе max_col
             column_names = self._generate_excel_column_names(max_col + 1) if max_col >= 0 else []
@@ -161,6 +159,28 @@ class DataManager:
             logger.error(f"Ошибка при подготовке редактируемых данных для листа '{sheet_name}': {e}", exc_info=True)
             return None
 
+    def get_sheet_formula_values(self, sheet_name: str) -> Dict[str, Any]:
+        """
+        Получает сохранённые в файле результаты формул листа (импорт формул с результатами),
+        чтобы GUI показывал их вместо текста формулы без пересчёта.
+
+        Args:
+            sheet_name (str): Имя листа.
+
+        Returns:
+            Dict[str, Any]: {адрес ячейки: результат формулы}; пустой словарь, если результатов нет.
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен.")
+            return {}
+
+        sheet_id = self._get_sheet_id_by_name(sheet_name)
+        if sheet_id is None:
+            logger.warning(f"Не найден sheet_id для листа '{sheet_name}'. Результаты формул не загружены.")
+            return {}
+        return storage.load_sheet_formula_values(sheet_id)
+
     def _column_letter_to_index(self, letter: str) -> int:
         """Преобразует букву столбца Excel (например, 'A', 'Z', 'AA') в 0-базовый индекс."""
         result = 0
@@ -171,14 +191,15 @@ class DataManager:
     def _get_sheet_id_by_name(self, sheet_name: str) -> Optional[int]:
         """Вспомогательный метод для получения sheet_id по имени листа."""
         storage = self.app_controller.storage
-        if not storage or not storage.connection:
+        if not storage:
             return None
 
         try:
-            cursor = storage.connection.cursor()
-            # Предполагаем project_id = 1
-            cursor.execute("SELECT sheet_id FROM sheets WHERE name = ? AND project_id = 1", (sheet_name,))
-            result = cursor.fetchone()
+            with storage.get_read_connection() as conn:
+                cursor = conn.cursor()
+                # Предполагаем project_id = 1
+                cursor.execute("SELECT sheet_id FROM sheets WHERE name = ? AND project_id = 1", (sheet_name,))
+                result = cursor.fetchone()
             return result[0] if result else None
         except sqlite3.Error:
             return None
@@ -207,12 +228,14 @@ class DataManager:
 
     def update_cell_value(self, sheet_name: str, cell_address: str, new_value: Any) -> bool:
         """
-        Обновляет значение ячейки и записывает изменение в историю.
+        Обновляет значение ячейки, записывает изменение в историю и пересчитывает
+        формулы, зависящие от ячейки (по графу зависимостей).
 
         Args:
             sheet_name (str): Имя листа.
             cell_address (str): Адрес ячейки (например, 'A1').
-            new_value (Any): Новое значение ячейки.
+            new_value (Any): Новое значение ячейки. Текст из редактора разбирается
+                в число, логическое значение или дату (cell_values.parse_input_value).
 
         Returns:
             bool: True, если обновление успешно, иначе False.
@@ -237,17 +260,27 @@ class DataManager:
             # или установить None. Более точная логика может потребоваться.
             old_value = None  # TODO: Получить реальное старое значение
 
-            # 3. Обновляем редактируемые данные
+            # 3. Обновляем редактируемые данные и формулу ячейки (введённую или заменённую значением)
+            # Текст из редактора хранится типизированным: '7' - число, '15.01.2024' - дата
+            if isinstance(new_value, str):
+                new_value = parse_input_value(new_value)
             # --- Используем исправленный метод из storage ---
-            if not storage.update_editable_cell(sheet_id, sheet_name, cell_address, new_value):
-                logger.error(f"Не удалось обновить редактируемую ячейку {cell_address} на листе '{sheet_name}'.")
-                return False
+            formula = _formula_text(new_value)
+            with storage.bulk_session():
+                if not storage.update_editable_cell(sheet_id, sheet_name, cell_address, new_value):
+                    raise RuntimeError(f"не удалось обновить редактируемую ячейку {cell_address} на листе '{sheet_name}'")
+                if not storage.update_cell_formulas(sheet_id, [(cell_address, formula)]):
+                    raise RuntimeError(f"не удалось обновить формулу ячейки {cell_address}")
 
             # 4. Записываем в историю редактирования
             # --- Используем метод из storage ---
             if not storage.save_edit_history_record(sheet_id, cell_address, old_value, new_value):
                 logger.warning(f"Не удалось записать изменение ячейки {cell_address} в историю.")
 
+            # 5. Пересчитываем зависящие от ячейки формулы
+            position = address_to_row_col(cell_address)
+            self._recalculate_dependents(sheet_id, [position], [position] if formula else [])
+
             # --- ИСПРАВЛЕНО: Проверка уровня лога перед форматированием ---
             # ВРЕМЕННО: Печатаем уровень и результат isEnabledFor
             current_logger_level = logger.level
@@ -262,6 +295,168 @@ class DataManager:
             logger.error(f"Ошибка при обновлении ячейки {cell_address} на листе '{sheet_name}': {e}", exc_info=True)
             return False
 
+    def load_sheet_columns(self, sheet_name: str, columns: List[int], row0: int = 1) -> Optional[Dict[int, List[Tuple[int, Any, Any]]]]:
+        """
+        Загружает значения нескольких столбцов листа в том виде, в каком они хранятся в БД
+        (даты - серийными номерами Excel), для пакетных вычислений.
+
+        Args:
+            sheet_name (str): Имя листа.
+            columns (List[int]): Номера столбцов (1-based).
+            row0 (int): Первая строка (1-based).
+
+        Returns:
+            Optional[Dict[int, List[Tuple[int, Any, Any]]]]: {столбец: [(row, value, value_type), ...]}
+            в порядке строк или None, если лист не найден.
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен.")
+            return None
+
+        sheet_id = self._get_sheet_id_by_name(sheet_name)
+        if sheet_id is None:
+            logger.error(f"Не найден sheet_id для листа '{sheet_name}'.")
+            return None
+        col0, col1 = min(columns), max(columns)
+        if col1 - col0 + 1 > 2 * len(columns):
+            # Столбцы далеко друг от друга - каждый читается отдельно, без лишних столбцов между ними
+            return {
+                col: storage.load_cells(sheet_id, row0=row0, col0=col, col1=col, columns=("row", "value", "value_type"), decode=False)
+                for col in columns
+            }
+        # Близкие столбцы читаются одним проходом по диапазону
+        result: Dict[int, List[Tuple[int, Any, Any]]] = {col: [] for col in columns}
+        records = storage.load_cells(sheet_id, row0=row0, col0=col0, col1=col1, columns=("row", "col", "value", "value_type"), decode=False)
+        for row, col, value, value_type in records:
+            target = result.get(col)
+            if target is not None:
+                target.append((row, value, value_type))
+        return result
+
+    def update_cells_batch(self, sheet_name: str, cells: List[Tuple[int, int, Any]], description: str, values_only: bool = False, value_type: Optional[str] = None) -> bool:
+        """
+        Записывает значения многих ячеек в одной транзакции и добавляет в историю
+        одну общую запись на весь изменённый диапазон (вместо записи на каждую ячейку).
+
+        Args:
+            sheet_name (str): Имя листа.
+            cells (List[Tuple[int, int, Any]]): Кортежи (row, col, value), row/col 1-based.
+            description (str): Описание изменения для истории (новое значение записи).
+            values_only (bool): Значения заведомо не формулы (результаты вычислений): текст
+                не проверяется на '=', удаляются только формулы, которые были в записанных ячейках.
+            value_type (Optional[str]): Все значения уже в форме хранения с этим тегом типа
+                (например, 'str' для текстовых результатов): кодирование каждой ячейки пропускается.
+
+        Returns:
+            bool: True, если все значения записаны, иначе False (изменения откатываются).
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен. Невозможно обновить ячейки.")
+            return False
+        if not cells:
+            return True
+
+        sheet_id = self._get_sheet_id_by_name(sheet_name)
+        if sheet_id is None:
+            logger.error(f"Не найден sheet_id для листа '{sheet_name}'. Обновление невозможно.")
+            return False
+
+        rows = [row for row, _, _ in cells]
+        cols = [col for _, col, _ in cells]
+        range_address = f"{row_col_to_address(min(rows), min(cols))}:{row_col_to_address(max(rows), max(cols))}"
+        if values_only:
+            formulas = self._overwritten_formulas(sheet_id, cells)
+        else:
+            formulas = [(row, col, _formula_text(value)) for row, col, value in cells]
+        try:
+            with storage.bulk_session():
+                if not storage.save_sheet_cells(sheet_id, [(row, col, value, value_type) for row, col, value in cells], encoded=value_type is not None):
+                    raise RuntimeError(f"не удалось записать ячейки диапазона {range_address}")
+                if formulas and not storage.update_cell_formulas(sheet_id, [(row_col_to_address(row, col), formula) for row, col, formula in formulas]):
+                    raise RuntimeError(f"не удалось обновить формулы ячеек диапазона {range_address}")
+                if not storage.save_edit_history_record(sheet_id, range_address, None, description):
+                    logger.warning(f"Не удалось записать изменение диапазона {range_address} в историю.")
+            logger.info(f"Обновлено {len(cells)} ячеек в диапазоне {range_address} листа '{sheet_name}'.")
+            self._recalculate_dependents(
+                sheet_id,
+                [(row, col) for row, col, _ in cells],
+                [(row, col) for row, col, formula in formulas if formula],
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном обновлении ячеек листа '{sheet_name}': {e}", exc_info=True)
+            return False
+
+    def recalculate_formulas(
+        self,
+        sheet_names: Optional[List[str]] = None,
+        progress_callback: Optional[Callable[..., None]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Пересчитывает формулы листов по данным проекта и записывает результаты
+        в cached_value таблицы formulas (их показывает GUI).
+
+        Args:
+            sheet_names (Optional[List[str]]): Листы для пересчёта; None - все листы проекта.
+            progress_callback (Optional[Callable[..., None]]): Функция для обновления прогресса.
+
+        Returns:
+            Optional[Dict[str, Any]]: Итоги пересчёта (RecalcResult.to_dict()) или None, если проект не загружен.
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен. Пересчёт формул невозможен.")
+            return None
+
+        engine = FormulaEngine(storage)
+        result = engine.recalculate(sheet_names, progress_callback=progress_callback)
+        return result.to_dict()
+
+    def _overwritten_formulas(self, sheet_id: int, cells: List[Tuple[int, int, Any]]) -> List[Tuple[int, int, Optional[str]]]:
+        """
+        Формулы листа, которые затираются записью значений в ячейки cells.
+
+        Returns:
+            List[Tuple[int, int, Optional[str]]]: Кортежи (row, col, None) для удаления формул.
+        """
+        formulas = self.app_controller.storage.load_sheet_formulas(sheet_id)
+        if not formulas:
+            return []
+        written = {(row, col) for row, col, _ in cells}
+        overwritten = []
+        for item in formulas:
+            try:
+                position = address_to_row_col(item["cell_address"])
+            except ValueError:
+                continue
+            if position in written:
+                overwritten.append((*position, None))
+        return overwritten
+
+    def _recalculate_dependents(self, sheet_id: int, cells: List[Tuple[int, int]], formulas: Optional[List[Tuple[int, int]]] = None):
+        """
+        Пересчитывает формулы, транзитивно зависящие от изменённых ячеек листа,
+        и формулы, введённые в эти ячейки.
+        Ошибка пересчёта не отменяет правку: у формул остаются прежние результаты.
+
+        Args:
+            sheet_id (int): ID листа изменённых ячеек.
+            cells (List[Tuple[int, int]]): Изменённые ячейки (row, col).
+            formulas (Optional[List[Tuple[int, int]]]): Ячейки (row, col), в которые введены формулы.
+        """
+        try:
+            graph = FormulaDependencyGraph(self.app_controller.storage)
+            result = graph.recalculate_dependents(
+                [(sheet_id, row, col) for row, col in cells],
+                formulas=[(sheet_id, row, col) for row, col in formulas or []],
+            )
+            if result is not None and not result.success:
+                logger.warning(f"Результаты зависимых формул записаны не полностью: {result.summary()}")
+        except Exception as e:
+            logger.error(f"Ошибка при пересчёте формул, зависящих от изменённых ячеек: {e}", exc_info=True)
+
     def get_edit_history(self, sheet_name: Optional[str] = None, limit: Optional[int] = 10) -> List[Dict[str, Any]]:
         """
         Получает историю редактирования.
@@ -309,6 +504,52 @@ class DataManager:
             logger.error(f"Ошибка при загрузке 'сырых' данных для листа '{sheet_name}': {e}", exc_info=True)
             return []
 
+    def get_sheet_extent(self, sheet_name: str) -> Optional[Tuple[int, int]]:
+        """
+        Получает границы заполненной области листа без чтения его ячеек.
+
+        Args:
+            sheet_name (str): Имя листа.
+
+        Returns:
+            Optional[Tuple[int, int]]: (max_row, max_col), обе 1-based, или None, если ячеек нет.
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен.")
+            return None
+
+        sheet_id = self._get_sheet_id_by_name(sheet_name)
+        if sheet_id is None:
+            logger.warning(f"Не найден sheet_id для листа '{sheet_name}'.")
+            return None
+        return storage.get_cells_extent(sheet_id)
+
+    def load_sheet_cells(self, sheet_name: str, row0: int, row1: int, col0: int = 1, col1: Optional[int] = None) -> List[Tuple[int, int, Any]]:
+        """
+        Загружает значения ячеек прямоугольного диапазона листа (например, видимого окна таблицы).
+
+        Args:
+            sheet_name (str): Имя листа.
+            row0 (int): Первая строка (1-based, включительно).
+            row1 (int): Последняя строка (включительно).
+            col0 (int): Первый столбец (1-based, включительно).
+            col1 (Optional[int]): Последний столбец (включительно). None - до последнего столбца.
+
+        Returns:
+            List[Tuple[int, int, Any]]: Список (row, col, value), row и col 1-based.
+        """
+        storage = self.app_controller.storage
+        if not storage:
+            logger.error("Проект не загружен.")
+            return []
+
+        sheet_id = self._get_sheet_id_by_name(sheet_name)
+        if sheet_id is None:
+            logger.warning(f"Не найден sheet_id для листа '{sheet_name}'.")
+            return []
+        return storage.load_cells(sheet_id, row0=row0, col0=col0, row1=row1, col1=col1, columns=("row", "col", "value"))
+
     def _generate_excel_column_names(self, num_cols: int) -> List[str]:
         """
         Генерирует список имён столбцов Excel (A, B, ..., Z, AA, AB, ...).
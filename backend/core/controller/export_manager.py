@@ -7,6 +7,7 @@ from pathlib import Path
 # Импортируем функцию экспорта
 from backend.exporter.excel.xlsxwriter_exporter import export_project_xlsxwriter
 from backend.storage.base import ProjectDBStorage # <-- Импортируем ProjectDBStorage
+from backend.storage.profiles import resolve_profile_name
 from backend.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -27,7 +28,7 @@ class ExportManager:
         """
         Выполняет экспорт данных проекта в файл.
         В текущей реализации поддерживает только 'excel' через xlsxwriter.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             export_type (str): Тип экспорта (например, 'excel').
@@ -45,8 +46,8 @@ class ExportManager:
             return False
 
         # Создаём ProjectDBStorage с указанным db_path ВНУТРИ текущего потока
-        storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        storage = ProjectDBStorage(db_path, profile=resolve_profile_name(purpose="export"))
+        if not storage.check_connection():
             logger.error(f"ExportManager: Не удалось подключиться к БД проекта {db_path} в потоке {id(__import__('threading').current_thread())}.")
             return False
 
@@ -91,5 +92,5 @@ class ExportManager:
             return False
         finally:
             # 3. Закрытие соединения с БД в текущем потоке
-            storage.disconnect()
-            logger.debug(f"ExportManager: Соединение с БД {db_path} закрыто в потоке {id(__import__('threading').current_thread())}.")
+            storage.release_thread_connections()
+            logger.debug(f"ExportManager: Соединение с БД {db_path} освобождено в потоке {id(__import__('threading').current_thread())}.")
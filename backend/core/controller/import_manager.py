@@ -15,8 +15,15 @@ from ..app_controller_data_import import (
     # import_styles_from_excel_selective, # Добавить при необходимости
     # и т.д.
     # --- НОВОЕ: Импорт функции для "сырых" значений ---
-    import_raw_values_only_from_excel # <-- НОВОЕ
+    import_raw_values_only_from_excel, # <-- НОВОЕ
+    import_streaming_data_from_excel,
+    import_formulas_with_values_from_excel,
+    import_all_data_from_excel,
+    STREAMING_CHECKPOINT_JOB
 )
+from ..import_checkpoints import load_checkpoint_state
+from ..import_strategy import choose_import_plan, record_import_plan
+from ..parallel_import import import_sheets_in_parallel
 
 logger = get_logger(__name__)
 
@@ -24,7 +31,7 @@ class ImportManager:
     def __init__(self, app_controller):
         """
         Инициализирует ImportManager.
-        Не хранит ссылку на storage, создаёт его в потоке метода.
+        Не хранит ссылку на storage, создаёт его в потоке метода (соединения берутся из пула).
 
         Args:
             app_controller: Экземпляр AppController.
@@ -35,7 +42,7 @@ class ImportManager:
     def perform_import_raw_data(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт "сырых" данных (значения, формулы как строки).
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -52,7 +59,7 @@ class ImportManager:
             bool: True, если импорт успешен.
         """
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -81,13 +88,13 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта 'сырых' данных: {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
 
     def perform_import_raw_values_only(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт "сырых" значений (только результаты формул и значения ячеек).
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -108,7 +115,7 @@ class ImportManager:
         # --- КОНЕЦ ИЗМЕНЕНИЯ ---
 
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -146,13 +153,13 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта 'сырых' значений (только результаты): {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
 
     def perform_import_styles(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт стилей.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -169,7 +176,7 @@ class ImportManager:
             bool: True, если импорт успешен.
         """
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -198,13 +205,13 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта стилей: {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
 
     def perform_import_charts(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт диаграмм.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -221,7 +228,7 @@ class ImportManager:
             bool: True, если импорт успешен.
         """
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -250,13 +257,13 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта диаграмм: {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
 
     def perform_import_formulas(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт формул.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -273,7 +280,7 @@ class ImportManager:
             bool: True, если импорт успешен.
         """
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -302,13 +309,13 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта формул: {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
 
     def perform_import_raw_data_in_chunks(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool: # <-- ИЗМЕНЕНО: Добавлен options
         """
         Выполняет импорт "сырых" данных частями.
-        Создаёт собственное соединение с БД в текущем потоке.
+        Использует соединения текущего потока из пула (запись сериализуется).
 
         Args:
             file_path (str): Путь к Excel-файлу.
@@ -325,7 +332,7 @@ class ImportManager:
             bool: True, если импорт успешен.
         """
         storage = ProjectDBStorage(db_path)
-        if not storage.connect():
+        if not storage.check_connection():
             logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
             return False
 
@@ -357,5 +364,195 @@ class ImportManager:
                 progress_callback(0, f"Ошибка импорта 'сырых' данных частями: {e}")
             return False
         finally:
-            storage.disconnect()
-            logger.debug(f"ImportManager: Соединение с БД {db_path} закрыто.")
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
+
+    # --- НОВОЕ: Импорт формул с сохранёнными результатами ---
+    def perform_import_formulas_with_values(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Выполняет импорт значений, формул и сохранённых результатов формул за один разбор листа.
+        Использует соединения текущего потока из пула (запись сериализуется).
+
+        Args:
+            file_path (str): Путь к Excel-файлу.
+            db_path (str): Путь к файлу БД проекта (.db).
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],  # Список имён листов для импорта.
+                }
+
+        Returns:
+            bool: True, если импорт успешен.
+        """
+        storage = ProjectDBStorage(db_path)
+        if not storage.check_connection():
+            logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
+            return False
+
+        try:
+            logger.info(f"ImportManager: Начало импорта формул с результатами из {file_path}.")
+
+            if progress_callback:
+                progress_callback(0, f"Импорт формул с результатами из {file_path}...")
+
+            success = import_formulas_with_values_from_excel(storage, file_path, options=options)
+
+            if progress_callback:
+                progress_callback(100 if success else 0, f"Импорт формул с результатами {'завершён' if success else 'не удался'}.")
+
+            if success:
+                logger.info(f"ImportManager: Импорт формул с результатами из {file_path} завершён успешно.")
+            else:
+                logger.error(f"ImportManager: Ошибка импорта формул с результатами из {file_path}.")
+            return success
+
+        except Exception as e:
+            logger.error(f"ImportManager: Ошибка при импорте формул с результатами из {file_path}: {e}", exc_info=True)
+            if progress_callback:
+                progress_callback(0, f"Ошибка импорта формул с результатами: {e}")
+            return False
+        finally:
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
+    # --- КОНЕЦ НОВОГО ---
+
+    # --- НОВОЕ: Потоковый импорт с продолжением после сбоя ---
+    def perform_import_streaming(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Выполняет потоковый импорт (openpyxl read_only) с контрольными точками.
+        Если предыдущий импорт того же файла в эту БД был прерван, импорт продолжается
+        с последней зафиксированной части (см. get_import_checkpoint).
+
+        Args:
+            file_path (str): Путь к Excel-файлу.
+            db_path (str): Путь к файлу БД проекта (.db).
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],  # Список имён листов для импорта.
+                    'resume': bool,       # Продолжить прерванный импорт (по умолчанию True)
+                    # Остальные опции - см. import_streaming_data_from_excel
+                }
+
+        Returns:
+            bool: True, если импорт успешен.
+        """
+        storage = ProjectDBStorage(db_path)
+        if not storage.check_connection():
+            logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
+            return False
+
+        try:
+            checkpoint_state = load_checkpoint_state(storage, STREAMING_CHECKPOINT_JOB)
+            resuming = checkpoint_state is not None and (options or {}).get('resume', True)
+            logger.info(f"ImportManager: Начало потокового импорта из {file_path}{' (продолжение)' if resuming else ''}.")
+
+            if progress_callback:
+                progress_callback(0, f"{'Продолжение' if resuming else 'Начало'} потокового импорта из {file_path}...")
+
+            success = import_streaming_data_from_excel(storage, file_path, options=options)
+
+            if progress_callback:
+                progress_callback(100 if success else 0, f"Потоковый импорт {'завершён' if success else 'не удался (можно продолжить повторным запуском)'}.")
+
+            if success:
+                logger.info(f"ImportManager: Потоковый импорт из {file_path} завершён успешно.")
+            else:
+                logger.error(f"ImportManager: Ошибка потокового импорта из {file_path}. Контрольная точка сохранена.")
+            return success
+
+        except Exception as e:
+            logger.error(f"ImportManager: Ошибка при потоковом импорте из {file_path}: {e}", exc_info=True)
+            if progress_callback:
+                progress_callback(0, f"Ошибка потокового импорта: {e}")
+            return False
+        finally:
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
+
+    # --- НОВОЕ: Автоматический выбор способа импорта ---
+    def perform_import_auto(self, file_path: str, db_path: str, progress_callback: Optional[Callable[[int, str], None]] = None, options: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Осматривает книгу (workbook_probe) и импортирует её способом, выбранным
+        choose_import_plan: openpyxl целиком, чтение XML (последовательно или параллельно
+        по листам) или потоково. Выбранный план и причины выбора пишутся в лог.
+        Использует соединения текущего потока из пула (запись сериализуется).
+
+        Args:
+            file_path (str): Путь к Excel-файлу.
+            db_path (str): Путь к файлу БД проекта (.db).
+            progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
+            options (Optional[Dict[str, Any]]): Опции импорта.
+                {
+                    'sheets': List[str],      # Список имён листов для импорта.
+                    'memory_limit_mb': int,   # Лимит памяти (по умолчанию 512 МБ, не больше половины свободной)
+                    'import_styles': bool,    # False - оформление не нужно
+                    'import_plan': dict,      # Если передан словарь, в него записывается выбранный план
+                    # Остальные опции передаются выбранному импортёру
+                }
+
+        Returns:
+            bool: True, если импорт успешен.
+        """
+        plan = choose_import_plan(file_path, options)
+        record_import_plan(plan, options)
+        run_options = dict(options or {})
+        run_options.update(plan.options)
+
+        storage = ProjectDBStorage(db_path)
+        if not storage.check_connection():
+            logger.error(f"ImportManager: Не удалось подключиться к БД проекта {db_path}.")
+            return False
+
+        try:
+            logger.info(f"ImportManager: Начало автоматического импорта из {file_path} (способ '{plan.strategy}').")
+
+            if progress_callback:
+                progress_callback(0, f"Импорт из {file_path} (способ: {plan.strategy})...")
+
+            if plan.strategy == "xml_parallel":
+                success = import_sheets_in_parallel(storage, file_path, run_options, progress_callback)
+            elif plan.strategy == "xml":
+                success = import_formulas_with_values_from_excel(storage, file_path, options=run_options)
+            elif plan.strategy == "streaming":
+                success = import_streaming_data_from_excel(storage, file_path, options=run_options)
+            else:
+                success = import_all_data_from_excel(storage, file_path, options=run_options)
+
+            if progress_callback:
+                progress_callback(100 if success else 0, f"Автоматический импорт ({plan.strategy}) {'завершён' if success else 'не удался'}.")
+
+            if success:
+                logger.info(f"ImportManager: Автоматический импорт из {file_path} завершён успешно.")
+            else:
+                logger.error(f"ImportManager: Ошибка автоматического импорта из {file_path} (способ '{plan.strategy}').")
+            return success
+
+        except Exception as e:
+            logger.error(f"ImportManager: Ошибка при автоматическом импорте из {file_path}: {e}", exc_info=True)
+            if progress_callback:
+                progress_callback(0, f"Ошибка автоматического импорта: {e}")
+            return False
+        finally:
+            storage.release_thread_connections()
+            logger.debug(f"ImportManager: Соединение с БД {db_path} освобождено.")
+    # --- КОНЕЦ НОВОГО ---
+
+    def get_import_checkpoint(self, db_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает контрольную точку прерванного потокового импорта в БД проекта.
+
+        Args:
+            db_path (str): Путь к файлу БД проекта (.db).
+
+        Returns:
+            Optional[Dict[str, Any]]: Состояние ('file_path', 'sheets_done', 'sheet', 'last_row', ...)
+                или None, если незавершённого импорта нет.
+        """
+        storage = ProjectDBStorage(db_path)
+        try:
+            return load_checkpoint_state(storage, STREAMING_CHECKPOINT_JOB)
+        finally:
+            storage.release_thread_connections()
+    # --- КОНЕЦ НОВОГО ---
@@ -4,18 +4,56 @@
 аналогичных тем, что используются в Excel, но реализованных на Python.
 
 Каждая функция получает данные через DataManager и сохраняет результат обратно.
+Калькуляторы столбцов работают пакетно: входные столбцы читаются массивами, расчёт
+выполняется векторно (numpy), результаты записываются одной транзакцией
+(apply_column_calculator).
 """
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import calendar
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+from backend.storage.cell_values import TYPE_DATE, TYPE_DATETIME, TYPE_STR, encode_cell_value
+from backend.storage.cells import address_to_row_col, column_letter_to_index
 from backend.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+# Окончания единиц возраста: (1; 2-4; 0, 5-9 и 11-14)
+_AGE_UNITS = {
+    "year": (" год", " года", " лет"),
+    "month": (" месяц", " месяца", " месяцев"),
+    "day": (" день", " дня", " дней"),
+}
+
+
+def _get_ending(value: int, unit_type: str) -> str:
+    """Окончание единицы возраста для числа value ("1 год", "2 года", "5 лет")."""
+    if value == 0:
+        return ""
+    one, few, many = _AGE_UNITS[unit_type]
+    last_digit = value % 10
+    last_two_digits = value % 100
+    if 11 <= last_two_digits <= 14 or last_digit == 0 or 5 <= last_digit <= 9:
+        return many
+    if 2 <= last_digit <= 4:
+        return few
+    return one
+
+
+def _format_age(years: int, months: int, days: int) -> str:
+    """Строка возраста по компонентам, например "5 лет 2 месяца 10 дней" (нулевые части опускаются)."""
+    parts = [
+        f"{value}{_get_ending(value, unit)}"
+        for value, unit in ((years, "year"), (months, "month"), (days, "day"))
+        if value > 0
+    ]
+    return " ".join(parts)
+
+
 def calculate_age_string(start_date_cell_value: Any, end_date_cell_value: Any) -> str:
     """
     Вычисляет строку возраста по формату Excel-формулы.
@@ -67,43 +105,7 @@ def calculate_age_string(start_date_cell_value: Any, end_date_cell_value: Any) -
             years -= 1
             months += 12
 
-        # Функция для определения окончания
-        def get_ending(value: int, unit_type: str) -> str:
-            if value == 0:
-                return ""
-            last_digit = value % 10
-            last_two_digits = value % 100
-
-            if unit_type == "year":
-                if 11 <= last_two_digits <= 14 or last_digit == 0 or 5 <= last_digit <= 9:
-                    return " лет"
-                elif 2 <= last_digit <= 4:
-                    return " года"
-                elif last_digit == 1:
-                    return " год"
-            elif unit_type == "month":
-                if 11 <= last_two_digits <= 14 or last_digit == 0 or 5 <= last_digit <= 9:
-                    return " месяцев"
-                elif 2 <= last_digit <= 4:
-                    return " месяца"
-                elif last_digit == 1:
-                    return " месяц"
-            elif unit_type == "day":
-                if 11 <= last_two_digits <= 14 or last_digit == 0 or 5 <= last_digit <= 9:
-                    return " дней"
-                elif 2 <= last_digit <= 4:
-                    return " дня"
-                elif last_digit == 1:
-                    return " день"
-            return ""
-
-        year_str = f"{years}{get_ending(years, 'year')}" if years > 0 else ""
-        month_str = f"{months}{get_ending(months, 'month')}" if months > 0 else ""
-        day_str = f"{days}{get_ending(days, 'day')}" if days > 0 else ""
-
-        result_parts = [s for s in [year_str, month_str, day_str] if s]
-        result = " ".join(result_parts)
-        return result.strip() # Убираем лишние пробелы в начале/конце
+        return _format_age(years, months, days)
 
     except Exception as e:
         logger.error(f"Ошибка при вычислении возраста: {e}", exc_info=True)
@@ -137,6 +139,218 @@ def _convert_to_datetime(value: Any) -> Optional[datetime]:
     return None
 
 
+# --- Пакетные (векторные) вычисления ---
+
+# Начало отсчёта серийных дат Excel (как в storage/cell_values.py)
+_EXCEL_EPOCH_MS = np.datetime64("1899-12-30", "ms")
+_MS_PER_DAY = 86_400_000
+# Теги типов, значения которых хранятся серийным номером даты (storage/cell_values.py)
+_DATE_VALUE_TYPES = (TYPE_DATETIME, TYPE_DATE)
+
+
+def stored_values_to_datetime64(values: Sequence[Any], value_types: Sequence[Any]) -> np.ndarray:
+    """
+    Преобразует значения ячеек в представлении БД (серийные номера дат, строки) в массив
+    datetime64[ms]. Строки разбираются pandas (каждая уникальная строка - один раз);
+    числа без тега даты, пустые и неразобранные значения дают NaT.
+
+    Args:
+        values (Sequence[Any]): Значения из колонки cells.value.
+        value_types (Sequence[Any]): Теги типов из колонки cells.value_type.
+
+    Returns:
+        np.ndarray: Массив datetime64[ms] той же длины.
+    """
+    values = np.asarray(values, dtype=object)
+    value_types = np.asarray(value_types, dtype=object)
+    result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ms]")
+    if not len(values):
+        return result
+
+    is_text = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+    is_serial = np.isin(value_types, _DATE_VALUE_TYPES) & ~is_text & (values != None)  # noqa: E711 - поэлементно
+    if is_serial.any():
+        serials = values[is_serial].astype(np.float64)
+        result[is_serial] = _EXCEL_EPOCH_MS + np.round(serials * _MS_PER_DAY).astype("timedelta64[ms]")
+    if is_text.any():
+        unique_texts, inverse = np.unique(values[is_text].astype(str), return_inverse=True)
+        parsed = pd.to_datetime(pd.Series(unique_texts), errors="coerce", format="mixed")
+        result[is_text] = parsed.to_numpy(dtype="datetime64[ms]")[inverse]
+    return result
+
+
+def values_to_datetime64(values: Sequence[Any]) -> np.ndarray:
+    """
+    Преобразует значения Python (datetime, date, pd.Timestamp, строки дат) в массив datetime64[ms].
+    Прочие значения дают NaT.
+    """
+    encoded = [encode_cell_value(value) for value in values]
+    return stored_values_to_datetime64([value for value, _ in encoded], [value_type for _, value_type in encoded])
+
+
+def age_components(start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Векторный расчёт возраста (годы, месяцы, дни) между датами, как calculate_age_string:
+    при нехватке дней занимается длина предыдущего месяца конечной даты.
+
+    Args:
+        start (np.ndarray): Начальные даты (datetime64).
+        end (np.ndarray): Конечные даты (datetime64).
+
+    Returns:
+        Tuple[np.ndarray, ...]: (years, months, days, valid); valid - обе даты заданы и начало не позже конца.
+            Для невалидных элементов компоненты равны 0.
+    """
+    valid = ~np.isnat(start) & ~np.isnat(end)
+    valid[valid] = start[valid] <= end[valid]
+    # Невалидные элементы заменяются эпохой, чтобы арифметика не переполнялась на NaT
+    start = np.where(valid, start, np.datetime64(0, "ms"))
+    end = np.where(valid, end, np.datetime64(0, "ms"))
+
+    start_month = start.astype("datetime64[M]")
+    end_month = end.astype("datetime64[M]")
+    years = end.astype("datetime64[Y]").astype(np.int64) - start.astype("datetime64[Y]").astype(np.int64)
+    months = end_month.astype(np.int64) % 12 - start_month.astype(np.int64) % 12
+    days = (
+        (end.astype("datetime64[D]") - end_month.astype("datetime64[D]")).astype(np.int64)
+        - (start.astype("datetime64[D]") - start_month.astype("datetime64[D]")).astype(np.int64)
+    )
+
+    borrow_days = days < 0
+    if borrow_days.any():
+        prev_month_days = (end_month.astype("datetime64[D]") - (end_month - 1).astype("datetime64[D]")).astype(np.int64)
+        months = months - borrow_days
+        days = np.where(borrow_days, days + prev_month_days, days)
+    borrow_months = months < 0
+    years = years - borrow_months
+    months = np.where(borrow_months, months + 12, months)
+
+    zero = np.zeros_like(years)
+    return np.where(valid, years, zero), np.where(valid, months, zero), np.where(valid, days, zero), valid
+
+
+def age_strings_from_datetime64(start: np.ndarray, end: np.ndarray) -> List[str]:
+    """
+    Строки возраста для массивов дат. Каждая уникальная тройка (годы, месяцы, дни)
+    форматируется один раз; для невалидных пар - пустая строка.
+    """
+    years, months, days, valid = age_components(start, end)
+    # Дни после заёма могут остаться отрицательными (31-е число -> короткий месяц), поэтому со сдвигом
+    keys = (years * 12 + months) * 64 + days + 32
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    formatted = np.array(
+        [_format_age(int(key // 64 // 12), int(key // 64 % 12), int(key % 64 - 32)) for key in unique_keys],
+        dtype=object,
+    )
+    result = formatted[inverse]
+    result[~valid] = ""
+    return result.tolist()
+
+
+def calculate_age_strings(start_values: Sequence[Any], end_values: Sequence[Any]) -> List[str]:
+    """
+    Пакетный вариант calculate_age_string: строки возраста для пар дат.
+
+    Args:
+        start_values (Sequence[Any]): Начальные даты (datetime, date, pd.Timestamp, строки).
+        end_values (Sequence[Any]): Конечные даты той же длины.
+
+    Returns:
+        List[str]: Строки возраста; пустая строка, если даты недействительны или начало позже конца.
+    """
+    if len(start_values) != len(end_values):
+        raise ValueError(f"Длины массивов дат не совпадают: {len(start_values)} и {len(end_values)}")
+    return age_strings_from_datetime64(values_to_datetime64(start_values), values_to_datetime64(end_values))
+
+
+def apply_column_calculator(
+    data_manager,
+    sheet_name: str,
+    input_cells: Sequence[str],
+    result_column_addr: str,
+    calculator: Callable[..., Sequence[Any]],
+    description: str,
+    result_type: Optional[str] = None,
+) -> bool:
+    """
+    Применяет пакетный калькулятор к столбцам листа.
+
+    Столбцы входных ячеек читаются из БД массивами (значения как в БД и теги типов)
+    от строки первой входной ячейки до последней заполненной строки; смещение строк
+    между входными ячейками сохраняется (B3 и D5 - значения B[i] и D[i + 2]).
+    calculator получает по паре массивов (values, value_types) на входной столбец и
+    возвращает значения результата для каждой строки (None - строку не записывать).
+    Все результаты записываются в одной транзакции с одной записью в истории.
+
+    Args:
+        data_manager: Экземпляр DataManager.
+        sheet_name (str): Имя листа.
+        input_cells (Sequence[str]): Адреса первых входных ячеек (e.g., ['A3', 'C3']).
+        result_column_addr (str): Буква результирующего столбца (e.g., 'F'); результат пишется
+            в строки первой входной ячейки и ниже.
+        calculator (Callable[..., Sequence[Any]]): Векторная функция расчёта.
+        description (str): Описание для истории редактирования.
+        result_type (Optional[str]): Тег типа, если calculator возвращает значения уже в форме
+            хранения (например, TYPE_STR для строк): они записываются без кодирования каждой ячейки.
+
+    Returns:
+        bool: True, если результаты записаны.
+    """
+    if not result_column_addr.isalpha():
+        logger.error(f"Неверная буква результирующего столбца: '{result_column_addr}'.")
+        return False
+    try:
+        positions = [address_to_row_col(address) for address in input_cells]
+    except ValueError as e:
+        logger.error(f"Неверный адрес входной ячейки: {e}")
+        return False
+    result_col = column_letter_to_index(result_column_addr)
+
+    first_row = positions[0][0]
+    offsets = [row - first_row for row, _ in positions]
+    # Строки входных ячеек выше первой читаются с их собственной начальной строки
+    stored = data_manager.load_sheet_columns(sheet_name, sorted({col for _, col in positions}), row0=max(1, min(row for row, _ in positions)))
+    if stored is None:
+        return False
+
+    # Последняя строка результата - по последней заполненной строке входных столбцов
+    last_row = first_row - 1
+    for (_, col), offset in zip(positions, offsets):
+        if stored[col]:
+            last_row = max(last_row, stored[col][-1][0] - offset)
+    count = last_row - first_row + 1
+    if count <= 0:
+        logger.warning(f"Во входных столбцах листа '{sheet_name}' нет данных ниже строк {', '.join(input_cells)}. Нечего обновлять.")
+        return False
+
+    arrays = []
+    present = np.zeros(count, dtype=bool)
+    for (_, col), offset in zip(positions, offsets):
+        values = np.full(count, None, dtype=object)
+        value_types = np.full(count, None, dtype=object)
+        records = stored[col]
+        if records:
+            rows = np.fromiter((record[0] for record in records), dtype=np.int64, count=len(records)) - offset - first_row
+            in_range = (rows >= 0) & (rows < count)
+            column_values = np.empty(len(records), dtype=object)
+            column_values[:] = [record[1] for record in records]
+            column_types = np.empty(len(records), dtype=object)
+            column_types[:] = [record[2] for record in records]
+            values[rows[in_range]] = column_values[in_range]
+            value_types[rows[in_range]] = column_types[in_range]
+        present |= values != None  # noqa: E711 - поэлементно
+        arrays.append((values, value_types))
+
+    results = calculator(*arrays)
+    cells = [
+        (first_row + index, result_col, results[index])
+        for index in np.flatnonzero(present).tolist()
+        if results[index] is not None
+    ]
+    # Результаты вычислений - значения, а не формулы
+    return data_manager.update_cells_batch(sheet_name, cells, description, values_only=True, value_type=result_type)
+
+
 def apply_age_formula_to_column(
     data_manager,
     sheet_name: str,
@@ -146,9 +360,13 @@ def apply_age_formula_to_column(
 ):
     """
     Применяет формулу возраста к столбцу.
-    Берёт даты из start_date_cell_addr и end_date_cell_addr,
-    вычисляет строку возраста и записывает её в result_column_addr,
-    начиная с той же строки, что и даты, до конца заполненных данных.
+    Для каждой строки, начиная со строки start_date_cell_addr, берёт начальную дату из
+    столбца start_date_cell_addr и конечную из столбца end_date_cell_addr (с тем же
+    смещением строк), вычисляет строку возраста и записывает её в result_column_addr.
+    Строки, где обе даты пусты, не изменяются.
+
+    Даты читаются массивами и обрабатываются векторно (numpy datetime64), все результаты
+    записываются одной транзакцией с одной записью в истории редактирования.
 
     Args:
         data_manager: Экземпляр DataManager.
@@ -163,69 +381,29 @@ def apply_age_formula_to_column(
     try:
         logger.info(f"Начало применения формулы возраста к листу '{sheet_name}', столбец {result_column_addr}, даты из {start_date_cell_addr} и {end_date_cell_addr}.")
 
-        # Получаем сырые и редактируемые данные листа
-        raw_data_rows, editable_data_rows = data_manager.get_sheet_data(sheet_name)
-        
-        # Создаем словарь для быстрого доступа к редактируемым значениям
-        editable_dict = {item["cell_address"]: item["value"] for item in editable_data_rows}
-
-        # Найдем значения дат в указанных ячейках
-        start_date_val = editable_dict.get(start_date_cell_addr.upper())
-        end_date_val = editable_dict.get(end_date_cell_addr.upper())
-
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"Найдены даты: {start_date_cell_addr}={start_date_val}, {end_date_cell_addr}={end_date_val}")
-
-        # Проверим, найдены ли обе даты
-        if start_date_val is None or end_date_val is None:
-            logger.error(f"Не удалось найти значения дат в ячейках {start_date_cell_addr} или {end_date_cell_addr}.")
-            return False
-
-        # Извлекаем номер строки из адресов (Excel-нумерация с 1, Python с 0)
-        def row_from_address(addr: str) -> int:
-            row_part = "".join(filter(str.isdigit, addr))
-            return int(row_part) - 1 if row_part.isdigit() else -1
-
-        start_row_idx = row_from_address(start_date_cell_addr)
-        end_row_idx = row_from_address(end_date_cell_addr)
-        result_start_row_idx = min(start_row_idx, end_row_idx) if start_row_idx >= 0 and end_row_idx >= 0 else -1
-
-        if result_start_row_idx < 0:
-            logger.error(f"Неверный формат адреса строки в {start_date_cell_addr} или {end_date_cell_addr}.")
-            return False
-
-        # Определяем максимальную строку, участвующую в editable_data
-        max_row_idx = -1
-        for item in editable_data_rows:
-            addr = item["cell_address"]
-            row_idx = row_from_address(addr)
-            if row_idx > max_row_idx:
-                max_row_idx = row_idx
-
-        # Если editable_data пуст или не содержит строк, можно выйти
-        if max_row_idx < 0:
-            logger.warning(f"Лист '{sheet_name}' не содержит редактируемых данных. Нечего обновлять.")
-            return False
-
-        # Проходим по строкам, начиная с result_start_row_idx, до max_row_idx
-        success_count = 0
-        for i in range(result_start_row_idx, max_row_idx + 1):
-            # Для каждой строки, мы всё равно используем одни и те же start_date_val и end_date_val
-            calculated_result = calculate_age_string(start_date_val, end_date_val)
-            result_cell_addr = f"{result_column_addr.upper()}{i + 1}" # Обратно в Excel-нумерацию
-
-            # Обновляем значение в БД
-            update_success = data_manager.update_cell_value(sheet_name, result_cell_addr, calculated_result)
-            if update_success:
-                success_count += 1
-                # Проверяем уровень перед логированием внутри цикла
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"Обновлена ячейка {result_cell_addr} значением '{calculated_result}'")
-            else:
-                logger.error(f"Не удалось обновить ячейку {result_cell_addr}.")
-
-        logger.info(f"Формула возраста применена. Обновлено {success_count} ячеек в столбце {result_column_addr.upper()} листа '{sheet_name}'.")
-        return True
+        def age_calculator(start_column, end_column) -> List[str]:
+            start = stored_values_to_datetime64(*start_column)
+            end = stored_values_to_datetime64(*end_column)
+            results = age_strings_from_datetime64(start, end)
+            invalid = int((np.isnat(start) | np.isnat(end)).sum())
+            if invalid:
+                logger.warning(f"Формула возраста: {invalid} строк без распознанной начальной или конечной даты.")
+            return results
+
+        description = f"Формула возраста: {start_date_cell_addr.upper()}, {end_date_cell_addr.upper()} -> столбец {result_column_addr.upper()}"
+        success = apply_column_calculator(
+            data_manager,
+            sheet_name,
+            [start_date_cell_addr.upper(), end_date_cell_addr.upper()],
+            result_column_addr,
+            age_calculator,
+            description,
+            # Строки возраста записываются как есть, с тегом 'str'
+            result_type=TYPE_STR,
+        )
+        if success:
+            logger.info(f"Формула возраста применена к столбцу {result_column_addr.upper()} листа '{sheet_name}'.")
+        return success
 
     except Exception as e:
         logger.error(f"Ошибка при применении формулы возраста к столбцу: {e}", exc_info=True)
@@ -0,0 +1,767 @@
+# backend/core/formula_engine.py
+"""
+Движок вычисления формул проекта по данным в БД (без Excel).
+
+FormulaEngine читает формулы из таблицы 'formulas' и значения ячеек из 'cells',
+вычисляет формулы в порядке зависимостей и записывает результаты в
+formulas.cached_value/cached_value_type - их показывает GUI (get_sheet_formula_values).
+
+- Разбор: backend/core/formula_parser.py (кэш по шаблону токенов, протянутые формулы
+  разбираются один раз). Дерево выражения компилируется в замыкания - тоже один раз на шаблон.
+- Значения, операторы и функции: backend/core/formula_functions.py.
+- Порядок: формула вычисляется после формул, на которые ссылается (обход в глубину
+  без рекурсии, поэтому длинные цепочки A2=A1+1, A3=A2+1, ... не упираются в стек).
+- Формулы с неподдерживаемыми функциями, именами или синтаксисом и формулы в циклических
+  ссылках не вычисляются: у них остаётся сохранённый результат (из файла), и он же
+  используется зависящими от них формулами.
+
+Выборочный пересчёт (recalculate_cells): вычисляются только указанные формулы
+(зависимые от правки, см. formula_graph.py), а из БД читаются лишь диапазоны, на которые
+они ссылаются, - объём работы пропорционален изменению, а не размеру листов.
+
+Пример:
+    engine = FormulaEngine(storage)
+    result = engine.recalculate()          # все листы
+    logger.info(result.summary())
+"""
+
+import datetime
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.storage.cell_values import EXCEL_ERRORS_BY_CODE, TYPE_BOOL, TYPE_ERROR
+from backend.storage.cells import address_to_row_col
+from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressReporter
+
+from .formula_functions import (
+    ERROR_DIV0, ERROR_NUM, ERROR_REF, FUNCTIONS, RESULT_DATE, RESULT_DATETIME,
+    ExcelError, FormulaErrorSignal, RangeValue, binary_operation, excel_error,
+    normalize_number, to_number,
+)
+from .formula_parser import (
+    Binary, Call, CompiledFormula, FormulaSyntaxError, Literal, Missing, Name, Node,
+    Percent, Ref, RefTemplate, Unary, compile_formula, formula_cache_info,
+)
+
+logger = get_logger(__name__)
+
+# Начало отсчёта серийных дат Excel (для записи результатов DATE/TODAY/NOW)
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+# Целые числа, которые float представляет точно
+_MAX_EXACT_INT = 2 ** 53
+# Сколько причин невычисленных формул приводится в результате
+_PROBLEM_SAMPLES = 20
+# Прогресс пересчёта отправляется пачками по стольку формул
+_PROGRESS_STEP = 1000
+
+
+def value_from_storage(value: Any, value_type: Optional[str]) -> Any:
+    """
+    Значение ячейки в представлении БД -> значение формул: логические - bool,
+    ошибки - ExcelError, даты остаются серийными номерами.
+    """
+    if value is None:
+        return None
+    if value_type == TYPE_BOOL:
+        return bool(value)
+    if value_type == TYPE_ERROR:
+        return excel_error(EXCEL_ERRORS_BY_CODE.get(value, "#VALUE!"))
+    return value
+
+
+def value_for_storage(value: Any, result_kind: Optional[str] = None) -> Tuple[Any, Optional[str]]:
+    """
+    Результат формулы -> (значение, явный тип) для save_formula_results.
+    Целые float записываются int (как результаты, прочитанные из файла), результаты
+    функций дат - датой.
+    """
+    if isinstance(value, ExcelError):
+        return value.code, TYPE_ERROR
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value, None
+    if result_kind == RESULT_DATE:
+        return (_EXCEL_EPOCH + datetime.timedelta(days=int(value))).date(), None
+    if result_kind == RESULT_DATETIME:
+        return _EXCEL_EPOCH + datetime.timedelta(days=value), None
+    if isinstance(value, float) and value.is_integer() and abs(value) < _MAX_EXACT_INT:
+        return int(value), None
+    return value, None
+
+
+class FormulaCell:
+    """Формула ячейки: адрес, текст и разобранная форма (заполняется при первом обращении)."""
+
+    __slots__ = ("sheet_id", "row", "col", "key", "address", "text", "compiled", "problem")
+
+    def __init__(self, sheet_id: int, row: int, col: int, address: str, text: str):
+        self.sheet_id = sheet_id
+        self.row = row
+        self.col = col
+        # Ключ формулы в графе зависимостей и при обходе
+        self.key: Tuple[int, int, int] = (sheet_id, row, col)
+        self.address = address
+        self.text = text
+        self.compiled: Optional[CompiledFormula] = None
+        # Почему формулу нельзя вычислить (синтаксис, неизвестная функция); None - можно
+        self.problem: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"FormulaCell({self.sheet_id}, {self.address!r}, {self.text!r})"
+
+
+class _SheetState:
+    """Загруженный лист: значения ячеек (с результатами формул), формулы и их индекс по столбцам."""
+
+    __slots__ = ("sheet_id", "name", "values", "formulas", "formula_rows", "formula_cols", "max_row", "max_col")
+
+    def __init__(self, sheet_id: int, name: str):
+        self.sheet_id = sheet_id
+        self.name = name
+        self.values: Dict[Tuple[int, int], Any] = {}
+        self.formulas: Dict[Tuple[int, int], FormulaCell] = {}
+        # Столбец -> отсортированные строки формул; отсортированные столбцы с формулами
+        self.formula_rows: Dict[int, List[int]] = {}
+        self.formula_cols: List[int] = []
+        self.max_row = 0
+        self.max_col = 0
+
+    def index_formulas(self):
+        self.formula_rows = {}
+        for row, col in self.formulas:
+            self.formula_rows.setdefault(col, []).append(row)
+        for rows in self.formula_rows.values():
+            rows.sort()
+        self.formula_cols = sorted(self.formula_rows)
+        keys = list(self.values) + list(self.formulas)
+        self.max_row = max((row for row, _ in keys), default=0)
+        self.max_col = max((col for _, col in keys), default=0)
+
+    def formulas_in(self, row1: int, col1: int, row2: int, col2: int) -> Iterable[FormulaCell]:
+        """Формулы внутри прямоугольника."""
+        if row1 == row2 and col1 == col2:
+            cell = self.formulas.get((row1, col1))
+            if cell is not None:
+                yield cell
+            return
+        cols = self.formula_cols
+        for col in cols[bisect_left(cols, col1):bisect_right(cols, col2)]:
+            rows = self.formula_rows[col]
+            for row in rows[bisect_left(rows, row1):bisect_right(rows, row2)]:
+                yield self.formulas[(row, col)]
+
+
+class RecalcResult:
+    """Итог пересчёта: сколько формул вычислено и записано, что пропущено и почему."""
+
+    def __init__(self):
+        self.evaluated = 0
+        self.written = 0
+        # Результатов-ошибок (#DIV/0! и т.п.) среди вычисленных
+        self.error_results = 0
+        self.unsupported = 0
+        self.cyclic = 0
+        # Примеры невычисленных формул: 'Лист!A1' -> причина
+        self.problems: Dict[str, str] = {}
+        self.elapsed = 0.0
+        self.success = True
+
+    def add_problem(self, address: str, reason: str):
+        if len(self.problems) < _PROBLEM_SAMPLES:
+            self.problems[address] = reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для логов и API."""
+        return {
+            "success": self.success,
+            "evaluated": self.evaluated,
+            "written": self.written,
+            "error_results": self.error_results,
+            "unsupported": self.unsupported,
+            "cyclic": self.cyclic,
+            "problems": dict(self.problems),
+            "elapsed": round(self.elapsed, 3),
+        }
+
+    def summary(self) -> str:
+        """Однострочная сводка для лога."""
+        text = f"Пересчёт формул: вычислено {self.evaluated}, записано {self.written} за {self.elapsed:.2f} с"
+        if self.error_results:
+            text += f", результатов-ошибок {self.error_results}"
+        if self.unsupported:
+            text += f", не поддерживается {self.unsupported}"
+        if self.cyclic:
+            text += f", в циклических ссылках {self.cyclic}"
+        return text + "."
+
+
+class FormulaEngine:
+    """
+    Вычисляет формулы проекта по значениям из БД.
+
+    Листы загружаются при первом обращении (значения ячеек и формулы целиком) и
+    остаются в памяти движка: повторные вычисления не читают БД заново.
+    Экземпляр не потокобезопасен.
+    """
+
+    def __init__(self, storage, project_id: int = 1):
+        """
+        Args:
+            storage (ProjectDBStorage): Хранилище проекта.
+            project_id (int): ID проекта (по умолчанию 1 для MVP).
+        """
+        self.storage = storage
+        self.project_id = project_id
+        self._sheet_ids: Optional[Dict[str, Tuple[int, str]]] = None
+        self._sheets: Dict[int, _SheetState] = {}
+        # Кэш значений диапазонов в пределах одного пересчёта
+        self._ranges: Dict[Tuple[int, int, int, int, int], RangeValue] = {}
+        # Выборочный пересчёт: листы не загружаются целиком, см. recalculate_cells()
+        self._partial = False
+        # Ячейка, формула которой вычисляется
+        self._current: Optional[_SheetState] = None
+        self._row = 0
+        self._col = 0
+
+    # --- Листы ---
+
+    def _sheet_index(self) -> Dict[str, Tuple[int, str]]:
+        if self._sheet_ids is None:
+            self._sheet_ids = {
+                str(sheet["name"]).upper(): (sheet["sheet_id"], sheet["name"])
+                for sheet in self.storage.load_all_sheets_metadata(self.project_id)
+            }
+        return self._sheet_ids
+
+    def sheet(self, sheet_name: str) -> Optional[_SheetState]:
+        """Загруженный лист по имени (без учёта регистра, как в Excel) или None."""
+        entry = self._sheet_index().get(sheet_name.upper())
+        if entry is None:
+            return None
+        return self._sheet_by_id(*entry)
+
+    def _sheet_by_id(self, sheet_id: int, name: str) -> _SheetState:
+        state = self._sheets.get(sheet_id)
+        if state is None:
+            state = _SheetState(sheet_id, name) if self._partial else self._load_sheet(sheet_id, name)
+            self._sheets[sheet_id] = state
+        return state
+
+    def _load_sheet(self, sheet_id: int, name: str) -> _SheetState:
+        started = time.perf_counter()
+        state = _SheetState(sheet_id, name)
+        values = state.values
+        for row, col, value, value_type in self.storage.load_cells(sheet_id, decode=False):
+            if value is not None:
+                values[(row, col)] = value_from_storage(value, value_type)
+        for _, address, text, cached_value, cached_type in self.storage.load_sheet_formula_records(sheet_id):
+            try:
+                row, col = address_to_row_col(address)
+            except ValueError:
+                logger.warning(f"Формула с неверным адресом '{address}' на листе '{name}' пропущена.")
+                continue
+            state.formulas[(row, col)] = FormulaCell(sheet_id, row, col, address, text)
+            # В 'cells' у ячейки формулы может быть текст формулы - значением считается её результат
+            cached = value_from_storage(cached_value, cached_type)
+            if cached is None:
+                values.pop((row, col), None)
+            else:
+                values[(row, col)] = cached
+        state.index_formulas()
+        logger.debug(
+            f"Движок формул: лист '{name}' загружен за {time.perf_counter() - started:.2f} с "
+            f"({len(values)} значений, {len(state.formulas)} формул)."
+        )
+        return state
+
+    def _referenced_sheet(self, template: RefTemplate) -> _SheetState:
+        if template.sheet is None:
+            return self._current
+        state = self.sheet(template.sheet)
+        if state is None:
+            raise FormulaErrorSignal(ERROR_REF)
+        return state
+
+    def formula_cells(self, sheet_names: Optional[Iterable[str]] = None) -> List[FormulaCell]:
+        """
+        Формулы листов (по умолчанию всех листов проекта).
+
+        Raises:
+            ValueError: Если лист не найден.
+        """
+        if sheet_names is None:
+            sheet_names = [name for _, name in self._sheet_index().values()]
+        cells: List[FormulaCell] = []
+        for sheet_name in sheet_names:
+            state = self.sheet(sheet_name)
+            if state is None:
+                raise ValueError(f"Лист '{sheet_name}' не найден в проекте.")
+            cells.extend(state.formulas.values())
+        return cells
+
+    def formula_cell(self, sheet_name: str, cell_address: str) -> Optional[FormulaCell]:
+        """Формула ячейки или None, если в ячейке нет формулы."""
+        state = self.sheet(sheet_name)
+        if state is None:
+            return None
+        return state.formulas.get(address_to_row_col(cell_address))
+
+    # --- Компиляция ---
+
+    def compiled(self, cell: FormulaCell) -> Optional[CompiledFormula]:
+        """
+        Разобранная и скомпилированная формула ячейки; None, если вычислить её нельзя
+        (причина - в cell.problem).
+        """
+        if cell.compiled is None and cell.problem is None:
+            try:
+                compiled = compile_formula(cell.text, cell.row, cell.col)
+            except FormulaSyntaxError as e:
+                cell.problem = str(e)
+                return None
+            if compiled.evaluator is None and compiled.problem is None:
+                try:
+                    compiled.evaluator = self._compile_node(compiled.root)
+                except FormulaSyntaxError as e:
+                    compiled.problem = str(e)
+            cell.problem = compiled.problem
+            cell.compiled = compiled
+        return cell.compiled if cell.problem is None else None
+
+    def _compile_node(self, node: Node, as_range: bool = False) -> Callable[["FormulaEngine"], Any]:
+        """
+        Компилирует узел AST в функцию от движка. as_range - ссылка на ячейку
+        передаётся функции как диапазон (для правил SUM/COUNT и т.п.).
+
+        Raises:
+            FormulaSyntaxError: Если в выражении есть неподдерживаемые функции или имена.
+        """
+        if isinstance(node, Literal):
+            value = excel_error(node.value) if node.error else node.value
+            return lambda engine: value
+        if isinstance(node, Missing):
+            return lambda engine: None
+        if isinstance(node, Ref):
+            template = node.template
+            if template.is_range or as_range:
+                return lambda engine: engine._range_value(template)
+            return lambda engine: engine._cell_value(template)
+        if isinstance(node, Name):
+            raise FormulaSyntaxError(f"Имена книги не поддерживаются: {node.name}.")
+        if isinstance(node, Unary):
+            operand = self._compile_node(node.operand)
+            if node.op == "-":
+                return lambda engine: normalize_number(-to_number(operand(engine)))
+            return operand
+        if isinstance(node, Percent):
+            operand = self._compile_node(node.operand)
+            return lambda engine: to_number(operand(engine)) / 100
+        if isinstance(node, Binary):
+            left, right, op = self._compile_node(node.left), self._compile_node(node.right), node.op
+            return lambda engine: binary_operation(op, left(engine), right(engine))
+        if isinstance(node, Call):
+            return self._compile_call(node)
+        raise FormulaSyntaxError(f"Неизвестный узел выражения {type(node).__name__}.")
+
+    def _compile_call(self, node: Call) -> Callable[["FormulaEngine"], Any]:
+        spec = FUNCTIONS.get(node.name)
+        if spec is None:
+            raise FormulaSyntaxError(f"Функция {node.name} не поддерживается.")
+        if len(node.args) < spec.min_args or (spec.max_args is not None and len(node.args) > spec.max_args):
+            raise FormulaSyntaxError(f"Неверное число аргументов {node.name}: {len(node.args)}.")
+        func = spec.func
+        args = [self._compile_node(arg, as_range=True) for arg in node.args]
+        if spec.lazy:
+            return lambda engine: func(*[_bind(arg, engine) for arg in args])
+        if len(args) == 1:
+            only = args[0]
+            return lambda engine: func(only(engine))
+        return lambda engine: func(*[arg(engine) for arg in args])
+
+    # --- Значения ссылок ---
+
+    def _cell_value(self, template: RefTemplate) -> Any:
+        ref = template.resolve(self._row, self._col)
+        if ref is None:
+            raise FormulaErrorSignal(ERROR_REF)
+        return self._referenced_sheet(template).values.get((ref.row1, ref.col1))
+
+    def _range_value(self, template: RefTemplate) -> RangeValue:
+        ref = template.resolve(self._row, self._col)
+        if ref is None:
+            raise FormulaErrorSignal(ERROR_REF)
+        state = self._referenced_sheet(template)
+        key = (state.sheet_id, ref.row1, ref.col1, ref.row2, ref.col2)
+        cached = self._ranges.get(key)
+        if cached is not None:
+            return cached
+
+        rows, cols = ref.row2 - ref.row1 + 1, ref.col2 - ref.col1 + 1
+        # Пустые строки и столбцы за пределами данных листа не просматриваются (A:A, 1:1)
+        row2, col2 = min(ref.row2, state.max_row), min(ref.col2, state.max_col)
+        values = state.values
+        area = max(0, row2 - ref.row1 + 1) * max(0, col2 - ref.col1 + 1)
+        if area == 0:
+            found = []
+        elif area <= 2 * len(values):
+            get = values.get
+            found = [
+                value
+                for row in range(ref.row1, row2 + 1)
+                for col in range(ref.col1, col2 + 1)
+                if (value := get((row, col))) is not None
+            ]
+        else:
+            # Диапазон больше заполненной части листа - дешевле пройти по значениям листа
+            row1, col1 = ref.row1, ref.col1
+            found = [
+                value for (row, col), value in sorted(values.items())
+                if row1 <= row <= row2 and col1 <= col <= col2 and value is not None
+            ]
+        result = RangeValue(rows, cols, found)
+        self._ranges[key] = result
+        return result
+
+    # --- Порядок вычисления ---
+
+    def precedents(self, cell: FormulaCell) -> List[FormulaCell]:
+        """Формулы, на результаты которых ссылается формула ячейки (прямые влияющие ячейки)."""
+        compiled = self.compiled(cell)
+        if compiled is None:
+            return []
+        result: List[FormulaCell] = []
+        own = self._sheets[cell.sheet_id]
+        for template in compiled.references:
+            ref = template.resolve(cell.row, cell.col)
+            if ref is None:
+                continue
+            state = own if template.sheet is None else self.sheet(template.sheet)
+            if state is not None:
+                result.extend(state.formulas_in(ref.row1, ref.col1, ref.row2, ref.col2))
+        return result
+
+    def evaluation_order(self, cells: Iterable[FormulaCell]) -> Tuple[List[FormulaCell], Set[Tuple[int, int, int]]]:
+        """
+        Порядок вычисления: каждая формула идёт после формул, на которые ссылается
+        (в порядок входят и влияющие формулы вне cells). Обход в глубину без рекурсии.
+
+        Returns:
+            Tuple[List[FormulaCell], Set[Tuple[int, int, int]]]: (порядок, ключи формул в циклах).
+        """
+        order: List[FormulaCell] = []
+        cyclic: Set[Tuple[int, int, int]] = set()
+        # Ключ -> позиция в стеке обхода (формула в обработке) или -1 (готово)
+        position: Dict[Tuple[int, int, int], int] = {}
+        for start in cells:
+            if start.key in position:
+                continue
+            stack = [(start, iter(self.precedents(start)))]
+            position[start.key] = 0
+            while stack:
+                cell, pending = stack[-1]
+                for precedent in pending:
+                    state = position.get(precedent.key)
+                    if state is None:
+                        position[precedent.key] = len(stack)
+                        stack.append((precedent, iter(self.precedents(precedent))))
+                        break
+                    if state >= 0:
+                        # Ссылка на формулу в обработке - цикл из формул стека от неё до вершины
+                        cyclic.update(item.key for item, _ in stack[state:])
+                else:
+                    stack.pop()
+                    position[cell.key] = -1
+                    order.append(cell)
+        return order, cyclic
+
+    # --- Вычисление ---
+
+    def evaluate_cell(self, cell: FormulaCell) -> Any:
+        """
+        Вычисляет формулу ячейки по текущим значениям (влияющие формулы должны быть
+        уже вычислены) и сохраняет результат в значениях листа.
+
+        Returns:
+            Any: Результат (ExcelError - для ошибок) или None, если формулу нельзя вычислить.
+        """
+        compiled = self.compiled(cell)
+        if compiled is None:
+            return None
+        state = self._sheets[cell.sheet_id]
+        self._current, self._row, self._col = state, cell.row, cell.col
+        try:
+            value = compiled.evaluator(self)
+            if isinstance(value, RangeValue):
+                value = value.single()
+        except FormulaErrorSignal as signal:
+            value = signal.error
+        except ZeroDivisionError:
+            value = ERROR_DIV0
+        except (OverflowError, ValueError):
+            value = ERROR_NUM
+        if value is None:
+            # Ссылка на пустую ячейку (=A1) даёт 0, как в Excel
+            value = 0
+        state.values[(cell.row, cell.col)] = value
+        return value
+
+    def evaluate_formula(self, sheet_name: str, formula: str, cell_address: str = "A1") -> Any:
+        """
+        Вычисляет произвольную формулу на листе, как если бы она стояла в cell_address.
+        Значения ячеек листа не меняются.
+
+        Args:
+            sheet_name (str): Имя листа.
+            formula (str): Формула ('=SUM(A1:A10)').
+            cell_address (str): Ячейка, относительно которой разрешаются ссылки.
+
+        Returns:
+            Any: Результат (ExcelError - для ошибок).
+
+        Raises:
+            ValueError: Если лист не найден или формула не поддерживается.
+        """
+        state = self.sheet(sheet_name)
+        if state is None:
+            raise ValueError(f"Лист '{sheet_name}' не найден в проекте.")
+        row, col = address_to_row_col(cell_address)
+        cell = FormulaCell(state.sheet_id, row, col, cell_address, formula)
+        if self.compiled(cell) is None:
+            raise ValueError(cell.problem)
+        previous = state.values.get((row, col))
+        self._ranges.clear()
+        try:
+            return self.evaluate_cell(cell)
+        finally:
+            if previous is None:
+                state.values.pop((row, col), None)
+            else:
+                state.values[(row, col)] = previous
+
+    def recalculate(
+        self,
+        sheet_names: Optional[Iterable[str]] = None,
+        write: bool = True,
+        progress_callback: Optional[Callable[..., None]] = None,
+    ) -> RecalcResult:
+        """
+        Пересчитывает формулы листов (по умолчанию всех) и записывает результаты в БД.
+
+        Args:
+            sheet_names (Optional[Iterable[str]]): Имена листов; None - все листы проекта.
+            write (bool): Записать результаты в formulas.cached_value.
+            progress_callback: progress_callback(percent, message) или ProgressChannel.
+
+        Returns:
+            RecalcResult: Итог пересчёта.
+        """
+        result = RecalcResult()
+        started = time.perf_counter()
+        try:
+            cells = self.formula_cells(sheet_names)
+        except ValueError as e:
+            logger.error(f"Пересчёт формул невозможен: {e}")
+            result.success = False
+            return result
+        self.run(cells, result, write=write, progress_callback=progress_callback)
+        result.elapsed = time.perf_counter() - started
+        cache = formula_cache_info()
+        logger.info(
+            f"{result.summary()} Кэш разбора: {cache['templates']['currsize']} шаблонов, "
+            f"{cache['shapes']} форм формул."
+        )
+        return result
+
+    def recalculate_cells(
+        self,
+        keys: Iterable[Tuple[int, int, int]],
+        write: bool = True,
+        progress_callback: Optional[Callable[..., None]] = None,
+    ) -> RecalcResult:
+        """
+        Выборочный пересчёт: вычисляет только формулы keys в порядке зависимостей между ними.
+        Остальные формулы не пересчитываются - используются их сохранённые результаты.
+        Из БД читаются формулы keys и диапазоны, на которые они ссылаются; загруженные
+        ранее листы сбрасываются (значения читаются заново).
+
+        Args:
+            keys (Iterable[Tuple[int, int, int]]): Формулы (sheet_id, row, col).
+            write (bool): Записать результаты в БД.
+            progress_callback (Optional[Callable[..., None]]): Функция для обновления прогресса.
+
+        Returns:
+            RecalcResult: Итоги пересчёта.
+        """
+        started = time.perf_counter()
+        result = RecalcResult()
+        names = {sheet_id: name for sheet_id, name in self._sheet_index().values()}
+        by_sheet: Dict[int, List[Tuple[int, int]]] = {}
+        for sheet_id, row, col in keys:
+            by_sheet.setdefault(sheet_id, []).append((row, col))
+
+        self._sheets = {}
+        self._partial = True
+        try:
+            cells: List[FormulaCell] = []
+            for sheet_id, positions in by_sheet.items():
+                if sheet_id not in names:
+                    continue
+                state = self._sheet_by_id(sheet_id, names[sheet_id])
+                for row, col, address, text, _, _ in self.storage.load_formula_records_at(sheet_id, positions):
+                    cell = FormulaCell(sheet_id, row, col, address, text)
+                    state.formulas[(row, col)] = cell
+                    cells.append(cell)
+            self._load_referenced(cells)
+            self.run(cells, result, write=write, progress_callback=progress_callback)
+        finally:
+            # Частично загруженные листы не должны попасть в полный пересчёт
+            self._sheets = {}
+            self._partial = False
+        result.elapsed = time.perf_counter() - started
+        logger.info(result.summary())
+        return result
+
+    def _load_referenced(self, cells: List[FormulaCell]):
+        """
+        Загружает значения диапазонов, на которые ссылаются формулы cells (выборочный пересчёт):
+        ячейки из 'cells' и поверх них сохранённые результаты формул.
+        """
+        wanted: Dict[int, Set[Tuple[int, int, int, int]]] = {}
+        for cell in cells:
+            compiled = self.compiled(cell)
+            if compiled is None:
+                continue
+            own = self._sheets[cell.sheet_id]
+            for template, ref in zip(compiled.references, compiled.references_at(cell.row, cell.col)):
+                state = own if template.sheet is None else self.sheet(template.sheet)
+                if ref is not None and state is not None:
+                    wanted.setdefault(state.sheet_id, set()).add((ref.row1, ref.col1, ref.row2, ref.col2))
+
+        for sheet_id, rects in wanted.items():
+            state = self._sheets[sheet_id]
+            values = state.values
+            rects = _merge_column_runs(rects)
+            for row1, col1, row2, col2 in rects:
+                for row, col, value, value_type in self.storage.load_cells(sheet_id, row0=row1, col0=col1, row1=row2, col1=col2, decode=False):
+                    if value is not None:
+                        values[(row, col)] = value_from_storage(value, value_type)
+            # Результаты формул - после всех ячеек: в 'cells' у формулы может быть её текст
+            for row1, col1, row2, col2 in rects:
+                for row, col, cached_value, cached_type in self.storage.load_formula_values_in_range(sheet_id, row1, col1, row2, col2):
+                    cached = value_from_storage(cached_value, cached_type)
+                    if cached is None:
+                        values.pop((row, col), None)
+                    else:
+                        values[(row, col)] = cached
+        # Границы листа - по загруженным значениям: все значения диапазонов ссылок загружены
+        for state in self._sheets.values():
+            state.index_formulas()
+
+    def run(
+        self,
+        cells: Iterable[FormulaCell],
+        result: RecalcResult,
+        write: bool = True,
+        progress_callback: Optional[Callable[..., None]] = None,
+    ) -> List[FormulaCell]:
+        """
+        Вычисляет формулы cells (и влияющие на них формулы) в порядке зависимостей
+        и записывает результаты. Общая часть полного и выборочного пересчёта.
+
+        Returns:
+            List[FormulaCell]: Вычисленные формулы в порядке вычисления.
+        """
+        self._ranges.clear()
+        order, cyclic = self.evaluation_order(cells)
+        reporter = ProgressReporter(progress_callback, job="recalc")
+        reporter.start("Пересчёт формул")
+        reporter.stage("Вычисление формул", total_cells=len(order), percent_range=(0, 90))
+
+        evaluated: List[FormulaCell] = []
+        for index, cell in enumerate(order, 1):
+            if cell.key in cyclic:
+                result.cyclic += 1
+                result.add_problem(self._display_address(cell), "циклическая ссылка")
+            else:
+                value = self.evaluate_cell(cell)
+                if value is None:
+                    result.unsupported += 1
+                    result.add_problem(self._display_address(cell), cell.problem or "")
+                else:
+                    result.evaluated += 1
+                    result.error_results += isinstance(value, ExcelError)
+                    evaluated.append(cell)
+            if index % _PROGRESS_STEP == 0:
+                reporter.advance(cells=_PROGRESS_STEP)
+        if cyclic:
+            logger.warning(f"Формулы в циклических ссылках не пересчитаны: {len(cyclic)}.")
+
+        if write and evaluated:
+            reporter.stage("Запись результатов", percent_range=(90, 100))
+            result.success = self.write_results(evaluated)
+            if result.success:
+                result.written = len(evaluated)
+        reporter.finish(result.success, result.summary())
+        return evaluated
+
+    def write_results(self, cells: Iterable[FormulaCell]) -> bool:
+        """
+        Записывает текущие результаты формул в formulas.cached_value одной транзакцией.
+
+        Returns:
+            bool: True, если все результаты записаны.
+        """
+        by_sheet: Dict[int, List[Tuple[str, Any, Optional[str]]]] = {}
+        for cell in cells:
+            state = self._sheets[cell.sheet_id]
+            root = cell.compiled.root
+            spec = FUNCTIONS.get(root.name) if isinstance(root, Call) else None
+            value = state.values.get((cell.row, cell.col))
+            by_sheet.setdefault(cell.sheet_id, []).append(
+                (cell.address, *value_for_storage(value, spec.result_kind if spec else None))
+            )
+        try:
+            with self.storage.bulk_session():
+                for sheet_id, rows in by_sheet.items():
+                    if not self.storage.save_formula_results(sheet_id, rows):
+                        raise RuntimeError(f"не удалось записать результаты формул листа ID {sheet_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при записи результатов формул: {e}", exc_info=True)
+            return False
+
+    def _display_address(self, cell: FormulaCell) -> str:
+        return f"{self._sheets[cell.sheet_id].name}!{cell.address}"
+
+
+def _merge_column_runs(rects: Iterable[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """
+    Объединяет диапазоны в пределах одного столбца, идущие подряд (ссылки протянутых
+    формул A1, A2, ... читаются одним запросом). Остальные диапазоны возвращаются как есть.
+    """
+    merged: List[Tuple[int, int, int, int]] = []
+    by_col: Dict[int, List[Tuple[int, int]]] = {}
+    for row1, col1, row2, col2 in rects:
+        if col1 == col2:
+            by_col.setdefault(col1, []).append((row1, row2))
+        else:
+            merged.append((row1, col1, row2, col2))
+    for col, runs in by_col.items():
+        runs.sort()
+        start, end = runs[0]
+        for row1, row2 in runs[1:]:
+            if row1 <= end + 1:
+                end = max(end, row2)
+            else:
+                merged.append((start, col, end, col))
+                start, end = row1, row2
+        merged.append((start, col, end, col))
+    return merged
+
+
+def _bind(arg: Callable[[FormulaEngine], Any], engine: FormulaEngine) -> Callable[[], Any]:
+    """Аргумент ленивой функции: вычисляется при вызове."""
+    return lambda: arg(engine)
+
+# Дополнительные функции движка формул (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,691 @@
+# backend/core/formula_functions.py
+"""
+Значения, операторы и функции движка формул (backend/core/formula_engine.py).
+
+Значения формул: None (пустая ячейка), int/float, str, bool, ExcelError и RangeValue
+(значения диапазона). Даты - серийные номера Excel (как в таблице cells), поэтому
+арифметика дат работает без преобразований.
+
+Правила приведения типов повторяют Excel: в арифметике пустое значение - 0, TRUE - 1,
+числовая строка - число, прочий текст - #VALUE!; агрегатные функции (SUM, AVERAGE, ...)
+в диапазонах пропускают текст и логические значения; ошибки распространяются.
+Ошибка при вычислении выражения прерывает его через FormulaErrorSignal.
+
+Функция регистрируется декоратором _function и получает вычисленные аргументы
+(аргумент-ссылка - RangeValue); ленивые функции (IF, IFERROR) получают вызываемые
+объекты аргументов.
+"""
+
+import datetime
+import math
+from decimal import ROUND_DOWN, ROUND_HALF_UP, ROUND_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from backend.storage.cell_values import EXCEL_ERROR_CODES
+
+# Начало отсчёта серийных дат Excel (как в storage/cell_values.py)
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+_EXCEL_EPOCH_ORDINAL = _EXCEL_EPOCH.toordinal()
+# Последняя дата Excel (31.12.9999)
+_MAX_SERIAL = 2_958_465
+
+# Вид результата функции (для тега типа при записи результата)
+RESULT_DATE = "date"
+RESULT_DATETIME = "datetime"
+
+
+class ExcelError:
+    """Значение-ошибка Excel ('#DIV/0!', '#VALUE!', ...). Экземпляры - по одному на код."""
+
+    __slots__ = ("code",)
+
+    def __init__(self, code: str):
+        self.code = code
+
+    def __repr__(self) -> str:
+        return f"ExcelError({self.code!r})"
+
+    def __str__(self) -> str:
+        return self.code
+
+
+_ERRORS: Dict[str, ExcelError] = {code: ExcelError(code) for code in EXCEL_ERROR_CODES}
+ERROR_DIV0 = _ERRORS["#DIV/0!"]
+ERROR_VALUE = _ERRORS["#VALUE!"]
+ERROR_REF = _ERRORS["#REF!"]
+ERROR_NAME = _ERRORS["#NAME?"]
+ERROR_NUM = _ERRORS["#NUM!"]
+ERROR_NA = _ERRORS["#N/A"]
+
+
+def excel_error(code: str) -> ExcelError:
+    """Ошибка Excel по тексту ('#N/A'); неизвестный текст - #VALUE!."""
+    return _ERRORS.get(code.upper(), ERROR_VALUE)
+
+
+class FormulaErrorSignal(Exception):
+    """Прерывает вычисление выражения с ошибкой Excel."""
+
+    def __init__(self, error: ExcelError):
+        super().__init__(error.code)
+        self.error = error
+
+
+class RangeValue:
+    """
+    Значения диапазона: размеры и непустые значения в порядке строк.
+    Пустые ячейки не хранятся - агрегатные функции их всё равно пропускают.
+    """
+
+    __slots__ = ("rows", "cols", "values")
+
+    def __init__(self, rows: int, cols: int, values: List[Any]):
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+
+    @property
+    def size(self) -> int:
+        return self.rows * self.cols
+
+    def single(self) -> Any:
+        """Значение диапазона из одной ячейки; для большего диапазона - #VALUE!."""
+        if self.rows != 1 or self.cols != 1:
+            raise FormulaErrorSignal(ERROR_VALUE)
+        return self.values[0] if self.values else None
+
+
+class FunctionSpec(NamedTuple):
+    """Описание функции: реализация, число аргументов, ленивость, изменчивость, вид результата."""
+    func: Callable[..., Any]
+    min_args: int
+    max_args: Optional[int]
+    lazy: bool = False
+    volatile: bool = False
+    result_kind: Optional[str] = None
+
+
+# Имя функции (в верхнем регистре) -> описание
+FUNCTIONS: Dict[str, FunctionSpec] = {}
+
+
+def _function(name: str, min_args: int = 1, max_args: Optional[int] = 1, lazy: bool = False,
+              volatile: bool = False, result_kind: Optional[str] = None):
+    def register(func):
+        FUNCTIONS[name] = FunctionSpec(func, min_args, max_args, lazy, volatile, result_kind)
+        return func
+    return register
+
+
+# --- Приведение типов ---
+
+def _raise_if_error(value: Any) -> Any:
+    if isinstance(value, ExcelError):
+        raise FormulaErrorSignal(value)
+    return value
+
+
+def scalar(value: Any) -> Any:
+    """Значение для скалярного контекста: диапазон из одной ячейки разворачивается, ошибка прерывает."""
+    if isinstance(value, RangeValue):
+        value = value.single()
+    return _raise_if_error(value)
+
+
+def to_number(value: Any) -> float:
+    """Число по правилам арифметики Excel."""
+    value = scalar(value)
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        # float() принимает и 'nan', 'inf', '1_000' - Excel такие строки числами не считает
+        text = value.strip()
+        percent = text.endswith("%")
+        digits = text[:-1] if percent else text
+        if digits and "_" not in digits:
+            try:
+                number = float(digits)
+            except ValueError:
+                number = None
+            if number is not None and math.isfinite(number):
+                return number / 100 if percent else number
+    raise FormulaErrorSignal(ERROR_VALUE)
+
+
+def format_number(value: float) -> str:
+    """Число в общем формате Excel (до 15 значащих цифр, без '.0' у целых)."""
+    if isinstance(value, int) or (math.isfinite(value) and value == int(value) and abs(value) < 1e15):
+        return str(int(value))
+    return format(value, ".15g")
+
+
+def to_text(value: Any) -> str:
+    """Текст по правилам Excel ('&', текстовые функции)."""
+    value = scalar(value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return format_number(value)
+    return str(value)
+
+
+def to_bool(value: Any) -> bool:
+    """Логическое значение по правилам Excel."""
+    value = scalar(value)
+    if value is None:
+        return False
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().upper()
+    if text in ("TRUE", "FALSE"):
+        return text == "TRUE"
+    raise FormulaErrorSignal(ERROR_VALUE)
+
+
+def to_int(value: Any) -> int:
+    """Целое (отбрасывание дробной части), как аргументы LEFT/MID/ROUND."""
+    return int(to_number(value))
+
+
+def normalize_number(value: float) -> Any:
+    """Проверяет результат арифметики: бесконечность и NaN - #NUM!."""
+    if isinstance(value, float) and not math.isfinite(value):
+        raise FormulaErrorSignal(ERROR_NUM)
+    return value
+
+
+# --- Операторы ---
+
+def _type_rank(value: Any) -> int:
+    # Порядок типов при сравнении в Excel: числа < текст < логические
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(op: str, left: Any, right: Any) -> bool:
+    """Сравнение значений по правилам Excel (текст - без учёта регистра)."""
+    left, right = scalar(left), scalar(right)
+    if left is None:
+        left = "" if isinstance(right, str) else (False if isinstance(right, bool) else 0)
+    if right is None:
+        right = "" if isinstance(left, str) else (False if isinstance(left, bool) else 0)
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        left, right = left_rank, right_rank
+    elif left_rank == 1:
+        left, right = left.lower(), right.lower()
+    if op == "=":
+        return left == right
+    if op == "<>":
+        return left != right
+    if op == "<":
+        return left < right
+    if op == ">":
+        return left > right
+    if op == "<=":
+        return left <= right
+    return left >= right
+
+
+def binary_operation(op: str, left: Any, right: Any) -> Any:
+    """Бинарный оператор формулы."""
+    if op == "&":
+        return to_text(left) + to_text(right)
+    if op in ("=", "<>", "<", ">", "<=", ">="):
+        return compare(op, left, right)
+    left, right = to_number(left), to_number(right)
+    if op == "+":
+        return normalize_number(left + right)
+    if op == "-":
+        return normalize_number(left - right)
+    if op == "*":
+        return normalize_number(left * right)
+    if op == "/":
+        if right == 0:
+            raise FormulaErrorSignal(ERROR_DIV0)
+        return normalize_number(left / right)
+    # '^'
+    if left == 0 and right <= 0:
+        raise FormulaErrorSignal(ERROR_NUM if right == 0 else ERROR_DIV0)
+    try:
+        result = left ** right
+    except OverflowError:
+        raise FormulaErrorSignal(ERROR_NUM)
+    if isinstance(result, complex):
+        raise FormulaErrorSignal(ERROR_NUM)
+    return normalize_number(result)
+
+
+# --- Аргументы агрегатных функций ---
+
+def _iter_values(args) -> Iterator[Any]:
+    """Значения аргументов: диапазоны разворачиваются, пропущенные аргументы пропускаются."""
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            yield from arg.values
+        elif arg is not None:
+            yield arg
+
+
+def _numbers(args) -> Iterator[float]:
+    """
+    Числа для SUM/AVERAGE/MIN/MAX/PRODUCT: в диапазонах учитываются только числа,
+    прямые аргументы приводятся к числу (TRUE, '5'); ошибки прерывают вычисление.
+    """
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            for value in arg.values:
+                if isinstance(value, ExcelError):
+                    raise FormulaErrorSignal(value)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield value
+        elif arg is not None:
+            yield to_number(arg)
+
+
+# --- Математические функции ---
+
+@_function("SUM", 1, None)
+def _sum(*args):
+    return normalize_number(math.fsum(_numbers(args)))
+
+
+@_function("PRODUCT", 1, None)
+def _product(*args):
+    return normalize_number(math.prod(_numbers(args)))
+
+
+@_function("AVERAGE", 1, None)
+def _average(*args):
+    numbers = list(_numbers(args))
+    if not numbers:
+        raise FormulaErrorSignal(ERROR_DIV0)
+    return math.fsum(numbers) / len(numbers)
+
+
+@_function("MIN", 1, None)
+def _min(*args):
+    return min(_numbers(args), default=0)
+
+
+@_function("MAX", 1, None)
+def _max(*args):
+    return max(_numbers(args), default=0)
+
+
+@_function("COUNT", 1, None)
+def _count(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            count += sum(1 for value in arg.values if isinstance(value, (int, float)) and not isinstance(value, bool))
+        elif arg is not None and not isinstance(arg, ExcelError):
+            try:
+                to_number(arg)
+                count += 1
+            except FormulaErrorSignal:
+                pass
+    return count
+
+
+@_function("COUNTA", 1, None)
+def _counta(*args):
+    return sum(1 for value in _iter_values(args) if value is not None)
+
+
+@_function("COUNTBLANK", 1, 1)
+def _countblank(rng):
+    if not isinstance(rng, RangeValue):
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return rng.size - sum(1 for value in rng.values if value is not None and value != "")
+
+
+def _round(value: Any, digits: Any, rounding: str) -> float:
+    number, digits = to_number(value), to_int(digits)
+    try:
+        quantum = Decimal(1).scaleb(-digits)
+        result = float(Decimal(repr(float(number))).quantize(quantum, rounding=rounding))
+    except InvalidOperation:
+        # Слишком много разрядов для Decimal - округлять нечего
+        return number
+    return result
+
+
+@_function("ROUND", 2, 2)
+def _round_half_up(value, digits):
+    # Excel округляет половину от нуля (2.5 -> 3, -2.5 -> -3)
+    return _round(value, digits, ROUND_HALF_UP)
+
+
+@_function("ROUNDUP", 2, 2)
+def _roundup(value, digits):
+    return _round(value, digits, ROUND_UP)
+
+
+@_function("ROUNDDOWN", 2, 2)
+def _rounddown(value, digits):
+    return _round(value, digits, ROUND_DOWN)
+
+
+@_function("INT", 1, 1)
+def _int(value):
+    return math.floor(to_number(value))
+
+
+@_function("ABS", 1, 1)
+def _abs(value):
+    return abs(to_number(value))
+
+
+@_function("SIGN", 1, 1)
+def _sign(value):
+    number = to_number(value)
+    return (number > 0) - (number < 0)
+
+
+@_function("MOD", 2, 2)
+def _mod(number, divisor):
+    number, divisor = to_number(number), to_number(divisor)
+    if divisor == 0:
+        raise FormulaErrorSignal(ERROR_DIV0)
+    # Знак результата - как у делителя (как в Excel и в Python)
+    return normalize_number(number - divisor * math.floor(number / divisor))
+
+
+@_function("POWER", 2, 2)
+def _power(number, power):
+    return binary_operation("^", number, power)
+
+
+@_function("SQRT", 1, 1)
+def _sqrt(value):
+    number = to_number(value)
+    if number < 0:
+        raise FormulaErrorSignal(ERROR_NUM)
+    return math.sqrt(number)
+
+
+# --- Логические и информационные функции ---
+
+@_function("IF", 1, 3, lazy=True)
+def _if(condition, if_true=None, if_false=None):
+    if to_bool(condition()):
+        return if_true() if if_true is not None else True
+    return if_false() if if_false is not None else False
+
+
+@_function("IFERROR", 2, 2, lazy=True)
+def _iferror(value, fallback):
+    try:
+        result = value()
+        if isinstance(result, RangeValue):
+            result = result.single()
+        if not isinstance(result, ExcelError):
+            return result
+    except FormulaErrorSignal:
+        pass
+    return fallback()
+
+
+def _logical_values(args) -> List[bool]:
+    values = []
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            for value in arg.values:
+                _raise_if_error(value)
+                # В диапазонах текст пропускается
+                if isinstance(value, (bool, int, float)):
+                    values.append(bool(value))
+        elif arg is not None:
+            values.append(to_bool(arg))
+    if not values:
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return values
+
+
+@_function("AND", 1, None)
+def _and(*args):
+    return all(_logical_values(args))
+
+
+@_function("OR", 1, None)
+def _or(*args):
+    return any(_logical_values(args))
+
+
+@_function("NOT", 1, 1)
+def _not(value):
+    return not to_bool(value)
+
+
+@_function("TRUE", 0, 0)
+def _true():
+    return True
+
+
+@_function("FALSE", 0, 0)
+def _false():
+    return False
+
+
+def _probe(thunk) -> Any:
+    """Значение ленивого аргумента ISxxx: ошибка возвращается, а не прерывает вычисление."""
+    try:
+        value = thunk()
+        return value.single() if isinstance(value, RangeValue) else value
+    except FormulaErrorSignal as signal:
+        return signal.error
+
+
+@_function("ISBLANK", 1, 1, lazy=True)
+def _isblank(value):
+    return _probe(value) is None
+
+
+@_function("ISNUMBER", 1, 1, lazy=True)
+def _isnumber(value):
+    value = _probe(value)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@_function("ISTEXT", 1, 1, lazy=True)
+def _istext(value):
+    return isinstance(_probe(value), str)
+
+
+@_function("ISERROR", 1, 1, lazy=True)
+def _iserror(value):
+    return isinstance(_probe(value), ExcelError)
+
+
+# --- Текстовые функции ---
+
+@_function("CONCATENATE", 1, None)
+def _concatenate(*args):
+    return "".join(to_text(arg) for arg in args)
+
+
+@_function("CONCAT", 1, None)
+def _concat(*args):
+    # В отличие от CONCATENATE принимает диапазоны
+    return "".join(to_text(value) for value in _iter_values(args))
+
+
+@_function("LEN", 1, 1)
+def _len(value):
+    return len(to_text(value))
+
+
+@_function("LEFT", 1, 2)
+def _left(text, count=None):
+    count = 1 if count is None else to_int(count)
+    if count < 0:
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return to_text(text)[:count]
+
+
+@_function("RIGHT", 1, 2)
+def _right(text, count=None):
+    count = 1 if count is None else to_int(count)
+    if count < 0:
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return to_text(text)[-count:] if count else ""
+
+
+@_function("MID", 3, 3)
+def _mid(text, start, count):
+    start, count = to_int(start), to_int(count)
+    if start < 1 or count < 0:
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return to_text(text)[start - 1:start - 1 + count]
+
+
+@_function("UPPER", 1, 1)
+def _upper(text):
+    return to_text(text).upper()
+
+
+@_function("LOWER", 1, 1)
+def _lower(text):
+    return to_text(text).lower()
+
+
+@_function("TRIM", 1, 1)
+def _trim(text):
+    # Excel убирает крайние пробелы и схлопывает внутренние
+    return " ".join(part for part in to_text(text).split(" ") if part)
+
+
+@_function("SUBSTITUTE", 3, 4)
+def _substitute(text, old, new, instance=None):
+    text, old, new = to_text(text), to_text(old), to_text(new)
+    if not old:
+        return text
+    if instance is None:
+        return text.replace(old, new)
+    instance = to_int(instance)
+    if instance < 1:
+        raise FormulaErrorSignal(ERROR_VALUE)
+    position = -1
+    for _ in range(instance):
+        position = text.find(old, position + 1)
+        if position < 0:
+            return text
+    return text[:position] + new + text[position + len(old):]
+
+
+@_function("VALUE", 1, 1)
+def _value(text):
+    value = scalar(text)
+    if isinstance(value, bool):
+        raise FormulaErrorSignal(ERROR_VALUE)
+    return to_number(value)
+
+
+# --- Функции дат ---
+
+def serial_to_date(serial: float) -> datetime.date:
+    """Серийный номер Excel -> дата (дробная часть отбрасывается)."""
+    serial = int(math.floor(serial))
+    if serial < 0 or serial > _MAX_SERIAL:
+        raise FormulaErrorSignal(ERROR_NUM)
+    return datetime.date.fromordinal(_EXCEL_EPOCH_ORDINAL + serial)
+
+
+def date_to_serial(value: datetime.date) -> int:
+    """Дата -> серийный номер Excel."""
+    return value.toordinal() - _EXCEL_EPOCH_ORDINAL
+
+
+def _date_arg(value: Any) -> datetime.date:
+    return serial_to_date(to_number(value))
+
+
+@_function("DATE", 3, 3, result_kind=RESULT_DATE)
+def _date(year, month, day):
+    year, month, day = to_int(year), to_int(month), to_int(day)
+    if 0 <= year < 1900:
+        year += 1900
+    # Месяцы и дни вне диапазона переносятся, как в Excel: DATE(2024, 14, 0) = 31.01.2025
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    if not 1 <= year <= 9999:
+        raise FormulaErrorSignal(ERROR_NUM)
+    serial = date_to_serial(datetime.date(year, month, 1)) + day - 1
+    if serial < 0 or serial > _MAX_SERIAL:
+        raise FormulaErrorSignal(ERROR_NUM)
+    return serial
+
+
+@_function("YEAR", 1, 1)
+def _year(value):
+    return _date_arg(value).year
+
+
+@_function("MONTH", 1, 1)
+def _month(value):
+    return _date_arg(value).month
+
+
+@_function("DAY", 1, 1)
+def _day(value):
+    return _date_arg(value).day
+
+
+@_function("TODAY", 0, 0, volatile=True, result_kind=RESULT_DATE)
+def _today():
+    return date_to_serial(datetime.date.today())
+
+
+@_function("NOW", 0, 0, volatile=True, result_kind=RESULT_DATETIME)
+def _now():
+    delta = datetime.datetime.now() - _EXCEL_EPOCH
+    return delta.days + delta.seconds / 86400
+
+
+def _months_between(start: datetime.date, end: datetime.date) -> int:
+    months = (end.year - start.year) * 12 + end.month - start.month
+    return months - 1 if end.day < start.day else months
+
+
+@_function("DATEDIF", 3, 3)
+def _datedif(start, end, unit):
+    start, end, unit = _date_arg(start), _date_arg(end), to_text(unit).upper()
+    if start > end:
+        raise FormulaErrorSignal(ERROR_NUM)
+    if unit == "D":
+        return (end - start).days
+    if unit == "M":
+        return _months_between(start, end)
+    if unit == "Y":
+        return _months_between(start, end) // 12
+    if unit == "YM":
+        return _months_between(start, end) % 12
+    if unit == "MD":
+        # Дни сверх полных месяцев, как calculate_age_string (заём длины предыдущего месяца)
+        days = end.day - start.day
+        if days < 0:
+            days += (end.replace(day=1) - datetime.timedelta(days=1)).day
+        return days
+    if unit == "YD":
+        try:
+            anniversary = start.replace(year=end.year)
+        except ValueError:
+            anniversary = datetime.date(end.year, 3, 1)
+        if anniversary > end:
+            try:
+                anniversary = start.replace(year=end.year - 1)
+            except ValueError:
+                anniversary = datetime.date(end.year - 1, 3, 1)
+        return (end - anniversary).days
+    raise FormulaErrorSignal(ERROR_NUM)
+
+# Дополнительные функции формул (если потребуются) могут быть добавлены здесь
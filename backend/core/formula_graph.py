@@ -0,0 +1,139 @@
+# backend/core/formula_graph.py
+"""
+Граф зависимостей формул и выборочный пересчёт после правки ячеек.
+
+Граф строится по таблице 'formulas' (ссылки формул разбираются formula_parser) и хранится
+в БД (storage/dependencies.py), поэтому после открытия проекта не строится заново.
+Граф листа сбрасывается хранилищем при записи его формул и строится при следующем
+обращении (ensure_built).
+
+После правки ячеек зависимые формулы находятся одним рекурсивным запросом по графу
+(транзитивно: формулы, зависящие от зависимых, тоже), и только они пересчитываются
+FormulaEngine.recalculate_cells в порядке зависимостей. Волатильные формулы (TODAY(), NOW())
+пересчитываются при каждой правке, как в Excel.
+
+Пример:
+    graph = FormulaDependencyGraph(storage)
+    result = graph.recalculate_dependents([(sheet_id, row, col)])
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.storage.cells import address_to_row_col
+from backend.utils.logger import get_logger
+
+from .formula_engine import FormulaEngine, RecalcResult
+from .formula_functions import FUNCTIONS
+from .formula_parser import FormulaSyntaxError, compile_formula
+
+logger = get_logger(__name__)
+
+
+class FormulaDependencyGraph:
+    """Построение сохранённого графа зависимостей и пересчёт формул, зависящих от правки."""
+
+    def __init__(self, storage, project_id: int = 1):
+        """
+        Args:
+            storage (ProjectDBStorage): Хранилище проекта.
+            project_id (int): ID проекта (по умолчанию 1 для MVP).
+        """
+        self.storage = storage
+        self.project_id = project_id
+
+    def ensure_built(self) -> int:
+        """
+        Строит граф для листов, у которых его нет (новый проект, изменённые формулы).
+
+        Returns:
+            int: Число листов, для которых граф построен сейчас.
+        """
+        sheets = self.storage.load_all_sheets_metadata(self.project_id)
+        built = self.storage.load_dependency_graph_sheets()
+        missing = [sheet for sheet in sheets if sheet["sheet_id"] not in built]
+        if not missing:
+            return 0
+
+        started = time.perf_counter()
+        sheet_ids = {str(sheet["name"]).upper(): sheet["sheet_id"] for sheet in sheets}
+        count = 0
+        for sheet in missing:
+            if self.build_sheet(sheet["sheet_id"], sheet["name"], sheet_ids):
+                count += 1
+        logger.info(f"Граф зависимостей формул построен для {count} листов за {time.perf_counter() - started:.2f} с.")
+        return count
+
+    def build_sheet(self, sheet_id: int, sheet_name: str, sheet_ids: Dict[str, int]) -> bool:
+        """
+        Строит и сохраняет граф зависимостей формул листа.
+
+        Args:
+            sheet_id (int): ID листа.
+            sheet_name (str): Имя листа (для лога).
+            sheet_ids (Dict[str, int]): {ИМЯ ЛИСТА в верхнем регистре: sheet_id} для ссылок на другие листы.
+
+        Returns:
+            bool: True, если граф сохранён.
+        """
+        nodes: List[Tuple[int, int, int, bool]] = []
+        edges: List[Tuple[int, int, int, int, int, int, int]] = []
+        for formula_id, address, text, _, _ in self.storage.load_sheet_formula_records(sheet_id):
+            try:
+                row, col = address_to_row_col(address)
+            except ValueError:
+                logger.warning(f"Формула с неверным адресом '{address}' на листе '{sheet_name}' не добавлена в граф.")
+                continue
+            try:
+                compiled = compile_formula(text, row, col)
+            except FormulaSyntaxError:
+                # Формула не вычисляется движком - узел без влияющих ячеек
+                nodes.append((row, col, formula_id, False))
+                continue
+            volatile = any(FUNCTIONS[name].volatile for name in compiled.functions if name in FUNCTIONS)
+            nodes.append((row, col, formula_id, volatile))
+            for template, ref in zip(compiled.references, compiled.references_at(row, col)):
+                ref_sheet_id = sheet_id if template.sheet is None else sheet_ids.get(template.sheet.upper())
+                if ref is not None and ref_sheet_id is not None:
+                    edges.append((row, col, ref_sheet_id, ref.row1, ref.col1, ref.row2, ref.col2))
+        return self.storage.save_sheet_dependencies(sheet_id, nodes, edges)
+
+    def dependents(self, changed_cells: Sequence[Tuple[int, int, int]], include_volatile: bool = True) -> List[Tuple[int, int, int]]:
+        """
+        Формулы, транзитивно зависящие от изменённых ячеек (граф строится при необходимости).
+
+        Args:
+            changed_cells (Sequence[Tuple[int, int, int]]): Изменённые ячейки (sheet_id, row, col).
+            include_volatile (bool): Добавить волатильные формулы и зависящие от них.
+
+        Returns:
+            List[Tuple[int, int, int]]: Формулы (sheet_id, row, col).
+        """
+        self.ensure_built()
+        return self.storage.find_dependent_formulas(list(changed_cells), include_volatile)
+
+    def recalculate_dependents(
+        self,
+        changed_cells: Iterable[Tuple[int, int, int]],
+        write: bool = True,
+        formulas: Iterable[Tuple[int, int, int]] = (),
+    ) -> Optional[RecalcResult]:
+        """
+        Пересчитывает формулы, зависящие от изменённых ячеек, и записывает их результаты.
+
+        Args:
+            changed_cells (Iterable[Tuple[int, int, int]]): Изменённые ячейки (sheet_id, row, col).
+            write (bool): Записать результаты в БД.
+            formulas (Iterable[Tuple[int, int, int]]): Формулы, введённые в изменённые ячейки:
+                пересчитываются вместе с зависимыми.
+
+        Returns:
+            Optional[RecalcResult]: Итоги пересчёта или None, если пересчитывать нечего.
+        """
+        dirty = set(self.dependents(list(changed_cells)))
+        dirty.update(formulas)
+        if not dirty:
+            return None
+        return FormulaEngine(self.storage, self.project_id).recalculate_cells(sorted(dirty), write=write)
+
+# Дополнительные функции графа зависимостей (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,529 @@
+# backend/core/formula_parser.py
+"""
+Разбор формул Excel: токенизация, дерево выражения (AST) и кэш разобранных формул.
+
+Ссылки в формуле хранятся относительно ячейки формулы (как в нотации R1C1): формулы,
+протянутые по столбцу ('=A2*2', '=A3*2', ...), дают одинаковую последовательность
+токенов и разбираются один раз - compile_formula() берёт готовое дерево из кэша,
+а абсолютные адреса вычисляются при обращении (RefTemplate.resolve).
+
+Поддерживается: числа, строки, TRUE/FALSE, ошибки (#DIV/0! и т.п.), ссылки A1, $A$1,
+диапазоны A1:B5, столбцы A:A, строки 1:1, ссылки на другие листы (Лист1!A1, 'Мой лист'!A1:B2),
+операторы + - * / ^ & % = <> < > <= >=, вызовы функций (в том числе с пропущенными
+аргументами). Массивы-константы, структурированные ссылки и оператор пересечения
+не поддерживаются (FormulaSyntaxError).
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.storage.cells import column_letter_to_index
+
+# Границы листа Excel
+MAX_ROWS = 1_048_576
+MAX_COLS = 16_384
+
+# Сколько разобранных шаблонов формул хранит кэш compile_formula
+FORMULA_CACHE_SIZE = 16_384
+
+# Виды токенов
+T_NUMBER = "number"
+T_STRING = "string"
+T_BOOL = "bool"
+T_ERROR = "error"
+T_REF = "ref"
+T_FUNC = "func"
+T_NAME = "name"
+T_OP = "op"
+T_LPAREN = "("
+T_RPAREN = ")"
+T_SEP = ","
+
+# Префиксы, которыми Excel помечает в файле функции новых версий (_xlfn.CONCAT)
+_FUNCTION_PREFIXES = ("_XLFN.", "_XLWS.")
+
+_SHEET = r"(?:'(?:[^']|'')+'|[^\W\d][\w.]*)!"
+_CELL = r"\$?[A-Za-z]{1,3}\$?\d+"
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A|GETTING_DATA))
+  | (?P<ref>(?:{sheet})?(?:{cell}(?::{cell})?|\$?[A-Za-z]{{1,3}}:\$?[A-Za-z]{{1,3}}|\$?\d+:\$?\d+)(?![\w(.!]))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<func>[A-Za-z_][\w.]*(?=\())
+  | (?P<bool>(?:TRUE|FALSE)(?![\w.]))
+  | (?P<name>[^\W\d][\w.]*)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%])
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<sep>[,;])
+    """.format(sheet=_SHEET, cell=_CELL),
+    re.VERBOSE | re.IGNORECASE,
+)
+_REF_PART_RE = re.compile(r"(\$?)([A-Za-z]{1,3})?(\$?)(\d+)?")
+# Всё, что похоже на адрес ячейки (в том числе внутри строк и имён) - для ключа формы формулы
+_CELL_LIKE_RE = re.compile(r"(\$?)([A-Za-z]{1,3})(\$?)(\d+)")
+
+# Приоритеты бинарных операторов (больше - связывает сильнее)
+_BINARY_PRECEDENCE = {
+    "=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1,
+    "&": 2,
+    "+": 3, "-": 3,
+    "*": 4, "/": 4,
+    "^": 5,
+}
+
+
+class FormulaSyntaxError(ValueError):
+    """Формула не разобрана: ошибка синтаксиса или неподдерживаемая конструкция."""
+
+
+class Reference(NamedTuple):
+    """Ссылка с абсолютными координатами (1-based, включительно); sheet - None для листа формулы."""
+    sheet: Optional[str]
+    row1: int
+    col1: int
+    row2: int
+    col2: int
+
+    @property
+    def is_cell(self) -> bool:
+        return self.row1 == self.row2 and self.col1 == self.col2
+
+
+class RefTemplate(NamedTuple):
+    """
+    Ссылка относительно ячейки формулы. Для частей без '$' хранится смещение от строки/столбца
+    формулы, для частей с '$' - абсолютное значение. is_range - ссылка записана диапазоном
+    (A1:A1 - диапазон, A1 - ячейка).
+    """
+    sheet: Optional[str]
+    row1: int
+    row1_abs: bool
+    col1: int
+    col1_abs: bool
+    row2: int
+    row2_abs: bool
+    col2: int
+    col2_abs: bool
+    is_range: bool
+
+    def resolve(self, row: int, col: int) -> Optional[Reference]:
+        """
+        Абсолютная ссылка для формулы в ячейке (row, col).
+
+        Returns:
+            Optional[Reference]: Ссылка или None, если она выходит за границы листа (#REF!).
+        """
+        row1 = self.row1 if self.row1_abs else row + self.row1
+        col1 = self.col1 if self.col1_abs else col + self.col1
+        row2 = self.row2 if self.row2_abs else row + self.row2
+        col2 = self.col2 if self.col2_abs else col + self.col2
+        if row1 > row2:
+            row1, row2 = row2, row1
+        if col1 > col2:
+            col1, col2 = col2, col1
+        if row1 < 1 or col1 < 1 or row2 > MAX_ROWS or col2 > MAX_COLS:
+            return None
+        return Reference(self.sheet, row1, col1, row2, col2)
+
+
+# --- Узлы дерева выражения ---
+
+class Node:
+    """Базовый узел AST."""
+    __slots__ = ()
+
+
+class Literal(Node):
+    """Константа: число, строка, логическое значение или ошибка (текст ошибки в error)."""
+    __slots__ = ("value", "error")
+
+    def __init__(self, value: Any, error: bool = False):
+        self.value = value
+        self.error = error
+
+
+class Missing(Node):
+    """Пропущенный аргумент функции (IF(A1,,1))."""
+    __slots__ = ()
+
+
+class Ref(Node):
+    """Ссылка на ячейку или диапазон."""
+    __slots__ = ("template",)
+
+    def __init__(self, template: RefTemplate):
+        self.template = template
+
+
+class Name(Node):
+    """Имя (определённое имя книги); вычисление не поддерживается."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Unary(Node):
+    """Унарный минус или плюс."""
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: str, operand: Node):
+        self.op = op
+        self.operand = operand
+
+
+class Percent(Node):
+    """Постфиксный оператор процента (5% = 0.05)."""
+    __slots__ = ("operand",)
+
+    def __init__(self, operand: Node):
+        self.operand = operand
+
+
+class Binary(Node):
+    """Бинарный оператор."""
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: str, left: Node, right: Node):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class Call(Node):
+    """Вызов функции (имя в верхнем регистре, без префикса _xlfn.)."""
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: List[Node]):
+        self.name = name
+        self.args = args
+
+
+# --- Токенизация ---
+
+@lru_cache(maxsize=4096)
+def _column_index(letters: str) -> int:
+    return column_letter_to_index(letters)
+
+
+def _parse_ref(text: str, row: int, col: int) -> RefTemplate:
+    """Токен ссылки -> RefTemplate относительно ячейки (row, col)."""
+    sheet = None
+    if "!" in text:
+        sheet, text = text.rsplit("!", 1)
+        if sheet.startswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+    first, _, second = text.partition(":")
+    parts = []
+    for part in (first, second or first):
+        col_abs, letters, row_abs, digits = _REF_PART_RE.fullmatch(part).groups()
+        parts.append((letters, bool(col_abs), digits, bool(row_abs or (col_abs and not letters))))
+
+    values = []
+    for index, (letters, col_abs, digits, row_abs) in enumerate(parts):
+        if digits is None:
+            # Столбцы целиком (A:A): строки от первой до последней
+            ref_row, row_abs = (1 if index == 0 else MAX_ROWS), True
+        else:
+            ref_row = int(digits) if row_abs else int(digits) - row
+        if letters is None:
+            # Строки целиком (1:1): столбцы от первого до последнего
+            ref_col, col_abs = (1 if index == 0 else MAX_COLS), True
+        else:
+            ref_col = _column_index(letters) if col_abs else _column_index(letters) - col
+        values.extend((ref_row, row_abs, ref_col, col_abs))
+    return RefTemplate(sheet, *values, bool(second))
+
+
+def tokenize(formula: str, row: int = 1, col: int = 1) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Разбивает формулу на токены. Ссылки преобразуются в RefTemplate относительно
+    ячейки формулы (row, col), поэтому одинаковые по смыслу протянутые формулы
+    дают равные кортежи токенов.
+
+    Args:
+        formula (str): Текст формулы ('=A1+1' или 'A1+1').
+        row (int): Строка ячейки формулы (1-based).
+        col (int): Столбец ячейки формулы (1-based).
+
+    Returns:
+        Tuple[Tuple[str, Any], ...]: Токены (вид, значение).
+
+    Raises:
+        FormulaSyntaxError: Если в формуле есть нераспознанные символы.
+    """
+    text = formula[1:] if formula.startswith("=") else formula
+    return _scan(text, row, col)[0]
+
+
+def _scan(text: str, row: int, col: int) -> Tuple[Tuple[Tuple[str, Any], ...], List[Tuple[int, int]]]:
+    """Токены формулы (без '=') и позиции адресной части ссылок (после имени листа)."""
+    tokens = []
+    ref_spans = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise FormulaSyntaxError(f"Неподдерживаемый синтаксис в позиции {position + 1}: {text[position:position + 10]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "ws":
+            continue
+        if kind == "string":
+            tokens.append((T_STRING, value[1:-1].replace('""', '"')))
+        elif kind == "error":
+            tokens.append((T_ERROR, value.upper()))
+        elif kind == "ref":
+            tokens.append((T_REF, _parse_ref(value, row, col)))
+            ref_spans.append((match.start() + value.rfind("!") + 1, position))
+        elif kind == "number":
+            tokens.append((T_NUMBER, float(value) if any(ch in value for ch in ".eE") else int(value)))
+        elif kind == "func":
+            name = value.upper()
+            for prefix in _FUNCTION_PREFIXES:
+                if name.startswith(prefix):
+                    name = name[len(prefix):]
+            tokens.append((T_FUNC, name))
+        elif kind == "bool":
+            tokens.append((T_BOOL, value.upper() == "TRUE"))
+        elif kind == "name":
+            tokens.append((T_NAME, value.upper()))
+        elif kind == "op":
+            tokens.append((T_OP, value))
+        elif kind == "lparen":
+            tokens.append((T_LPAREN, None))
+        elif kind == "rparen":
+            tokens.append((T_RPAREN, None))
+        else:
+            tokens.append((T_SEP, None))
+    return tuple(tokens), ref_spans
+
+
+# --- Разбор ---
+
+class _Parser:
+    """Рекурсивный спуск с приоритетами операторов Excel."""
+
+    def __init__(self, tokens: Tuple[Tuple[str, Any], ...]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Tuple[Optional[str], Any]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def take(self) -> Tuple[Optional[str], Any]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise FormulaSyntaxError("Пустая формула.")
+        node = self.expression(1)
+        if self.position < len(self.tokens):
+            raise FormulaSyntaxError(f"Лишний токен {self.tokens[self.position]!r}.")
+        return node
+
+    def expression(self, min_precedence: int) -> Node:
+        left = self.unary()
+        while True:
+            kind, value = self.peek()
+            precedence = _BINARY_PRECEDENCE.get(value) if kind == T_OP else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.take()
+            # Все бинарные операторы Excel левоассоциативны (2^3^2 = 64)
+            left = Binary(value, left, self.expression(precedence + 1))
+
+    def unary(self) -> Node:
+        kind, value = self.peek()
+        if kind == T_OP and value in ("-", "+"):
+            self.take()
+            # Унарный минус связывает сильнее '^': -2^2 = 4
+            return Unary(value, self.unary())
+        node = self.primary()
+        while self.peek() == (T_OP, "%"):
+            self.take()
+            node = Percent(node)
+        return node
+
+    def primary(self) -> Node:
+        kind, value = self.take()
+        if kind in (T_NUMBER, T_STRING, T_BOOL):
+            return Literal(value)
+        if kind == T_ERROR:
+            return Literal(value, error=True)
+        if kind == T_REF:
+            return Ref(value)
+        if kind == T_NAME:
+            return Name(value)
+        if kind == T_FUNC:
+            return self.call(value)
+        if kind == T_LPAREN:
+            node = self.expression(1)
+            if self.take()[0] != T_RPAREN:
+                raise FormulaSyntaxError("Нет закрывающей скобки.")
+            return node
+        raise FormulaSyntaxError(f"Неожиданный токен {(kind, value)!r}.")
+
+    def call(self, name: str) -> Call:
+        self.take()  # '('
+        args: List[Node] = []
+        if self.peek()[0] == T_RPAREN:
+            self.take()
+            return Call(name, args)
+        while True:
+            kind = self.peek()[0]
+            args.append(Missing() if kind in (T_SEP, T_RPAREN) else self.expression(1))
+            kind = self.take()[0]
+            if kind == T_RPAREN:
+                return Call(name, args)
+            if kind != T_SEP:
+                raise FormulaSyntaxError(f"Ожидалась ',' или ')' в аргументах {name}.")
+
+
+class CompiledFormula:
+    """
+    Разобранная формула (общая для всех ячеек с тем же шаблоном токенов).
+
+    root - корень AST; references - шаблоны ссылок в порядке появления;
+    functions и names - использованные функции и имена. Поля evaluator (скомпилированное
+    выражение) и problem (почему формулу нельзя вычислить) заполняет движок вычислений
+    при первом использовании.
+    """
+
+    __slots__ = ("root", "references", "functions", "names", "evaluator", "problem")
+
+    def __init__(self, root: Node, references: List[RefTemplate], functions: List[str], names: List[str]):
+        self.root = root
+        self.references = references
+        self.functions = functions
+        self.names = names
+        self.evaluator = None
+        self.problem: Optional[str] = None
+
+    def references_at(self, row: int, col: int) -> List[Optional[Reference]]:
+        """Абсолютные ссылки формулы в ячейке (row, col); None - ссылка за границами листа."""
+        return [template.resolve(row, col) for template in self.references]
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _compile_tokens(tokens: Tuple[Tuple[str, Any], ...]) -> CompiledFormula:
+    root = _Parser(tokens).parse()
+    references = [value for kind, value in tokens if kind == T_REF]
+    functions = sorted({value for kind, value in tokens if kind == T_FUNC})
+    names = sorted({value for kind, value in tokens if kind == T_NAME})
+    return CompiledFormula(root, references, functions, names)
+
+
+# Кэш форм формул: текст вне адресов -> (какие адреса являются ссылками, {вид адресов: формула}).
+# Позволяет узнать протянутую формулу без токенизации: '=A2*2' в B2 и '=A3*2' в B3 имеют
+# одинаковый текст вне адресов и одинаковые смещения ссылок.
+_SHAPES: Dict[Tuple[str, ...], Tuple[Tuple[bool, ...], Dict[tuple, CompiledFormula]]] = {}
+
+
+def _cell_like(text: str) -> Tuple[Tuple[str, ...], list]:
+    """Текст формулы вне похожих на адреса фрагментов и сами фрагменты (re.Match)."""
+    skeleton = []
+    matches = []
+    last = 0
+    for match in _CELL_LIKE_RE.finditer(text):
+        skeleton.append(text[last:match.start()])
+        matches.append(match)
+        last = match.end()
+    skeleton.append(text[last:])
+    return tuple(skeleton), matches
+
+
+def _shape_variant(matches: list, mask: Tuple[bool, ...], row: int, col: int) -> tuple:
+    """
+    Вид адресов формулы: для ссылок - смещения относительно ячейки (row, col)
+    (абсолютные части - как есть), для остальных фрагментов (имена функций, строки,
+    имена листов) - исходный текст.
+    """
+    variant = []
+    for match, is_ref in zip(matches, mask):
+        if is_ref:
+            col_abs, letters, row_abs, digits = match.groups()
+            ref_col = _column_index(letters)
+            ref_row = int(digits)
+            variant.append((ref_col if col_abs else ref_col - col, ref_row if row_abs else ref_row - row, col_abs, row_abs))
+        else:
+            variant.append(match.group())
+    return tuple(variant)
+
+
+def _shape_mask(matches: list, ref_spans: List[Tuple[int, int]]) -> Optional[Tuple[bool, ...]]:
+    """
+    Какие похожие на адреса фрагменты - части ссылок. None - форму нельзя кэшировать:
+    адресная часть ссылки не состоит целиком из таких фрагментов (A:A, 1:1).
+    """
+    mask = []
+    index = 0
+    for start, end in ref_spans:
+        while index < len(matches) and matches[index].start() < start:
+            mask.append(False)
+            index += 1
+        covered = []
+        while index < len(matches) and matches[index].end() <= end:
+            covered.append(matches[index])
+            mask.append(True)
+            index += 1
+        if not covered or covered[0].start() != start or covered[-1].end() != end:
+            return None
+        if len(covered) == 2 and covered[0].end() + 1 != covered[1].start() or len(covered) > 2:
+            return None
+    mask.extend(False for _ in range(index, len(matches)))
+    return tuple(mask)
+
+
+def compile_formula(formula: str, row: int = 1, col: int = 1) -> CompiledFormula:
+    """
+    Разбирает формулу ячейки (row, col). Результат кэшируется по шаблону токенов,
+    поэтому протянутые формулы разбираются один раз; повторная форма формулы
+    узнаётся без токенизации (по тексту вне адресов и смещениям ссылок).
+
+    Args:
+        formula (str): Текст формулы ('=SUM(A1:A10)').
+        row (int): Строка ячейки формулы (1-based).
+        col (int): Столбец ячейки формулы (1-based).
+
+    Returns:
+        CompiledFormula: Разобранная формула.
+
+    Raises:
+        FormulaSyntaxError: Если формула не разобрана.
+    """
+    text = formula[1:] if formula.startswith("=") else formula
+    skeleton, matches = _cell_like(text)
+    shape = _SHAPES.get(skeleton)
+    if shape is not None:
+        compiled = shape[1].get(_shape_variant(matches, shape[0], row, col))
+        if compiled is not None:
+            return compiled
+
+    tokens, ref_spans = _scan(text, row, col)
+    compiled = _compile_tokens(tokens)
+    mask = _shape_mask(matches, ref_spans)
+    if mask is not None:
+        if shape is None or shape[0] != mask:
+            if len(_SHAPES) >= FORMULA_CACHE_SIZE:
+                _SHAPES.clear()
+            shape = _SHAPES[skeleton] = (mask, {})
+        if len(shape[1]) < FORMULA_CACHE_SIZE:
+            shape[1][_shape_variant(matches, mask, row, col)] = compiled
+    return compiled
+
+
+def formula_cache_info() -> Dict[str, Any]:
+    """Статистика кэшей разбора: шаблоны токенов (hits, misses, maxsize, currsize) и число форм формул."""
+    return {"templates": _compile_tokens.cache_info()._asdict(), "shapes": len(_SHAPES)}
+
+# Дополнительные функции разбора формул (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,202 @@
+# backend/core/import_checkpoints.py
+"""
+Контрольные точки импорта для возобновления после сбоя.
+
+Состояние импорта (хэш файла, завершённые листы, текущий лист и последняя записанная
+строка) хранится в таблице 'project_metadata' под ключом 'import_checkpoint_<job>'.
+Контрольная точка сохраняется в той же транзакции, что и часть данных, после чего
+изменения фиксируются (storage.flush_bulk_session()): после падения процесса в БД
+остаются ровно те части, которые указаны в контрольной точке.
+
+Пример:
+    checkpoint = ImportCheckpoint(storage, "streaming", file_path)
+    checkpoint.load()                       # состояние прерванного импорта того же файла или пустое
+    start_row = checkpoint.resume_row(sheet_name) + 1
+    ...
+    checkpoint.commit_chunk(sheet_name, last_row)
+    checkpoint.sheet_done(sheet_name)
+    checkpoint.clear()                      # импорт завершён
+"""
+
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.storage.base import ProjectDBStorage
+from backend.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Префикс ключа контрольной точки в project_metadata
+CHECKPOINT_KEY_PREFIX = "import_checkpoint_"
+# Размер блока чтения файла при расчёте хэша (байт)
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    SHA-256 содержимого файла: контрольная точка применима только к тому же файлу.
+
+    Args:
+        file_path (str): Путь к файлу.
+
+    Returns:
+        str: Шестнадцатеричный хэш.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checkpoint_key(job: str) -> str:
+    """Ключ контрольной точки задания импорта в project_metadata."""
+    return f"{CHECKPOINT_KEY_PREFIX}{job}"
+
+
+class ImportCheckpoint:
+    """
+    Контрольная точка одного задания импорта (например, 'streaming') в БД проекта.
+    """
+
+    def __init__(self, storage: ProjectDBStorage, job: str, file_path: str, project_id: int = 1):
+        """
+        Args:
+            storage (ProjectDBStorage): Хранилище проекта.
+            job (str): Имя задания импорта (часть ключа в project_metadata).
+            file_path (str): Путь к импортируемому файлу.
+            project_id (int): ID проекта (для MVP - 1).
+        """
+        self.storage = storage
+        self.job = job
+        self.file_path = file_path
+        self.project_id = project_id
+        self.key = checkpoint_key(job)
+        self.file_hash = file_fingerprint(file_path)
+        self.state: Dict[str, Any] = self._empty_state()
+
+    def _empty_state(self) -> Dict[str, Any]:
+        return {
+            "job": self.job,
+            "file_path": os.path.abspath(self.file_path),
+            "file_hash": self.file_hash,
+            "sheets_done": [],
+            "sheet": None,
+            "last_row": 0,
+            "updated_at": None,
+        }
+
+    # --- Чтение ---
+
+    def load(self) -> bool:
+        """
+        Загружает сохранённое состояние задания.
+        Контрольная точка другого файла (или изменённого файла) игнорируется.
+
+        Returns:
+            bool: True, если найдена контрольная точка для этого файла (импорт возобновляется).
+        """
+        saved = self.storage.load_project_metadata_value(self.project_id, self.key)
+        if not isinstance(saved, dict):
+            self.state = self._empty_state()
+            return False
+        if saved.get("file_hash") != self.file_hash:
+            logger.info(
+                f"Контрольная точка '{self.key}' относится к другому файлу "
+                f"({saved.get('file_path')}); импорт начинается заново."
+            )
+            self.state = self._empty_state()
+            return False
+        self.state = self._empty_state()
+        self.state.update(saved)
+        logger.info(
+            f"Найдена контрольная точка '{self.key}': завершено листов - {len(self.state['sheets_done'])}, "
+            f"лист '{self.state['sheet']}' записан до строки {self.state['last_row']}."
+        )
+        return True
+
+    @property
+    def sheets_done(self) -> List[str]:
+        """Листы, импорт которых завершён."""
+        return list(self.state["sheets_done"])
+
+    def is_sheet_done(self, sheet_name: str) -> bool:
+        """True, если лист уже полностью импортирован."""
+        return sheet_name in self.state["sheets_done"]
+
+    def resume_row(self, sheet_name: str) -> int:
+        """
+        Последняя строка листа, записанная до сбоя (0 - лист не начинался).
+
+        Args:
+            sheet_name (str): Имя листа.
+        """
+        return int(self.state["last_row"] or 0) if self.state["sheet"] == sheet_name else 0
+
+    # --- Запись ---
+
+    def _save(self) -> bool:
+        self.state["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        return self.storage.save_project_metadata(self.project_id, {self.key: self.state})
+
+    def _save_and_flush(self) -> bool:
+        if not self._save():
+            return False
+        # Внутри write_batch() фиксация откладывается до конца пакета: контрольная точка
+        # остаётся согласованной с данными в той же транзакции
+        self.storage.flush_bulk_session()
+        return True
+
+    def commit_chunk(self, sheet_name: str, last_row: int) -> bool:
+        """
+        Отмечает, что строки листа до last_row записаны, и фиксирует транзакцию
+        вместе с уже записанными данными части.
+
+        Args:
+            sheet_name (str): Имя листа.
+            last_row (int): Последняя записанная строка (1-based).
+
+        Returns:
+            bool: True, если контрольная точка сохранена.
+        """
+        self.state["sheet"] = sheet_name
+        self.state["last_row"] = int(last_row)
+        return self._save_and_flush()
+
+    def sheet_done(self, sheet_name: str) -> bool:
+        """
+        Отмечает лист как полностью импортированный и фиксирует транзакцию.
+
+        Args:
+            sheet_name (str): Имя листа.
+        """
+        if sheet_name not in self.state["sheets_done"]:
+            self.state["sheets_done"].append(sheet_name)
+        self.state["sheet"] = None
+        self.state["last_row"] = 0
+        return self._save_and_flush()
+
+    def clear(self) -> bool:
+        """Удаляет контрольную точку после успешного завершения импорта."""
+        self.state = self._empty_state()
+        return self.storage.delete_project_metadata(self.project_id, self.key)
+
+
+def load_checkpoint_state(storage: ProjectDBStorage, job: str, project_id: int = 1) -> Optional[Dict[str, Any]]:
+    """
+    Сохранённое состояние задания импорта без проверки файла (для отображения в UI).
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта.
+        job (str): Имя задания импорта.
+        project_id (int): ID проекта.
+
+    Returns:
+        Optional[Dict[str, Any]]: Состояние или None, если контрольной точки нет.
+    """
+    saved = storage.load_project_metadata_value(project_id, checkpoint_key(job))
+    return saved if isinstance(saved, dict) else None
+
+# Дополнительные функции контрольных точек импорта (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,280 @@
+# backend/core/import_pipeline.py
+"""
+Конвейер импорта «разбор -> запись» с ограниченной очередью между стадиями.
+
+Стадия разбора выполняется в фоновом потоке и складывает готовые пакеты в очередь,
+стадия записи выполняется в вызывающем потоке: соединение SQLite и открытая
+bulk_session/write_batch принадлежат ему. Пока писатель выполняет executemany,
+разборщик готовит следующий пакет; если очередь заполнена, разборщик ждёт
+(обратное давление), поэтому в памяти не больше queue_size пакетов.
+
+Для каждой стадии ведутся счётчики (элементы, пакеты, время работы и ожидания),
+по которым видно, какая из стадий ограничивает скорость.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from backend.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Ёмкость очереди в пакетах по умолчанию
+DEFAULT_PIPELINE_QUEUE_SIZE = 4
+# Интервал, с которым разборщик проверяет остановку конвейера, ожидая место в очереди (сек.)
+_PUT_TIMEOUT = 0.2
+
+# Маркер конца потока пакетов
+_END = object()
+
+
+class StageCounters:
+    """
+    Счётчики пропускной способности одной стадии конвейера.
+
+    busy_seconds - время полезной работы стадии (разбор пакета или его запись),
+    wait_seconds - время ожидания другой стадии (место в очереди или новый пакет).
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Имя стадии ('parse' или 'write').
+        """
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        """Пропускная способность стадии по времени полезной работы."""
+        return self.items / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Счётчики в виде словаря (для логов и options['pipeline_stats'])."""
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "batches": self.batches,
+            "busy_s": round(self.busy_seconds, 3),
+            "wait_s": round(self.wait_seconds, 3),
+            "items_per_s": round(self.items_per_second, 1),
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.name}: {self.items} эл. / {self.batches} пак., работа {self.busy_seconds:.2f} с, "
+            f"ожидание {self.wait_seconds:.2f} с, {self.items_per_second:.0f} эл./с"
+        )
+
+
+class ImportPipeline:
+    """
+    Конвейер из двух стадий: фоновый разбор пакетов и запись в вызывающем потоке.
+
+    Пример:
+        pipeline = ImportPipeline(f"Лист '{sheet_name}'")
+        ok = pipeline.run(iter_batches(), write_batch, count=len)
+        logger.info(pipeline.summary())
+    """
+
+    def __init__(self, label: str = "", queue_size: int = DEFAULT_PIPELINE_QUEUE_SIZE, threaded: bool = True):
+        """
+        Args:
+            label (str): Подпись для логов (например, имя листа).
+            queue_size (int): Ёмкость очереди в пакетах.
+            threaded (bool): False - обе стадии по очереди в вызывающем потоке
+                (поведение без конвейера, для сравнения и отладки).
+        """
+        self.label = label
+        self.queue_size = max(1, int(queue_size))
+        self.threaded = threaded
+        self.parse = StageCounters("parse")
+        self.write = StageCounters("write")
+        self.elapsed_seconds = 0.0
+
+    @property
+    def batches_in_flight(self) -> int:
+        """Сколько пакетов может одновременно находиться в памяти: очередь, разбираемый и записываемый."""
+        return self.queue_size + 2 if self.threaded else 1
+
+    def split_budget(self, budget_cells: int, minimum: int = 1) -> int:
+        """
+        Размер пакета, при котором все пакеты в работе укладываются в бюджет ячеек
+        (бюджет рассчитан на одну часть, как при импорте без конвейера).
+
+        Args:
+            budget_cells (int): Бюджет ячеек на импорт листа.
+            minimum (int): Нижняя граница размера пакета.
+        """
+        return max(minimum, budget_cells // self.batches_in_flight)
+
+    # --- Запуск ---
+
+    def run(
+        self,
+        batches: Iterable[Any],
+        write: Callable[[Any], bool],
+        count: Callable[[Any], int] = len
+    ) -> bool:
+        """
+        Прогоняет пакеты через конвейер.
+
+        Args:
+            batches (Iterable[Any]): Источник пакетов (обычно генератор); обходится в потоке разбора.
+            write (Callable[[Any], bool]): Запись пакета; False останавливает конвейер.
+            count (Callable[[Any], int]): Число элементов в пакете (для счётчиков).
+
+        Returns:
+            bool: True, если все пакеты записаны, False, если запись вернула False.
+
+        Raises:
+            Exception: Исключение стадии разбора передаётся в вызывающий поток
+                (например, UnsupportedXlsxFeature для перехода на openpyxl).
+        """
+        started = time.perf_counter()
+        try:
+            if self.threaded:
+                return self._run_threaded(batches, write, count)
+            return self._run_inline(batches, write, count)
+        finally:
+            self.elapsed_seconds = time.perf_counter() - started
+
+    def _write_one(self, batch: Any, write: Callable[[Any], bool], count: Callable[[Any], int]) -> bool:
+        t0 = time.perf_counter()
+        ok = write(batch)
+        self.write.busy_seconds += time.perf_counter() - t0
+        self.write.batches += 1
+        self.write.items += count(batch)
+        return ok
+
+    def _run_inline(self, batches: Iterable[Any], write: Callable[[Any], bool], count: Callable[[Any], int]) -> bool:
+        iterator = iter(batches)
+        while True:
+            t0 = time.perf_counter()
+            batch = next(iterator, _END)
+            self.parse.busy_seconds += time.perf_counter() - t0
+            if batch is _END:
+                return True
+            self.parse.batches += 1
+            self.parse.items += count(batch)
+            if not self._write_one(batch, write, count):
+                return False
+
+    def _run_threaded(self, batches: Iterable[Any], write: Callable[[Any], bool], count: Callable[[Any], int]) -> bool:
+        batch_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: list = []
+
+        def produce():
+            try:
+                iterator = iter(batches)
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    batch = next(iterator, _END)
+                    self.parse.busy_seconds += time.perf_counter() - t0
+                    if batch is not _END:
+                        self.parse.batches += 1
+                        self.parse.items += count(batch)
+                    t0 = time.perf_counter()
+                    while not stop.is_set():
+                        try:
+                            batch_queue.put(batch, timeout=_PUT_TIMEOUT)
+                            break
+                        except queue.Full:
+                            continue
+                    self.parse.wait_seconds += time.perf_counter() - t0
+                    if batch is _END:
+                        return
+            except BaseException as e:  # передаётся писателю и пробрасывается в вызывающем потоке
+                errors.append(e)
+                batch_queue.put(_END)
+
+        producer = threading.Thread(target=produce, name=f"import-parse {self.label}".strip(), daemon=True)
+        producer.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                batch = batch_queue.get()
+                self.write.wait_seconds += time.perf_counter() - t0
+                if batch is _END:
+                    break
+                if not self._write_one(batch, write, count):
+                    return False
+        finally:
+            stop.set()
+            # Освобождаем место в очереди, если разборщик ждёт put()
+            while producer.is_alive():
+                try:
+                    batch_queue.get_nowait()
+                except queue.Empty:
+                    producer.join(_PUT_TIMEOUT)
+        if errors:
+            raise errors[0]
+        return True
+
+    # --- Отчёт ---
+
+    @property
+    def bottleneck(self) -> Optional[str]:
+        """
+        Стадия, ограничивающая скорость: с большим временем полезной работы
+        (другая стадия в это время ждёт её). None, если пакетов не было.
+        """
+        if self.write.batches == 0:
+            return None
+        return "write" if self.write.busy_seconds >= self.parse.busy_seconds else "parse"
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики обеих стадий и общее время."""
+        return {
+            "label": self.label,
+            "elapsed_s": round(self.elapsed_seconds, 3),
+            "bottleneck": self.bottleneck,
+            "parse": self.parse.as_dict(),
+            "write": self.write.as_dict(),
+        }
+
+    def summary(self) -> str:
+        """Строка для лога."""
+        return (
+            f"Конвейер {self.label} за {self.elapsed_seconds:.2f} с; {self.parse!r}; {self.write!r}; "
+            f"узкое место: {self.bottleneck or '-'}"
+        )
+
+
+def pipeline_from_options(label: str, options: Optional[Dict[str, Any]]) -> ImportPipeline:
+    """
+    Создаёт конвейер по опциям импорта.
+
+    Args:
+        label (str): Подпись для логов.
+        options (Optional[Dict[str, Any]]): Опции импорта:
+            'pipeline' (bool) - разбор в фоновом потоке (по умолчанию - если доступно больше одного ядра:
+                на одном ядре стадии не перекрываются, и поток только добавляет переключения),
+            'pipeline_queue_size' (int) - ёмкость очереди в пакетах (по умолчанию 4).
+    """
+    options = options or {}
+    return ImportPipeline(
+        label,
+        queue_size=options.get('pipeline_queue_size') or DEFAULT_PIPELINE_QUEUE_SIZE,
+        threaded=bool(options.get('pipeline', (os.cpu_count() or 1) > 1)),
+    )
+
+
+def record_pipeline_stats(pipeline: ImportPipeline, options: Optional[Dict[str, Any]]):
+    """
+    Пишет счётчики конвейера в лог и, если вызывающая сторона передала список
+    options['pipeline_stats'], добавляет в него pipeline.stats().
+    """
+    logger.info(pipeline.summary())
+    sink = (options or {}).get('pipeline_stats')
+    if isinstance(sink, list):
+        sink.append(pipeline.stats())
+
+# Дополнительные функции конвейера импорта (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,235 @@
+# backend/core/import_strategy.py
+"""
+Автоматический выбор способа импорта по осмотру книги (backend/importer/workbook_probe.py).
+
+choose_import_plan() смотрит на число ячеек, долю ячеек со стилями, наличие формул и
+диаграмм, свободную память и число ядер и выбирает один из способов:
+
+* 'openpyxl'     - книга открывается openpyxl целиком, каждый лист обходится один раз
+                   (значения, формулы, стили, объединения, диаграммы). Простой путь для
+                   небольших книг и для оформленных книг, которые помещаются в память;
+* 'xml'          - значения, формулы и их результаты читаются прямо из XML листов
+                   (FastXlsxReader) частями; память не зависит от размера книги.
+                   Выбирается для "плоских" данных без оформления и диаграмм: если книга
+                   помещается в память - только без стилей в выборке и без объединённых
+                   ячеек, чтобы не импортировать меньше, чем режим "всё";
+* 'xml_parallel' - то же, но листы разбираются в пуле процессов (несколько крупных листов
+                   и больше одного ядра);
+* 'streaming'    - openpyxl read_only частями с контрольными точками: книга с оформлением,
+                   которая не помещается в память. Диаграммы и объединения не импортируются.
+
+Каждое решение сопровождается причинами (ImportPlan.reasons), которые пишутся в лог.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from backend.importer.workbook_probe import WorkbookProbe, has_merged_cells, probe_workbook
+from backend.utils.logger import get_logger
+
+from .app_controller_data_import import DEFAULT_MEMORY_LIMIT_MB, _FULL_MODE_MEMORY_FACTOR
+
+logger = get_logger(__name__)
+
+# Книги до стольких ячеек импортируются простым путём (openpyxl целиком) без дальнейших оценок
+SMALL_WORKBOOK_CELLS = 50_000
+# Доля ячеек со стилем в выборке, ниже которой оформление книги, не помещающейся в память,
+# считается несущественным (книга, которая помещается, читается из XML только без оформления)
+PLAIN_STYLE_RATIO = 0.01
+# Параллельный разбор: минимум ячеек на книгу и на крупный лист
+PARALLEL_MIN_CELLS = 500_000
+PARALLEL_MIN_SHEET_CELLS = 100_000
+# Доля свободной памяти системы, которую может занять полная загрузка книги
+_AVAILABLE_MEMORY_SHARE = 0.5
+
+IMPORT_STRATEGIES = ("openpyxl", "xml", "xml_parallel", "streaming")
+
+
+def _available_memory_mb() -> Optional[float]:
+    """
+    Свободная (доступная для выделения) память системы в мегабайтах.
+    Используется psutil, если установлен, иначе /proc/meminfo (Linux).
+
+    Returns:
+        Optional[float]: Объём в МБ или None, если определить не удалось.
+    """
+    try:
+        import psutil  # type: ignore[import-not-found]
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.debug(f"psutil не смог определить свободную память: {e}")
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ImportPlan:
+    """Выбранный способ импорта, опции для него и причины выбора."""
+
+    def __init__(self, strategy: str, probe: Optional[WorkbookProbe] = None):
+        self.strategy = strategy
+        self.probe = probe
+        # Опции, которые добавляются к опциям пользователя при запуске импорта
+        self.options: Dict[str, Any] = {}
+        self.reasons: List[str] = []
+        # Что не будет импортировано выбранным способом (для предупреждения)
+        self.skipped: List[str] = []
+        self.estimated_cells = 0
+        self.estimated_memory_mb: Optional[float] = None
+        self.memory_budget_mb: Optional[float] = None
+        self.cpu_count = 1
+
+    def because(self, reason: str) -> "ImportPlan":
+        self.reasons.append(reason)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для логов, API и options['import_plan']."""
+        return {
+            "strategy": self.strategy,
+            "options": dict(self.options),
+            "reasons": list(self.reasons),
+            "skipped": list(self.skipped),
+            "estimated_cells": self.estimated_cells,
+            "estimated_memory_mb": round(self.estimated_memory_mb, 1) if self.estimated_memory_mb is not None else None,
+            "memory_budget_mb": round(self.memory_budget_mb, 1) if self.memory_budget_mb is not None else None,
+            "cpu_count": self.cpu_count,
+        }
+
+    def summary(self) -> str:
+        """Однострочная сводка для лога."""
+        text = f"План импорта: '{self.strategy}' ({'; '.join(self.reasons)})"
+        if self.skipped:
+            text += f"; не импортируются: {', '.join(self.skipped)}"
+        return text + "."
+
+
+def choose_import_plan(
+    file_path: str,
+    options: Optional[Dict[str, Any]] = None,
+    probe: Optional[WorkbookProbe] = None,
+) -> ImportPlan:
+    """
+    Выбирает способ импорта книги.
+
+    Учитываются опции:
+        'sheets': List[str]      - оцениваются только выбранные листы;
+        'memory_limit_mb': int   - лимит памяти импорта (по умолчанию DEFAULT_MEMORY_LIMIT_MB,
+                                   но не больше половины свободной памяти системы);
+        'import_styles': bool    - False: оформление не нужно, допускается чтение XML;
+        'fast_reader': bool      - False: чтение XML запрещено, только openpyxl;
+        'max_workers': int       - число процессов для параллельного разбора.
+
+    Args:
+        file_path (str): Путь к Excel-файлу.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+        probe (Optional[WorkbookProbe]): Готовый результат осмотра (иначе файл осматривается).
+
+    Returns:
+        ImportPlan: Выбранный способ с причинами.
+    """
+    options = options or {}
+    probe = probe or probe_workbook(file_path)
+    if probe is None:
+        return ImportPlan("openpyxl").because("файл не является книгой .xlsx/.xlsm - осмотр невозможен")
+
+    plan = ImportPlan("openpyxl", probe)
+    selected = {str(name) for name in options.get('sheets', [])}
+    sheets = [sheet for sheet in probe.sheets if not selected or sheet.name in selected]
+    plan.estimated_cells = sum(sheet.estimated_cells for sheet in sheets)
+    xml_size = sum(sheet.xml_size for sheet in sheets) + probe.shared_strings_xml_size
+    plan.estimated_memory_mb = xml_size * _FULL_MODE_MEMORY_FACTOR / (1024 * 1024)
+    plan.cpu_count = int(options.get('max_workers') or os.cpu_count() or 1)
+
+    memory_limit_mb = float(options.get('memory_limit_mb') or DEFAULT_MEMORY_LIMIT_MB)
+    available_mb = _available_memory_mb()
+    if available_mb is not None:
+        memory_limit_mb = min(memory_limit_mb, available_mb * _AVAILABLE_MEMORY_SHARE)
+    plan.memory_budget_mb = memory_limit_mb
+    fits_in_memory = plan.estimated_memory_mb <= memory_limit_mb
+    memory_note = f"оценка памяти полной загрузки {plan.estimated_memory_mb:.0f} МБ при бюджете {memory_limit_mb:.0f} МБ"
+
+    styled_cells = sum(sheet.sample_styled for sheet in sheets)
+    sampled_cells = sum(sheet.sample_cells for sheet in sheets)
+    style_ratio = styled_cells / sampled_cells if sampled_cells else 0.0
+    charts = sum(sheet.charts for sheet in sheets)
+    needs_styles = options.get('import_styles', True) and style_ratio >= PLAIN_STYLE_RATIO
+    formulas = "с формулами" if any(sheet.sample_formulas for sheet in sheets) or probe.has_calc_chain else "без формул"
+
+    if plan.estimated_cells <= SMALL_WORKBOOK_CELLS and fits_in_memory:
+        plan.options['streaming'] = False
+        return plan.because(
+            f"небольшая книга (~{plan.estimated_cells} ячеек, {formulas}) - простой путь, импортируется всё"
+        )
+
+    merged = None
+    use_xml = not charts and options.get('fast_reader', True)
+    if use_xml and fits_in_memory:
+        # Книга помещается в память: чтение XML не должно импортировать меньше, чем режим "всё",
+        # поэтому допускается только без оформления в выборке и без объединённых ячеек
+        use_xml = not (options.get('import_styles', True) and styled_cells)
+        if use_xml:
+            merged = has_merged_cells(file_path, sheets)
+            use_xml = not merged
+    elif use_xml:
+        use_xml = not needs_styles
+
+    if use_xml:
+        # Плоские данные: оформления нет, значения и формулы читаются из XML частями
+        styles_note = "оформление не требуется" if not options.get('import_styles', True) else f"ячеек со стилем {style_ratio:.1%}"
+        plan.because(f"~{plan.estimated_cells} ячеек {formulas}, {styles_note}, диаграмм нет - чтение XML без openpyxl")
+        if merged is None:
+            plan.skipped.append("объединённые ячейки")
+        if style_ratio > 0:
+            plan.skipped.append("оформление")
+        big_sheets = [sheet for sheet in sheets if sheet.estimated_cells >= PARALLEL_MIN_SHEET_CELLS]
+        if plan.cpu_count > 1 and len(big_sheets) > 1 and plan.estimated_cells >= PARALLEL_MIN_CELLS:
+            plan.strategy = "xml_parallel"
+            plan.options['max_workers'] = min(plan.cpu_count, len(big_sheets))
+            plan.skipped.append("сохранённые результаты формул")
+            return plan.because(f"{len(big_sheets)} крупных листов и {plan.cpu_count} ядер - листы разбираются параллельно")
+        plan.strategy = "xml"
+        if plan.cpu_count <= 1:
+            return plan.because("одно ядро - разбор в одном процессе")
+        return plan.because(f"крупных листов {len(big_sheets)} - параллельный разбор не окупится")
+
+    reason = f"оформлено {style_ratio:.1%} ячеек" + (f", диаграмм: {charts}" if charts else "")
+    if merged:
+        reason += ", есть объединённые ячейки"
+    if fits_in_memory:
+        plan.options['streaming'] = False
+        plan.because(f"~{plan.estimated_cells} ячеек {formulas}, {reason}")
+        if probe.has_pivots:
+            plan.because("есть сводные таблицы - при ошибке openpyxl импорт прервётся")
+        return plan.because(f"{memory_note} - книга открывается целиком, импортируется всё")
+
+    plan.strategy = "streaming"
+    plan.options['memory_limit_mb'] = int(memory_limit_mb)
+    plan.skipped.append("объединённые ячейки")
+    if charts:
+        plan.skipped.append("диаграммы")
+    return plan.because(f"~{plan.estimated_cells} ячеек {formulas}, {reason}").because(
+        f"{memory_note} - потоковое чтение частями"
+    )
+
+
+def record_import_plan(plan: ImportPlan, options: Optional[Dict[str, Any]]):
+    """
+    Пишет план в лог и, если вызывающая сторона передала словарь options['import_plan'],
+    записывает в него plan.to_dict().
+    """
+    logger.info(plan.summary())
+    if plan.skipped:
+        logger.warning(f"Выбранным способом ('{plan.strategy}') не импортируются: {', '.join(plan.skipped)}.")
+    sink = (options or {}).get('import_plan')
+    if isinstance(sink, dict):
+        sink.update(plan.to_dict())
+
+# Дополнительные функции выбора способа импорта (если потребуются) могут быть добавлены здесь
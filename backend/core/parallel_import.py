@@ -0,0 +1,311 @@
+# backend/core/parallel_import.py
+"""
+Параллельный импорт листов: разбор листов в пуле процессов и запись одним писателем.
+
+Каждый процесс пула открывает книгу сам и разбирает один лист (FastXlsxReader,
+при неподдерживаемых элементах - openpyxl read_only). Готовые пакеты ячеек и формул
+передаются через ограниченную очередь: если писатель не успевает, процессы ждут
+(обратное давление), и память не растёт. Запись в SQLite выполняет только вызывающий
+поток внутри одной bulk_session - SQLite допускает одного писателя.
+
+Импортируются значения и формулы; стили, объединённые ячейки и диаграммы требуют
+объектов openpyxl всей книги и импортируются отдельно.
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.importer.xlsx_fast_reader import FastXlsxReader, UnsupportedXlsxFeature, iter_sheet_cells_openpyxl
+from backend.storage.base import ProjectDBStorage
+from backend.storage.cells import row_col_to_address
+from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressReporter
+
+logger = get_logger(__name__)
+
+# Размер пакета ячеек, передаваемого процессом писателю
+DEFAULT_BATCH_CELLS = 20_000
+# Ёмкость очереди в пакетах (ограничивает память, занятую непереданными пакетами)
+DEFAULT_QUEUE_SIZE = 8
+# Как часто писатель проверяет завершение процессов, если очередь пуста (сек.)
+_POLL_INTERVAL = 0.5
+
+# Типы сообщений от процессов разбора
+_MSG_BATCH = "batch"
+_MSG_DONE = "done"
+_MSG_ERROR = "error"
+
+
+def _iter_sheet(file_path: str, sheet_name: str):
+    """Разбор листа быстрым путём XML: (row, col, value, formula, is_error)."""
+    with FastXlsxReader(file_path) as reader:
+        yield from reader.iter_cells_flagged(sheet_name)
+
+
+def parse_sheet_worker(
+    file_path: str,
+    sheet_name: str,
+    value_source: str,
+    import_formulas: bool,
+    batch_cells: int,
+    out_queue
+) -> Tuple[str, int, int]:
+    """
+    Разбирает лист в процессе пула и отправляет пакеты в очередь писателя.
+    Функция верхнего уровня, чтобы её можно было передать в ProcessPoolExecutor.
+
+    Сообщения очереди:
+        ('batch', sheet_name, cells, formulas, replace_formulas) -
+            cells: [(row, col, value, value_type)], formulas: [{'cell_address', 'formula'}],
+            replace_formulas: очистить формулы листа перед записью пакета (повторный разбор через openpyxl);
+        ('done', sheet_name, cells_count, formulas_count);
+        ('error', sheet_name, текст ошибки).
+
+    Args:
+        file_path (str): Путь к книге.
+        sheet_name (str): Имя листа.
+        value_source (str): 'formula' - значением ячейки с формулой служит текст формулы,
+            'cached' - сохранённый результат.
+        import_formulas (bool): Передавать формулы для таблицы 'formulas'.
+        batch_cells (int): Размер пакета в ячейках.
+        out_queue: Очередь multiprocessing (Manager().Queue).
+
+    Returns:
+        Tuple[str, int, int]: (имя листа, число ячеек, число формул).
+    """
+    def run(cell_source, replace_sheet: bool) -> Tuple[int, int]:
+        cells: List[tuple] = []
+        formulas: List[Dict[str, str]] = []
+        cells_count = formulas_count = 0
+        first = True
+        for row, col, value, formula, is_error in cell_source:
+            if value_source == 'formula' and formula is not None:
+                cells.append((row, col, formula, None))
+            elif value is not None:
+                cells.append((row, col, value, "error" if is_error else None))
+            if import_formulas and formula is not None:
+                formulas.append({"cell_address": row_col_to_address(row, col), "formula": formula})
+            if len(cells) + len(formulas) >= batch_cells:
+                out_queue.put((_MSG_BATCH, sheet_name, cells, formulas, first and replace_sheet))
+                first = False
+                cells_count += len(cells)
+                formulas_count += len(formulas)
+                cells, formulas = [], []
+        out_queue.put((_MSG_BATCH, sheet_name, cells, formulas, first and replace_sheet))
+        return cells_count + len(cells), formulas_count + len(formulas)
+
+    try:
+        try:
+            counts = run(_iter_sheet(file_path, sheet_name), replace_sheet=False)
+        except UnsupportedXlsxFeature:
+            # Уже отправленные пакеты перезаписываются: ячейки - INSERT OR REPLACE,
+            # формулы листа очищаются первым пакетом запасного разбора
+            counts = run(iter_sheet_cells_openpyxl(file_path, sheet_name), replace_sheet=True)
+        out_queue.put((_MSG_DONE, sheet_name, counts[0], counts[1]))
+        return sheet_name, counts[0], counts[1]
+    except Exception as e:
+        out_queue.put((_MSG_ERROR, sheet_name, f"{type(e).__name__}: {e}"))
+        raise
+
+
+def _sheet_weights(file_path: str, sheet_names: List[str]) -> Dict[str, int]:
+    """Вес листа для прогресса - несжатый размер его XML (1, если определить не удалось)."""
+    weights = {name: 1 for name in sheet_names}
+    try:
+        with FastXlsxReader(file_path) as reader:
+            for name in sheet_names:
+                weights[name] = max(1, reader.sheet_xml_size(name))
+    except (UnsupportedXlsxFeature, KeyError):
+        pass
+    return weights
+
+
+def _drain_until_done(futures, out_queue):
+    """
+    Отменяет ожидающие задачи и вычитывает очередь, пока процессы не завершатся:
+    процесс, заблокированный на put() в заполненную очередь, иначе не завершится никогда.
+    """
+    for future in futures:
+        future.cancel()
+    while not all(future.done() for future in futures):
+        try:
+            out_queue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+
+
+def _write_from_queue(
+    storage: ProjectDBStorage,
+    out_queue,
+    futures: Dict[Any, str],
+    pending: set,
+    sheet_ids: Dict[str, int],
+    weights: Dict[str, int],
+    import_formulas: bool,
+    reporter: ProgressReporter
+) -> Optional[Tuple[int, int]]:
+    """
+    Цикл единственного писателя: забирает пакеты из очереди и пишет их в хранилище,
+    пока все листы из pending не сообщат о завершении.
+
+    Returns:
+        Optional[Tuple[int, int]]: (число значений, число формул) или None при ошибке.
+    """
+    total_sheets = len(pending)
+    cells_total = formulas_total = 0
+
+    while pending:
+        try:
+            message = out_queue.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            # Процесс мог завершиться аварийно, не отправив сообщение
+            for future, name in futures.items():
+                if name in pending and future.done() and future.exception() is not None:
+                    logger.error(f"Разбор листа '{name}' завершился с ошибкой: {future.exception()}")
+                    return None
+            continue
+
+        kind, sheet_name = message[0], message[1]
+        sheet_id = sheet_ids[sheet_name]
+        if kind == _MSG_BATCH:
+            _, _, cells, formulas, replace_formulas = message
+            if replace_formulas and import_formulas and not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                logger.error(f"Не удалось очистить формулы листа '{sheet_name}'.")
+                return None
+            if cells and not storage.save_sheet_cells(sheet_id, cells):
+                logger.error(f"Не удалось сохранить ячейки листа '{sheet_name}'.")
+                return None
+            if formulas and not storage.save_sheet_formulas(sheet_id, formulas, replace=False):
+                logger.error(f"Не удалось сохранить формулы листа '{sheet_name}'.")
+                return None
+            cells_total += len(cells)
+            formulas_total += len(formulas)
+            reporter.advance(cells=len(cells), message=f"Лист '{sheet_name}': записано ячеек всего {cells_total}")
+        elif kind == _MSG_DONE:
+            pending.discard(sheet_name)
+            logger.info(f"Лист '{sheet_name}' импортирован: {message[2]} значений, {message[3]} формул.")
+            # Процент - по размеру XML завершённых листов
+            reporter.advance(
+                bytes_count=weights[sheet_name],
+                message=f"Лист '{sheet_name}' импортирован ({total_sheets - len(pending)}/{total_sheets})",
+                force=True,
+            )
+        elif kind == _MSG_ERROR:
+            logger.error(f"Ошибка разбора листа '{sheet_name}': {message[2]}")
+            return None
+
+    return cells_total, formulas_total
+
+
+def import_sheets_in_parallel(
+    storage: ProjectDBStorage,
+    file_path: str,
+    options: Optional[Dict[str, Any]] = None,
+    progress_callback: Optional[Callable[[int, str], None]] = None
+) -> bool:
+    """
+    Импортирует значения и формулы листов, разбирая листы параллельно в пуле процессов.
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта.
+        file_path (str): Путь к .xlsx/.xlsm файлу.
+        options (Optional[Dict[str, Any]]): Опции импорта.
+            {
+                'sheets': List[str],      # Список имён листов. Если пуст, все.
+                'max_workers': int,       # Число процессов (по умолчанию - число ядер, не больше числа листов)
+                'batch_cells': int,       # Размер пакета в ячейках (по умолчанию 20000)
+                'queue_size': int,        # Ёмкость очереди в пакетах (по умолчанию 8)
+                'values_only': bool       # Значением ячейки с формулой служит результат, формулы не импортируются
+            }
+        progress_callback (Optional[Callable[[int, str], None]]): Прогресс (процент, сообщение),
+            суммарный по всем процессам; обновления по пакетам ограничены по частоте (ProgressReporter).
+
+    Returns:
+        bool: True, если импорт прошёл успешно, иначе False.
+    """
+    if not storage:
+        logger.error("Экземпляр ProjectDBStorage не предоставлен. Невозможно выполнить импорт.")
+        return False
+
+    if not os.path.exists(file_path):
+        logger.error(f"Excel-файл для импорта не найден: {file_path}")
+        return False
+
+    options = options or {}
+    values_only = bool(options.get('values_only', False))
+    value_source = 'cached' if values_only else 'formula'
+    import_formulas = not values_only
+    batch_cells = int(options.get('batch_cells') or DEFAULT_BATCH_CELLS)
+    queue_size = int(options.get('queue_size') or DEFAULT_QUEUE_SIZE)
+
+    try:
+        with FastXlsxReader(file_path) as reader:
+            all_sheets = reader.sheetnames
+    except UnsupportedXlsxFeature as e:
+        logger.error(f"Параллельный импорт недоступен для '{file_path}': {e}")
+        return False
+
+    sheets_to_import = [str(name) for name in options.get('sheets', [])] or all_sheets
+    missing = [name for name in sheets_to_import if name not in all_sheets]
+    for name in missing:
+        logger.warning(f"Лист '{name}' не найден в файле '{file_path}'. Пропущен.")
+    sheets_to_import = [name for name in sheets_to_import if name not in missing]
+    if not sheets_to_import:
+        logger.info("Нет листов для параллельного импорта.")
+        return True
+
+    max_workers = int(options.get('max_workers') or os.cpu_count() or 1)
+    max_workers = max(1, min(max_workers, len(sheets_to_import)))
+    weights = _sheet_weights(file_path, sheets_to_import)
+
+    reporter = ProgressReporter(progress_callback, job="parallel")
+    reporter.stage("Параллельный импорт", total_bytes=sum(weights.values()))
+
+    logger.info(f"Параллельный импорт '{file_path}': {len(sheets_to_import)} листов, процессов: {max_workers}.")
+    started = time.perf_counter()
+
+    # (импорт здесь: рабочие процессы импортируют этот модуль и не должны тянуть импортёр openpyxl)
+    from backend.core.app_controller_data_import import _ImportFailed
+
+    # Ошибка записи прерывает сессию исключением: частично записанное откатывается, а не фиксируется
+    try:
+        with storage.bulk_session():
+            # Записи листов создаются заранее в порядке книги: ID не зависят от порядка завершения процессов
+            sheet_ids: Dict[str, int] = {}
+            for sheet_name in sheets_to_import:
+                sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet_name)
+                if sheet_id is None:
+                    logger.error(f"Не удалось создать/получить ID для листа '{sheet_name}'.")
+                    raise _ImportFailed()
+                sheet_ids[sheet_name] = sheet_id
+                if import_formulas and not storage.save_sheet_formulas(sheet_id, [], replace=True):
+                    logger.error(f"Не удалось очистить формулы листа '{sheet_name}' перед импортом.")
+                    raise _ImportFailed()
+
+            with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=max_workers) as executor:
+                out_queue = manager.Queue(maxsize=queue_size)
+                futures = {
+                    executor.submit(parse_sheet_worker, file_path, name, value_source, import_formulas, batch_cells, out_queue): name
+                    for name in sheets_to_import
+                }
+                pending = set(sheets_to_import)
+                try:
+                    totals = _write_from_queue(storage, out_queue, futures, pending, sheet_ids, weights, import_formulas, reporter)
+                finally:
+                    if pending:
+                        _drain_until_done(futures, out_queue)
+                if totals is None:
+                    raise _ImportFailed()
+    except _ImportFailed:
+        return False
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Параллельный импорт завершён за {elapsed:.1f} с: {totals[0]} значений, {totals[1]} формул.")
+    reporter.finish(True, "Импорт завершён")
+    return True
+
+# Дополнительные функции параллельного импорта (если потребуются) могут быть добавлены здесь
@@ -307,7 +307,13 @@ class ProjectManager:
                 return False
 
             storage = ProjectDBStorage(str(db_path))
-            if not storage.connect():
+            # Приводим схему БД к актуальной версии (новые таблицы, перенос устаревших raw_data_*)
+            if not storage.initialize_project_tables():
+                logger.error(f"Не удалось обновить схему БД проекта: {db_path}")
+                return False
+            # Соединения берутся из пула по потокам (чтение - свои для каждого потока,
+            # запись - через один сериализованный писатель), явный connect() не нужен
+            if not storage.check_connection():
                 logger.error(f"Не удалось подключиться к БД проекта: {db_path}")
                 return False
 
@@ -407,7 +413,7 @@ class ProjectManager:
                     storage.disconnect()
                     return False
 
-                required_tables = ['projects', 'sheets', 'formulas', 'sheet_styles', 'sheet_charts', 'edit_history']
+                required_tables = ['projects', 'sheets', 'cells', 'formulas', 'styles', 'sheet_styles', 'sheet_charts', 'edit_history']
                 if cursor:  # Дополнительная проверка на None для Pylance
                     for table_name in required_tables:
                         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (table_name,))
@@ -449,6 +455,7 @@ class ProjectManager:
         if self.app_controller.storage:
             try:
                 self.app_controller.storage.disconnect()
+                self.app_controller.storage.close_pool()
                 logger.debug("Соединение с БД проекта закрыто.")
             except Exception as e:
                 logger.error(f"Ошибка при закрытии соединения с БД проекта: {e}")
@@ -6,14 +6,18 @@
 import logging
 import json
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Union, Callable # <-- Добавлен Callable
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union, Callable # <-- Добавлен Callable
 
 import xlsxwriter # Импортируем xlsxwriter
-import datetime # Импортируем datetime для проверки типов и парсинга
+import datetime # Импортируем datetime для проверки типов
 
 # Импортируем ProjectDBStorage для взаимодействия с БД
 # ИСПРАВЛЕНО: Импорт теперь из backend.storage
 from backend.storage.base import ProjectDBStorage # <-- ИСПРАВЛЕНО: было from storage.base
+from backend.storage.profiles import resolve_profile_name
+from backend.storage.cell_values import format_cell_value_for_display
+from backend.utils.range_map import RangeMap
+from backend.utils.progress import ProgressReporter
 
 # Импортируем вспомогательные функции для конвертации стилей
 # ИСПРАВЛЕНО: Импорт теперь из backend.exporter.excel.style_handlers
@@ -26,32 +30,8 @@ from backend.exporter.excel.style_handlers.db_style_converter import json_style_
 # ИСПРАВЛЕНО: Импорт logger теперь из logging
 logger = logging.getLogger(__name__) # <-- ИСПРАВЛЕНО: было logger = logging.getLogger(__name__)
 
-
-def _parse_datetime_string(dt_str: str) -> Union[datetime.datetime, datetime.date, datetime.time, str]:
-    """
-    Пытается распознать строку как datetime, date или time.
-    Возвращает соответствующий объект или исходную строку, если не удалось распознать.
-    """
-    # Паттерны для распознавания
-    dt_patterns = [
-        "%Y-%m-%d %H:%M:%S",  # 2024-01-15 00:00:00
-        "%Y-%m-%d",           # 2024-01-15
-        "%H:%M:%S",           # 00:00:00
-        # Можно добавить больше паттернов при необходимости
-    ]
-    for pattern in dt_patterns:
-        try:
-            parsed = datetime.datetime.strptime(dt_str, pattern)
-            if pattern == "%Y-%m-%d %H:%M:%S":
-                return parsed
-            elif pattern == "%Y-%m-%d":
-                return parsed.date() # Возвращаем date
-            elif pattern == "%H:%M:%S":
-                return parsed.time() # Возвращаем time
-        except ValueError:
-            continue
-    # Если не распознано, возвращаем строку
-    return dt_str
+# Сколько строк листа читать из БД за один запрос при экспорте
+EXPORT_CHUNK_ROWS = 10_000
 
 
 def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Union[str, Path], progress_callback: Optional[Callable[[int, str], None]] = None) -> bool: # <-- ИЗМЕНЕНА СИГНАТУРА
@@ -80,8 +60,8 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
     logger.info("Подключение к БД проекта...")
     try:
         # ИСПРАВЛЕНО: Создание экземпляра ProjectDBStorage теперь с префиксом backend.storage
-        storage = ProjectDBStorage(str(project_db_path)) # <-- ИСПРАВЛЕНО
-        if not storage.connect():
+        storage = ProjectDBStorage(str(project_db_path), profile=resolve_profile_name(purpose="export")) # Профиль экспорта из settings.yaml
+        if not storage.check_connection():
             logger.error("Не удалось подключиться к БД проекта.")
             return False
     except Exception as e:
@@ -101,12 +81,13 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
         workbook = xlsxwriter.Workbook(str(output_path), workbook_options)
     except Exception as e:
         logger.error(f"Ошибка при создании книги xlsxwriter: {e}")
-        storage.disconnect() # Закрываем соединение при ошибке
+        storage.release_thread_connections() # Освобождаем соединение потока при ошибке
         return False
 
     success = False
     total_sheets = 0 # <-- НОВАЯ ПЕРЕМЕННАЯ
     processed_sheets = 0 # <-- НОВАЯ ПЕРЕМЕННАЯ
+    reporter = ProgressReporter(progress_callback, job="export")
     try:
         # 3. Получение списка листов из БД
         logger.debug("Получение списка листов из БД...")
@@ -116,16 +97,20 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
         if not sheets_data:
             logger.warning("В проекте не найдено листов. Создается пустой файл.")
             workbook.add_worksheet("EmptySheet")
-            # Обновляем прогресс, если callback предоставлен
-            if progress_callback:
-                progress_callback(100, "Экспорт завершён (пустой файл).") # <-- ВЫЗОВ CALLBACK
+            reporter.finish(True, "Экспорт завершён (пустой файл).")
         else:
             logger.info(f"Найдено {total_sheets} листов для экспорта.")
+            # Словарь стилей общий для проекта: формат xlsxwriter создаётся один раз на style_id
+            format_cache: Dict[Any, Any] = {}
             # 4. Итерация по листам и их экспорт
             for sheet_info in sheets_data:
                 sheet_id = sheet_info['sheet_id']
                 sheet_name = sheet_info['name']
                 logger.info(f"Экспорт листа: '{sheet_name}' (ID: {sheet_id})")
+                reporter.stage(
+                    f"Экспорт листа '{sheet_name}' ({processed_sheets + 1} из {total_sheets})",
+                    percent_range=(processed_sheets / total_sheets * 100, (processed_sheets + 1) / total_sheets * 100),
+                )
 
                 # 4a. Создание листа в xlsxwriter
                 worksheet = workbook.add_worksheet(sheet_name)
@@ -133,19 +118,20 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
                 # 4b. Загрузка данных для листа
                 # Предполагаем, что storage предоставляет методы для загрузки данных
                 # ИСПРАВЛЕНО: Вызовы методов storage теперь с префиксом backend.storage
-                raw_data = storage.load_sheet_raw_data(sheet_name) # Возвращает список {'cell_address': ..., 'value': ..., 'value_type': ...} # <-- ИСПРАВЛЕНО
+                # Значения ячеек читаются блоками строк по мере записи (см. _iter_sheet_cells), а не целым листом
+                cells = _iter_sheet_cells(storage, sheet_id)
                 formulas = storage.load_sheet_formulas(sheet_id) # Возвращает список {'cell_address': ..., 'formula': ...} # <-- ИСПРАВЛЕНО
-                styles = storage.load_sheet_styles(sheet_id) # Возвращает список {'range_address': ..., 'style_attributes': ...} # <-- ИСПРАВЛЕНО
+                styles = storage.load_sheet_style_refs(sheet_id) # Возвращает {'styles': {style_id: JSON}, 'ranges': [(range_address, style_id), ...]}
                 merged_cells = storage.load_sheet_merged_cells(sheet_id) # Возвращает список ['A1:B2', ...] # <-- ИСПРАВЛЕНО
                 logger.debug(f"[ЭКСПОРТ] Загружены объединённые ячейки для листа '{sheet_name}' (ID: {sheet_id}): {merged_cells}")
 
                 # 4c. Подготовка стилей (создание карты форматов)
                 # ИСПРАВЛЕНО: Вызов build_cell_format_map теперь с префиксом backend.exporter.excel
-                cell_format_map = build_cell_format_map(workbook, styles) # <-- ИСПРАВЛЕНО
+                cell_format_map = build_cell_format_map(workbook, styles, format_cache) # <-- ИСПРАВЛЕНО
 
                 # 4d. Запись данных и формул с применением стилей
                 # ИСПРАВЛЕНО: Вызов _write_data_and_formulas теперь с префиксом backend.exporter.excel
-                written_cells = _write_data_and_formulas(worksheet, raw_data, formulas, cell_format_map) # <-- ИСПРАВЛЕНО
+                written_cells = _write_data_and_formulas(worksheet, cells, formulas, cell_format_map) # <-- ИСПРАВЛЕНО
 
                 # 4e. Применение стилей к пустым ячейкам, у которых есть стиль в cell_format_map
                 for (r, c), cell_format in cell_format_map.items():
@@ -165,11 +151,7 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
                 _export_charts_for_sheet(workbook, worksheet, sheet_id, project_db_path) # <-- ИСПРАВЛЕНО
 
                 processed_sheets += 1 # <-- УВЕЛИЧИВАЕМ СЧЁТЧИК
-                # --- НОВОЕ: Обновление прогресса ---
-                if progress_callback and total_sheets > 0: # <-- ПРОВЕРЯЕМ CALLBACK И total_sheets
-                    progress_percent = int((processed_sheets / total_sheets) * 100)
-                    progress_callback(progress_percent, f"Обработан лист {processed_sheets} из {total_sheets}...") # <-- ВЫЗОВ CALLBACK
-                # --- КОНЕЦ НОВОГО ---
+                reporter.advance(cells=len(written_cells), message=f"Обработан лист {processed_sheets} из {total_sheets}...")
 
                 # 4h. (Опционально) Обработка других элементов (диаграмм, изображений и т.д.)
                 # ...
@@ -179,27 +161,19 @@ def export_project_xlsxwriter(project_db_path: Union[str, Path], output_path: Un
         workbook.close()
         logger.info(f"Файл успешно сохранен: {output_path}")
         success = True
-        # --- НОВОЕ: Обновление прогресса при завершении ---
-        if progress_callback and total_sheets > 0: # <-- ПРОВЕРЯЕМ CALLBACK И total_sheets, хотя это может быть избыточно, если total_sheets == 0, то мы уже вызвали progress_callback выше для пустого файла
-             # Убедимся, что прогресс 100%, если он не достигнут
-             if processed_sheets == 0: # Для случая, если не было листов, но файл создан
-                 progress_callback(100, "Экспорт завершён.")
-             # В остальных случаях прогресс уже должен быть 100% при последнем вызове в цикле
-        elif progress_callback: # <-- Если total_sheets == 0 и callback предоставлен, но файл был пустой, он уже вызван выше
-             # В случае ошибки, можно отправить 100% или специальное сообщение, но обычно это делается в except/finally
-             pass # Оставим это на усмотрение вызывающего кода или finally
-        # --- КОНЕЦ НОВОГО ---
+        if total_sheets > 0: # Для пустого файла завершение уже отправлено выше
+            reporter.finish(True, "Экспорт завершён.")
 
     except Exception as e:
         logger.error(f"Критическая ошибка при экспорте проекта: {e}", exc_info=True)
         # workbook.close() вызывается автоматически при выходе из блока try/except,
         # если он был открыт, но xlsxwriter может не сохранить файл при ошибке.
-        # Важно, чтобы storage.disconnect() вызывался в finally.
+        # Важно, чтобы storage.release_thread_connections() вызывался в finally.
 
     finally:
-        # 6. Закрытие соединения с БД
-        logger.info("Закрытие соединения с БД проекта.")
-        storage.disconnect()
+        # 6. Освобождение соединения потока из пула
+        logger.info("Освобождение соединения с БД проекта.")
+        storage.release_thread_connections()
 
     return success
 
@@ -223,46 +197,60 @@ def _write_value_with_format(worksheet, row: int, col: int, value: Any, cell_for
         worksheet.write(row, col, value, cell_format)
 
 
-def _write_data_and_formulas(worksheet, raw_data: List[Dict[str, Any]], formulas: List[Dict[str, Any]], cell_format_map: Dict[tuple[int, int], Any]) -> set[tuple[int, int]]:
+def _iter_sheet_cells(storage: ProjectDBStorage, sheet_id: int, chunk_rows: Optional[int] = None) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Перебирает значения ячеек листа блоками по chunk_rows строк.
+    Каждый блок читается отдельным запросом по первичному ключу, поэтому в памяти
+    одновременно находится только один блок, а не весь лист.
+
+    Args:
+        storage (ProjectDBStorage): Хранилище проекта.
+        sheet_id (int): ID листа в БД.
+        chunk_rows (Optional[int]): Количество строк в одном блоке. По умолчанию EXPORT_CHUNK_ROWS.
+
+    Yields:
+        Tuple[int, int, Any]: (row, col, value), row и col 1-based.
+    """
+    extent = storage.get_cells_extent(sheet_id)
+    if not extent:
+        return
+    max_row = extent[0]
+    chunk_rows = chunk_rows or EXPORT_CHUNK_ROWS
+    for row0 in range(1, max_row + 1, chunk_rows):
+        yield from storage.load_cells(sheet_id, row0=row0, row1=row0 + chunk_rows - 1, columns=("row", "col", "value"))
+
+
+def _write_data_and_formulas(worksheet, cells, formulas: List[Dict[str, Any]], cell_format_map: RangeMap) -> set[tuple[int, int]]:
     """
     Записывает данные и формулы на лист xlsxwriter, применяя стили из cell_format_map.
     Возвращает множество координат (row, col), в которые что-то было записано.
 
     Args:
         worksheet: Объект листа xlsxwriter.
-        raw_data (List[Dict[str, Any]]): Список данных.
+        cells (Iterable[Tuple[int, int, Any]]): Значения ячеек (row, col, value), row и col 1-based.
         formulas (List[Dict[str, Any]]): Список формул.
-        cell_format_map (Dict[tuple[int, int], Any]): Словарь сопоставления (row, col) -> xlsxwriter.format.
+        cell_format_map (RangeMap): Карта сопоставления (row, col) -> xlsxwriter.format.
 
     Returns:
         set[tuple[int, int]]: Множество координат (row, col), в которые были записаны данные или формулы.
     """
-    logger.debug(f"Запись {len(raw_data)} записей данных и {len(formulas)} формул на лист с применением стилей.")
     written_cells = set()
     # Запись "сырых" данных
-    for item in raw_data:
-        address = item['cell_address'] # e.g., 'A1'
-        value = item['value']
-        value_type = item.get('value_type') # Получаем тип значения, если он есть
-        # xlsxwriter требует номера строки/столбца, преобразуем адрес
+    for row, col, value in cells:
+        # xlsxwriter использует номера строки/столбца с нуля
+        row, col = row - 1, col - 1
         try:
-            row, col = _xl_cell_to_row_col(address)
-            # Проверяем, нужно ли преобразовать строку в datetime-объект
-            parsed_value = value
-            if isinstance(value, str) and value_type in ['datetime', 'date', 'time']:
-                parsed_value = _parse_datetime_string(value)
-                # Если _parse_datetime_string не смог распознать, он вернёт строку
-                # В этом случае, если value_type был определён, но строка не распознана, можно логировать
-                if isinstance(parsed_value, str) and value_type in ['datetime', 'date', 'time']:
-                    logger.warning(f"[ЭКСПОРТ] Не удалось распознать строку '{value}' как {value_type} для ячейки {address}.")
+            # Значения приходят из БД уже в родных типах (datetime, bool, числа),
+            # поэтому повторный разбор строк дат не нужен
 
             # Проверяем, есть ли формат для этой ячейки
             cell_format = cell_format_map.get((row, col))
             # Используем новую вспомогательную функцию
-            _write_value_with_format(worksheet, row, col, parsed_value, cell_format)
+            _write_value_with_format(worksheet, row, col, value, cell_format)
             written_cells.add((row, col))
         except Exception as e:
-            logger.warning(f"Не удалось записать данные в ячейку {address}: {e}")
+            logger.warning(f"Не удалось записать данные в ячейку ({row + 1}, {col + 1}): {e}")
+    logger.debug(f"Записано {len(written_cells)} ячеек данных и {len(formulas)} формул на лист с применением стилей.")
 
     # Запись формул
     for item in formulas:
@@ -282,56 +270,61 @@ def _write_data_and_formulas(worksheet, raw_data: List[Dict[str, Any]], formulas
     return written_cells
 
 
-def build_cell_format_map(workbook, styles: List[Dict[str, Any]]) -> Dict[tuple[int, int], Any]:
+def build_cell_format_map(workbook, styles: Union[Dict[str, Any], List[Dict[str, Any]]], format_cache: Optional[Dict[Any, Any]] = None) -> RangeMap:
     """
-    Создает словарь, сопоставляющий координаты ячеек (row, col) с форматами xlsxwriter.
+    Создает карту, сопоставляющую координаты ячеек (row, col) с форматами xlsxwriter.
     Это позволяет применять стили одновременно с записью данных/формул.
+    Формат xlsxwriter создаётся один раз на каждый уникальный стиль, а не на каждый диапазон.
+    Диапазоны не разворачиваются по ячейкам: карта хранит прямоугольники (см. RangeMap).
 
     Args:
         workbook: Объект книги xlsxwriter (для создания форматов).
-        styles (List[Dict[str, Any]]): Список стилей из БД.
+        styles (Union[Dict[str, Any], List[Dict[str, Any]]]): Стили из БД - результат
+            load_sheet_style_refs() ({'styles': {style_id: JSON}, 'ranges': [(range_address, style_id)]})
+            или список {'range_address', 'style_attributes'} из load_sheet_styles().
+        format_cache (Optional[Dict[Any, Any]]): Общий для книги кэш style_id -> формат,
+            чтобы одинаковые стили разных листов не создавали повторные форматы.
 
     Returns:
-        Dict[tuple[int, int], Any]: Словарь, где ключ - (row, col), значение - объект формата xlsxwriter.
+        RangeMap: Карта с интерфейсом чтения словаря: get((row, col)) -> объект формата xlsxwriter.
     """
-    logger.debug(f"Создание карты форматов ячеек для {len(styles)} стилей.")
-    cell_format_map: Dict[tuple[int, int], Any] = {}
-
-    for style_item in styles:
-        range_addr = style_item['range_address'] # e.g., 'A1:B10'
-        style_json_str = style_item['style_attributes']
-
+    if isinstance(styles, dict):
+        style_defs = styles.get('styles', {})
+        style_ranges = styles.get('ranges', [])
+    else:
+        # Старый формат: атрибуты в каждой записи, ключом стиля служит сам JSON
+        style_defs = {item['style_attributes']: item['style_attributes'] for item in styles}
+        style_ranges = [(item['range_address'], item['style_attributes']) for item in styles]
+        format_cache = None  # ключи-JSON несовместимы с кэшем по style_id
+
+    logger.debug(f"Создание карты форматов ячеек для {len(style_ranges)} диапазонов и {len(style_defs)} уникальных стилей.")
+    # Если ячейка попадает в несколько диапазонов, xlsxwriter использует первый применённый формат.
+    # Для MVP/простоты принимаем первый встреченный стиль для ячейки.
+    cell_format_map = RangeMap(prefer_last=False)
+    formats: Dict[Any, Any] = format_cache if format_cache is not None else {}
+
+    for range_addr, style_key in style_ranges:
         try:
-            # 1. Конвертируем JSON-стиль в формат xlsxwriter
-            # ИСПРАВЛЕНО: Вызов json_style_to_xlsxwriter_format теперь с префиксом backend.exporter.excel.style_handlers
-            xlsxwriter_format_dict = json_style_to_xlsxwriter_format(style_json_str) # <-- ИСПРАВЛЕНО
-            if not xlsxwriter_format_dict:
+            # 1-2. Конвертируем JSON-стиль в формат xlsxwriter - один раз на стиль
+            if style_key not in formats:
+                # ИСПРАВЛЕНО: Вызов json_style_to_xlsxwriter_format теперь с префиксом backend.exporter.excel.style_handlers
+                xlsxwriter_format_dict = json_style_to_xlsxwriter_format(style_defs.get(style_key, '{}')) # <-- ИСПРАВЛЕНО
+                formats[style_key] = workbook.add_format(xlsxwriter_format_dict) if xlsxwriter_format_dict else None
+            cell_format = formats[style_key]
+            if cell_format is None:
                 logger.debug(f"Для стиля {range_addr} не определено атрибутов для xlsxwriter, пропуск.")
                 continue
 
-            # 2. Создаём формат xlsxwriter
-            cell_format = workbook.add_format(xlsxwriter_format_dict)
-
-            # 3. Заполняем карту форматов для каждой ячейки в диапазоне
+            # 3. Добавляем диапазон в карту форматов целиком
             row_start, col_start, row_end, col_end = _xl_range_to_coords(range_addr)
-            
-            for r in range(row_start, row_end + 1):
-                for c in range(col_start, col_end + 1):
-                    # Если ячейка уже имеет формат, xlsxwriter использует первый применённый формат.
-                    # В реальных сценариях диапазоны могут пересекаться, и нужно решать, какой стиль приоритетнее.
-                    # Для MVP/простоты принимаем первый встреченный стиль для ячейки.
-                    if (r, c) not in cell_format_map:
-                        cell_format_map[(r, c)] = cell_format
-                    else:
-                        # Логируем, если стили пересекаются, чтобы было видно в отладке
-                        logger.debug(f"Ячейка ({r}, {c}) уже имеет формат. Второй стиль из диапазона {range_addr} игнорируется.")
+            cell_format_map.add(row_start, col_start, row_end, col_end, cell_format)
 
         except json.JSONDecodeError as je:
             logger.error(f"Ошибка разбора JSON стиля для диапазона {range_addr}: {je}")
         except Exception as e:
             logger.error(f"Ошибка при создании карты форматов для диапазона {range_addr}: {e}", exc_info=True)
     
-    logger.debug(f"Создана карта форматов для {len(cell_format_map)} ячеек.")
+    logger.debug(f"Создана карта форматов: {len(cell_format_map)} диапазонов, {cell_format_map.cell_count()} ячеек.")
     return cell_format_map
 
 
@@ -421,8 +414,8 @@ def _export_charts_for_sheet(workbook, worksheet, sheet_id: int, project_db_path
     
     # 1. Подключаемся к БД проекта для загрузки диаграмм
     # ИСПРАВЛЕНО: Создание экземпляра ProjectDBStorage теперь с префиксом backend.storage
-    storage = ProjectDBStorage(str(project_db_path)) # <-- ИСПРАВЛЕНО
-    if not storage.connect():
+    storage = ProjectDBStorage(str(project_db_path), profile=resolve_profile_name(purpose="export")) # Профиль экспорта из settings.yaml
+    if not storage.check_connection():
         logger.error(f"[ДИАГРАММА] Не удалось подключиться к БД проекта для загрузки диаграмм листа ID {sheet_id}.")
         return
     
@@ -434,7 +427,6 @@ def _export_charts_for_sheet(workbook, worksheet, sheet_id: int, project_db_path
         
         if not charts_data:
             logger.info(f"[ДИАГРАММА] Нет диаграмм для экспорта на листе ID {sheet_id}.")
-            storage.disconnect()
             return
         
         # 3. Итерация по диаграммам и их экспорт
@@ -611,15 +603,11 @@ def _export_charts_for_sheet(workbook, worksheet, sheet_id: int, project_db_path
             except Exception as e_inner:
                 logger.error(f"[ДИАГРАММА] Ошибка при обработке одной из диаграмм для листа ID {sheet_id}: {e_inner}", exc_info=True)
         
-        # 10. Закрываем соединение с БД
-        storage.disconnect()
+        # 10. Соединение потока остаётся в пуле и переиспользуется для следующих листов
         logger.info(f"[ДИАГРАММА] Экспорт диаграмм для листа ID {sheet_id} завершен.")
         
     except Exception as e_outer:
         logger.error(f"[ДИАГРАММА] Критическая ошибка при экспорте диаграмм для листа ID {sheet_id}: {e_outer}", exc_info=True)
-        # Пытаемся закрыть соединение, если оно было открыто
-        if storage:
-            storage.disconnect()
 
 def _apply_merged_cells(worksheet, merged_ranges: List[str]):
     """
@@ -730,19 +718,18 @@ def _extract_single_value_from_ref(db_path: Union[str, Path], ref: str) -> Optio
         
         # Загружаем данные листа из БД
         # ИСПРАВЛЕНО: Создание экземпляра ProjectDBStorage теперь с префиксом backend.storage
-        storage = ProjectDBStorage(str(db_path)) # <-- ИСПРАВЛЕНО
-        if not storage.connect():
+        storage = ProjectDBStorage(str(db_path), profile=resolve_profile_name(purpose="export")) # Профиль экспорта из settings.yaml
+        if not storage.check_connection():
             logger.error(f"[ДИАГРАММА] Не удалось подключиться к БД для извлечения значения из ссылки: {ref}")
             return None
         
         # ИСПРАВЛЕНО: Вызов метода storage.load_sheet_raw_data теперь с префиксом backend.storage
         raw_data = storage.load_sheet_raw_data(sheet_name) # <-- ИСПРАВЛЕНО
-        storage.disconnect()
         
         # Ищем значение по адресу ячейки
         for item in raw_data:
             if item.get('cell_address') == cell_address:
-                return str(item.get('value', ''))
+                return format_cell_value_for_display(item.get('value'))
                 
         logger.warning(f"[ДИАГРАММА] Ячейка {cell_address} не найдена на листе {sheet_name} для ссылки: {ref}")
         return None
@@ -0,0 +1,387 @@
+# backend/importer/workbook_probe.py
+"""
+Быстрый осмотр книги .xlsx/.xlsm без её загрузки.
+
+probe_workbook() читает из ZIP-пакета только оглавление, xl/workbook.xml со связями,
+начало XML каждого листа (до тега <dimension>) и заголовки sharedStrings.xml/styles.xml.
+Ни openpyxl, ни Excel не запускаются, поэтому осмотр занимает миллисекунды даже для
+книг в сотни мегабайт - его можно вызывать перед диалогом выбора листов или
+перед выбором способа импорта.
+
+Результат - WorkbookProbe: имена листов, их диапазоны и оценка числа ячеек,
+число общих строк и стилей, признаки сводных таблиц, диаграмм, макросов и т.п.
+Дополнительно по первым SAMPLE_BYTES байтам данных листа оценивается доля
+ячеек с формулами и со стилями (выборка, а не точный подсчёт).
+
+Пример:
+    probe = probe_workbook(path)
+    if probe:
+        print(probe.sheetnames, probe.total_estimated_cells, probe.has_pivots)
+"""
+
+import logging
+import os
+import posixpath
+import re
+import time
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from lxml import etree as _etree
+except ImportError:  # lxml - необязательная зависимость
+    import xml.etree.ElementTree as _etree
+
+from openpyxl.utils.cell import range_boundaries
+
+from backend.importer.xlsx_fast_reader import _NS_MAIN, _NS_PKG_REL, _NS_REL, SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+_SST_TAG = f"{{{_NS_MAIN}}}sst"
+_CELL_XFS_TAG = f"{{{_NS_MAIN}}}cellXfs"
+
+_REL_TYPE_DRAWING = "/drawing"
+_REL_TYPE_CHART = "/chart"
+_REL_TYPE_PIVOT = "/pivotTable"
+_REL_TYPE_TABLE = "/table"
+
+# Сколько несжатых байт данных листа просматривается для выборки формул и стилей
+SAMPLE_BYTES = 256 * 1024
+# Средний размер XML одной ячейки (<c r="B12" s="3"><v>123</v></c>) для оценки без <dimension>
+_XML_BYTES_PER_CELL = 30
+# Блок чтения начала XML листа в поисках <dimension>
+_HEAD_READ_BYTES = 16 * 1024
+# Блок распаковки XML листа при поиске объединённых ячеек
+_MERGE_SCAN_READ_BYTES = 1024 * 1024
+# Лист с <dimension> из одной ячейки и XML больше этого размера оценивается по размеру XML
+_SUSPECT_DIMENSION_XML_BYTES = 4 * 1024
+
+
+class SheetProbe:
+    """Сведения об одном листе, полученные без разбора его данных."""
+
+    def __init__(self, name: str, part_name: str, state: str = "visible"):
+        self.name = name
+        self.part_name = part_name
+        # visible / hidden / veryHidden
+        self.state = state
+        # Диапазон из <dimension ref="A1:T5000"> или None, если тега нет
+        self.dimension: Optional[str] = None
+        self.min_row = self.min_col = self.max_row = self.max_col = 0
+        # Несжатый и сжатый размер XML листа
+        self.xml_size = 0
+        self.compressed_size = 0
+        self.estimated_cells = 0
+        # Оценка по <dimension> (True) или по размеру XML (False)
+        self.dimension_reliable = False
+        self.charts = 0
+        self.pivot_tables = 0
+        self.tables = 0
+        self.has_drawing = False
+        # Выборка начала данных листа
+        self.sample_cells = 0
+        self.sample_formulas = 0
+        self.sample_styled = 0
+
+    @property
+    def formula_ratio(self) -> float:
+        """Доля ячеек с формулами в выборке."""
+        return self.sample_formulas / self.sample_cells if self.sample_cells else 0.0
+
+    @property
+    def style_ratio(self) -> float:
+        """Доля ячеек с нестандартным стилем (s != 0) в выборке."""
+        return self.sample_styled / self.sample_cells if self.sample_cells else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для API и логов."""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "dimension": self.dimension,
+            "max_row": self.max_row,
+            "max_col": self.max_col,
+            "estimated_cells": self.estimated_cells,
+            "dimension_reliable": self.dimension_reliable,
+            "xml_size": self.xml_size,
+            "charts": self.charts,
+            "pivot_tables": self.pivot_tables,
+            "tables": self.tables,
+            "formula_ratio": round(self.formula_ratio, 4),
+            "style_ratio": round(self.style_ratio, 4),
+        }
+
+
+class WorkbookProbe:
+    """Сводка по книге: листы, размеры и признаки содержимого."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        # Размер файла книги на диске, байт
+        self.file_size = 0
+        self.sheets: List[SheetProbe] = []
+        # Атрибуты uniqueCount/count таблицы общих строк
+        self.shared_strings_count = 0
+        self.shared_strings_refs = 0
+        self.shared_strings_xml_size = 0
+        # Число записей cellXfs в styles.xml
+        self.cell_styles_count = 0
+        self.has_pivots = False
+        self.has_charts = False
+        self.has_vba = False
+        self.has_external_links = False
+        self.has_calc_chain = False
+        self.elapsed_ms = 0.0
+
+    @property
+    def sheetnames(self) -> List[str]:
+        """Имена листов в порядке книги."""
+        return [sheet.name for sheet in self.sheets]
+
+    @property
+    def total_estimated_cells(self) -> int:
+        return sum(sheet.estimated_cells for sheet in self.sheets)
+
+    @property
+    def total_xml_size(self) -> int:
+        """Несжатый размер XML листов и общих строк (основа оценки памяти openpyxl)."""
+        return sum(sheet.xml_size for sheet in self.sheets) + self.shared_strings_xml_size
+
+    @property
+    def has_formulas(self) -> bool:
+        """Формулы найдены в выборке какого-либо листа или в книге есть calcChain.xml."""
+        return self.has_calc_chain or any(sheet.sample_formulas for sheet in self.sheets)
+
+    def sheet(self, name: str) -> Optional[SheetProbe]:
+        for sheet in self.sheets:
+            if sheet.name == name:
+                return sheet
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для API и логов."""
+        return {
+            "file_path": self.file_path,
+            "file_size": self.file_size,
+            "sheets": [sheet.to_dict() for sheet in self.sheets],
+            "total_estimated_cells": self.total_estimated_cells,
+            "shared_strings_count": self.shared_strings_count,
+            "cell_styles_count": self.cell_styles_count,
+            "has_pivots": self.has_pivots,
+            "has_charts": self.has_charts,
+            "has_vba": self.has_vba,
+            "has_external_links": self.has_external_links,
+            "has_formulas": self.has_formulas,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+    def summary(self) -> str:
+        """Однострочная сводка для лога."""
+        flags = [name for name, value in (
+            ("формулы", self.has_formulas), ("диаграммы", self.has_charts),
+            ("сводные", self.has_pivots), ("макросы", self.has_vba),
+        ) if value]
+        return (
+            f"Книга '{self.file_path}': {len(self.sheets)} листов, ~{self.total_estimated_cells} ячеек, "
+            f"{self.shared_strings_count} общих строк, {self.cell_styles_count} стилей"
+            f"{', ' + ', '.join(flags) if flags else ''} (осмотр {self.elapsed_ms:.1f} мс)."
+        )
+
+
+def _resolve_target(base_dir: str, target: str) -> str:
+    """Путь части по цели связи: абсолютный от корня пакета или относительно base_dir."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _rels_part(part_name: str) -> str:
+    """Имя части связей для части: xl/worksheets/sheet1.xml -> xl/worksheets/_rels/sheet1.xml.rels."""
+    directory, file_name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", f"{file_name}.rels")
+
+
+def _read_rels(archive: zipfile.ZipFile, part_name: str) -> List[Tuple[str, str]]:
+    """Список (тип, путь цели) связей части; пустой, если связей нет."""
+    try:
+        with archive.open(_rels_part(part_name)) as source:
+            root = _etree.parse(source).getroot()
+    except KeyError:
+        return []
+    base_dir = posixpath.dirname(part_name)
+    rels = []
+    for rel in root.iter(f"{{{_NS_PKG_REL}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        rels.append((rel.get("Type", ""), _resolve_target(base_dir, rel.get("Target", ""))))
+    return rels
+
+
+def _root_attributes(archive: zipfile.ZipFile, part_name: str, tag: str) -> Dict[str, str]:
+    """Атрибуты первого элемента tag части; разбирается только начало XML."""
+    try:
+        with archive.open(part_name) as source:
+            for _, element in _etree.iterparse(source, events=("start",)):
+                if element.tag == tag:
+                    return dict(element.attrib)
+    except KeyError:
+        pass
+    return {}
+
+
+def _read_sheet_head(archive: zipfile.ZipFile, sheet: SheetProbe):
+    """
+    Читает <dimension> и выборку данных листа из первых байт его XML.
+    Распаковывается не больше SAMPLE_BYTES (плюс заголовок листа).
+    """
+    with archive.open(sheet.part_name) as source:
+        head = b""
+        # Заголовок листа (sheetPr, dimension, sheetViews, cols) обычно укладывается в первый блок
+        while b"<sheetData" not in head and b":sheetData" not in head:
+            block = source.read(_HEAD_READ_BYTES)
+            if not block:
+                break
+            head += block
+        match = re.search(rb"<(?:\w+:)?dimension\s[^>]*?ref=\"([^\"]+)\"", head)
+        if match:
+            sheet.dimension = match.group(1).decode("ascii", "replace")
+        data_start = max(head.find(b"sheetData"), 0)
+        sample = head[data_start:]
+        if len(sample) < SAMPLE_BYTES:
+            sample += source.read(SAMPLE_BYTES - len(sample))
+    # bytes.count на порядок быстрее регулярных выражений; для оценки долей этого достаточно
+    sheet.sample_cells = sample.count(b"<c ") + sample.count(b"<c>")
+    sheet.sample_formulas = sample.count(b"<f>") + sample.count(b"<f ")
+    sheet.sample_styled = sample.count(b' s="') - sample.count(b' s="0"')
+
+
+def _estimate_cells(sheet: SheetProbe):
+    """Оценка числа ячеек листа по <dimension>, а без него - по размеру XML."""
+    size_estimate = sheet.xml_size // _XML_BYTES_PER_CELL
+    if sheet.dimension:
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(sheet.dimension)
+        except (ValueError, TypeError):
+            min_col = min_row = max_col = max_row = None
+        if max_row and max_col:
+            sheet.min_row, sheet.min_col = min_row or 1, min_col or 1
+            sheet.max_row, sheet.max_col = max_row, max_col
+            cells = (max_row - sheet.min_row + 1) * (max_col - sheet.min_col + 1)
+            # Некоторые генераторы пишут <dimension ref="A1"/> для любого листа:
+            # такому значению верим, только если XML листа действительно мал
+            if cells > 1 or sheet.xml_size <= _SUSPECT_DIMENSION_XML_BYTES:
+                sheet.estimated_cells = cells
+                sheet.dimension_reliable = True
+                return
+    sheet.estimated_cells = size_estimate
+
+
+def _probe_sheet_relations(archive: zipfile.ZipFile, sheet: SheetProbe):
+    """Диаграммы, сводные таблицы и таблицы листа по его связям (и связям рисунков)."""
+    for rel_type, target in _read_rels(archive, sheet.part_name):
+        if rel_type.endswith(_REL_TYPE_DRAWING):
+            sheet.has_drawing = True
+            sheet.charts += sum(
+                1 for drawing_type, _ in _read_rels(archive, target) if drawing_type.endswith(_REL_TYPE_CHART)
+            )
+        elif rel_type.endswith(_REL_TYPE_PIVOT):
+            sheet.pivot_tables += 1
+        elif rel_type.endswith(_REL_TYPE_TABLE):
+            sheet.tables += 1
+
+
+def probe_workbook(file_path: str) -> Optional[WorkbookProbe]:
+    """
+    Осматривает книгу .xlsx/.xlsm, не загружая её.
+
+    Args:
+        file_path (str): Путь к файлу книги.
+
+    Returns:
+        Optional[WorkbookProbe]: Сводка по книге или None, если файл не является
+        пакетом SpreadsheetML (например, .xls) или повреждён.
+    """
+    started = time.perf_counter()
+    if not str(file_path).lower().endswith(SUPPORTED_EXTENSIONS):
+        logger.debug(f"Осмотр '{file_path}' пропущен: поддерживаются только {SUPPORTED_EXTENSIONS}.")
+        return None
+    probe = WorkbookProbe(str(file_path))
+    try:
+        probe.file_size = os.path.getsize(file_path)
+        with zipfile.ZipFile(file_path) as archive:
+            entries = {info.filename: info for info in archive.infolist()}
+
+            with archive.open("xl/workbook.xml") as source:
+                workbook = _etree.parse(source).getroot()
+            targets = {}
+            with archive.open("xl/_rels/workbook.xml.rels") as source:
+                for rel in _etree.parse(source).getroot().iter(f"{{{_NS_PKG_REL}}}Relationship"):
+                    targets[rel.get("Id")] = _resolve_target("xl", rel.get("Target", ""))
+
+            for element in workbook.iter(f"{{{_NS_MAIN}}}sheet"):
+                part_name = targets.get(element.get(f"{{{_NS_REL}}}id"))
+                # Листы-диаграммы (chartsheets) не содержат ячеек и не импортируются
+                if not part_name or part_name not in entries or "/worksheets/" not in part_name:
+                    continue
+                sheet = SheetProbe(element.get("name"), part_name, element.get("state", "visible"))
+                sheet.xml_size = entries[part_name].file_size
+                sheet.compressed_size = entries[part_name].compress_size
+                _read_sheet_head(archive, sheet)
+                _estimate_cells(sheet)
+                _probe_sheet_relations(archive, sheet)
+                probe.sheets.append(sheet)
+
+            sst = _root_attributes(archive, "xl/sharedStrings.xml", _SST_TAG)
+            probe.shared_strings_count = int(sst.get("uniqueCount") or sst.get("count") or 0)
+            probe.shared_strings_refs = int(sst.get("count") or 0)
+            if "xl/sharedStrings.xml" in entries:
+                probe.shared_strings_xml_size = entries["xl/sharedStrings.xml"].file_size
+            cell_xfs = _root_attributes(archive, "xl/styles.xml", _CELL_XFS_TAG)
+            probe.cell_styles_count = int(cell_xfs.get("count") or 0)
+    except (zipfile.BadZipFile, OSError, KeyError, _etree.ParseError, ValueError) as e:
+        logger.warning(f"Не удалось осмотреть книгу '{file_path}': {e}")
+        return None
+
+    names = entries.keys()
+    probe.has_pivots = any(name.startswith(("xl/pivotTables/", "xl/pivotCache/")) for name in names)
+    probe.has_charts = any(name.startswith(("xl/charts/chart", "xl/chartsheets/")) for name in names)
+    probe.has_vba = "xl/vbaProject.bin" in entries
+    probe.has_external_links = any(name.startswith("xl/externalLinks/") for name in names)
+    probe.has_calc_chain = "xl/calcChain.xml" in entries
+    probe.elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug(probe.summary())
+    return probe
+
+def has_merged_cells(file_path: str, sheets: List[SheetProbe]) -> bool:
+    """
+    Проверяет, есть ли на листах объединённые ячейки (<mergeCell>).
+    Элемент <mergeCells> записывается после данных листа, поэтому XML листа распаковывается
+    целиком (без разбора); вызывать только для книг, которые и так помещаются в память.
+
+    Args:
+        file_path (str): Путь к файлу книги.
+        sheets (List[SheetProbe]): Проверяемые листы из probe_workbook().
+
+    Returns:
+        bool: True, если объединения найдены или файл прочитать не удалось.
+    """
+    marker = b"mergeCell "
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            for sheet in sheets:
+                with archive.open(sheet.part_name) as source:
+                    tail = b""
+                    while True:
+                        block = source.read(_MERGE_SCAN_READ_BYTES)
+                        if not block:
+                            break
+                        if marker in tail + block[:len(marker)] or marker in block:
+                            return True
+                        tail = block[-len(marker):]
+    except (zipfile.BadZipFile, OSError, KeyError) as e:
+        logger.warning(f"Не удалось проверить объединённые ячейки книги '{file_path}': {e}")
+        return True
+    return False
+
+# Дополнительные функции осмотра книги (если потребуются) могут быть добавлены здесь
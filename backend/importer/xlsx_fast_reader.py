@@ -0,0 +1,369 @@
+# backend/importer/xlsx_fast_reader.py
+"""
+Быстрое чтение значений и формул из .xlsx/.xlsm без создания объектов ячеек openpyxl.
+
+XML листа (xl/worksheets/sheetN.xml) читается потоково через iterparse: для каждой строки
+разбираются элементы <c>, после чего строка удаляется из дерева. Общие строки
+(xl/sharedStrings.xml) и форматы дат (xl/styles.xml) читаются один раз на книгу.
+Результат - кортежи (row, col, value, formula), которые импортёр передаёт в хранилище напрямую.
+
+Разбор значений повторяет openpyxl (worksheet/_reader.py): приведение чисел, даты по
+числовому формату стиля, общие формулы (t="shared") транслируются через Translator.
+Формулы массивов и таблиц данных не поддерживаются - при их обнаружении выбрасывается
+UnsupportedXlsxFeature, и вызывающая сторона переходит на openpyxl.
+
+Используется lxml, если установлен, иначе xml.etree.ElementTree.
+"""
+
+import logging
+import posixpath
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from lxml import etree as _etree
+    HAS_LXML = True
+except ImportError:  # lxml - необязательная зависимость
+    import xml.etree.ElementTree as _etree
+    HAS_LXML = False
+
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+logger = logging.getLogger(__name__)
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_SHEET_DATA_TAG = f"{{{_NS_MAIN}}}sheetData"
+_ROW_TAG = f"{{{_NS_MAIN}}}row"
+_CELL_TAG = f"{{{_NS_MAIN}}}c"
+_VALUE_TAG = f"{{{_NS_MAIN}}}v"
+_FORMULA_TAG = f"{{{_NS_MAIN}}}f"
+_INLINE_STRING_TAG = f"{{{_NS_MAIN}}}is"
+_TEXT_TAG = f"{{{_NS_MAIN}}}t"
+_RUN_TAG = f"{{{_NS_MAIN}}}r"
+_SI_TAG = f"{{{_NS_MAIN}}}si"
+
+# Расширения, которые читает быстрый путь (ZIP-пакет SpreadsheetML)
+SUPPORTED_EXTENSIONS = (".xlsx", ".xlsm")
+
+# Кортеж ячейки: (row, col, value, formula). formula - текст с '=' или None; для ячеек
+# с формулой value - кэшированный результат из файла. Ошибки Excel приходят строкой и
+# отмечаются в наборе error_cells ридера.
+CellTuple = Tuple[int, int, Any, Optional[str]]
+
+
+class UnsupportedXlsxFeature(Exception):
+    """Книга содержит элементы, которые быстрый путь не разбирает (нужен openpyxl)."""
+
+
+def _cast_number(text: str) -> Any:
+    """Приведение числа как в openpyxl: int, если нет точки и экспоненты."""
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _string_item_text(element) -> str:
+    """Текст элемента <si>/<is>: прямой <t> и <t> внутри фрагментов <r> (фонетика <rPh> пропускается)."""
+    parts = []
+    for child in element:
+        if child.tag == _TEXT_TAG:
+            parts.append(child.text or "")
+        elif child.tag == _RUN_TAG:
+            text_node = child.find(_TEXT_TAG)
+            if text_node is not None:
+                parts.append(text_node.text or "")
+    return "".join(parts).replace("x005F_", "")
+
+
+class FastXlsxReader:
+    """
+    Потоковый ридер значений и формул книги .xlsx.
+
+    Пример:
+        with FastXlsxReader(path) as reader:
+            for row, col, value, formula in reader.iter_cells("Лист1"):
+                ...
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path (str): Путь к .xlsx/.xlsm файлу.
+
+        Raises:
+            UnsupportedXlsxFeature: Файл не является пакетом SpreadsheetML.
+        """
+        self.file_path = file_path
+        try:
+            self._archive = zipfile.ZipFile(file_path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise UnsupportedXlsxFeature(f"Файл '{file_path}' не является ZIP-пакетом xlsx: {e}") from e
+        self._sheet_paths: Dict[str, str] = {}
+        self.epoch = CALENDAR_WINDOWS_1900
+        self._shared_strings: Optional[List[str]] = None
+        self._date_styles: Set[int] = set()
+        self._timedelta_styles: Set[int] = set()
+        # Ячейки с ошибками Excel последнего прочитанного листа: {(row, col)}
+        self.error_cells: Set[Tuple[int, int]] = set()
+        try:
+            self._read_workbook()
+            self._read_styles()
+        except Exception:
+            self._archive.close()
+            raise
+
+    # --- Контекстный менеджер ---
+
+    def __enter__(self) -> "FastXlsxReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Закрывает архив книги."""
+        self._archive.close()
+
+    # --- Части книги ---
+
+    def _parse_part(self, part_name: str):
+        with self._archive.open(part_name) as source:
+            return _etree.parse(source).getroot()
+
+    def _read_workbook(self):
+        """Читает список листов (имя -> путь части) и систему дат из workbook.xml."""
+        try:
+            workbook = self._parse_part("xl/workbook.xml")
+            rels = self._parse_part("xl/_rels/workbook.xml.rels")
+        except KeyError as e:
+            raise UnsupportedXlsxFeature(f"В книге нет workbook.xml или связей: {e}") from e
+
+        targets = {}
+        for rel in rels.iter(f"{{{_NS_PKG_REL}}}Relationship"):
+            target = rel.get("Target", "")
+            # Цель связи задаётся относительно xl/ или абсолютным путём от корня пакета
+            target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            targets[rel.get("Id")] = target
+
+        workbook_pr = workbook.find(f"{{{_NS_MAIN}}}workbookPr")
+        if workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true"):
+            self.epoch = CALENDAR_MAC_1904
+
+        for sheet in workbook.iter(f"{{{_NS_MAIN}}}sheet"):
+            target = targets.get(sheet.get(f"{{{_NS_REL}}}id"))
+            if target:
+                self._sheet_paths[sheet.get("name")] = target
+
+    def _read_styles(self):
+        """Определяет индексы стилей ячеек с форматом даты/длительности (как openpyxl)."""
+        try:
+            styles = self._parse_part("xl/styles.xml")
+        except KeyError:
+            return
+        custom_formats = {}
+        num_fmts = styles.find(f"{{{_NS_MAIN}}}numFmts")
+        if num_fmts is not None:
+            for num_fmt in num_fmts:
+                custom_formats[int(num_fmt.get("numFmtId"))] = num_fmt.get("formatCode")
+        cell_xfs = styles.find(f"{{{_NS_MAIN}}}cellXfs")
+        if cell_xfs is None:
+            return
+        for index, xf in enumerate(cell_xfs):
+            num_fmt_id = int(xf.get("numFmtId", 0))
+            fmt = custom_formats.get(num_fmt_id, BUILTIN_FORMATS.get(num_fmt_id))
+            if fmt and is_date_format(fmt):
+                self._date_styles.add(index)
+            if fmt and is_timedelta_format(fmt):
+                self._timedelta_styles.add(index)
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """Таблица общих строк (читается один раз при первом обращении)."""
+        if self._shared_strings is None:
+            strings = []
+            try:
+                with self._archive.open("xl/sharedStrings.xml") as source:
+                    for _, element in _etree.iterparse(source, events=("end",)):
+                        if element.tag == _SI_TAG:
+                            strings.append(_string_item_text(element))
+                            element.clear()
+            except KeyError:
+                pass  # В книге нет общих строк
+            self._shared_strings = strings
+        return self._shared_strings
+
+    @property
+    def sheetnames(self) -> List[str]:
+        """Имена листов в порядке книги."""
+        return list(self._sheet_paths)
+
+    def sheet_xml_size(self, sheet_name: str) -> int:
+        """Несжатый размер XML листа в байтах (оценка объёма работы для прогресса)."""
+        return self._archive.getinfo(self._sheet_paths[sheet_name]).file_size
+
+    def iter_cells_flagged(self, sheet_name: str) -> Iterator[Tuple[int, int, Any, Optional[str], bool]]:
+        """iter_cells с признаком ошибки Excel: (row, col, value, formula, is_error)."""
+        for row, col, value, formula in self.iter_cells(sheet_name):
+            yield row, col, value, formula, (row, col) in self.error_cells
+
+    def sheet_source_fingerprint(self, sheet_name: str) -> str:
+        """
+        Отпечаток исходных данных листа без распаковки: CRC32 XML листа и частей книги,
+        от которых зависит разбор его значений (общие строки, стили, workbook.xml).
+        Совпадение отпечатков означает, что разбор листа даст тот же результат.
+        """
+        parts = [self._sheet_paths[sheet_name], "xl/sharedStrings.xml", "xl/styles.xml", "xl/workbook.xml"]
+        crcs = []
+        for part_name in parts:
+            try:
+                info = self._archive.getinfo(part_name)
+                crcs.append(f"{info.CRC:08x}:{info.file_size}")
+            except KeyError:
+                crcs.append("-")
+        return "/".join(crcs)
+
+    # --- Чтение листа ---
+
+    def _decode_value(self, element, data_type: str, style_id: int, row: int, col: int) -> Any:
+        """Значение ячейки по типу t (повторяет WorksheetReader.parse_cell openpyxl)."""
+        if data_type == "inlineStr":
+            inline = element.find(_INLINE_STRING_TAG)
+            return _string_item_text(inline) if inline is not None else None
+
+        text = element.findtext(_VALUE_TAG) or None
+        if text is None:
+            return None
+        if data_type == "n":
+            value = _cast_number(text)
+            if style_id in self._date_styles:
+                try:
+                    return from_excel(value, self.epoch, timedelta=style_id in self._timedelta_styles)
+                except (OverflowError, ValueError):
+                    self.error_cells.add((row, col))
+                    return "#VALUE!"
+            return value
+        if data_type == "s":
+            return self.shared_strings[int(text)]
+        if data_type == "b":
+            return bool(int(text))
+        if data_type == "e":
+            self.error_cells.add((row, col))
+            return text
+        if data_type == "d":
+            return from_ISO8601(text)
+        # 'str' - строковый результат формулы
+        return text
+
+    def iter_cells(self, sheet_name: str) -> Iterator[CellTuple]:
+        """
+        Перебирает непустые ячейки листа в порядке файла (по строкам).
+
+        Args:
+            sheet_name (str): Имя листа.
+
+        Yields:
+            CellTuple: (row, col, value, formula), row/col 1-based.
+
+        Raises:
+            KeyError: Лист не найден.
+            UnsupportedXlsxFeature: Формулы массивов или таблиц данных.
+        """
+        part_name = self._sheet_paths[sheet_name]
+        self.error_cells = set()
+        shared_formulas: Dict[str, Translator] = {}
+        row_counter = 0
+
+        with self._archive.open(part_name) as source:
+            sheet_data = None
+            if HAS_LXML:
+                events = _etree.iterparse(source, events=("end",), tag=_ROW_TAG)
+            else:
+                events = _etree.iterparse(source, events=("start", "end"))
+
+            for event, row_element in events:
+                if event == "start":
+                    if row_element.tag == _SHEET_DATA_TAG:
+                        sheet_data = row_element
+                    continue
+                if row_element.tag != _ROW_TAG:
+                    continue
+                row_attr = row_element.get("r")
+                row_counter = int(float(row_attr)) if row_attr else row_counter + 1
+                col_counter = 0
+
+                for cell in row_element.iter(_CELL_TAG):
+                    coordinate = cell.get("r")
+                    if coordinate:
+                        row, col = coordinate_to_tuple(coordinate)
+                        col_counter = col
+                    else:
+                        col_counter += 1
+                        row, col = row_counter, col_counter
+
+                    style_attr = cell.get("s")
+                    style_id = int(style_attr) if style_attr else 0
+                    value = self._decode_value(cell, cell.get("t", "n"), style_id, row, col)
+
+                    formula = None
+                    formula_element = cell.find(_FORMULA_TAG)
+                    if formula_element is not None:
+                        formula_type = formula_element.get("t")
+                        if formula_type in ("array", "dataTable"):
+                            raise UnsupportedXlsxFeature(f"Лист '{sheet_name}', ячейка {coordinate}: формула типа '{formula_type}'.")
+                        formula = "=" + (formula_element.text or "")
+                        if formula_type == "shared":
+                            index = formula_element.get("si")
+                            if index in shared_formulas:
+                                if not coordinate:
+                                    raise UnsupportedXlsxFeature(f"Лист '{sheet_name}': общая формула без адреса ячейки.")
+                                formula = shared_formulas[index].translate_formula(coordinate)
+                            elif formula != "=":
+                                shared_formulas[index] = Translator(formula, coordinate)
+
+                    if value is not None or formula is not None:
+                        yield row, col, value, formula
+
+                # Разобранные строки больше не нужны - удаляем их из дерева
+                row_element.clear()
+                if HAS_LXML:
+                    while row_element.getprevious() is not None:
+                        del row_element.getparent()[0]
+                elif sheet_data is not None:
+                    sheet_data.clear()
+
+def iter_sheet_cells_openpyxl(file_path: str, sheet_name: str) -> Iterator[Tuple[int, int, Any, Optional[str], bool]]:
+    """
+    Запасной разбор листа через openpyxl read_only, когда FastXlsxReader выбросил
+    UnsupportedXlsxFeature. Кэшированные результаты формул в этом режиме недоступны:
+    для ячейки с формулой value = None.
+
+    Args:
+        file_path (str): Путь к книге.
+        sheet_name (str): Имя листа.
+
+    Yields:
+        Tuple[int, int, Any, Optional[str], bool]: (row, col, value, formula, is_error).
+    """
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=False)
+    try:
+        for row in workbook[sheet_name].iter_rows(values_only=False):
+            for cell in row:
+                if getattr(cell, 'coordinate', None) is None or cell.value is None:
+                    continue
+                value = cell.value
+                if cell.data_type == 'f':
+                    formula = value if isinstance(value, str) else getattr(value, 'text', str(value))
+                    yield cell.row, cell.column, None, formula, False
+                else:
+                    yield cell.row, cell.column, value, None, cell.data_type == 'e'
+    finally:
+        workbook.close()
+
+# Дополнительные функции быстрого чтения (если потребуются) могут быть добавлены здесь
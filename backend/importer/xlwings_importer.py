@@ -18,10 +18,17 @@ import json
 import xlwings as xw
 
 from backend.storage.base import ProjectDBStorage
+from backend.storage.cells import address_to_row_col, row_col_to_address
 from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressReporter
 
 logger = get_logger(__name__)
 
+
+class _ImportFailed(Exception):
+    """Импорт вернул False: сессия массовой записи откатывается."""
+
+
 def import_all_from_excel_xlwings(
     storage: ProjectDBStorage,
     file_path: str,
@@ -34,7 +41,8 @@ def import_all_from_excel_xlwings(
         storage (ProjectDBStorage): Экземпляр хранилища БД.
         file_path (str): Путь к Excel-файлу (.xlsx, .xls).
         progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
-            Принимает (процент: int, сообщение: str).
+            Принимает (процент: int, сообщение: str); ProgressChannel получает структурированные
+            события. Обновления по ячейкам отправляются не чаще раза в DEFAULT_PROGRESS_INTERVAL.
 
     Returns:
         bool: True, если импорт прошёл успешно, иначе False.
@@ -43,6 +51,25 @@ def import_all_from_excel_xlwings(
         logger.error("Экземпляр ProjectDBStorage не предоставлен.")
         return False
 
+    # Вся запись идёт в одной транзакции, commit выполняется один раз в конце;
+    # при ошибке (False) сессия откатывается, а не фиксирует уже записанные листы
+    try:
+        with storage.bulk_session():
+            if not _import_all_from_excel_xlwings(storage, file_path, progress_callback):
+                raise _ImportFailed()
+    except _ImportFailed:
+        return False
+    return True
+
+
+def _import_all_from_excel_xlwings(
+    storage: ProjectDBStorage,
+    file_path: str,
+    progress_callback: Optional[Callable[[int, str], None]] = None
+) -> bool:
+    """
+    Реализация import_all_from_excel_xlwings, выполняемая внутри сессии массовой записи.
+    """
     if not os.path.exists(file_path):
         logger.error(f"Excel-файл не найден: {file_path}")
         return False
@@ -53,6 +80,7 @@ def import_all_from_excel_xlwings(
     app = None
     wb = None
     # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
+    reporter = ProgressReporter(progress_callback, job="xlwings")
 
     try:
         # Открываем Excel-приложение в скрытом режиме
@@ -67,10 +95,7 @@ def import_all_from_excel_xlwings(
         # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
         logger.debug(f"Книга '{file_path}' открыта через xlwings (read-only).")
 
-        # --- НОВОЕ: Сообщаем о начале ---
-        if progress_callback:
-            progress_callback(0, f"Открыт файл: {os.path.basename(file_path)}")
-        # --- КОНЕЦ НОВОГО ---
+        reporter.start(f"Открыт файл: {os.path.basename(file_path)}")
 
         total_sheets = len(wb.sheets)
         processed_sheets = 0
@@ -80,11 +105,11 @@ def import_all_from_excel_xlwings(
             processed_sheets += 1
             logger.info(f"Обработка листа: {sheet.name}")
             
-            # --- НОВОЕ: Обновляем прогресс ---
-            if progress_callback:
-                percent = int((processed_sheets / total_sheets) * 50) # Первые 50% — листы
-                progress_callback(percent, f"Обработка листа: {sheet.name}")
-            # --- КОНЕЦ НОВОГО ---
+            # Каждому листу отводится равная доля общего процента
+            sheet_percent_range = (
+                (processed_sheets - 1) / total_sheets * 100,
+                processed_sheets / total_sheets * 100,
+            )
             
             # Сохраняем информацию о листе
             sheet_id = storage.save_sheet(project_id=1, sheet_name=sheet.name)
@@ -93,7 +118,7 @@ def import_all_from_excel_xlwings(
                 return False
 
             # --- ИМПОРТ СЫРЫХ ДАННЫХ, ФОРМУЛ И ФОРМАТОВ ---
-            raw_data_list, formulas_list, formats_list = _extract_raw_formula_and_format_data_from_sheet(sheet, progress_callback, processed_sheets, total_sheets)
+            raw_data_list, formulas_list, formats_list = _extract_raw_formula_and_format_data_from_sheet(sheet, reporter, sheet_percent_range)
 
             if raw_data_list:
                 if not storage.save_sheet_raw_data(sheet.name, raw_data_list):
@@ -163,10 +188,7 @@ def import_all_from_excel_xlwings(
                 logger.info(f"Сохранено {len(metadata_dict)} записей метаданных.")
         # --- КОНЕЦ НОВОГО ---
 
-        # --- НОВОЕ: Сообщаем о завершении ---
-        if progress_callback:
-            progress_callback(100, "Импорт завершён")
-        # --- КОНЕЦ НОВОГО ---
+        reporter.finish(True, "Импорт завершён")
 
         # Всё прошло успешно
         return True
@@ -193,20 +215,115 @@ def import_all_from_excel_xlwings(
 
 # --- Вспомогательные функции для преобразования данных xlwings в формат storage ---
 
+# Каждое обращение к свойству Range/Range.api - межпроцессный COM-вызов в Excel.
+# Поэтому адреса ячеек вычисляются локально, а числовые форматы, стили и объединения
+# читаются для блоков ячеек: свойство многоячеечного диапазона Excel возвращает общее
+# значение или Null (None), если у ячеек оно разное. Блок с разными значениями делится
+# пополам, пока не станет однородным (в худшем случае - до отдельной ячейки).
+
+# Маркер «у ячеек блока разные значения свойства»
+_MIXED = object()
+
+
+def _used_range_bounds(sheet: xw.Sheet) -> Optional[tuple[int, int, int, int]]:
+    """
+    Границы used_range листа (start_row, start_col, n_rows, n_cols) за один запрос к листу.
+
+    Returns:
+        Optional[tuple[int, int, int, int]]: Границы или None, если лист пуст.
+    """
+    used_range = sheet.used_range
+    if not used_range:
+        return None
+    return used_range.row, used_range.column, used_range.rows.count, used_range.columns.count
+
+
+def _as_matrix(data: Any, n_rows: int, n_cols: int) -> List[List[Any]]:
+    """
+    Приводит значение диапазона xlwings к списку строк: для одной ячейки xlwings
+    возвращает скаляр, для одной строки или столбца - плоский список.
+    """
+    if n_rows == 1 and n_cols == 1 and not isinstance(data, (list, tuple)):
+        return [[data]]
+    rows = list(data) if data is not None else []
+    if rows and not isinstance(rows[0], (list, tuple)):
+        # Плоский список: одна строка или один столбец
+        return [rows] if n_rows == 1 else [[item] for item in rows]
+    return [list(row) for row in rows]
+
+
+def _iter_uniform_blocks(
+    sheet: xw.Sheet,
+    read_block: Callable[[Any, bool], Any],
+    start_row: int,
+    start_col: int,
+    n_rows: int,
+    n_cols: int
+):
+    """
+    Делит прямоугольник листа на блоки, для которых read_block вернул общее значение.
+
+    Args:
+        sheet (xw.Sheet): Лист xlwings.
+        read_block (Callable[[Any, bool], Any]): Читает свойство блока по его Range.api;
+            второй аргумент - True для одной ячейки. Возвращает _MIXED, если значения разные.
+        start_row, start_col (int): Левая верхняя ячейка (1-based).
+        n_rows, n_cols (int): Размер прямоугольника.
+
+    Yields:
+        tuple: (row, col, n_rows, n_cols, value) однородного блока.
+    """
+    stack = [(start_row, start_col, n_rows, n_cols)]
+    while stack:
+        row, col, height, width = stack.pop()
+        single = height == 1 and width == 1
+        block = sheet.range((row, col), (row + height - 1, col + width - 1))
+        value = read_block(block.api, single)
+        if value is not _MIXED:
+            yield row, col, height, width, value
+            continue
+        # Сначала делим по столбцам (оформление листа обычно задаётся по столбцам),
+        # затем столбец - по строкам; первой обрабатывается левая/верхняя половина
+        if width > 1:
+            half = width // 2
+            stack.append((row, col + half, height, width - half))
+            stack.append((row, col, height, half))
+        else:
+            half = height // 2
+            stack.append((row + half, col, height - half, width))
+            stack.append((row, col, half, width))
+
+
+def _block_address(row: int, col: int, n_rows: int, n_cols: int) -> str:
+    """Адрес блока без обращения к Excel: 'A1' или 'A1:C10'."""
+    first = row_col_to_address(row, col)
+    if n_rows == 1 and n_cols == 1:
+        return first
+    return f"{first}:{row_col_to_address(row + n_rows - 1, col + n_cols - 1)}"
+
+
+def _read_number_format(xl_range_api, single: bool):
+    number_format = xl_range_api.NumberFormat
+    if number_format is None and not single:
+        return _MIXED
+    return number_format
+
+
 def _extract_raw_formula_and_format_data_from_sheet(
     sheet: xw.Sheet,
-    progress_callback: Optional[Callable[[int, str], None]] = None,
-    sheet_index: int = 0,
-    total_sheets: int = 1
+    reporter: Optional[ProgressReporter] = None,
+    percent_range: tuple[float, float] = (0, 100)
 ) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]: # <-- ИЗМЕНЕНО
     """
     Извлекает raw_data, formulas и formats из листа xlwings.
 
+    Значения и формулы читаются одним запросом на лист, адреса вычисляются локально,
+    числовые форматы - по однородным блокам (_iter_uniform_blocks).
+
     Args:
         sheet (xw.Sheet): Лист xlwings.
-        progress_callback (Optional[Callable[[int, str], None]]): Функция для обновления прогресса.
-        sheet_index (int): Индекс текущего листа (для расчёта процента).
-        total_sheets (int): Общее количество листов.
+        reporter (Optional[ProgressReporter]): Отправитель прогресса (с ограничением частоты).
+        percent_range (tuple[float, float]): Доля общего процента, отведённая листу.
 
     Returns:
         tuple: (raw_data_list, formulas_list, formats_list)
@@ -215,26 +332,28 @@ def _extract_raw_formula_and_format_data_from_sheet(
     formulas_list = []
     formats_list = []
 
-    used_range = sheet.used_range
-    if not used_range:
+    bounds = _used_range_bounds(sheet)
+    if not bounds:
         return raw_data_list, formulas_list, formats_list
+    start_row, start_col, n_rows, n_cols = bounds
 
-    values_matrix = used_range.value
-    formulas_matrix = used_range.formula
+    used_range = sheet.range((start_row, start_col), (start_row + n_rows - 1, start_col + n_cols - 1))
+    values_matrix = _as_matrix(used_range.value, n_rows, n_cols)
+    formulas_matrix = _as_matrix(used_range.formula, n_rows, n_cols)
 
-    start_row, start_col = used_range.row, used_range.column
-    n_rows, n_cols = used_range.rows.count, used_range.columns.count
-
-    total_cells = n_rows * n_cols
-    processed_cells = 0
+    if reporter:
+        reporter.stage(f"Обработка ячеек листа {sheet.name}", total_cells=n_rows * n_cols, percent_range=percent_range)
 
     # xlwings использует 1-based индексацию
     for i in range(n_rows):
+        values_row = values_matrix[i] if i < len(values_matrix) else []
+        formulas_row = formulas_matrix[i] if i < len(formulas_matrix) else []
         for j in range(n_cols):
-            value = values_matrix[i][j] if values_matrix else None
-            formula = formulas_matrix[i][j] if formulas_matrix else None
-            # Получаем адрес ячейки
-            cell_address = sheet.range(start_row + i, start_col + j).address
+            value = values_row[j] if j < len(values_row) else None
+            formula = formulas_row[j] if j < len(formulas_row) else None
+            if value is None and not formula:
+                continue
+            cell_address = row_col_to_address(start_row + i, start_col + j)
 
             if value is not None:
                 raw_data_list.append({
@@ -248,31 +367,33 @@ def _extract_raw_formula_and_format_data_from_sheet(
                     "formula": formula
                 })
 
-            # --- ИЗВЛЕЧЕНИЕ ЧИСЛОВОГО ФОРМАТА ---
-            cell_xl = sheet.range(start_row + i, start_col + j).api  # COM-объект Excel
-            number_format = cell_xl.NumberFormat
-            if number_format:
+        # Прогресс по строкам: ProgressReporter сам отбрасывает слишком частые обновления
+        if reporter:
+            reporter.advance(cells=n_cols)
+
+    # --- ИЗВЛЕЧЕНИЕ ЧИСЛОВЫХ ФОРМАТОВ (по однородным блокам) ---
+    for row, col, height, width, number_format in _iter_uniform_blocks(
+        sheet, _read_number_format, start_row, start_col, n_rows, n_cols
+    ):
+        if not number_format:
+            continue
+        number_format = str(number_format)
+        for r in range(row, row + height):
+            for c in range(col, col + width):
                 formats_list.append({
-                    "cell_address": cell_address,
-                    "number_format": str(number_format)
+                    "cell_address": row_col_to_address(r, c),
+                    "number_format": number_format
                 })
 
-            processed_cells += 1
-            # --- НОВОЕ: Обновляем прогресс каждые 10 ячеек ---
-            if progress_callback and processed_cells % 10 == 0: # <-- ИЗМЕНЕНО С 1000 НА 10
-                # Рассчитываем общий процент: первые 50% — листы, следующие 50% — ячейки
-                sheet_percent = (sheet_index / total_sheets) * 50
-                cell_percent = (processed_cells / total_cells) * 50 if total_cells > 0 else 0
-                total_percent = int(sheet_percent + cell_percent)
-                progress_callback(min(total_percent, 99), f"Обработка ячеек листа {sheet.name} ({processed_cells}/{total_cells})")
-            # --- КОНЕЦ НОВОГО ---
-
     return raw_data_list, formulas_list, formats_list
 
 def _extract_styles_from_xlwings_sheet(sheet: xw.Sheet, sheet_id: int) -> List[Dict[str, Any]]:
     """
     Извлекает стили из листа xlwings.
 
+    Стили читаются для однородных блоков ячеек (одна запись на блок с адресом
+    диапазона), JSON одинаковых стилей сериализуется один раз.
+
     Args:
         sheet (xw.Sheet): Лист xlwings.
         sheet_id (int): ID листа в БД.
@@ -282,64 +403,100 @@ def _extract_styles_from_xlwings_sheet(sheet: xw.Sheet, sheet_id: int) -> List[D
     """
     styles_list = []
 
-    used_range = sheet.used_range
-    if not used_range:
+    bounds = _used_range_bounds(sheet)
+    if not bounds:
         return styles_list
 
-    start_row, start_col = used_range.row, used_range.column
-    n_rows, n_cols = used_range.rows.count, used_range.columns.count
-
-    for i in range(n_rows):
-        for j in range(n_cols):
-            cell = sheet.range(start_row + i, start_col + j)
-            cell_address = cell.address
-            xl_api_obj = cell.api
-
-            style_dict = _serialize_style_from_xlwings_range_api(xl_api_obj)
-            if style_dict:
-                style_json = json.dumps(style_dict, ensure_ascii=False)
-                styles_list.append({
-                    "range_address": cell_address,
-                    "style_attributes": style_json
-                })
+    style_json_cache: Dict[tuple, str] = {}
+    for row, col, height, width, style_dict in _iter_uniform_blocks(
+        sheet, _read_style_block, *bounds
+    ):
+        if not style_dict:
+            continue
+        cache_key = tuple(
+            (name, tuple(value.items()) if isinstance(value, dict) else value)
+            for name, value in style_dict.items()
+        )
+        style_json = style_json_cache.get(cache_key)
+        if style_json is None:
+            style_json = json.dumps(style_dict, ensure_ascii=False)
+            style_json_cache[cache_key] = style_json
+        styles_list.append({
+            "range_address": _block_address(row, col, height, width),
+            "style_attributes": style_json
+        })
 
     return styles_list
-def _serialize_style_from_xlwings_range_api(xl_range_api):
+
+
+def _read_style_block(xl_range_api, single: bool):
+    """
+    Стиль блока для _iter_uniform_blocks: словарь или _MIXED, если хотя бы одно
+    свойство у ячеек блока различается (чтение прекращается на первом таком свойстве).
+    """
+    return _serialize_style_from_xlwings_range_api(xl_range_api, stop_on_mixed=not single)
+
+
+def _serialize_style_from_xlwings_range_api(xl_range_api, stop_on_mixed: bool = False):
     """
     Сериализует стили COM-объекта xlwings Range.api в словарь.
+
+    Args:
+        xl_range_api: COM-объект Range.
+        stop_on_mixed (bool): Для многоячеечного диапазона - вернуть _MIXED, как только
+            свойство окажется разным у ячеек (COM Null -> None).
     """
+    def read(obj, name):
+        value = getattr(obj, name)
+        if value is None and stop_on_mixed:
+            raise _MixedStyle()
+        return value
+
     style_dict = {}
     try:
         font = xl_range_api.Font
+        font_size = read(font, 'Size')
+        font_color = read(font, 'Color')
         style_dict['font'] = {
-            'name': font.Name,
-            'size': float(font.Size) if font.Size else None,
-            'bold': bool(font.Bold),
-            'italic': bool(font.Italic),
-            'color': int(font.Color) if font.Color else None,  # Excel Color — это число
+            'name': read(font, 'Name'),
+            'size': float(font_size) if font_size else None,
+            'bold': bool(read(font, 'Bold')),
+            'italic': bool(read(font, 'Italic')),
+            'color': int(font_color) if font_color else None,  # Excel Color — это число
         }
 
         interior = xl_range_api.Interior
+        interior_color = read(interior, 'Color')
         style_dict['interior'] = {
-            'color': int(interior.Color) if interior.Color else None,
-            'pattern': interior.Pattern,
+            'color': int(interior_color) if interior_color else None,
+            'pattern': read(interior, 'Pattern'),
         }
 
         borders = xl_range_api.Borders
+        borders_style = read(borders, 'LineStyle')
+        borders_color = read(borders, 'Color')
         style_dict['borders'] = {
-            'style': borders.LineStyle,
-            'color': int(borders.Color) if borders.Color else None,
+            'style': borders_style,
+            'color': int(borders_color) if borders_color else None,
         }
 
-        style_dict['number_format'] = xl_range_api.NumberFormat
-        style_dict['horizontal_alignment'] = xl_range_api.HorizontalAlignment
-        style_dict['vertical_alignment'] = xl_range_api.VerticalAlignment
+        style_dict['number_format'] = read(xl_range_api, 'NumberFormat')
+        style_dict['horizontal_alignment'] = read(xl_range_api, 'HorizontalAlignment')
+        style_dict['vertical_alignment'] = read(xl_range_api, 'VerticalAlignment')
 
+    except _MixedStyle:
+        return _MIXED
     except Exception as e:
         logger.warning(f"Ошибка при сериализации стиля xlwings: {e}")
         return {}
 
     return style_dict
+
+
+class _MixedStyle(Exception):
+    """Свойство стиля различается у ячеек блока."""
+
+
 def _extract_charts_from_xlwings_sheet(sheet: xw.Sheet, sheet_id: int) -> List[Dict[str, Any]]:
     """
     Извлекает диаграммы из листа xlwings.
@@ -372,27 +529,38 @@ def _extract_merged_cells_from_xlwings_sheet(sheet: xw.Sheet, sheet_id: int) ->
     Returns:
         List[str]: Список строк адресов диапазонов (например, ['A1:B2', 'C3:D4']).
     """
-    # Простой обход used_range для поиска объединённых ячеек
-    used_range = sheet.used_range
-    if not used_range:
+    bounds = _used_range_bounds(sheet)
+    if not bounds:
         return []
 
+    # Блоки без объединений (MergeCells = False) пропускаются целиком;
+    # адрес области читается только для объединённых ячеек
     merged_set = set()
-    start_row, start_col = used_range.row, used_range.column
-    n_rows, n_cols = used_range.rows.count, used_range.columns.count
-
-    for i in range(n_rows):
-        for j in range(n_cols):
-            cell = sheet.range(start_row + i, start_col + j)
-            # Если ячейка — часть объединённой области
-            if cell.merge_area.count > 1:
-                # Получаем адрес всей объединённой области
-                merged_addr = cell.merge_area.address
-                merged_set.add(merged_addr)
-
-    merged_list = list(merged_set)
+    merged_bounds: List[tuple[int, int, int, int]] = []
+    for row, col, height, width, merged in _iter_uniform_blocks(sheet, _read_merge_block, *bounds):
+        if not merged:
+            continue
+        # Остальные ячейки уже найденной области не требуют запроса MergeArea
+        if any(r1 <= row <= r2 and c1 <= col <= c2 for r1, c1, r2, c2 in merged_bounds):
+            continue
+        merged_addr = str(sheet.range((row, col), (row, col)).api.MergeArea.Address).replace('$', '')
+        merged_set.add(merged_addr)
+        first, _, last = merged_addr.partition(':')
+        r1, c1 = address_to_row_col(first)
+        r2, c2 = address_to_row_col(last or first)
+        merged_bounds.append((r1, c1, r2, c2))
+
+    merged_list = sorted(merged_set)
     return merged_list
 
+
+def _read_merge_block(xl_range_api, single: bool):
+    """MergeCells блока: False - объединений нет; для нескольких ячеек True/Null - делить дальше."""
+    merged = xl_range_api.MergeCells
+    if single:
+        return bool(merged)
+    return False if merged is False else _MIXED
+
 # --- НОВОЕ: ИЗВЛЕЧЕНИЕ МЕТАДАННЫХ ---
 def _extract_metadata_from_xlwings_workbook(wb: xw.Book) -> Dict[str, Any]:
     """
@@ -2,14 +2,20 @@
 
 import sqlite3
 import logging
-from contextlib import contextmanager
-from typing import List, Dict, Any, Optional, Union
+from contextlib import contextmanager, ExitStack
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Set, Tuple, Union
 import os
 import json
+import threading
 
 # Импортируем новые функции из модулей storage
 # ИСПРАВЛЕНО: Все импорты теперь с префиксом backend.
-from backend.storage import schema, raw_data, editable_data, formulas, styles, charts, history, metadata, sheets # <-- ИСПРАВЛЕНО: было from . import ...
+from backend.storage import schema, cells, raw_data, editable_data, formulas, styles, charts, history, metadata, sheets # <-- ИСПРАВЛЕНО: было from . import ...
+from backend.storage.bulk import BulkWriteSession
+from backend.storage import profiles
+from backend.storage import fingerprints
+from backend.storage import dependencies
+from backend.storage.connection_manager import ConnectionManager, get_connection_manager, close_connection_managers
 
 # Импортируем logger из utils
 # ИСПРАВЛЕНО: Импорт теперь из backend.utils
@@ -25,16 +31,22 @@ class ProjectDBStorage:
     Координирует вызовы подмодулей для работы с различными аспектами данных проекта.
     """
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, profile: Optional[str] = None):
         """
         Инициализирует объект хранилища проекта.
 
         Args:
             db_path (str): Путь к файлу базы данных SQLite проекта.
+            profile (Optional[str]): Профиль хранилища ('interactive', 'bulk-import', 'read-only').
+                Если не задан, берётся из config/settings.yaml (database.storage_profile).
         """
         self.db_path = db_path
+        self.profile = profiles.resolve_profile_name(profile)
+        # Явное соединение (connect()). Если не задано, используется пул соединений по потокам.
         self.connection: Optional[sqlite3.Connection] = None
-        logger.debug(f"ProjectDBStorage инициализирован с путем к БД: {db_path}")
+        # Состояние, привязанное к потоку (сессия массовой записи)
+        self._local = threading.local()
+        logger.debug(f"ProjectDBStorage инициализирован с путем к БД: {db_path} (профиль '{self.profile}')")
 
     def connect(self) -> bool:
         """
@@ -48,8 +60,8 @@ class ProjectDBStorage:
         try:
             # Убираем проверку существования файла.
             # SQLite создаст его при первом обращении (CREATE TABLE и т.д.)
-            self.connection = sqlite3.connect(self.db_path)
-            logger.info(f"Установлено соединение с БД проекта: {self.db_path}")
+            self.connection = profiles.open_connection(self.db_path, self.profile)
+            logger.info(f"Установлено соединение с БД проекта: {self.db_path} (профиль '{self.profile}')")
             return True
         except sqlite3.Error as e:
             logger.error(f"Ошибка подключения к БД проекта {self.db_path}: {e}")
@@ -67,22 +79,152 @@ class ProjectDBStorage:
             finally:
                 self.connection = None
 
+    # --- ИЗМЕНЕНО: Соединения из пула по потокам ---
+    def _pool(self) -> ConnectionManager:
+        """Возвращает общий пул соединений для БД и профиля этого хранилища."""
+        return get_connection_manager(self.db_path, self.profile)
+
+    def _active_bulk_session(self) -> Optional[BulkWriteSession]:
+        """Возвращает сессию массовой записи, открытую в текущем потоке, если она есть."""
+        return getattr(self._local, "bulk_session", None)
+
     @contextmanager
     def get_connection(self):
         """
-        Контекстный менеджер для автоматического управления соединением.
+        Контекстный менеджер соединения для записи (и чтения).
+        Приоритет: сессия массовой записи текущего потока -> явное соединение (connect()) ->
+        единственный писатель из пула (доступ сериализуется между потоками).
+        Соединение из пула не закрывается после операции и переиспользуется.
         """
-        was_connected = self.connection is not None
-        if not was_connected:
-            # Пытаемся подключиться. Если файл не существует, connect() все равно вернет True,
-            # а ошибка возникнет позже при выполнении запроса.
-            if not self.connect():
-                raise Exception(f"Не удалось подключиться к БД: {self.db_path}")
-        try:
+        session = self._active_bulk_session()
+        if session is not None:
+            yield session
+        elif self.connection is not None:
             yield self.connection
-        finally:
-            if not was_connected and self.connection:
-                self.disconnect()
+        else:
+            with self._pool().writer() as connection:
+                yield connection
+
+    @contextmanager
+    def get_read_connection(self):
+        """
+        Контекстный менеджер соединения только для чтения.
+        Без явного соединения используется соединение чтения текущего потока из пула
+        (query_only), которое не блокируется записью при профиле с WAL.
+        """
+        session = self._active_bulk_session()
+        if session is not None:
+            yield session
+        elif self.connection is not None:
+            yield self.connection
+        else:
+            with self._pool().reader() as connection:
+                yield connection
+
+    def check_connection(self) -> bool:
+        """
+        Проверяет доступность БД (health check соединения текущего потока).
+
+        Returns:
+            bool: True, если запрос к БД выполняется.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            logger.error(f"БД проекта {self.db_path} недоступна: {e}")
+            return False
+
+    def release_thread_connections(self):
+        """Освобождает соединение пула, закреплённое за текущим потоком (при завершении воркера)."""
+        self._pool().release_current_thread()
+
+    def close_pool(self):
+        """Закрывает все соединения пула для этой БД (при закрытии проекта)."""
+        close_connection_managers(self.db_path)
+    # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+
+    # --- НОВОЕ: Сессия массовой записи ---
+    @contextmanager
+    def bulk_session(self, max_rows: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Контекстный менеджер массовой записи.
+        Все вызовы save_* внутри сессии выполняются в одной транзакции: их commit()
+        откладывается, изменения периодически фиксируются в SAVEPOINT (по числу строк или байт),
+        а COMMIT выполняется один раз при выходе. При исключении транзакция откатывается.
+        Сессия привязана к потоку; повторный вход в том же потоке использует её же.
+
+        Без явного соединения сессия удерживает писателя пула (ConnectionManager.writer) до своего
+        завершения - это сделано намеренно: транзакция сессии открыта на единственном соединении
+        записи, и запись другого потока между SAVEPOINT попала бы в эту транзакцию (откатилась бы
+        вместе с импортом или зафиксировала бы его незавершённую часть своим commit()). Поэтому
+        правки из GUI во время импорта ждут его завершения; чтение (соединения только для чтения,
+        WAL) не блокируется и видит данные на момент последнего COMMIT (flush_bulk_session).
+
+        Args:
+            max_rows (Optional[int]): Максимум изменённых строк в одном SAVEPOINT.
+            max_bytes (Optional[int]): Максимум (оценочно) байт данных в одном SAVEPOINT.
+
+        Yields:
+            BulkWriteSession: Активная сессия.
+        """
+        session = self._active_bulk_session()
+        if session is not None:
+            yield session
+            return
+
+        with ExitStack() as stack:
+            if self.connection is not None:
+                raw_connection = self.connection
+            else:
+                raw_connection = stack.enter_context(self._pool().writer())
+            # Профиль 'bulk-import' ослабляет журнал и синхронизацию на время загрузки
+            bulk_mode = profiles.enter_bulk_mode(raw_connection, self.profile)
+            session = BulkWriteSession(raw_connection, max_rows=max_rows, max_bytes=max_bytes)
+            session.begin()
+            self._local.bulk_session = session
+            try:
+                yield session
+                session.finish()
+            except BaseException:
+                session.abort()
+                raise
+            finally:
+                self._local.bulk_session = None
+                if bulk_mode:
+                    profiles.leave_bulk_mode(raw_connection, self.profile)
+
+    @contextmanager
+    def write_batch(self):
+        """
+        Пакет записи (SAVEPOINT) внутри сессии массовой записи.
+        Если сессия не открыта, пакет выполняется в собственной сессии.
+        При исключении изменения пакета откатываются.
+        """
+        session = self._active_bulk_session()
+        if session is not None:
+            with session.batch():
+                yield session
+        else:
+            with self.bulk_session() as session:
+                with session.batch():
+                    yield session
+
+    def flush_bulk_session(self) -> bool:
+        """
+        Фиксирует (COMMIT) изменения открытой сессии массовой записи, не завершая её:
+        при последующей ошибке сессия откатится только до этой точки.
+        Вне сессии изменения фиксируются каждым save_* сами.
+
+        Returns:
+            bool: True, если изменения зафиксированы или сессия не открыта.
+        """
+        session = self._active_bulk_session()
+        if session is None:
+            return True
+        return session.flush()
+    # --- КОНЕЦ НОВОГО ---
 
     def initialize_project_tables(self) -> bool:
         """
@@ -95,7 +237,9 @@ class ProjectDBStorage:
         try:
             # Вместо использования get_connection (который вызывает connect и проверяет существование файла),
             # создаем соединение напрямую. Это позволит SQLite создать файл БД, если его нет.
-            self.connection = sqlite3.connect(self.db_path)
+            # Для профиля только для чтения схему создаём в обычном интерактивном режиме
+            init_profile = profiles.DEFAULT_PROFILE if profiles.is_read_only(self.profile) else self.profile
+            self.connection = profiles.open_connection(self.db_path, init_profile)
             logger.info(f"Создано соединение с БД проекта (новый файл): {self.db_path}")
             
             # Теперь инициализируем схему
@@ -155,7 +299,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия листов.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов sheets.load_all_sheets_metadata теперь с префиксом backend.storage
                     return sheets.load_all_sheets_metadata(conn, project_id) # <-- ИСПРАВЛЕНО
@@ -225,7 +369,7 @@ class ProjectDBStorage:
             Optional[Dict[str, Any]]: Словарь с метаданными листа или None в случае ошибки.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов metadata.load_sheet_metadata теперь с префиксом backend.storage
                     return metadata.load_sheet_metadata(conn, sheet_name) # <-- ИСПРАВЛЕНО
@@ -257,6 +401,48 @@ class ProjectDBStorage:
         except Exception as e:
             logger.error(f"Ошибка при сохранении метаданных проекта (ID: {project_id}): {e}", exc_info=True)
             return False
+
+    def load_project_metadata_value(self, project_id: int, key: str) -> Optional[Any]:
+        """
+        Загружает одно значение метаданных проекта по ключу.
+
+        Args:
+            project_id (int): ID проекта.
+            key (str): Ключ метаданных.
+
+        Returns:
+            Optional[Any]: Значение (JSON десериализуется) или None.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                if conn:
+                    return metadata.load_project_metadata_value(conn, project_id, key)
+                else:
+                    return None
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке метаданных проекта '{key}' (ID: {project_id}): {e}", exc_info=True)
+            return None
+
+    def delete_project_metadata(self, project_id: int, key: str) -> bool:
+        """
+        Удаляет значение метаданных проекта по ключу.
+
+        Args:
+            project_id (int): ID проекта.
+            key (str): Ключ метаданных.
+
+        Returns:
+            bool: True, если удаление успешно, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                if conn:
+                    return metadata.delete_project_metadata(conn, project_id, key)
+                else:
+                    return False
+        except Exception as e:
+            logger.error(f"Ошибка при удалении метаданных проекта '{key}' (ID: {project_id}): {e}", exc_info=True)
+            return False
     # --- КОНЕЦ НОВОГО ---
 
     # --- Методы для работы с "сырыми" данными ---
@@ -283,6 +469,28 @@ class ProjectDBStorage:
             logger.error(f"Ошибка при сохранении сырых данных листа '{sheet_name}': {e}", exc_info=True)
             return False
 
+    def save_sheet_cells(self, sheet_id: int, cells: Iterable[Tuple[int, int, Any, Optional[str]]], encoded: bool = False) -> bool:
+        """
+        Сохраняет ячейки листа, заданные координатами (row, col, value, value_type).
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            cells (Iterable[Tuple[int, int, Any, Optional[str]]]): Кортежи ячеек, row/col 1-based.
+            encoded (bool): Значения уже в форме хранения с тегом типа value_type (без кодирования).
+
+        Returns:
+            bool: True, если сохранение успешно, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                if conn:
+                    return raw_data.save_sheet_cells(conn, sheet_id, cells, encoded)
+                else:
+                    return False
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении ячеек листа ID {sheet_id}: {e}", exc_info=True)
+            return False
+
     def load_sheet_raw_data(self, sheet_name: str) -> List[Dict[str, Any]]:
         """
         Загружает "сырые" данные листа из БД проекта.
@@ -295,7 +503,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия данных.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов raw_data.load_sheet_raw_data теперь с префиксом backend.storage
                     return raw_data.load_sheet_raw_data(conn, sheet_name) # <-- ИСПРАВЛЕНО
@@ -305,6 +513,66 @@ class ProjectDBStorage:
             logger.error(f"Ошибка при загрузке сырых данных листа '{sheet_name}': {e}", exc_info=True)
             return []
 
+    def load_cells(
+        self,
+        sheet_id: int,
+        row0: int = 1,
+        col0: int = 1,
+        row1: Optional[int] = None,
+        col1: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        decode: bool = True,
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Загружает ячейки прямоугольного диапазона листа в порядке строк (row-major).
+        Позволяет читать только видимое окно или очередной блок строк вместо всего листа.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            row0 (int): Первая строка диапазона (1-based, включительно).
+            col0 (int): Первый столбец диапазона (1-based, включительно).
+            row1 (Optional[int]): Последняя строка (включительно). None - до конца листа.
+            col1 (Optional[int]): Последний столбец (включительно). None - до последнего столбца.
+            columns (Optional[Sequence[str]]): Поля из cells.CELL_COLUMNS
+                ('row', 'col', 'value', 'value_type', 'cell_address').
+                По умолчанию ('row', 'col', 'value', 'value_type').
+            decode (bool): Преобразовывать 'value' в объекты Python (datetime, bool и т.д.).
+                False - значения как в БД (серийные номера дат, коды ошибок).
+
+        Returns:
+            List[Tuple[Any, ...]]: Список кортежей значений в порядке columns.
+            Возвращает пустой список в случае ошибки или отсутствия данных.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                if conn:
+                    return cells.load_cells(conn, sheet_id, row0, col0, row1, col1, columns, decode)
+                else:
+                    return []
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке диапазона ячеек листа ID {sheet_id}: {e}", exc_info=True)
+            return []
+
+    def get_cells_extent(self, sheet_id: int) -> Optional[Tuple[int, int]]:
+        """
+        Возвращает границы заполненной области листа (max_row, max_col), обе 1-based.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Optional[Tuple[int, int]]: (max_row, max_col) или None, если ячеек нет.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                if conn:
+                    return cells.get_cells_extent(conn, sheet_id)
+                else:
+                    return None
+        except Exception as e:
+            logger.error(f"Ошибка при определении границ листа ID {sheet_id}: {e}", exc_info=True)
+            return None
+
     # --- Методы для работы с редактируемыми данными ---
 
     # Используют функции из storage/editable_data.py
@@ -322,7 +590,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия данных.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов editable_data.load_sheet_editable_data теперь с префиксом backend.storage
                     return editable_data.load_sheet_editable_data(conn, sheet_id, sheet_name) # <-- ИСПРАВЛЕНО
@@ -360,13 +628,14 @@ class ProjectDBStorage:
 
     # Используют функции из storage/formulas.py
 
-    def save_sheet_formulas(self, sheet_id: int, formulas_list: List[Dict[str, str]]) -> bool:
+    def save_sheet_formulas(self, sheet_id: int, formulas_list: List[Dict[str, str]], replace: bool = True) -> bool:
         """
         Сохраняет формулы листа в БД проекта.
 
         Args:
             sheet_id (int): ID листа в БД.
             formulas_list (List[Dict[str, str]]): Список словарей с 'cell_address' и 'formula'.
+            replace (bool): Удалить существующие записи листа перед вставкой (False - дописать).
 
         Returns:
             bool: True, если сохранение успешно, иначе False.
@@ -375,7 +644,7 @@ class ProjectDBStorage:
             with self.get_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов formulas.save_sheet_formulas теперь с префиксом backend.storage
-                    return formulas.save_sheet_formulas(conn, sheet_id, formulas_list) # <-- ИСПРАВЛЕНО
+                    return formulas.save_sheet_formulas(conn, sheet_id, formulas_list, replace=replace) # <-- ИСПРАВЛЕНО
                 else:
                     return False
         except Exception as e:
@@ -394,7 +663,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия данных.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # ИСПРАВЛЕНО: Вызов formulas.load_sheet_formulas теперь с префиксом backend.storage
                     return formulas.load_sheet_formulas(conn, sheet_id) # <-- ИСПРАВЛЕНО
@@ -404,17 +673,288 @@ class ProjectDBStorage:
             logger.error(f"Ошибка при загрузке формул для листа ID {sheet_id}: {e}", exc_info=True)
             return []
 
+    def load_sheet_formula_values(self, sheet_id: int) -> Dict[str, Any]:
+        """
+        Загружает сохранённые в файле результаты формул листа.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Dict[str, Any]: {адрес ячейки: результат формулы}.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                if conn:
+                    return formulas.load_sheet_formula_values(conn, sheet_id)
+                else:
+                    return {}
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке результатов формул для листа ID {sheet_id}: {e}", exc_info=True)
+            return {}
+
+    def load_sheet_formula_records(self, sheet_id: int) -> List[Tuple[int, str, str, Any, Optional[str]]]:
+        """
+        Загружает формулы листа с результатами в представлении БД (для движка формул).
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            List[Tuple[int, str, str, Any, Optional[str]]]: (formula_id, cell_address, formula, cached_value, cached_value_type).
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return formulas.load_sheet_formula_records(conn, sheet_id) if conn else []
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке формул для листа ID {sheet_id}: {e}", exc_info=True)
+            return []
+
+    def update_cell_formulas(self, sheet_id: int, cells: List[Tuple[str, Optional[str]]]) -> bool:
+        """
+        Заменяет или удаляет формулы отдельных ячеек листа после их правки.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            cells (List[Tuple[str, Optional[str]]]): Кортежи (cell_address, formula); formula None - удалить формулу.
+
+        Returns:
+            bool: True, если запись успешна, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                return formulas.update_cell_formulas(conn, sheet_id, cells) if conn else False
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении формул ячеек листа ID {sheet_id}: {e}", exc_info=True)
+            return False
+
+    def save_formula_results(self, sheet_id: int, results: List[Tuple[str, Any, Optional[str]]]) -> bool:
+        """
+        Записывает вычисленные результаты формул листа (cached_value).
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            results (List[Tuple[str, Any, Optional[str]]]): Кортежи (cell_address, value, value_type).
+
+        Returns:
+            bool: True, если запись успешна, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                return formulas.save_formula_results(conn, sheet_id, results) if conn else False
+        except Exception as e:
+            logger.error(f"Ошибка при записи результатов формул для листа ID {sheet_id}: {e}", exc_info=True)
+            return False
+
+    # --- Методы для графа зависимостей формул (storage/dependencies.py) ---
+
+    def load_dependency_graph_sheets(self) -> Dict[int, int]:
+        """
+        Возвращает листы, для которых построен граф зависимостей формул.
+
+        Returns:
+            Dict[int, int]: {sheet_id: число формул в графе}.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return dependencies.load_dependency_graph_sheets(conn) if conn else {}
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке состояния графа зависимостей: {e}", exc_info=True)
+            return {}
+
+    def save_sheet_dependencies(
+        self,
+        sheet_id: int,
+        nodes: List[Tuple[int, int, int, bool]],
+        edges: List[Tuple[int, int, int, int, int, int, int]],
+    ) -> bool:
+        """
+        Заменяет граф зависимостей формул листа.
+
+        Args:
+            sheet_id (int): ID листа формул.
+            nodes (List[Tuple[int, int, int, bool]]): Формулы (row, col, formula_id, volatile).
+            edges (List[Tuple[int, int, int, int, int, int, int]]): Влияющие диапазоны
+                (row, col, ref_sheet_id, row1, col1, row2, col2).
+
+        Returns:
+            bool: True, если сохранение успешно, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                return dependencies.save_sheet_dependencies(conn, sheet_id, nodes, edges) if conn else False
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении графа зависимостей листа ID {sheet_id}: {e}", exc_info=True)
+            return False
+
+    def find_dependent_formulas(self, changed_cells: Sequence[Tuple[int, int, int]], include_volatile: bool = True) -> List[Tuple[int, int, int]]:
+        """
+        Находит формулы, транзитивно зависящие от изменённых ячеек.
+
+        Args:
+            changed_cells (Sequence[Tuple[int, int, int]]): Изменённые ячейки (sheet_id, row, col).
+            include_volatile (bool): Добавить волатильные формулы и зависящие от них.
+
+        Returns:
+            List[Tuple[int, int, int]]: Формулы (sheet_id, row, col).
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return dependencies.find_dependent_formulas(conn, changed_cells, include_volatile) if conn else []
+        except Exception as e:
+            logger.error(f"Ошибка при поиске зависимых формул: {e}", exc_info=True)
+            return []
+
+    def load_formula_records_at(self, sheet_id: int, cells: Iterable[Tuple[int, int]]) -> List[Tuple[int, int, str, str, Any, Optional[str]]]:
+        """
+        Загружает формулы указанных ячеек листа (для выборочного пересчёта).
+
+        Args:
+            sheet_id (int): ID листа.
+            cells (Iterable[Tuple[int, int]]): Ячейки (row, col).
+
+        Returns:
+            List[Tuple[int, int, str, str, Any, Optional[str]]]:
+            (row, col, cell_address, formula, cached_value, cached_value_type).
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return dependencies.load_formula_records_at(conn, sheet_id, cells) if conn else []
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке формул листа ID {sheet_id}: {e}", exc_info=True)
+            return []
+
+    def load_formula_values_in_range(self, sheet_id: int, row1: int, col1: int, row2: int, col2: int) -> List[Tuple[int, int, Any, Optional[str]]]:
+        """
+        Загружает результаты формул внутри прямоугольника листа.
+
+        Args:
+            sheet_id (int): ID листа.
+            row1, col1, row2, col2 (int): Границы прямоугольника (1-based, включительно).
+
+        Returns:
+            List[Tuple[int, int, Any, Optional[str]]]: (row, col, cached_value, cached_value_type).
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return dependencies.load_formula_values_in_range(conn, sheet_id, row1, col1, row2, col2) if conn else []
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке результатов формул листа ID {sheet_id}: {e}", exc_info=True)
+            return []
+
+    # --- Методы для инкрементального импорта (storage/fingerprints.py) ---
+
+    def load_sheet_fingerprints(self, sheet_id: int) -> Dict[int, str]:
+        """
+        Загружает отпечатки блоков листа.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Dict[int, str]: {номер блока: хэш}. Пустой словарь при ошибке или отсутствии отпечатков.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return fingerprints.load_sheet_fingerprints(conn, sheet_id) if conn else {}
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке отпечатков листа ID {sheet_id}: {e}", exc_info=True)
+            return {}
+
+    def save_sheet_fingerprints(self, sheet_id: int, sheet_fingerprints: Dict[int, str]) -> bool:
+        """
+        Заменяет отпечатки блоков листа.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            sheet_fingerprints (Dict[int, str]): {номер блока: хэш}.
+
+        Returns:
+            bool: True, если сохранение успешно, иначе False.
+        """
+        try:
+            with self.get_connection() as conn:
+                return fingerprints.save_sheet_fingerprints(conn, sheet_id, sheet_fingerprints) if conn else False
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении отпечатков листа ID {sheet_id}: {e}", exc_info=True)
+            return False
+
+    def load_sheet_formulas_by_block(self, sheet_id: int) -> Dict[int, Dict[Tuple[int, int], str]]:
+        """
+        Загружает формулы листа, сгруппированные по блокам строк.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Dict[int, Dict[Tuple[int, int], str]]: {номер блока: {(row, col): формула}}.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return fingerprints.load_sheet_formulas_by_block(conn, sheet_id) if conn else {}
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке формул листа ID {sheet_id} по блокам: {e}", exc_info=True)
+            return {}
+
+    def load_sheet_cell_blocks(self, sheet_id: int) -> Set[int]:
+        """
+        Возвращает номера блоков строк, в которых у листа есть ячейки.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Set[int]: Номера блоков.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                return fingerprints.load_sheet_cell_blocks(conn, sheet_id) if conn else set()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке блоков листа ID {sheet_id}: {e}", exc_info=True)
+            return set()
+
+    def apply_block_changes(
+        self,
+        sheet_id: int,
+        block: int,
+        block_cells: Dict[Tuple[int, int], Tuple[Any, str]],
+        block_formulas: Dict[Tuple[int, int], str],
+        stored_formulas: Dict[Tuple[int, int], str]
+    ) -> Optional[Dict[str, int]]:
+        """
+        Применяет к блоку строк листа только вставки, обновления и удаления ячеек и формул.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+            block (int): Номер блока строк.
+            block_cells (Dict[Tuple[int, int], Tuple[Any, str]]): Новые ячейки блока в виде хранения.
+            block_formulas (Dict[Tuple[int, int], str]): Новые формулы блока.
+            stored_formulas (Dict[Tuple[int, int], str]): Сохранённые формулы блока.
+
+        Returns:
+            Optional[Dict[str, int]]: Счётчики изменений или None при ошибке.
+        """
+        try:
+            with self.get_connection() as conn:
+                if conn:
+                    return fingerprints.apply_block_changes(conn, sheet_id, block, block_cells, block_formulas, stored_formulas)
+                return None
+        except Exception as e:
+            logger.error(f"Ошибка при применении изменений блока {block} листа ID {sheet_id}: {e}", exc_info=True)
+            return None
+
     # --- Методы для работы со стилями ---
 
     # Используют функции из storage/styles.py
 
-    def save_sheet_styles(self, sheet_id: int, styles_list: List[Dict[str, Any]]) -> bool:
+    def save_sheet_styles(self, sheet_id: int, styles_list: List[Dict[str, Any]], replace: bool = True) -> bool:
         """
         Сохраняет стили листа в БД проекта.
 
         Args:
             sheet_id (int): ID листа в БД.
             styles_list (List[Dict[str, Any]]): Список словарей с 'style_attributes' и 'range_address'.
+            replace (bool): Удалить существующие записи листа перед вставкой (False - дописать).
 
         Returns:
             bool: True, если сохранение успешно, иначе False.
@@ -424,7 +964,7 @@ class ProjectDBStorage:
                 if conn:
                     # Предполагается, что функция в styles.py имеет эту сигнатуру
                     # ИСПРАВЛЕНО: Вызов styles.save_sheet_styles теперь с префиксом backend.storage
-                    return styles.save_sheet_styles(conn, sheet_id, styles_list) # <-- ИСПРАВЛЕНО
+                    return styles.save_sheet_styles(conn, sheet_id, styles_list, replace=replace) # <-- ИСПРАВЛЕНО
                 else:
                     return False
         except Exception as e:
@@ -443,7 +983,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия данных.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # Предполагается, что функция в styles.py имеет эту сигнатуру
                     # ИСПРАВЛЕНО: Вызов styles.load_sheet_styles теперь с префиксом backend.storage
@@ -454,17 +994,39 @@ class ProjectDBStorage:
             logger.error(f"Ошибка при загрузке стилей для листа ID {sheet_id}: {e}", exc_info=True)
             return []
 
+    def load_sheet_style_refs(self, sheet_id: int) -> Dict[str, Any]:
+        """
+        Загружает стили листа в компактном виде: каждый используемый стиль один раз
+        плюс ссылки диапазон -> style_id.
+
+        Args:
+            sheet_id (int): ID листа в БД.
+
+        Returns:
+            Dict[str, Any]: {'styles': {style_id: JSON атрибутов}, 'ranges': [(range_address, style_id), ...]}.
+        """
+        try:
+            with self.get_read_connection() as conn:
+                if conn:
+                    return styles.load_sheet_style_refs(conn, sheet_id)
+                else:
+                    return {"styles": {}, "ranges": []}
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке стилей для листа ID {sheet_id}: {e}", exc_info=True)
+            return {"styles": {}, "ranges": []}
+
     # --- Методы для работы с диаграммами ---
 
     # Используют функции из storage/charts.py
 
-    def save_sheet_charts(self, sheet_id: int, charts_list: List[Dict[str, Any]]) -> bool:
+    def save_sheet_charts(self, sheet_id: int, charts_list: List[Dict[str, Any]], replace: bool = True) -> bool:
         """
         Сохраняет диаграммы листа в БД проекта.
 
         Args:
             sheet_id (int): ID листа в БД.
             charts_list (List[Dict[str, Any]]): Список словарей с данными диаграмм.
+            replace (bool): Удалить существующие записи листа перед вставкой (False - дописать).
 
         Returns:
             bool: True, если сохранение успешно, иначе False.
@@ -474,7 +1036,7 @@ class ProjectDBStorage:
                 if conn:
                     # Предполагается, что функция в charts.py имеет эту сигнатуру
                     # ИСПРАВЛЕНО: Вызов charts.save_sheet_charts теперь с префиксом backend.storage
-                    return charts.save_sheet_charts(conn, sheet_id, charts_list) # <-- ИСПРАВЛЕНО
+                    return charts.save_sheet_charts(conn, sheet_id, charts_list, replace=replace) # <-- ИСПРАВЛЕНО
                 else:
                     return False
         except Exception as e:
@@ -493,7 +1055,7 @@ class ProjectDBStorage:
             Возвращает пустой список в случае ошибки или отсутствия данных.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # Предполагается, что функция в charts.py имеет эту сигнатуру
                     # ИСПРАВЛЕНО: Вызов charts.load_sheet_charts теперь с префиксом backend.storage
@@ -593,7 +1155,7 @@ class ProjectDBStorage:
             List[Dict[str, Any]]: Список записей истории.
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_read_connection() as conn:
                 if conn:
                     # Предполагается, что функция в history.py имеет эту сигнатуру
                     # ИСПРАВЛЕНО: Вызов history.load_edit_history теперь с префиксом backend.storage
@@ -617,23 +1179,15 @@ class ProjectDBStorage:
             List[str]: Список строковых адресов объединенных диапазонов (например, ['A1:B2', 'C3:D5']).
                     Возвращает пустой список, если данных нет или произошла ошибка.
         """
-        if not self.connection:
-            logger.error("[ОБЪЕДИНЕНИЕ] Нет подключения к БД для загрузки объединенных ячеек.")
-            return []
-
         try:
             logger.debug(f"[ОБЪЕДИНЕНИЕ] Запрос объединенных ячеек для sheet_id={sheet_id}...")
-            # Устанавливаем row_factory для получения sqlite3.Row
-            self.connection.row_factory = sqlite3.Row
-            cursor = self.connection.execute(
-                "SELECT merged_cells_data FROM sheet_merged_cells WHERE sheet_id = ?", (sheet_id,)
-            )
-            row = cursor.fetchone()
-            # Сбрасываем row_factory в значение по умолчанию (None -> tuple)
-            self.connection.row_factory = None
-            
-            if row and row['merged_cells_data']:
-                merged_cells_list = json.loads(row['merged_cells_data'])
+            with self.get_read_connection() as conn:
+                row = conn.execute(
+                    "SELECT merged_cells_data FROM sheet_merged_cells WHERE sheet_id = ?", (sheet_id,)
+                ).fetchone()
+
+            if row and row[0]:
+                merged_cells_list = json.loads(row[0])
                 if isinstance(merged_cells_list, list):
                     logger.info(f"[ОБЪЕДИНЕНИЕ] Загружено {len(merged_cells_list)} объединенных диапазонов для sheet_id={sheet_id}.")
                     return merged_cells_list
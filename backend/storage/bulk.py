@@ -0,0 +1,249 @@
+# backend/storage/bulk.py
+"""
+Транзакционная сессия массовой записи в БД проекта.
+
+Функции модулей storage (save_sheet_raw_data, save_sheet_formulas и т.д.) сами вызывают
+connection.commit() после каждой записи. При импорте частями это приводит к тысячам
+fsync на одну книгу. BulkWriteSession подменяет соединение на время сессии:
+commit() из функций storage откладывается, вся запись идёт в одной транзакции,
+а внутри неё периодически создаются SAVEPOINT, ограниченные числом строк или объёмом данных.
+Реальный COMMIT выполняется один раз при завершении сессии (или явно через flush()).
+"""
+
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterable, Optional
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+# Границы одного SAVEPOINT по умолчанию
+DEFAULT_SAVEPOINT_ROWS = 50_000
+DEFAULT_SAVEPOINT_BYTES = 16 * 1024 * 1024
+# Для executemany больше стольких строк объём оценивается по равномерной выборке строк
+_SIZE_SAMPLE_ROWS = 1000
+
+
+def _estimate_params_size(parameters: Any) -> int:
+    """
+    Грубо оценивает объём данных в параметрах одного SQL-запроса (в байтах).
+
+    Args:
+        parameters: Кортеж/список/словарь параметров запроса.
+
+    Returns:
+        int: Оценка размера в байтах.
+    """
+    if not parameters:
+        return 0
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    size = 0
+    for value in values:
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+def _estimate_many_size(seq: list) -> int:
+    """
+    Оценивает объём данных executemany. Для больших пакетов оценка строится по
+    равномерной выборке из _SIZE_SAMPLE_ROWS строк: проход по каждому значению
+    стоил сопоставимо с самой вставкой.
+
+    Args:
+        seq (list): Параметры запросов.
+
+    Returns:
+        int: Оценка размера в байтах.
+    """
+    if len(seq) <= _SIZE_SAMPLE_ROWS:
+        return sum(_estimate_params_size(p) for p in seq)
+    step = len(seq) / _SIZE_SAMPLE_ROWS
+    sample = sum(_estimate_params_size(seq[int(i * step)]) for i in range(_SIZE_SAMPLE_ROWS))
+    return int(sample * step)
+
+
+class _BulkCursor:
+    """
+    Обёртка над sqlite3.Cursor, учитывающая объём записываемых данных в сессии.
+    Остальные атрибуты и методы делегируются исходному курсору.
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor, session: "BulkWriteSession"):
+        self._cursor = cursor
+        self._session = session
+
+    def execute(self, sql: str, parameters: Any = ()):
+        self._session._account_bytes(_estimate_params_size(parameters))
+        return self._cursor.execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]):
+        seq = list(seq_of_parameters)
+        self._session._account_bytes(_estimate_many_size(seq))
+        return self._cursor.executemany(sql, seq)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class BulkWriteSession:
+    """
+    Заместитель sqlite3.Connection на время массовой записи.
+
+    Передаётся функциям storage вместо соединения: commit() становится отложенным,
+    cursor()/execute()/executemany() учитывают объём записанных данных, остальные
+    атрибуты делегируются исходному соединению.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, max_rows: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            connection (sqlite3.Connection): Исходное соединение с БД проекта.
+            max_rows (Optional[int]): Максимум изменённых строк в одном SAVEPOINT.
+            max_bytes (Optional[int]): Максимум (оценочно) байт данных в одном SAVEPOINT.
+        """
+        self.raw_connection = connection
+        self.max_rows = max_rows or DEFAULT_SAVEPOINT_ROWS
+        self.max_bytes = max_bytes or DEFAULT_SAVEPOINT_BYTES
+        self._savepoint_name: Optional[str] = None
+        self._savepoint_seq = 0
+        self._batch_depth = 0
+        self._changes_at_savepoint = 0
+        self._bytes_since_savepoint = 0
+        # Статистика сессии
+        self.deferred_commits = 0
+        self.savepoints_released = 0
+        self.commits = 0
+
+    # --- Интерфейс sqlite3.Connection, используемый модулями storage ---
+
+    def cursor(self, *args, **kwargs) -> _BulkCursor:
+        return _BulkCursor(self.raw_connection.cursor(*args, **kwargs), self)
+
+    def execute(self, sql: str, parameters: Any = ()):
+        self._account_bytes(_estimate_params_size(parameters))
+        return self.raw_connection.execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]):
+        seq = list(seq_of_parameters)
+        self._account_bytes(_estimate_many_size(seq))
+        return self.raw_connection.executemany(sql, seq)
+
+    def commit(self):
+        """Отложенный commit: фиксирует только границу SAVEPOINT при превышении лимитов."""
+        self.deferred_commits += 1
+        self._maybe_roll_savepoint()
+
+    def rollback(self):
+        """Откатывает изменения до последнего SAVEPOINT, не прерывая сессию."""
+        if self._savepoint_name:
+            self.raw_connection.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint_name}")
+            self._reset_counters()
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw_connection, name)
+
+    # --- Управление сессией ---
+
+    def begin(self):
+        """Открывает транзакцию сессии и первый SAVEPOINT."""
+        if self.raw_connection.in_transaction:
+            # Фиксируем то, что было начато до сессии, чтобы не смешивать с массовой записью
+            self.raw_connection.commit()
+        self.raw_connection.execute("BEGIN")
+        self._open_savepoint()
+        logger.debug(f"Начата сессия массовой записи (max_rows={self.max_rows}, max_bytes={self.max_bytes}).")
+
+    def flush(self) -> bool:
+        """
+        Явно фиксирует накопленные изменения (COMMIT) и продолжает сессию в новой транзакции.
+
+        Returns:
+            bool: True, если изменения зафиксированы (False - вызов внутри write_batch()).
+        """
+        if self._batch_depth:
+            logger.warning("flush() внутри write_batch() пропущен: пакет ещё не завершён.")
+            return False
+        self._release_savepoint()
+        self.raw_connection.commit()
+        self.commits += 1
+        self.raw_connection.execute("BEGIN")
+        self._open_savepoint()
+        return True
+
+    def finish(self):
+        """Завершает сессию: единственный COMMIT всех изменений."""
+        self._release_savepoint()
+        self.raw_connection.commit()
+        self.commits += 1
+        logger.info(
+            f"Сессия массовой записи завершена: отложено commit - {self.deferred_commits}, "
+            f"SAVEPOINT - {self.savepoints_released}, COMMIT - {self.commits}."
+        )
+
+    def abort(self):
+        """Откатывает всю незафиксированную транзакцию сессии."""
+        self._savepoint_name = None
+        self.raw_connection.rollback()
+        logger.warning("Сессия массовой записи прервана, незафиксированные изменения откатаны.")
+
+    @contextmanager
+    def batch(self):
+        """
+        Пакет записи внутри сессии (вложенный SAVEPOINT).
+        При исключении изменения пакета откатываются, а исключение пробрасывается дальше.
+        """
+        self._savepoint_seq += 1
+        name = f"bulk_batch_{self._savepoint_seq}"
+        self.raw_connection.execute(f"SAVEPOINT {name}")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.raw_connection.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.raw_connection.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        else:
+            self.raw_connection.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            self._batch_depth -= 1
+        self._maybe_roll_savepoint()
+
+    # --- Внутренние методы ---
+
+    def _account_bytes(self, size: int):
+        self._bytes_since_savepoint += size
+
+    def _reset_counters(self):
+        self._changes_at_savepoint = self.raw_connection.total_changes
+        self._bytes_since_savepoint = 0
+
+    def _open_savepoint(self):
+        self._savepoint_seq += 1
+        self._savepoint_name = f"bulk_sp_{self._savepoint_seq}"
+        self.raw_connection.execute(f"SAVEPOINT {self._savepoint_name}")
+        self._reset_counters()
+
+    def _release_savepoint(self):
+        if self._savepoint_name:
+            self.raw_connection.execute(f"RELEASE SAVEPOINT {self._savepoint_name}")
+            self.savepoints_released += 1
+            self._savepoint_name = None
+
+    def _maybe_roll_savepoint(self):
+        """Закрывает текущий SAVEPOINT и открывает новый, если превышен лимит строк или байт."""
+        if self._batch_depth:
+            return
+        rows = self.raw_connection.total_changes - self._changes_at_savepoint
+        if rows >= self.max_rows or self._bytes_since_savepoint >= self.max_bytes:
+            logger.debug(f"Граница SAVEPOINT: строк {rows}, ~{self._bytes_since_savepoint} байт.")
+            self._release_savepoint()
+            self._open_savepoint()
+
+# Дополнительные функции для массовой записи (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,289 @@
+# backend/storage/cell_values.py
+"""
+Типизированное хранение значений ячеек в таблице 'cells'.
+
+Значения хранятся в «родных» типах SQLite, а исходный тип Python - в колонке value_type:
+- int/float   -> INTEGER/REAL как есть;
+- bool        -> INTEGER 0/1, тег 'bool';
+- datetime    -> REAL, серийный номер даты Excel (система 1900), тег 'datetime';
+- date        -> INTEGER, серийный номер даты Excel, тег 'date';
+- time        -> REAL, доля суток, тег 'time';
+- timedelta   -> REAL, число суток, тег 'timedelta';
+- ошибки Excel ('#DIV/0!' и т.п.) -> INTEGER код ошибки, тег 'error';
+- str         -> TEXT как есть.
+
+Преобразование в объекты Python выполняется при чтении (decode_cell_value), а в строку
+для отображения - только на границе GUI (format_cell_value_for_display).
+Текст, введённый в ячейку в GUI, так же на границе правки разбирается в число, дату и т.п.
+(parse_input_value).
+Это убирает разбор строк дат при загрузке/экспорте и позволяет считать агрегаты прямо в SQL.
+"""
+
+import datetime
+import logging
+import re
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+# Теги типов (колонка cells.value_type)
+TYPE_INT = "int"
+TYPE_FLOAT = "float"
+TYPE_STR = "str"
+TYPE_BOOL = "bool"
+TYPE_DATETIME = "datetime"
+TYPE_DATE = "date"
+TYPE_TIME = "time"
+TYPE_TIMEDELTA = "timedelta"
+TYPE_ERROR = "error"
+TYPE_NONE = "NoneType"
+
+# Теги, значения которых хранятся как серийные номера дат/времени Excel
+TEMPORAL_TYPES = (TYPE_DATETIME, TYPE_DATE, TYPE_TIME, TYPE_TIMEDELTA)
+
+# Коды ошибок Excel (совпадают с кодами ошибок в формате XLSB)
+EXCEL_ERROR_CODES = {
+    "#NULL!": 0x00,
+    "#DIV/0!": 0x07,
+    "#VALUE!": 0x0F,
+    "#REF!": 0x17,
+    "#NAME?": 0x1D,
+    "#NUM!": 0x24,
+    "#N/A": 0x2A,
+    "#GETTING_DATA": 0x2B,
+}
+EXCEL_ERRORS_BY_CODE = {code: text for text, code in EXCEL_ERROR_CODES.items()}
+
+# Начало отсчёта серийных дат Excel (система 1900, с учётом ошибки 29.02.1900)
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+_EXCEL_EPOCH_DATE = _EXCEL_EPOCH.date()
+_MS_PER_DAY = 86_400_000
+
+# Формат даты для отображения в GUI
+DISPLAY_DATE_FORMAT = "%d.%m.%Y"
+
+
+def _datetime_to_serial(value: datetime.datetime) -> float:
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    delta = value - _EXCEL_EPOCH
+    return delta.days + (delta.seconds * 1000 + delta.microseconds // 1000) / _MS_PER_DAY
+
+
+def _serial_to_datetime(serial: float) -> datetime.datetime:
+    # Округляем до миллисекунд (точность Excel), чтобы не получать 59.999999 секунд
+    return _EXCEL_EPOCH + datetime.timedelta(milliseconds=round(serial * _MS_PER_DAY))
+
+
+def _time_to_fraction(value: datetime.time) -> float:
+    ms = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + value.microsecond // 1000
+    return ms / _MS_PER_DAY
+
+
+def _fraction_to_time(fraction: float) -> datetime.time:
+    ms = round(fraction * _MS_PER_DAY) % _MS_PER_DAY
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return datetime.time(hours, minutes, seconds, ms * 1000)
+
+
+def encode_cell_value(value: Any, value_type: Optional[str] = None) -> Tuple[Any, str]:
+    """
+    Преобразует значение ячейки в представление для хранения в таблице 'cells'.
+
+    Args:
+        value (Any): Значение ячейки (из openpyxl, xlwings, GUI).
+        value_type (Optional[str]): Явно заданный тип. Учитывается TYPE_ERROR:
+            строка ошибки Excel сохраняется кодом только при явном указании,
+            чтобы обычный текст вида '#N/A' не превращался в ошибку.
+
+    Returns:
+        Tuple[Any, str]: (значение для SQLite, тег типа).
+    """
+    if value is None:
+        return None, TYPE_NONE
+    # bool проверяется раньше int: bool - подкласс int
+    if isinstance(value, bool):
+        return int(value), TYPE_BOOL
+    if isinstance(value, int):
+        return value, TYPE_INT
+    if isinstance(value, float):
+        return value, TYPE_FLOAT
+    if isinstance(value, str):
+        if value_type == TYPE_ERROR and value in EXCEL_ERROR_CODES:
+            return EXCEL_ERROR_CODES[value], TYPE_ERROR
+        return value, TYPE_STR
+    # datetime проверяется раньше date: datetime - подкласс date
+    if isinstance(value, datetime.datetime):
+        return _datetime_to_serial(value), TYPE_DATETIME
+    if isinstance(value, datetime.date):
+        return (value - _EXCEL_EPOCH_DATE).days, TYPE_DATE
+    if isinstance(value, datetime.time):
+        return _time_to_fraction(value), TYPE_TIME
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds() / 86400, TYPE_TIMEDELTA
+    if isinstance(value, Decimal):
+        return float(value), TYPE_FLOAT
+    # Прочие типы (например, numpy-скаляры или объекты openpyxl) сохраняем строкой
+    if hasattr(value, "item"):
+        try:
+            return encode_cell_value(value.item(), value_type)
+        except (TypeError, ValueError):
+            pass
+    return str(value), TYPE_STR
+
+
+def decode_legacy_text(value: str, value_type: str) -> Any:
+    """
+    Разбирает значение, сохранённое старыми версиями строкой
+    (столбец value TEXT таблиц raw_data_*: '5', '1.5', '2024-01-15 00:00:00').
+
+    Args:
+        value (str): Строковое значение из БД.
+        value_type (str): Тег типа.
+
+    Returns:
+        Any: Значение Python или исходная строка, если разобрать не удалось.
+    """
+    try:
+        if value_type == TYPE_INT:
+            return int(value)
+        if value_type == TYPE_FLOAT:
+            return float(value)
+        if value_type == TYPE_BOOL:
+            return value.strip().lower() in ("1", "true")
+        if value_type == TYPE_DATETIME:
+            return datetime.datetime.fromisoformat(value)
+        if value_type == TYPE_DATE:
+            return datetime.date.fromisoformat(value)
+        if value_type == TYPE_TIME:
+            return datetime.time.fromisoformat(value)
+    except ValueError:
+        logger.debug(f"Не удалось разобрать строку '{value}' как {value_type}.")
+    return value
+
+
+def decode_cell_value(value: Any, value_type: Optional[str]) -> Any:
+    """
+    Восстанавливает значение Python из представления в таблице 'cells'.
+
+    Args:
+        value (Any): Значение из колонки cells.value.
+        value_type (Optional[str]): Тег типа из колонки cells.value_type.
+
+    Returns:
+        Any: Значение ячейки (int, float, str, bool, datetime, date, time, timedelta или None).
+             Ошибки Excel возвращаются строкой ('#DIV/0!').
+    """
+    if value is None or value_type is None:
+        return value
+    if isinstance(value, str):
+        # Строки возвращаются как есть, кроме значений из старых БД, где всё хранилось текстом
+        if value_type != TYPE_STR:
+            return decode_legacy_text(value, value_type)
+        return value
+    if value_type == TYPE_DATETIME:
+        return _serial_to_datetime(value)
+    if value_type == TYPE_DATE:
+        return _EXCEL_EPOCH_DATE + datetime.timedelta(days=int(value))
+    if value_type == TYPE_TIME:
+        return _fraction_to_time(value)
+    if value_type == TYPE_TIMEDELTA:
+        return datetime.timedelta(days=value)
+    if value_type == TYPE_BOOL:
+        return bool(value)
+    if value_type == TYPE_ERROR:
+        return EXCEL_ERRORS_BY_CODE.get(value, "#VALUE!")
+    return value
+
+
+def format_cell_value_for_display(value: Any) -> str:
+    """
+    Форматирует значение ячейки (результат decode_cell_value) для отображения в GUI.
+
+    Args:
+        value (Any): Значение ячейки.
+
+    Returns:
+        str: Строковое представление ('DD.MM.YYYY' для дат, 'TRUE'/'FALSE' для логических значений).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime(DISPLAY_DATE_FORMAT)
+    if isinstance(value, datetime.time):
+        return value.strftime("%H:%M:%S")
+    return str(value)
+
+# Логические значения, вводимые текстом (английская и русская Excel)
+_INPUT_BOOLS = {"TRUE": True, "FALSE": False, "ИСТИНА": True, "ЛОЖЬ": False}
+# Форматы дат/времени, вводимых текстом в GUI (кроме ISO, который разбирает fromisoformat)
+_INPUT_DATETIME_FORMATS = (DISPLAY_DATE_FORMAT, "%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S")
+_INPUT_TIME_FORMATS = ("%H:%M", "%H:%M:%S")
+# Число, вводимое текстом (без '_', 'inf', 'nan', которые принимают int()/float())
+_INPUT_NUMBER_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+
+def parse_input_value(text: str) -> Any:
+    """
+    Преобразует текст, введённый в ячейку в GUI, в значение ячейки, как это делает Excel:
+    числа ('42', '1.5', '1,5', '15%'), логические значения ('TRUE', 'ЛОЖЬ'),
+    даты ('15.01.2024', '2024-01-15 00:00:00') и время ('09:30').
+    Формулы ('=...') и прочий текст возвращаются как есть; апостроф в начале
+    ('007) оставляет текст текстом; пустая строка очищает ячейку.
+
+    Args:
+        text (str): Введённый текст.
+
+    Returns:
+        Any: int, float, bool, datetime, time, str или None.
+    """
+    stripped = text.strip()
+    if not stripped:
+        return None
+    if text.startswith("'"):
+        return text[1:]
+    if stripped.startswith("="):
+        return text
+
+    boolean = _INPUT_BOOLS.get(stripped.upper())
+    if boolean is not None:
+        return boolean
+
+    number = stripped.replace("\u00a0", "").replace(" ", "")
+    percent = number.endswith("%")
+    if percent:
+        number = number[:-1]
+    if "," in number and "." not in number and number.count(",") == 1:
+        # Десятичная запятая (русская локаль)
+        number = number.replace(",", ".")
+    if _INPUT_NUMBER_RE.fullmatch(number):
+        value = int(number) if number.lstrip("+-").isdigit() else float(number)
+        return value / 100 if percent else value
+
+    for date_format in _INPUT_DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(stripped, date_format)
+        except ValueError:
+            pass
+    for time_format in _INPUT_TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(stripped, time_format).time()
+        except ValueError:
+            pass
+    if stripped[:1].isdigit() and "-" in stripped:
+        try:
+            # ISO-дата: так редактор показывает значение datetime ('2024-01-15 00:00:00')
+            return datetime.datetime.fromisoformat(stripped)
+        except ValueError:
+            pass
+    return text
+
+# Дополнительные функции преобразования значений (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,297 @@
+# backend/storage/cells.py
+
+import sqlite3
+import logging
+import re
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from backend.storage.cell_values import decode_cell_value
+from backend.storage.dependencies import invalidate_sheet_dependencies
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+# Имя единой таблицы значений ячеек (см. schema.SQL_CREATE_CELLS_TABLE)
+CELLS_TABLE_NAME = "cells"
+
+# Столбцы, которые можно запросить у load_cells/iter_cells.
+# 'cell_address' не хранится в таблице и вычисляется из (row, col).
+CELL_COLUMNS = ("row", "col", "value", "value_type", "cell_address")
+DEFAULT_CELL_COLUMNS = ("row", "col", "value", "value_type")
+
+# Сколько строк результата забирать из курсора за раз в iter_cells
+_FETCH_SIZE = 10_000
+
+# Регулярное выражение для адреса ячейки вида 'A1', '$B$12'
+_CELL_ADDRESS_RE = re.compile(r"^\$?([A-Za-z]{1,3})\$?(\d+)$")
+
+
+def column_letter_to_index(letters: str) -> int:
+    """
+    Преобразует буквенное обозначение столбца Excel в номер (1-based).
+
+    Args:
+        letters (str): Буквы столбца, например, 'A', 'AB'.
+
+    Returns:
+        int: Номер столбца (A -> 1).
+    """
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + (ord(ch) - ord('A') + 1)
+    return col
+
+
+def column_index_to_letter(col: int) -> str:
+    """
+    Преобразует номер столбца (1-based) в буквенное обозначение Excel.
+
+    Args:
+        col (int): Номер столбца (1 -> 'A').
+
+    Returns:
+        str: Буквы столбца.
+    """
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def address_to_row_col(cell_address: str) -> Tuple[int, int]:
+    """
+    Преобразует адрес ячейки Excel в пару (row, col), обе 1-based.
+
+    Args:
+        cell_address (str): Адрес ячейки, например, 'B3'.
+
+    Returns:
+        Tuple[int, int]: (row, col), например, (3, 2).
+
+    Raises:
+        ValueError: Если адрес имеет неверный формат.
+    """
+    match = _CELL_ADDRESS_RE.match(cell_address.strip()) if cell_address else None
+    if not match:
+        raise ValueError(f"Неверный формат адреса ячейки: {cell_address!r}")
+    return int(match.group(2)), column_letter_to_index(match.group(1))
+
+
+def row_col_to_address(row: int, col: int) -> str:
+    """
+    Преобразует пару (row, col), обе 1-based, в адрес ячейки Excel.
+
+    Args:
+        row (int): Номер строки.
+        col (int): Номер столбца.
+
+    Returns:
+        str: Адрес ячейки, например, 'B3'.
+    """
+    return f"{column_index_to_letter(col)}{row}"
+
+
+def get_sheet_id(connection: sqlite3.Connection, sheet_name: str, project_id: int = 1, create: bool = False) -> Optional[int]:
+    """
+    Возвращает sheet_id листа по его имени.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_name (str): Имя листа Excel.
+        project_id (int): ID проекта (по умолчанию 1 для MVP).
+        create (bool): Создать запись в 'sheets', если лист не найден.
+
+    Returns:
+        Optional[int]: sheet_id или None, если лист не найден и create=False.
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT sheet_id FROM sheets WHERE project_id = ? AND name = ?",
+        (project_id, sheet_name)
+    )
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    if not create:
+        return None
+    cursor.execute(
+        "INSERT INTO sheets (project_id, name) VALUES (?, ?)",
+        (project_id, sheet_name)
+    )
+    sheet_id = cursor.lastrowid
+    # Ссылки 'Лист!A1' на новый лист в уже разобранных формулах теперь разрешаются (как в sheets.save_sheet)
+    invalidate_sheet_dependencies(connection)
+    logger.info(f"Создан новый лист '{sheet_name}' с ID {sheet_id} для хранения ячеек.")
+    return sheet_id
+
+def iter_cells(
+    connection: sqlite3.Connection,
+    sheet_id: int,
+    row0: int = 1,
+    col0: int = 1,
+    row1: Optional[int] = None,
+    col1: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    decode: bool = True,
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    Построчно (row-major) перебирает ячейки прямоугольного диапазона листа.
+    Диапазон выбирается по первичному ключу (sheet_id, row, col), поэтому чтение
+    окна или очередного блока строк не требует сканирования всего листа.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа.
+        row0 (int): Первая строка диапазона (1-based, включительно).
+        col0 (int): Первый столбец диапазона (1-based, включительно).
+        row1 (Optional[int]): Последняя строка (включительно). None - до конца листа.
+        col1 (Optional[int]): Последний столбец (включительно). None - до последнего столбца.
+        columns (Optional[Sequence[str]]): Возвращаемые поля из CELL_COLUMNS.
+            По умолчанию DEFAULT_CELL_COLUMNS.
+        decode (bool): Преобразовывать 'value' в объекты Python (cell_values.decode_cell_value).
+            False - вернуть значения как они хранятся (серийные номера дат, коды ошибок).
+
+    Yields:
+        Tuple[Any, ...]: Кортеж значений в порядке columns.
+
+    Raises:
+        ValueError: Если запрошено неизвестное поле.
+    """
+    columns = tuple(columns) if columns else DEFAULT_CELL_COLUMNS
+    unknown = [name for name in columns if name not in CELL_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля ячеек: {unknown}. Допустимые: {CELL_COLUMNS}")
+
+    # Адрес вычисляется в Python, поэтому для него всегда выбираем row и col;
+    # для восстановления типа значения нужен value_type
+    need_address = "cell_address" in columns
+    need_decode = decode and "value" in columns
+    select_fields = [name for name in columns if name != "cell_address"]
+    required = (("row", "col") if need_address else ()) + (("value_type",) if need_decode else ())
+    for name in required:
+        if name not in select_fields:
+            select_fields.append(name)
+
+    conditions = ["sheet_id = ?", "row >= ?", "col >= ?"]
+    params: List[Any] = [sheet_id, row0, col0]
+    if row1 is not None:
+        conditions.append("row <= ?")
+        params.append(row1)
+    if col1 is not None:
+        conditions.append("col <= ?")
+        params.append(col1)
+
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT {', '.join(select_fields)} FROM {CELLS_TABLE_NAME} "
+        f"WHERE {' AND '.join(conditions)} ORDER BY row, col",
+        params
+    )
+
+    if not need_address and not need_decode:
+        while True:
+            batch = cursor.fetchmany(_FETCH_SIZE)
+            if not batch:
+                return
+            yield from batch
+
+    positions = {name: i for i, name in enumerate(select_fields)}
+    row_pos, col_pos = positions.get("row"), positions.get("col")
+    value_pos, type_pos = positions.get("value"), positions.get("value_type")
+
+    def _field(record, name):
+        if name == "cell_address":
+            return row_col_to_address(record[row_pos], record[col_pos])
+        if name == "value" and need_decode:
+            return decode_cell_value(record[value_pos], record[type_pos])
+        return record[positions[name]]
+
+    while True:
+        batch = cursor.fetchmany(_FETCH_SIZE)
+        if not batch:
+            return
+        for record in batch:
+            yield tuple(_field(record, name) for name in columns)
+
+
+def load_cells(
+    connection: sqlite3.Connection,
+    sheet_id: int,
+    row0: int = 1,
+    col0: int = 1,
+    row1: Optional[int] = None,
+    col1: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    decode: bool = True,
+) -> List[Tuple[Any, ...]]:
+    """
+    Загружает ячейки прямоугольного диапазона листа в порядке строк (row-major).
+    См. iter_cells().
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа.
+        row0 (int): Первая строка диапазона (1-based, включительно).
+        col0 (int): Первый столбец диапазона (1-based, включительно).
+        row1 (Optional[int]): Последняя строка (включительно). None - до конца листа.
+        col1 (Optional[int]): Последний столбец (включительно). None - до последнего столбца.
+        columns (Optional[Sequence[str]]): Возвращаемые поля из CELL_COLUMNS.
+        decode (bool): Преобразовывать 'value' в объекты Python.
+
+    Returns:
+        List[Tuple[Any, ...]]: Список кортежей значений в порядке columns.
+        Возвращает пустой список в случае ошибки.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки диапазона ячеек.")
+        return []
+
+    try:
+        cells = list(iter_cells(connection, sheet_id, row0, col0, row1, col1, columns, decode))
+        logger.debug(
+            f"Загружено {len(cells)} ячеек листа ID {sheet_id} "
+            f"в диапазоне ({row0}, {col0})-({row1 or '*'}, {col1 or '*'})."
+        )
+        return cells
+    except ValueError as ve:
+        logger.error(f"Неверные параметры диапазона ячеек для листа ID {sheet_id}: {ve}")
+        return []
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке диапазона ячеек листа ID {sheet_id}: {e}")
+        return []
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при загрузке диапазона ячеек листа ID {sheet_id}: {e}", exc_info=True)
+        return []
+
+
+def get_cells_extent(connection: sqlite3.Connection, sheet_id: int) -> Optional[Tuple[int, int]]:
+    """
+    Возвращает границы заполненной области листа по таблице 'cells'.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа.
+
+    Returns:
+        Optional[Tuple[int, int]]: (max_row, max_col) или None, если ячеек нет или произошла ошибка.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для определения границ листа.")
+        return None
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT MAX(row), MAX(col) FROM {CELLS_TABLE_NAME} WHERE sheet_id = ?",
+            (sheet_id,)
+        )
+        max_row, max_col = cursor.fetchone()
+        if max_row is None:
+            return None
+        return max_row, max_col
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при определении границ листа ID {sheet_id}: {e}")
+        return None
+
+# Дополнительные функции для работы с таблицей ячеек (если потребуются) могут быть добавлены здесь
@@ -9,7 +9,7 @@ import json # Импортируем json для сериализации
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
-def save_sheet_charts(connection: sqlite3.Connection, sheet_id: int, charts_list: list[dict]) -> bool:
+def save_sheet_charts(connection: sqlite3.Connection, sheet_id: int, charts_list: list[dict], replace: bool = True) -> bool:
     """
     Сохраняет диаграммы листа в БД проекта.
     В текущей реализации предполагается, что данные диаграммы уже подготовлены
@@ -22,6 +22,8 @@ def save_sheet_charts(connection: sqlite3.Connection, sheet_id: int, charts_list
                                   Каждый словарь должен содержать как минимум ключ 'chart_data',
                                   который представляет собой сериализованные данные диаграммы
                                   (например, строка JSON или XML).
+        replace (bool): Удалить существующие диаграммы листа перед вставкой.
+            False - дописать к уже сохранённым.
 
     Returns:
         bool: True, если сохранение успешно, иначе False.
@@ -39,8 +41,9 @@ def save_sheet_charts(connection: sqlite3.Connection, sheet_id: int, charts_list
         
         # Удаляем существующие диаграммы для этого листа, чтобы избежать дубликатов
         # Предполагается, что диаграммы хранятся в таблице 'sheet_charts'
-        cursor.execute("DELETE FROM sheet_charts WHERE sheet_id = ?", (sheet_id,))
-        logger.debug(f"Удалены существующие диаграммы для sheet_id {sheet_id}.")
+        if replace:
+            cursor.execute("DELETE FROM sheet_charts WHERE sheet_id = ?", (sheet_id,))
+            logger.debug(f"Удалены существующие диаграммы для sheet_id {sheet_id}.")
 
         # Подготавливаем данные для вставки
         # Предполагаем, что каждый элемент charts_list имеет ключ 'chart_data'
@@ -79,6 +82,7 @@ def save_sheet_charts(connection: sqlite3.Connection, sheet_id: int, charts_list
             connection.commit()
             logger.info(f"Сохранено {len(charts_to_insert)} диаграмм для листа ID {sheet_id}.")
         else:
+             connection.commit()
              logger.info(f"Нет диаграмм для сохранения для листа ID {sheet_id}.")
              
         return True
@@ -0,0 +1,222 @@
+# backend/storage/connection_manager.py
+"""
+Пул соединений с БД проекта.
+
+sqlite3.Connection нельзя безопасно разделять между потоками, а открытие/закрытие
+соединения на каждый вызов ProjectDBStorage.get_connection() заметно дорого.
+ConnectionManager выдаёт:
+- по одному соединению только для чтения (query_only) на поток - для чтения из GUI и воркеров;
+- одно общее соединение для записи, доступ к которому сериализуется блокировкой.
+Соединения переиспользуются между операциями и периодически проверяются (health check).
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from backend.storage import profiles
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) повторно проверять соединение перед выдачей
+HEALTH_CHECK_INTERVAL = 30.0
+
+
+class _PooledConnection:
+    """Соединение пула и время его последней проверки."""
+
+    __slots__ = ("connection", "checked_at")
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.checked_at = time.monotonic()
+
+
+class ConnectionManager:
+    """
+    Реестр соединений с одной БД проекта: читатели по потокам и один сериализованный писатель.
+    """
+
+    def __init__(self, db_path: str, profile: Optional[str] = None):
+        """
+        Args:
+            db_path (str): Путь к файлу БД проекта.
+            profile (Optional[str]): Профиль хранилища (см. profiles.py).
+        """
+        self.db_path = db_path
+        self.profile = profiles.resolve_profile_name(profile)
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._readers: Dict[int, _PooledConnection] = {}
+        self._writer: Optional[_PooledConnection] = None
+        self.stats: Dict[str, int] = {"opened": 0, "reused": 0, "reopened": 0}
+
+    # --- Внутренние методы ---
+
+    def _open(self, read_only: bool) -> sqlite3.Connection:
+        # check_same_thread=False: читатель используется только своим потоком,
+        # писатель - только под блокировкой, но закрыть их можно из любого потока.
+        connection = profiles.open_connection(self.db_path, self.profile, check_same_thread=False)
+        if read_only:
+            connection.execute("PRAGMA query_only = ON")
+        self.stats["opened"] += 1
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection: sqlite3.Connection) -> bool:
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _checked(self, pooled: Optional[_PooledConnection], read_only: bool) -> _PooledConnection:
+        """Возвращает рабочее соединение: переиспользует pooled или открывает новое."""
+        now = time.monotonic()
+        if pooled is not None:
+            if now - pooled.checked_at < HEALTH_CHECK_INTERVAL or self._is_healthy(pooled.connection):
+                pooled.checked_at = now
+                self.stats["reused"] += 1
+                return pooled
+            logger.warning(f"Соединение пула с {self.db_path} не прошло проверку, открывается заново.")
+            self._close_quietly(pooled.connection)
+            self.stats["reopened"] += 1
+        return _PooledConnection(self._open(read_only))
+
+    @staticmethod
+    def _close_quietly(connection: sqlite3.Connection):
+        try:
+            connection.close()
+        except sqlite3.Error as e:
+            logger.debug(f"Ошибка при закрытии соединения пула: {e}")
+
+    # --- Публичный интерфейс ---
+
+    def get_reader(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение только для чтения, закреплённое за текущим потоком.
+
+        Returns:
+            sqlite3.Connection: Соединение с PRAGMA query_only = ON.
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            pooled = self._checked(self._readers.get(ident), read_only=True)
+            self._readers[ident] = pooled
+            return pooled.connection
+
+    @contextmanager
+    def reader(self):
+        """Контекстный менеджер для соединения только для чтения текущего потока."""
+        yield self.get_reader()
+
+    @contextmanager
+    def writer(self):
+        """
+        Контекстный менеджер для единственного соединения записи.
+        Доступ сериализуется: пока один поток пишет, остальные ждут.
+        Незавершённая транзакция при исключении откатывается. Транзакция, оставшаяся
+        открытой после обычного выхода (функция хранилища поймала sqlite3.Error и вернула False
+        без rollback), тоже откатывается - иначе её зафиксировал бы commit() следующей записи.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._writer = self._checked(self._writer, read_only=False)
+                connection = self._writer.connection
+            try:
+                yield connection
+            except BaseException:
+                if connection.in_transaction:
+                    connection.rollback()
+                raise
+            if connection.in_transaction:
+                logger.warning(f"Незавершённая транзакция на соединении записи {self.db_path} откатывается.")
+                connection.rollback()
+
+    def release_current_thread(self):
+        """Закрывает соединение чтения текущего потока (вызывать при завершении воркера)."""
+        with self._lock:
+            pooled = self._readers.pop(threading.get_ident(), None)
+        if pooled is not None:
+            self._close_quietly(pooled.connection)
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Проверяет все соединения пула и закрывает неработоспособные.
+
+        Returns:
+            Dict[str, Any]: Количество читателей, состояние писателя и статистика пула.
+        """
+        with self._lock:
+            broken = [ident for ident, pooled in self._readers.items() if not self._is_healthy(pooled.connection)]
+            for ident in broken:
+                self._close_quietly(self._readers.pop(ident).connection)
+            writer_ok = self._writer is not None and self._is_healthy(self._writer.connection)
+            return {
+                "db_path": self.db_path,
+                "profile": self.profile,
+                "readers": len(self._readers),
+                "broken_readers_closed": len(broken),
+                "writer_open": writer_ok,
+                **self.stats,
+            }
+
+    def close_all(self):
+        """Закрывает все соединения пула."""
+        with self._write_lock:
+            with self._lock:
+                for pooled in self._readers.values():
+                    self._close_quietly(pooled.connection)
+                self._readers.clear()
+                if self._writer is not None:
+                    self._close_quietly(self._writer.connection)
+                    self._writer = None
+        logger.debug(f"Пул соединений с {self.db_path} закрыт.")
+
+
+# --- Реестр пулов по БД ---
+
+_managers: Dict[Tuple[str, str], ConnectionManager] = {}
+_registry_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str, profile: Optional[str] = None) -> ConnectionManager:
+    """
+    Возвращает общий для процесса пул соединений для БД и профиля.
+
+    Args:
+        db_path (str): Путь к файлу БД проекта.
+        profile (Optional[str]): Профиль хранилища.
+
+    Returns:
+        ConnectionManager: Пул соединений.
+    """
+    key = (os.path.abspath(db_path), profiles.resolve_profile_name(profile))
+    with _registry_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path, key[1])
+            _managers[key] = manager
+        return manager
+
+
+def close_connection_managers(db_path: Optional[str] = None):
+    """
+    Закрывает пулы соединений (для указанной БД или все).
+
+    Args:
+        db_path (Optional[str]): Путь к БД. Если None, закрываются все пулы.
+    """
+    target = os.path.abspath(db_path) if db_path else None
+    with _registry_lock:
+        keys = [key for key in _managers if target is None or key[0] == target]
+        managers = [_managers.pop(key) for key in keys]
+    for manager in managers:
+        manager.close_all()
+
+# Дополнительные функции для работы с пулом (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,341 @@
+# backend/storage/dependencies.py
+"""
+Граф зависимостей формул проекта (для выборочного пересчёта после правки ячейки).
+
+Узлы графа:
+- формулы ('formula_nodes'): ячейка с формулой, ссылка на запись 'formulas' и признак
+  волатильности (TODAY(), NOW() пересчитываются при любой правке);
+- диапазоны ('dependency_ranges'): ячейка или прямоугольник листа, на который ссылается
+  хотя бы одна формула; одинаковые диапазоны разных формул хранятся один раз.
+
+Рёбра 'formula_precedents' (формула -> диапазон) - влияющие ячейки формулы; индекс
+idx_formula_dependents по range_id даёт обратное направление - зависимые формулы диапазона.
+Листы с построенным графом перечислены в 'formula_graph_sheets'; запись формул листа
+(save_sheet_formulas, инкрементальный импорт) сбрасывает его граф.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.storage.formulas import FORMULAS_TABLE_NAME
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+FORMULA_NODES_TABLE_NAME = "formula_nodes"
+DEPENDENCY_RANGES_TABLE_NAME = "dependency_ranges"
+FORMULA_PRECEDENTS_TABLE_NAME = "formula_precedents"
+FORMULA_GRAPH_SHEETS_TABLE_NAME = "formula_graph_sheets"
+
+# Сколько изменённых ячеек передаётся в один запрос поиска зависимых формул (3 параметра на ячейку)
+_CHANGED_CELLS_PER_QUERY = 300
+# Больше стольких прямоугольников в области правки - ячейки не отбираются заранее, а ищутся запросом
+_PREFILTER_MAX_RECTS = 64
+# Сколько адресов передаётся в один запрос IN (...)
+_CELLS_PER_QUERY = 500
+
+# Зависимые формулы изменённых ячеек и, транзитивно, зависимые от них.
+# Ячейка входит в диапазон-узел либо точно (узел-ячейка, поиск по UNIQUE-индексу),
+# либо попадает в прямоугольник (is_range = 1, индекс idx_dependency_ranges_area).
+# UNION (без ALL) отбрасывает уже найденные формулы, поэтому циклы не зацикливают обход.
+_DEPENDENTS_QUERY = f"""
+WITH RECURSIVE
+    changed(sheet_id, row, col) AS (VALUES {{changed}}),
+    seed(sheet_id, row, col) AS (
+        SELECT p.sheet_id, p.row, p.col
+        FROM changed AS c
+        JOIN {FORMULA_PRECEDENTS_TABLE_NAME} AS p ON p.range_id IN (
+            SELECT r.range_id FROM {DEPENDENCY_RANGES_TABLE_NAME} AS r
+            WHERE r.sheet_id = c.sheet_id AND r.row1 = c.row AND r.col1 = c.col AND r.row2 = c.row AND r.col2 = c.col
+            UNION ALL
+            SELECT r.range_id FROM {DEPENDENCY_RANGES_TABLE_NAME} AS r
+            WHERE r.sheet_id = c.sheet_id AND r.is_range = 1
+              AND r.col1 <= c.col AND r.col2 >= c.col AND r.row1 <= c.row AND r.row2 >= c.row
+        )
+        {{volatile}}
+    ),
+    dirty(sheet_id, row, col) AS (
+        SELECT sheet_id, row, col FROM seed
+        UNION
+        SELECT p.sheet_id, p.row, p.col
+        FROM dirty AS d
+        JOIN {FORMULA_PRECEDENTS_TABLE_NAME} AS p ON p.range_id IN (
+            SELECT r.range_id FROM {DEPENDENCY_RANGES_TABLE_NAME} AS r
+            WHERE r.sheet_id = d.sheet_id AND r.row1 = d.row AND r.col1 = d.col AND r.row2 = d.row AND r.col2 = d.col
+            UNION ALL
+            SELECT r.range_id FROM {DEPENDENCY_RANGES_TABLE_NAME} AS r
+            WHERE r.sheet_id = d.sheet_id AND r.is_range = 1
+              AND r.col1 <= d.col AND r.col2 >= d.col AND r.row1 <= d.row AND r.row2 >= d.row
+        )
+    )
+SELECT sheet_id, row, col FROM dirty
+"""
+
+
+def invalidate_sheet_dependencies(connection: sqlite3.Connection, sheet_id: Optional[int] = None):
+    """
+    Сбрасывает граф зависимостей листа после изменения его формул.
+    Вызывается модулями хранилища внутри их транзакции; commit не выполняет.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (Optional[int]): ID листа. None - сбрасывается граф всех листов
+            (новый или переименованный лист меняет смысл ссылок 'Лист!A1' в формулах).
+    """
+    try:
+        if sheet_id is None:
+            for table in (FORMULA_GRAPH_SHEETS_TABLE_NAME, FORMULA_PRECEDENTS_TABLE_NAME,
+                          FORMULA_NODES_TABLE_NAME, DEPENDENCY_RANGES_TABLE_NAME):
+                connection.execute(f"DELETE FROM {table}")
+        else:
+            for table in (FORMULA_GRAPH_SHEETS_TABLE_NAME, FORMULA_PRECEDENTS_TABLE_NAME, FORMULA_NODES_TABLE_NAME):
+                connection.execute(f"DELETE FROM {table} WHERE sheet_id = ?", (sheet_id,))
+    except sqlite3.OperationalError as e:
+        # БД, созданная до появления графа зависимостей: сбрасывать нечего
+        if "no such table" not in str(e):
+            raise
+
+
+def load_dependency_graph_sheets(connection: sqlite3.Connection) -> Dict[int, int]:
+    """
+    Листы, для которых граф зависимостей построен.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+
+    Returns:
+        Dict[int, int]: {sheet_id: число формул в графе}. Пустой словарь при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки состояния графа зависимостей.")
+        return {}
+
+    try:
+        cursor = connection.execute(f"SELECT sheet_id, formulas FROM {FORMULA_GRAPH_SHEETS_TABLE_NAME}")
+        return dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке состояния графа зависимостей: {e}")
+        return {}
+
+
+def save_sheet_dependencies(
+    connection: sqlite3.Connection,
+    sheet_id: int,
+    nodes: List[Tuple[int, int, int, bool]],
+    edges: List[Tuple[int, int, int, int, int, int, int]],
+) -> bool:
+    """
+    Заменяет граф зависимостей формул листа.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа формул.
+        nodes (List[Tuple[int, int, int, bool]]): Формулы листа (row, col, formula_id, volatile).
+        edges (List[Tuple[int, int, int, int, int, int, int]]): Влияющие диапазоны формул
+            (row, col, ref_sheet_id, row1, col1, row2, col2); координаты 1-based, включительно.
+
+    Returns:
+        bool: True, если сохранение успешно, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для сохранения графа зависимостей.")
+        return False
+
+    try:
+        cursor = connection.cursor()
+        invalidate_sheet_dependencies(connection, sheet_id)
+
+        cursor.executemany(
+            f"INSERT INTO {FORMULA_NODES_TABLE_NAME} (sheet_id, row, col, formula_id, volatile) VALUES (?, ?, ?, ?, ?)",
+            [(sheet_id, row, col, formula_id, int(volatile)) for row, col, formula_id, volatile in nodes]
+        )
+        ranges = {edge[2:] for edge in edges}
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {DEPENDENCY_RANGES_TABLE_NAME} (sheet_id, row1, col1, row2, col2, is_range) "
+            f"VALUES (?, ?, ?, ?, ?, ?)",
+            [(*rect, int(rect[1] != rect[3] or rect[2] != rect[4])) for rect in ranges]
+        )
+        # range_id диапазонов - одним запросом по листам ссылок, а не поиском на каждое ребро
+        range_ids = {}
+        for ref_sheet_id in {rect[0] for rect in ranges}:
+            for range_id, *rect in cursor.execute(
+                f"SELECT range_id, sheet_id, row1, col1, row2, col2 FROM {DEPENDENCY_RANGES_TABLE_NAME} WHERE sheet_id = ?",
+                (ref_sheet_id,)
+            ):
+                range_ids[tuple(rect)] = range_id
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {FORMULA_PRECEDENTS_TABLE_NAME} (sheet_id, row, col, range_id) VALUES (?, ?, ?, ?)",
+            sorted({(sheet_id, row, col, range_ids[tuple(rect)]) for row, col, *rect in edges})
+        )
+        # Диапазоны, на которые больше не ссылается ни одна формула
+        cursor.execute(
+            f"DELETE FROM {DEPENDENCY_RANGES_TABLE_NAME} WHERE NOT EXISTS ("
+            f"SELECT 1 FROM {FORMULA_PRECEDENTS_TABLE_NAME} AS p WHERE p.range_id = {DEPENDENCY_RANGES_TABLE_NAME}.range_id)"
+        )
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {FORMULA_GRAPH_SHEETS_TABLE_NAME} (sheet_id, formulas, built_at) VALUES (?, ?, ?)",
+            (sheet_id, len(nodes), datetime.now().isoformat())
+        )
+        connection.commit()
+        logger.debug(f"Граф зависимостей листа ID {sheet_id}: {len(nodes)} формул, {len(edges)} ссылок, {len(ranges)} диапазонов.")
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при сохранении графа зависимостей листа ID {sheet_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при сохранении графа зависимостей листа ID {sheet_id}: {e}", exc_info=True)
+        return False
+
+
+def _referenced_cells(connection: sqlite3.Connection, changed_cells: Sequence[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """
+    Отбирает изменённые ячейки, на которые ссылается хотя бы один диапазон графа.
+    Диапазоны загружаются одним запросом на лист по области правки, поэтому запись
+    большого блока значений, на который не ссылаются формулы, не перебирается рекурсивным запросом.
+    """
+    sheet_ids = {cell[0] for cell in changed_cells}
+    referenced = []
+    for sheet_id in sheet_ids:
+        cells = changed_cells if len(sheet_ids) == 1 else [cell for cell in changed_cells if cell[0] == sheet_id]
+        rows = [cell[1] for cell in cells]
+        cols = [cell[2] for cell in cells]
+        ranges = connection.execute(
+            f"SELECT row1, col1, row2, col2, is_range FROM {DEPENDENCY_RANGES_TABLE_NAME} "
+            f"WHERE sheet_id = ? AND row1 <= ? AND row2 >= ? AND col1 <= ? AND col2 >= ?",
+            (sheet_id, max(rows), min(rows), max(cols), min(cols))
+        ).fetchall()
+        if not ranges:
+            continue
+        rects = [rect[:4] for rect in ranges if rect[4]]
+        if len(rects) > _PREFILTER_MAX_RECTS:
+            referenced.extend(cells)
+            continue
+        points = {(rect[0], rect[1]) for rect in ranges if not rect[4]}
+        referenced.extend(
+            cell for cell in cells
+            if (cell[1], cell[2]) in points
+            or any(row1 <= cell[1] <= row2 and col1 <= cell[2] <= col2 for row1, col1, row2, col2 in rects)
+        )
+    return referenced
+
+
+def find_dependent_formulas(
+    connection: sqlite3.Connection,
+    changed_cells: Sequence[Tuple[int, int, int]],
+    include_volatile: bool = True,
+) -> List[Tuple[int, int, int]]:
+    """
+    Находит формулы, транзитивно зависящие от изменённых ячеек (по сохранённому графу).
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        changed_cells (Sequence[Tuple[int, int, int]]): Изменённые ячейки (sheet_id, row, col).
+        include_volatile (bool): Добавить волатильные формулы (TODAY(), NOW()) и зависящие от них.
+
+    Returns:
+        List[Tuple[int, int, int]]: Формулы (sheet_id, row, col) без повторов. Пустой список при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для поиска зависимых формул.")
+        return []
+
+    volatile = f"UNION SELECT sheet_id, row, col FROM {FORMULA_NODES_TABLE_NAME} WHERE volatile = 1"
+    found = set()
+    try:
+        changed_cells = _referenced_cells(connection, changed_cells)
+        for start in range(0, max(len(changed_cells), 1), _CHANGED_CELLS_PER_QUERY):
+            chunk = changed_cells[start:start + _CHANGED_CELLS_PER_QUERY]
+            if not chunk:
+                # Изменений нет - только волатильные формулы
+                if not include_volatile:
+                    break
+                chunk = [(0, 0, 0)]
+            query = _DEPENDENTS_QUERY.format(
+                changed=", ".join("(?, ?, ?)" for _ in chunk),
+                volatile=volatile if include_volatile and start == 0 else "",
+            )
+            found.update(connection.execute(query, [value for cell in chunk for value in cell]).fetchall())
+        return list(found)
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при поиске зависимых формул: {e}")
+        return []
+
+
+def load_formula_records_at(connection: sqlite3.Connection, sheet_id: int, cells: Iterable[Tuple[int, int]]) -> List[Tuple[int, int, str, str, Any, Optional[str]]]:
+    """
+    Загружает формулы указанных ячеек листа по узлам графа (без decode_cell_value).
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа.
+        cells (Iterable[Tuple[int, int]]): Ячейки (row, col).
+
+    Returns:
+        List[Tuple[int, int, str, str, Any, Optional[str]]]: Кортежи
+        (row, col, cell_address, formula, cached_value, cached_value_type). Пустой список при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки формул.")
+        return []
+
+    cells = list(cells)
+    records = []
+    try:
+        for start in range(0, len(cells), _CELLS_PER_QUERY):
+            chunk = cells[start:start + _CELLS_PER_QUERY]
+            records.extend(connection.execute(
+                f"WITH wanted(row, col) AS (VALUES {', '.join('(?, ?)' for _ in chunk)}) "
+                f"SELECT n.row, n.col, f.cell_address, f.formula, f.cached_value, f.cached_value_type "
+                f"FROM wanted AS w "
+                f"JOIN {FORMULA_NODES_TABLE_NAME} AS n ON n.sheet_id = ? AND n.row = w.row AND n.col = w.col "
+                f"JOIN {FORMULAS_TABLE_NAME} AS f ON f.formula_id = n.formula_id",
+                [value for cell in chunk for value in cell] + [sheet_id]
+            ).fetchall())
+        return records
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке формул листа ID {sheet_id}: {e}")
+        return []
+
+
+def load_formula_values_in_range(
+    connection: sqlite3.Connection,
+    sheet_id: int,
+    row1: int,
+    col1: int,
+    row2: int,
+    col2: int,
+) -> List[Tuple[int, int, Any, Optional[str]]]:
+    """
+    Загружает результаты формул внутри прямоугольника листа (по узлам графа, без decode_cell_value).
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа.
+        row1, col1, row2, col2 (int): Границы прямоугольника (1-based, включительно).
+
+    Returns:
+        List[Tuple[int, int, Any, Optional[str]]]: Кортежи (row, col, cached_value, cached_value_type).
+        Пустой список при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки результатов формул.")
+        return []
+
+    try:
+        return connection.execute(
+            f"SELECT n.row, n.col, f.cached_value, f.cached_value_type "
+            f"FROM {FORMULA_NODES_TABLE_NAME} AS n JOIN {FORMULAS_TABLE_NAME} AS f ON f.formula_id = n.formula_id "
+            f"WHERE n.sheet_id = ? AND n.row BETWEEN ? AND ? AND n.col BETWEEN ? AND ?",
+            (sheet_id, row1, row2, col1, col2)
+        ).fetchall()
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке результатов формул листа ID {sheet_id}: {e}")
+        return []
+
+# Дополнительные функции для работы с графом зависимостей (если потребуются) могут быть добавлены здесь
@@ -4,22 +4,13 @@ import sqlite3
 import logging
 from typing import List, Dict, Any, Optional
 
+from backend.storage.cells import CELLS_TABLE_NAME, address_to_row_col, row_col_to_address
+from backend.storage.cell_values import encode_cell_value, decode_cell_value
+from backend.storage.fingerprints import invalidate_sheet_fingerprints
+
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
-def _get_raw_data_table_name(sheet_name: str) -> str:
-    """
-    Генерирует имя таблицы для "сырых" данных листа.
-    Args:
-        sheet_name (str): Имя листа Excel.
-    Returns:
-        str: Имя таблицы в БД.
-    """
-    # Санитизация имени таблицы для безопасности
-    sanitized_sheet_name = "".join(c for c in sheet_name if c.isalnum() or c in (' ', '_')).rstrip()
-    sanitized_sheet_name = sanitized_sheet_name.replace(' ', '_')
-    return f"raw_data_{sanitized_sheet_name}"
-
 def load_sheet_editable_data(connection: sqlite3.Connection, sheet_id: int, sheet_name: str) -> List[Dict[str, Any]]:
     """
     Загружает "сырые" (редактируемые) данные для указанного листа.
@@ -37,22 +28,17 @@ def load_sheet_editable_data(connection: sqlite3.Connection, sheet_id: int, shee
 
     try:
         cursor = connection.cursor()
-        table_name = _get_raw_data_table_name(sheet_name)
-
-        # Проверяем, существует ли таблица
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name=?
-        """, (table_name,))
-        if not cursor.fetchone():
-            logger.info(f"Таблица 'сырых' данных '{table_name}' не найдена. Возвращается пустой список.")
-            return []
-
-        # Загружаем данные
-        cursor.execute(f"SELECT cell_address, value FROM {table_name}")
+        # Загружаем данные напрямую по sheet_id, имя листа нужно только для логов
+        cursor.execute(
+            f"SELECT row, col, value, value_type FROM {CELLS_TABLE_NAME} WHERE sheet_id = ? ORDER BY row, col",
+            (sheet_id,)
+        )
         rows = cursor.fetchall()
-        
-        editable_data = [{"cell_address": row[0], "value": row[1]} for row in rows]
+
+        editable_data = [
+            {"cell_address": row_col_to_address(row, col), "value": decode_cell_value(value, value_type)}
+            for row, col, value, value_type in rows
+        ]
         logger.debug(f"Загружено {len(editable_data)} записей 'сырых' данных для листа '{sheet_name}' (ID: {sheet_id}).")
         return editable_data
 
@@ -65,7 +51,7 @@ def load_sheet_editable_data(connection: sqlite3.Connection, sheet_id: int, shee
 
 def update_editable_cell(connection: sqlite3.Connection, sheet_id: int, sheet_name: str, cell_address: str, new_value: Any) -> bool:
     """
-    Обновляет значение редактируемой ячейки в таблице raw_data_<имя_листа>.
+    Обновляет значение редактируемой ячейки в таблице 'cells'.
     Если запись для ячейки не существует, она создается.
     Args:
         connection (sqlite3.Connection): Активное соединение с БД проекта.
@@ -82,36 +68,24 @@ def update_editable_cell(connection: sqlite3.Connection, sheet_id: int, sheet_na
 
     try:
         cursor = connection.cursor()
-        table_name = _get_raw_data_table_name(sheet_name)
+        row, col = address_to_row_col(cell_address)
 
-        # Проверяем, существует ли таблица, и создаем её, если нет
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name=?
-        """, (table_name,))
-        if not cursor.fetchone():
-            logger.info(f"Таблица '{table_name}' не найдена, создаем новую.")
-            cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS {table_name} (
-                    cell_address TEXT PRIMARY KEY,
-                    value TEXT,
-                    value_type TEXT
-                )
-            """)
-            connection.commit()
-            logger.debug(f"Таблица '{table_name}' создана.")
-
-        # Вставляем или обновляем запись
-        # Для совместимости с raw_data, добавляем заглушку для value_type
+        # Вставляем или обновляем запись; значение хранится в родном типе, как в raw_data
+        stored_value, value_type = encode_cell_value(new_value)
         cursor.execute(f"""
-            INSERT OR REPLACE INTO {table_name} (cell_address, value, value_type)
-            VALUES (?, ?, ?)
-        """, (cell_address, str(new_value) if new_value is not None else None, 'str'))
-        
+            INSERT OR REPLACE INTO {CELLS_TABLE_NAME} (sheet_id, row, col, value, value_type)
+            VALUES (?, ?, ?, ?, ?)
+        """, (sheet_id, row, col, stored_value, value_type))
+        # Блок строки больше не совпадает с файлом: повторный импорт сравнит его заново
+        invalidate_sheet_fingerprints(connection, sheet_id, row=row)
+
         connection.commit()
-        logger.debug(f"Обновлено значение ячейки {cell_address} в таблице '{table_name}' для листа '{sheet_name}' (ID: {sheet_id}). Новое значение: {new_value}")
+        logger.debug(f"Обновлено значение ячейки {cell_address} для листа '{sheet_name}' (ID: {sheet_id}). Новое значение: {new_value}")
         return True
 
+    except ValueError as ve:
+        logger.error(f"Некорректный адрес ячейки для листа '{sheet_name}' (ID: {sheet_id}): {ve}")
+        return False
     except sqlite3.Error as e:
         logger.error(f"Ошибка SQLite при обновлении ячейки {cell_address} для листа '{sheet_name}' (ID: {sheet_id}): {e}")
         return False
@@ -0,0 +1,291 @@
+# backend/storage/fingerprints.py
+"""
+Отпечатки содержимого листов для инкрементального повторного импорта.
+
+Лист делится на блоки по FINGERPRINT_BLOCK_ROWS строк; для каждого блока хранится хэш
+его ячеек и формул (таблица 'sheet_fingerprints'). При повторном импорте пересчитанный
+хэш сравнивается с сохранённым, и изменения применяются только к несовпавшим блокам.
+Запись с block = SOURCE_BLOCK хранит отпечаток исходного XML листа (CRC частей книги):
+если он не изменился, лист не разбирается вовсе.
+
+Любая запись ячеек или формул в обход инкрементального импорта сбрасывает отпечатки
+листа (invalidate_sheet_fingerprints), чтобы следующий импорт не пропустил изменения.
+"""
+
+import hashlib
+import logging
+import sqlite3
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from backend.storage.cells import CELLS_TABLE_NAME, address_to_row_col, row_col_to_address
+from backend.storage.formulas import FORMULAS_TABLE_NAME
+from backend.storage.dependencies import invalidate_sheet_dependencies
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINTS_TABLE_NAME = "sheet_fingerprints"
+
+# Высота блока строк: изменение одной ячейки приводит к сравнению с БД одного блока
+FINGERPRINT_BLOCK_ROWS = 256
+# Номер записи с отпечатком исходного XML листа
+SOURCE_BLOCK = -1
+
+
+def block_of_row(row: int) -> int:
+    """Номер блока для строки (row 1-based)."""
+    return (row - 1) // FINGERPRINT_BLOCK_ROWS
+
+
+def block_row_range(block: int) -> Tuple[int, int]:
+    """Первая и последняя строка блока (включительно)."""
+    first = block * FINGERPRINT_BLOCK_ROWS + 1
+    return first, first + FINGERPRINT_BLOCK_ROWS - 1
+
+
+def fingerprint_block(entries: Iterable[Tuple[int, int, Any, Optional[str], Optional[str]]]) -> str:
+    """
+    Хэш содержимого блока.
+
+    Args:
+        entries: Кортежи (row, col, value, value_type, formula) в порядке строк;
+            value/value_type - в виде хранения (cell_values.encode_cell_value).
+
+    Returns:
+        str: Шестнадцатеричный хэш BLAKE2b (128 бит).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        digest.update(repr(entry).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_sheet_fingerprints(connection: sqlite3.Connection, sheet_id: int) -> Dict[int, str]:
+    """
+    Загружает отпечатки блоков листа.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        Dict[int, str]: {номер блока: хэш}, включая SOURCE_BLOCK. Пустой словарь при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки отпечатков листа.")
+        return {}
+
+    try:
+        rows = connection.execute(
+            f"SELECT block, fingerprint FROM {FINGERPRINTS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,)
+        ).fetchall()
+        return dict(rows)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке отпечатков листа ID {sheet_id}: {e}")
+        return {}
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при загрузке отпечатков листа ID {sheet_id}: {e}", exc_info=True)
+        return {}
+
+
+def save_sheet_fingerprints(connection: sqlite3.Connection, sheet_id: int, fingerprints: Dict[int, str]) -> bool:
+    """
+    Заменяет отпечатки блоков листа.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        fingerprints (Dict[int, str]): {номер блока: хэш}, включая SOURCE_BLOCK.
+
+    Returns:
+        bool: True, если сохранение успешно, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для сохранения отпечатков листа.")
+        return False
+
+    try:
+        connection.execute(f"DELETE FROM {FINGERPRINTS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,))
+        connection.executemany(
+            f"INSERT INTO {FINGERPRINTS_TABLE_NAME} (sheet_id, block, fingerprint) VALUES (?, ?, ?)",
+            [(sheet_id, block, fingerprint) for block, fingerprint in fingerprints.items()]
+        )
+        connection.commit()
+        logger.debug(f"Сохранено {len(fingerprints)} отпечатков для листа ID {sheet_id}.")
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при сохранении отпечатков листа ID {sheet_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при сохранении отпечатков листа ID {sheet_id}: {e}", exc_info=True)
+        return False
+
+
+def invalidate_sheet_fingerprints(connection: sqlite3.Connection, sheet_id: int, row: Optional[int] = None):
+    """
+    Сбрасывает отпечатки листа после записи ячеек или формул в обход инкрементального импорта.
+    Вызывается модулями хранилища внутри их транзакции; commit не выполняет.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        row (Optional[int]): Изменённая строка: сбрасываются только её блок и отпечаток XML.
+            None - сбрасываются все отпечатки листа.
+    """
+    try:
+        if row is None:
+            connection.execute(f"DELETE FROM {FINGERPRINTS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,))
+        else:
+            connection.execute(
+                f"DELETE FROM {FINGERPRINTS_TABLE_NAME} WHERE sheet_id = ? AND block IN (?, ?)",
+                (sheet_id, SOURCE_BLOCK, block_of_row(row))
+            )
+    except sqlite3.OperationalError as e:
+        # БД, созданная до появления таблицы отпечатков: сбрасывать нечего
+        if "no such table" not in str(e):
+            raise
+
+
+def load_sheet_formulas_by_block(connection: sqlite3.Connection, sheet_id: int) -> Dict[int, Dict[Tuple[int, int], str]]:
+    """
+    Загружает формулы листа, сгруппированные по блокам строк, для сравнения блоков.
+    Таблица 'formulas' адресует ячейки строкой, поэтому выборки по диапазону строк нет.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        Dict[int, Dict[Tuple[int, int], str]]: {номер блока: {(row, col): формула}}. Пустой словарь при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки формул листа.")
+        return {}
+
+    try:
+        result: Dict[int, Dict[Tuple[int, int], str]] = {}
+        for cell_address, formula in connection.execute(
+            f"SELECT cell_address, formula FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,)
+        ):
+            try:
+                row, col = address_to_row_col(cell_address)
+            except ValueError:
+                continue
+            result.setdefault(block_of_row(row), {})[(row, col)] = formula
+        return result
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке формул листа ID {sheet_id}: {e}")
+        return {}
+
+
+def load_sheet_cell_blocks(connection: sqlite3.Connection, sheet_id: int) -> Set[int]:
+    """
+    Номера блоков, в которых у листа есть ячейки. Нужны, когда отпечатки сброшены
+    и по ним нельзя узнать, какие блоки заполнены в БД.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        Set[int]: Номера блоков. Пустое множество при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки блоков листа.")
+        return set()
+
+    try:
+        return {
+            block for (block,) in connection.execute(
+                f"SELECT DISTINCT (row - 1) / ? FROM {CELLS_TABLE_NAME} WHERE sheet_id = ?",
+                (FINGERPRINT_BLOCK_ROWS, sheet_id)
+            )
+        }
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке блоков листа ID {sheet_id}: {e}")
+        return set()
+
+
+def apply_block_changes(
+    connection: sqlite3.Connection,
+    sheet_id: int,
+    block: int,
+    cells: Dict[Tuple[int, int], Tuple[Any, str]],
+    formulas: Dict[Tuple[int, int], str],
+    stored_formulas: Dict[Tuple[int, int], str]
+) -> Optional[Dict[str, int]]:
+    """
+    Приводит ячейки и формулы блока в БД к новому содержимому: вставляет новые,
+    обновляет изменившиеся и удаляет исчезнувшие записи. Совпадающие ячейки не трогаются.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        block (int): Номер блока строк.
+        cells (Dict[Tuple[int, int], Tuple[Any, str]]): Новые ячейки блока {(row, col): (value, value_type)}
+            в виде хранения (cell_values.encode_cell_value).
+        formulas (Dict[Tuple[int, int], str]): Новые формулы блока {(row, col): формула}.
+        stored_formulas (Dict[Tuple[int, int], str]): Сохранённые формулы блока
+            (элемент load_sheet_formulas_by_block).
+
+    Returns:
+        Optional[Dict[str, int]]: Счётчики 'cells_inserted', 'cells_updated', 'cells_deleted',
+            'formulas_inserted', 'formulas_updated', 'formulas_deleted' или None при ошибке.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для применения изменений блока.")
+        return None
+
+    first_row, last_row = block_row_range(block)
+    try:
+        stored_cells = {
+            (row, col): (value, value_type)
+            for row, col, value, value_type in connection.execute(
+                f"SELECT row, col, value, value_type FROM {CELLS_TABLE_NAME} WHERE sheet_id = ? AND row BETWEEN ? AND ?",
+                (sheet_id, first_row, last_row)
+            )
+        }
+        cells_upsert = [(sheet_id, row, col, value, value_type) for (row, col), (value, value_type) in cells.items()
+                        if stored_cells.get((row, col)) != (value, value_type)]
+        cells_delete = [(sheet_id, row, col) for (row, col) in stored_cells if (row, col) not in cells]
+        formulas_upsert = [(key, formula) for key, formula in formulas.items() if stored_formulas.get(key) != formula]
+        formulas_delete = [key for key in stored_formulas if key not in formulas]
+
+        if cells_delete:
+            connection.executemany(f"DELETE FROM {CELLS_TABLE_NAME} WHERE sheet_id = ? AND row = ? AND col = ?", cells_delete)
+        if cells_upsert:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {CELLS_TABLE_NAME} (sheet_id, row, col, value, value_type) VALUES (?, ?, ?, ?, ?)",
+                cells_upsert
+            )
+        if formulas_delete:
+            connection.executemany(
+                f"DELETE FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ? AND cell_address = ?",
+                [(sheet_id, row_col_to_address(row, col)) for row, col in formulas_delete]
+            )
+        if formulas_upsert:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {FORMULAS_TABLE_NAME} (sheet_id, cell_address, formula) VALUES (?, ?, ?)",
+                [(sheet_id, row_col_to_address(row, col), formula) for (row, col), formula in formulas_upsert]
+            )
+        if formulas_delete or formulas_upsert:
+            invalidate_sheet_dependencies(connection, sheet_id)
+        connection.commit()
+
+        cells_inserted = sum(1 for _, row, col, _, _ in cells_upsert if (row, col) not in stored_cells)
+        formulas_inserted = sum(1 for key, _ in formulas_upsert if key not in stored_formulas)
+        return {
+            "cells_inserted": cells_inserted,
+            "cells_updated": len(cells_upsert) - cells_inserted,
+            "cells_deleted": len(cells_delete),
+            "formulas_inserted": formulas_inserted,
+            "formulas_updated": len(formulas_upsert) - formulas_inserted,
+            "formulas_deleted": len(formulas_delete),
+        }
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при применении изменений блока {block} листа ID {sheet_id}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при применении изменений блока {block} листа ID {sheet_id}: {e}", exc_info=True)
+        return None
+
+# Дополнительные функции для работы с отпечатками (если потребуются) могут быть добавлены здесь
@@ -2,7 +2,9 @@
 
 import sqlite3
 import logging
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.storage.cell_values import encode_cell_value, decode_cell_value
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
@@ -10,7 +12,15 @@ logger = logging.getLogger(__name__)
 # Имя общей таблицы для хранения формул всех листов проекта
 FORMULAS_TABLE_NAME = "formulas"
 
-def save_sheet_formulas(connection: sqlite3.Connection, sheet_id: int, formulas_list: List[Dict[str, str]]) -> bool:
+def _encode_cached_value(item: Dict[str, Any]) -> tuple:
+    """(cached_value, cached_value_type) для записи формулы; (None, None) - результат неизвестен."""
+    value = item.get('cached_value')
+    if value is None:
+        return None, None
+    return encode_cell_value(value, item.get('cached_value_type'))
+
+
+def save_sheet_formulas(connection: sqlite3.Connection, sheet_id: int, formulas_list: List[Dict[str, str]], replace: bool = True) -> bool:
     """
     Сохраняет формулы листа в БД проекта.
     Формулы хранятся в общей таблице 'formulas', связанной с листом по sheet_id.
@@ -19,6 +29,10 @@ def save_sheet_formulas(connection: sqlite3.Connection, sheet_id: int, formulas_
         connection (sqlite3.Connection): Активное соединение с БД проекта.
         sheet_id (int): ID листа в БД.
         formulas_list (List[Dict[str, str]]): Список словарей с 'cell_address' и 'formula'.
+            Необязательные ключи: 'cached_value' - сохранённый в файле результат формулы,
+            'cached_value_type' - его явный тип (например, 'error').
+        replace (bool): Удалить существующие формулы листа перед вставкой.
+            False - дописать к уже сохранённым (импорт частями).
 
     Returns:
         bool: True, если сохранение успешно, иначе False.
@@ -33,16 +47,25 @@ def save_sheet_formulas(connection: sqlite3.Connection, sheet_id: int, formulas_
 
     try:
         cursor = connection.cursor()
+
+        # Запись в обход инкрементального импорта: отпечатки листа больше не соответствуют данным
+        # (импорт здесь, так как fingerprints сам импортирует этот модуль)
+        from backend.storage.fingerprints import invalidate_sheet_fingerprints
+        from backend.storage.dependencies import invalidate_sheet_dependencies
+        invalidate_sheet_fingerprints(connection, sheet_id)
+        # Граф зависимостей строится по формулам листа и ссылается на их formula_id
+        invalidate_sheet_dependencies(connection, sheet_id)
         
         # Удаляем существующие формулы для этого листа, чтобы избежать дубликатов
-        logger.debug(f"Удаление существующих формул для sheet_id {sheet_id}...")
-        cursor.execute(f"DELETE FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,))
-        logger.debug(f"Удалено {cursor.rowcount} существующих записей формул для sheet_id {sheet_id}.")
+        if replace:
+            logger.debug(f"Удаление существующих формул для sheet_id {sheet_id}...")
+            cursor.execute(f"DELETE FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?", (sheet_id,))
+            logger.debug(f"Удалено {cursor.rowcount} существующих записей формул для sheet_id {sheet_id}.")
 
         # Подготавливаем данные для вставки
         # Используем INSERT OR REPLACE для простоты и атомарности
         formulas_to_insert = [
-            (sheet_id, item.get('cell_address'), item.get('formula'))
+            (sheet_id, item.get('cell_address'), item.get('formula'), *_encode_cached_value(item))
             for item in formulas_list
             if item.get('cell_address') and item.get('formula') # Пропускаем записи без адреса или формулы
         ]
@@ -50,12 +73,14 @@ def save_sheet_formulas(connection: sqlite3.Connection, sheet_id: int, formulas_
         if formulas_to_insert:
             logger.debug(f"Подготовлено {len(formulas_to_insert)} формул для листа ID {sheet_id}.")
             cursor.executemany(
-                f"INSERT OR REPLACE INTO {FORMULAS_TABLE_NAME} (sheet_id, cell_address, formula) VALUES (?, ?, ?)",
+                f"INSERT OR REPLACE INTO {FORMULAS_TABLE_NAME} (sheet_id, cell_address, formula, cached_value, cached_value_type) "
+                f"VALUES (?, ?, ?, ?, ?)",
                 formulas_to_insert
             )
             connection.commit()
             logger.info(f"Сохранено {len(formulas_to_insert)} формул для листа ID {sheet_id} в таблицу '{FORMULAS_TABLE_NAME}'.")
         else:
+            connection.commit()
             logger.info(f"Нет формул для сохранения для листа ID {sheet_id}.")
             
         return True
@@ -77,7 +102,8 @@ def load_sheet_formulas(connection: sqlite3.Connection, sheet_id: int) -> List[D
         sheet_id (int): ID листа в БД.
 
     Returns:
-        List[Dict[str, str]]: Список словарей с 'cell_address' и 'formula'.
+        List[Dict[str, str]]: Список словарей с 'cell_address' и 'formula'
+                             (и 'cached_value', если результат формулы импортирован).
                              Возвращает пустой список в случае ошибки или отсутствия данных.
     """
     if not connection:
@@ -90,15 +116,17 @@ def load_sheet_formulas(connection: sqlite3.Connection, sheet_id: int) -> List[D
         # Загружаем формулы для этого листа из общей таблицы
         logger.debug(f"Загрузка формул для sheet_id {sheet_id} из таблицы '{FORMULAS_TABLE_NAME}'...")
         cursor.execute(
-            f"SELECT cell_address, formula FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?",
+            f"SELECT cell_address, formula, cached_value, cached_value_type FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?",
             (sheet_id,)
         )
         rows = cursor.fetchall()
         
-        formulas_data = [
-            {"cell_address": row[0], "formula": row[1]}
-            for row in rows
-        ]
+        formulas_data = []
+        for cell_address, formula, cached_value, cached_value_type in rows:
+            item = {"cell_address": cell_address, "formula": formula}
+            if cached_value_type is not None:
+                item["cached_value"] = decode_cell_value(cached_value, cached_value_type)
+            formulas_data.append(item)
         
         logger.debug(f"Загружено {len(formulas_data)} формул для листа ID {sheet_id}.")
         return formulas_data
@@ -110,4 +138,163 @@ def load_sheet_formulas(connection: sqlite3.Connection, sheet_id: int) -> List[D
         logger.error(f"Неожиданная ошибка при загрузке формул для листа ID {sheet_id}: {e}", exc_info=True)
         return []
 
+def load_sheet_formula_values(connection: sqlite3.Connection, sheet_id: int) -> Dict[str, Any]:
+    """
+    Загружает сохранённые в файле результаты формул листа (для отображения без пересчёта).
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        Dict[str, Any]: {адрес ячейки: результат}; только формулы с импортированным результатом.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки результатов формул.")
+        return {}
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT cell_address, cached_value, cached_value_type FROM {FORMULAS_TABLE_NAME} "
+            f"WHERE sheet_id = ? AND cached_value_type IS NOT NULL",
+            (sheet_id,)
+        )
+        return {
+            cell_address: decode_cell_value(cached_value, cached_value_type)
+            for cell_address, cached_value, cached_value_type in cursor.fetchall()
+        }
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке результатов формул для листа ID {sheet_id}: {e}")
+        return {}
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при загрузке результатов формул для листа ID {sheet_id}: {e}", exc_info=True)
+        return {}
+
+def load_sheet_formula_records(connection: sqlite3.Connection, sheet_id: int) -> List[Tuple[int, str, str, Any, Optional[str]]]:
+    """
+    Загружает формулы листа с результатами в представлении БД (без decode_cell_value):
+    даты - серийными номерами, ошибки - кодами. Используется движком формул.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        List[Tuple[int, str, str, Any, Optional[str]]]: Кортежи
+        (formula_id, cell_address, formula, cached_value, cached_value_type).
+        Возвращает пустой список в случае ошибки.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки формул.")
+        return []
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT formula_id, cell_address, formula, cached_value, cached_value_type FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ?",
+            (sheet_id,)
+        )
+        return cursor.fetchall()
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке формул для листа ID {sheet_id}: {e}")
+        return []
+
+def save_formula_results(connection: sqlite3.Connection, sheet_id: int, results: List[Tuple[str, Any, Optional[str]]]) -> bool:
+    """
+    Записывает вычисленные результаты формул листа в cached_value/cached_value_type.
+    Текст формул не меняется; адреса без формулы пропускаются.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        results (List[Tuple[str, Any, Optional[str]]]): Кортежи (cell_address, value, value_type);
+            value_type - явный тип (например, 'error') или None.
+
+    Returns:
+        bool: True, если запись успешна, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для записи результатов формул.")
+        return False
+
+    try:
+        rows = [
+            (*encode_cell_value(value, value_type), sheet_id, cell_address)
+            for cell_address, value, value_type in results
+        ]
+        if rows:
+            connection.executemany(
+                f"UPDATE {FORMULAS_TABLE_NAME} SET cached_value = ?, cached_value_type = ? "
+                f"WHERE sheet_id = ? AND cell_address = ?",
+                rows
+            )
+            logger.debug(f"Записано {len(rows)} результатов формул для листа ID {sheet_id}.")
+        connection.commit()
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при записи результатов формул для листа ID {sheet_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при записи результатов формул для листа ID {sheet_id}: {e}", exc_info=True)
+        return False
+
+def update_cell_formulas(connection: sqlite3.Connection, sheet_id: int, cells: List[Tuple[str, Optional[str]]]) -> bool:
+    """
+    Заменяет или удаляет формулы отдельных ячеек листа после их правки.
+    Новая формула записывается без результата (его вычисляет движок формул);
+    если формулы ячеек изменились, граф зависимостей листа сбрасывается.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        cells (List[Tuple[str, Optional[str]]]): Кортежи (cell_address, formula);
+            formula None - в ячейку введено значение, её формула удаляется.
+
+    Returns:
+        bool: True, если запись успешна, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для обновления формул ячеек.")
+        return False
+
+    try:
+        cursor = connection.cursor()
+        changed = 0
+        removed = [(sheet_id, address) for address, formula in cells if not formula]
+        if removed:
+            cursor.executemany(
+                f"DELETE FROM {FORMULAS_TABLE_NAME} WHERE sheet_id = ? AND cell_address = ?",
+                removed
+            )
+            changed += cursor.rowcount
+        added = [(sheet_id, address, formula) for address, formula in cells if formula]
+        if added:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {FORMULAS_TABLE_NAME} (sheet_id, cell_address, formula, cached_value, cached_value_type) "
+                f"VALUES (?, ?, ?, NULL, NULL)",
+                added
+            )
+            changed += len(added)
+
+        if changed:
+            # (импорт здесь, так как эти модули сами импортируют formulas)
+            from backend.storage.fingerprints import invalidate_sheet_fingerprints
+            from backend.storage.dependencies import invalidate_sheet_dependencies
+            invalidate_sheet_fingerprints(connection, sheet_id)
+            invalidate_sheet_dependencies(connection, sheet_id)
+            logger.debug(f"Обновлены формулы {changed} ячеек листа ID {sheet_id}.")
+        connection.commit()
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при обновлении формул ячеек листа ID {sheet_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при обновлении формул ячеек листа ID {sheet_id}: {e}", exc_info=True)
+        return False
+
 # Дополнительные функции для работы с формулами (если потребуются) могут быть добавлены здесь
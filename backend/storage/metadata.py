@@ -199,4 +199,77 @@ def save_project_metadata(connection: sqlite3.Connection, project_id: int, metad
         return False
 # --- КОНЕЦ НОВОГО ---
 
+def load_project_metadata_value(connection: sqlite3.Connection, project_id: int, key: str) -> Optional[Any]:
+    """
+    Загружает одно значение метаданных проекта по ключу.
+    Значения, сохранённые как JSON (dict/list), возвращаются десериализованными.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД.
+        project_id (int): ID проекта.
+        key (str): Ключ метаданных.
+
+    Returns:
+        Optional[Any]: Значение или None, если ключ не найден или произошла ошибка.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки метаданных проекта.")
+        return None
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT value FROM {METADATA_TABLE_NAME} WHERE project_id = ? AND key = ?",
+            (project_id, key)
+        )
+        row = cursor.fetchone()
+        if row is None or not row[0]:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return row[0]
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке метаданных проекта '{key}' (ID: {project_id}): {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при загрузке метаданных проекта '{key}' (ID: {project_id}): {e}", exc_info=True)
+        return None
+
+
+def delete_project_metadata(connection: sqlite3.Connection, project_id: int, key: str) -> bool:
+    """
+    Удаляет значение метаданных проекта по ключу (отсутствие ключа ошибкой не считается).
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД.
+        project_id (int): ID проекта.
+        key (str): Ключ метаданных.
+
+    Returns:
+        bool: True, если удаление успешно, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для удаления метаданных проекта.")
+        return False
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"DELETE FROM {METADATA_TABLE_NAME} WHERE project_id = ? AND key = ?",
+            (project_id, key)
+        )
+        connection.commit()
+        logger.debug(f"Удалены метаданные проекта '{key}' (ID: {project_id}).")
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при удалении метаданных проекта '{key}' (ID: {project_id}): {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при удалении метаданных проекта '{key}' (ID: {project_id}): {e}", exc_info=True)
+        return False
+
+
 # Дополнительные функции для работы с метаданными проекта (не только листа) могут быть добавлены здесь
@@ -0,0 +1,196 @@
+# backend/storage/profiles.py
+"""
+Профили производительности SQLite для БД проекта.
+
+Профиль определяет, как открывается соединение и какие PRAGMA к нему применяются:
+- "interactive"  - режим по умолчанию для GUI: WAL (чтение не блокируется записью),
+                   synchronous=NORMAL, mmap, увеличенный page cache, temp_store=MEMORY;
+- "bulk-import"  - как "interactive", но на время массовой загрузки (bulk_session)
+                   журнал переводится в MEMORY и synchronous=OFF, после загрузки
+                   настройки возвращаются к "interactive";
+- "read-only"    - режим раздачи/экспорта готового проекта: immutable URI, query_only.
+                   Подходит только для БД, которую никто не изменяет (WAL должен быть
+                   сброшен в основной файл, например, после закрытия проекта).
+
+Профиль по умолчанию и профиль экспорта задаются в config/settings.yaml
+(секция database: storage_profile, export_storage_profile).
+"""
+
+import sqlite3
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERACTIVE = "interactive"
+PROFILE_BULK_IMPORT = "bulk-import"
+PROFILE_READ_ONLY = "read-only"
+
+DEFAULT_PROFILE = PROFILE_INTERACTIVE
+
+# Общие настройки кэша для всех профилей
+_CACHE_PRAGMAS: Dict[str, Any] = {
+    "mmap_size": 256 * 1024 * 1024,  # 256 МБ memory-mapped I/O
+    "cache_size": -64 * 1024,        # 64 МБ page cache (отрицательное значение - в КиБ)
+    "temp_store": "MEMORY",
+}
+
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    PROFILE_INTERACTIVE: {
+        "read_only": False,
+        "pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL", **_CACHE_PRAGMAS},
+    },
+    PROFILE_BULK_IMPORT: {
+        "read_only": False,
+        "pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL", **_CACHE_PRAGMAS},
+        # Применяются на время bulk_session(), затем восстанавливаются "pragmas"
+        "bulk_pragmas": {"journal_mode": "MEMORY", "synchronous": "OFF", "cache_size": -256 * 1024},
+    },
+    PROFILE_READ_ONLY: {
+        "read_only": True,
+        "pragmas": {"query_only": "ON", **_CACHE_PRAGMAS},
+    },
+}
+
+# Путь к файлу настроек относительно корня проекта
+_SETTINGS_PATH = Path(__file__).resolve().parents[2] / "config" / "settings.yaml"
+
+
+@lru_cache(maxsize=1)
+def _load_database_settings() -> Dict[str, Any]:
+    """
+    Загружает секцию 'database' из config/settings.yaml.
+
+    Returns:
+        Dict[str, Any]: Настройки БД или пустой словарь, если файл/PyYAML недоступны.
+    """
+    try:
+        import yaml
+    except ImportError:
+        logger.debug("PyYAML не установлен, используются профили хранилища по умолчанию.")
+        return {}
+    try:
+        with open(_SETTINGS_PATH, "r", encoding="utf-8") as f:
+            settings = yaml.safe_load(f) or {}
+        return settings.get("database", {}) or {}
+    except FileNotFoundError:
+        logger.debug(f"Файл настроек {_SETTINGS_PATH} не найден, используются профили по умолчанию.")
+        return {}
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать настройки БД из {_SETTINGS_PATH}: {e}")
+        return {}
+
+
+def resolve_profile_name(profile: Optional[str] = None, purpose: str = "default") -> str:
+    """
+    Определяет имя профиля хранилища.
+
+    Args:
+        profile (Optional[str]): Явно заданный профиль. Если None, берётся из настроек.
+        purpose (str): Назначение соединения: 'default' или 'export'.
+
+    Returns:
+        str: Имя существующего профиля.
+    """
+    if profile is None:
+        settings = _load_database_settings()
+        if purpose == "export":
+            profile = settings.get("export_storage_profile") or settings.get("storage_profile")
+        else:
+            profile = settings.get("storage_profile")
+    if not profile:
+        return DEFAULT_PROFILE
+    if profile not in STORAGE_PROFILES:
+        logger.warning(f"Неизвестный профиль хранилища '{profile}'. Используется '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return profile
+
+
+def is_read_only(profile: str) -> bool:
+    """Возвращает True, если профиль открывает БД только для чтения."""
+    return STORAGE_PROFILES[resolve_profile_name(profile)]["read_only"]
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: Dict[str, Any]) -> None:
+    """
+    Применяет набор PRAGMA к соединению.
+    journal_mode проверяется по возвращаемому значению: SQLite не меняет режим,
+    если это невозможно (например, при открытой транзакции или других соединениях).
+
+    Args:
+        connection (sqlite3.Connection): Соединение с БД.
+        pragmas (Dict[str, Any]): Словарь PRAGMA -> значение.
+    """
+    for name, value in pragmas.items():
+        try:
+            result = connection.execute(f"PRAGMA {name} = {value}").fetchone()
+            if name == "journal_mode" and result and str(result[0]).upper() != str(value).upper():
+                logger.warning(f"journal_mode не изменён на {value}: текущий режим {result[0]}.")
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось применить PRAGMA {name}={value}: {e}")
+
+
+def open_connection(db_path: str, profile: Optional[str] = None, **kwargs) -> sqlite3.Connection:
+    """
+    Открывает соединение с БД проекта и применяет PRAGMA профиля.
+
+    Args:
+        db_path (str): Путь к файлу БД.
+        profile (Optional[str]): Имя профиля (None - из настроек).
+        **kwargs: Дополнительные аргументы для sqlite3.connect (например, check_same_thread).
+
+    Returns:
+        sqlite3.Connection: Открытое соединение.
+
+    Raises:
+        sqlite3.Error: Если соединение не удалось открыть.
+    """
+    profile_name = resolve_profile_name(profile)
+    profile_def = STORAGE_PROFILES[profile_name]
+    if profile_def["read_only"]:
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro&immutable=1"
+        connection = sqlite3.connect(uri, uri=True, **kwargs)
+    else:
+        connection = sqlite3.connect(db_path, **kwargs)
+    apply_pragmas(connection, profile_def["pragmas"])
+    logger.debug(f"Соединение с {db_path} открыто с профилем '{profile_name}'.")
+    return connection
+
+
+def enter_bulk_mode(connection: sqlite3.Connection, profile: str) -> bool:
+    """
+    Переключает соединение в режим массовой загрузки, если профиль это предусматривает.
+
+    Args:
+        connection (sqlite3.Connection): Соединение без открытой транзакции.
+        profile (str): Имя профиля.
+
+    Returns:
+        bool: True, если PRAGMA массовой загрузки были применены.
+    """
+    bulk_pragmas = STORAGE_PROFILES[resolve_profile_name(profile)].get("bulk_pragmas")
+    if not bulk_pragmas:
+        return False
+    if connection.in_transaction:
+        connection.commit()
+    apply_pragmas(connection, bulk_pragmas)
+    logger.info(f"Профиль '{profile}': включён режим массовой загрузки {bulk_pragmas}.")
+    return True
+
+
+def leave_bulk_mode(connection: sqlite3.Connection, profile: str) -> None:
+    """
+    Возвращает соединению обычные PRAGMA профиля после массовой загрузки.
+
+    Args:
+        connection (sqlite3.Connection): Соединение без открытой транзакции.
+        profile (str): Имя профиля.
+    """
+    profile_def = STORAGE_PROFILES[resolve_profile_name(profile)]
+    apply_pragmas(connection, profile_def["pragmas"])
+    logger.info(f"Профиль '{profile}': режим массовой загрузки выключен.")
+
+# Дополнительные профили и функции (если потребуются) могут быть добавлены здесь
@@ -2,59 +2,20 @@
 
 import sqlite3
 import logging
-from typing import List, Dict, Any
-import re
-from datetime import datetime
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from backend.storage.cells import CELLS_TABLE_NAME, address_to_row_col, row_col_to_address, get_sheet_id
+from backend.storage.cell_values import encode_cell_value, decode_cell_value
+from backend.storage.fingerprints import invalidate_sheet_fingerprints
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
-# --- ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ ДЛЯ ФОРМАТИРОВАНИЯ ДАТЫ ДЛЯ GUI ---
-
-def _format_datetime_for_gui(dt_str: str) -> str:
-    """
-    Преобразует строку даты из формата 'YYYY-MM-DD HH:MM:SS' в 'DD.MM.YYYY'.
-    Если строка не соответствует формату, возвращается исходная строка.
-    """
-    try:
-        # Пытаемся распарсить строку как datetime
-        dt_obj = datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
-        # Форматируем в нужный формат для GUI
-        return dt_obj.strftime("%d.%m.%Y")
-    except ValueError:
-        # Если не удалось распарсить, возвращаем исходную строку
-        logger.debug(f"Не удалось преобразовать строку '{dt_str}' в дату для GUI. Возвращается исходная строка.")
-        return dt_str
-
-# --- КОНЕЦ ВСПОМОГАТЕЛЬНОЙ ФУНКЦИИ ---
-
-def _get_raw_data_table_name(sheet_name: str) -> str:
-    """
-    Генерирует имя таблицы для "сырых" данных листа.
-    Args:
-        sheet_name (str): Имя листа Excel.
-    Returns:
-        str: Имя таблицы в БД.
-    """
-    # Санитизация имени таблицы для безопасности и корректности SQL
-    # Разрешаем только буквы, цифры и подчеркивания, заменяем пробелы подчеркиваниями
-    sanitized_sheet_name = re.sub(r'[^\w]', '_', sheet_name)
-    # Убедимся, что имя не начинается с цифры
-    if sanitized_sheet_name and sanitized_sheet_name[0].isdigit():
-        sanitized_sheet_name = f"_{sanitized_sheet_name}"
-    # Ограничиваем длину имени таблицы (SQLite ограничение, обычно 64 символа)
-    # Оставляем место для префикса 'raw_data_'
-    max_len = 50 # Примерное ограничение
-    if len(sanitized_sheet_name) > max_len:
-        sanitized_sheet_name = sanitized_sheet_name[:max_len]
-        
-    return f"raw_data_{sanitized_sheet_name}"
-
-
 def save_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str, raw_data_list: List[Dict[str, Any]]) -> bool:
     """
     Сохраняет "сырые" данные листа в БД проекта.
-    Создает отдельную таблицу для данных листа, если она не существует.
+    Данные записываются в единую таблицу 'cells' с ключом (sheet_id, row, col).
+    Если лист ещё не зарегистрирован в таблице 'sheets', он создаётся.
+    Значения хранятся в родных типах SQLite (см. cell_values.encode_cell_value).
 
     Args:
         connection (sqlite3.Connection): Активное соединение с БД проекта.
@@ -74,38 +35,36 @@ def save_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str, raw_dat
 
     try:
         cursor = connection.cursor()
-        table_name = _get_raw_data_table_name(sheet_name)
-
-        # Создаем таблицу для сырых данных листа, если она не существует
-        logger.debug(f"Создание/проверка таблицы '{table_name}' для сырых данных листа '{sheet_name}'...")
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                cell_address TEXT PRIMARY KEY,
-                value TEXT,
-                value_type TEXT
-            )
-        """)
-        logger.debug(f"Таблица '{table_name}' готова.")
+        sheet_id = get_sheet_id(connection, sheet_name, create=True)
 
         # Подготавливаем данные для вставки/обновления
         # Используем INSERT OR REPLACE для простоты и атомарности
-        data_to_insert = [
-            (item.get('cell_address'), item.get('value'), type(item.get('value')).__name__)
-            for item in raw_data_list
-            if item.get('cell_address') # Пропускаем записи без адреса
-        ]
+        data_to_insert = []
+        for item in raw_data_list:
+            cell_address = item.get('cell_address')
+            if not cell_address: # Пропускаем записи без адреса
+                continue
+            try:
+                row, col = address_to_row_col(cell_address)
+            except ValueError as ve:
+                logger.warning(f"Пропущена ячейка листа '{sheet_name}': {ve}")
+                continue
+            value, value_type = encode_cell_value(item.get('value'), item.get('value_type'))
+            data_to_insert.append((sheet_id, row, col, value, value_type))
 
         if data_to_insert:
+            # Запись в обход инкрементального импорта: отпечатки листа больше не соответствуют данным
+            invalidate_sheet_fingerprints(connection, sheet_id)
             logger.debug(f"Подготовлено {len(data_to_insert)} записей сырых данных для листа '{sheet_name}'.")
             cursor.executemany(
-                f"INSERT OR REPLACE INTO {table_name} (cell_address, value, value_type) VALUES (?, ?, ?)",
+                f"INSERT OR REPLACE INTO {CELLS_TABLE_NAME} (sheet_id, row, col, value, value_type) VALUES (?, ?, ?, ?, ?)",
                 data_to_insert
             )
-            connection.commit()
-            logger.info(f"Сохранено {len(data_to_insert)} записей сырых данных для листа '{sheet_name}' в таблицу '{table_name}'.")
+            logger.info(f"Сохранено {len(data_to_insert)} записей сырых данных для листа '{sheet_name}' (ID: {sheet_id}).")
         else:
             logger.info(f"Нет сырых данных для сохранения для листа '{sheet_name}'.")
-            
+
+        connection.commit()
         return True
 
     except sqlite3.Error as e:
@@ -119,6 +78,9 @@ def save_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str, raw_dat
 def load_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str) -> List[Dict[str, Any]]:
     """
     Загружает "сырые" данные листа из БД проекта.
+    Ячейки возвращаются в порядке строк (row-major), как их хранит кластерный ключ таблицы 'cells'.
+    Значения возвращаются объектами Python (datetime, bool и т.д.); форматирование
+    для отображения выполняется в GUI (cell_values.format_cell_value_for_display).
 
     Args:
         connection (sqlite3.Connection): Активное соединение с БД проекта.
@@ -126,7 +88,7 @@ def load_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str) -> List
 
     Returns:
         List[Dict[str, Any]]: Список словарей с 'cell_address', 'value', 'value_type'.
-                             Возвращает пустой список в случае ошибки или отсутствия данных/таблицы.
+                             Возвращает пустой список в случае ошибки или отсутствия данных/листа.
     """
     if not connection:
         logger.error("Нет активного соединения с БД для загрузки сырых данных.")
@@ -134,33 +96,24 @@ def load_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str) -> List
 
     try:
         cursor = connection.cursor()
-        table_name = _get_raw_data_table_name(sheet_name)
-
-        # Проверяем, существует ли таблица
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name=?
-        """, (table_name,))
-        if not cursor.fetchone():
-            logger.info(f"Таблица сырых данных '{table_name}' для листа '{sheet_name}' не найдена. Возвращается пустой список.")
+        sheet_id = get_sheet_id(connection, sheet_name)
+        if sheet_id is None:
+            logger.info(f"Лист '{sheet_name}' не найден. Возвращается пустой список сырых данных.")
             return []
 
         # Загружаем данные
-        cursor.execute(f"SELECT cell_address, value, value_type FROM {table_name}")
+        cursor.execute(
+            f"SELECT row, col, value, value_type FROM {CELLS_TABLE_NAME} WHERE sheet_id = ? ORDER BY row, col",
+            (sheet_id,)
+        )
         rows = cursor.fetchall()
-        
-        raw_data = []
-        for row in rows:
-            cell_address, value, value_type = row
-            # --- ИЗМЕНЕНИЕ: Форматируем дату для GUI ---
-            if value_type == 'datetime' and isinstance(value, str):
-                formatted_value = _format_datetime_for_gui(value)
-                raw_data.append({"cell_address": cell_address, "value": formatted_value, "value_type": value_type})
-            else:
-                raw_data.append({"cell_address": cell_address, "value": value, "value_type": value_type})
-            # --- КОНЕЦ ИЗМЕНЕНИЯ ---
-        
-        logger.debug(f"Загружено {len(raw_data)} записей сырых данных для листа '{sheet_name}' из таблицы '{table_name}'.")
+
+        raw_data = [
+            {"cell_address": row_col_to_address(row, col), "value": decode_cell_value(value, value_type), "value_type": value_type}
+            for row, col, value, value_type in rows
+        ]
+
+        logger.debug(f"Загружено {len(raw_data)} записей сырых данных для листа '{sheet_name}' (ID: {sheet_id}).")
         return raw_data
 
     except sqlite3.Error as e:
@@ -170,4 +123,49 @@ def load_sheet_raw_data(connection: sqlite3.Connection, sheet_name: str) -> List
         logger.error(f"Неожиданная ошибка при загрузке сырых данных для листа '{sheet_name}': {e}", exc_info=True)
         return []
 
+def save_sheet_cells(connection: sqlite3.Connection, sheet_id: int, cells: Iterable[Tuple[int, int, Any, Optional[str]]], encoded: bool = False) -> bool:
+    """
+    Сохраняет ячейки листа, заданные координатами, без разбора строковых адресов.
+    Используется быстрыми импортёрами, которые получают (row, col) прямо из XML.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+        cells (Iterable[Tuple[int, int, Any, Optional[str]]]): Кортежи (row, col, value, value_type),
+            row/col 1-based; value_type - явный тип (например, 'error') или None.
+        encoded (bool): Значения уже в форме хранения (cell_values.encode_cell_value), а value_type -
+            их тег типа: кодирование каждой ячейки пропускается.
+
+    Returns:
+        bool: True, если сохранение успешно, иначе False.
+    """
+    if not connection:
+        logger.error("Нет активного соединения с БД для сохранения ячеек.")
+        return False
+
+    try:
+        if encoded:
+            data_to_insert = [(sheet_id, row, col, value, value_type) for row, col, value, value_type in cells]
+        else:
+            data_to_insert = [
+                (sheet_id, row, col, *encode_cell_value(value, value_type))
+                for row, col, value, value_type in cells
+            ]
+        if data_to_insert:
+            invalidate_sheet_fingerprints(connection, sheet_id)
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {CELLS_TABLE_NAME} (sheet_id, row, col, value, value_type) VALUES (?, ?, ?, ?, ?)",
+                data_to_insert
+            )
+            logger.debug(f"Сохранено {len(data_to_insert)} ячеек для листа ID {sheet_id}.")
+        connection.commit()
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при сохранении ячеек для листа ID {sheet_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при сохранении ячеек для листа ID {sheet_id}: {e}", exc_info=True)
+        return False
+
 # Дополнительные функции для работы с сырыми данными (если потребуются) могут быть добавлены здесь
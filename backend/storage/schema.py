@@ -2,6 +2,7 @@
 
 import sqlite3
 import logging
+import re
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
@@ -33,22 +34,37 @@ CREATE TABLE IF NOT EXISTS sheets (
 );
 """
 
-# --- Таблицы для хранения "сырых" данных ---
-# Таблица для хранения "сырых" данных будет создаваться динамически для каждого листа
-# как raw_data_<sanitized_sheet_name>
-
-# --- Таблицы для хранения редактируемых данных ---
-# Таблица для хранения редактируемых данных будет создаваться динамически для каждого листа
-# как editable_data_<sanitized_sheet_name>
+# --- Таблица для хранения значений ячеек ("сырые" и редактируемые данные) ---
+# Единая таблица для всех листов с кластерным ключом (sheet_id, row, col).
+# WITHOUT ROWID: строки физически упорядочены по ключу, поэтому выборка листа/диапазона
+# и экспорт в порядке строк не требуют сортировки, а переименование листа не затрагивает ячейки.
+# row и col - 1-based, как в Excel. Колонка value объявлена без типа, тип хранится в value_type.
+# Ранее данные хранились в динамических таблицах raw_data_<sanitized_sheet_name>,
+# они переносятся сюда функцией migrate_legacy_raw_data_tables.
+SQL_CREATE_CELLS_TABLE = """
+CREATE TABLE IF NOT EXISTS cells (
+    sheet_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    value,
+    value_type TEXT,
+    PRIMARY KEY (sheet_id, row, col),
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
 
 # --- Таблицы для хранения формул ---
 
+# cached_value/cached_value_type - сохранённый в файле результат формулы (кодируется как
+# значения ячеек, см. cell_values); NULL, если результат не импортировался.
 SQL_CREATE_FORMULAS_TABLE = """
 CREATE TABLE IF NOT EXISTS formulas (
     formula_id INTEGER PRIMARY KEY AUTOINCREMENT,
     sheet_id INTEGER NOT NULL,
     cell_address TEXT NOT NULL,
     formula TEXT NOT NULL,
+    cached_value,
+    cached_value_type TEXT,
     FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE,
     UNIQUE(sheet_id, cell_address)
 );
@@ -56,30 +72,26 @@ CREATE TABLE IF NOT EXISTS formulas (
 
 # --- Таблицы для хранения стилей ---
 
-# Таблица для хранения определений уникальных стилей
+# Таблица для хранения определений уникальных стилей (словарь стилей проекта).
+# Каждый уникальный набор атрибутов хранится один раз, ключ - хэш содержимого.
 SQL_CREATE_STYLES_TABLE = """
 CREATE TABLE IF NOT EXISTS styles (
-    style_id INTEGER PRIMARY KEY AUTOINCREMENT
-    -- Можно добавить общие атрибуты стиля, если нужно для поиска/индексации
-    -- Например: name TEXT UNIQUE
-    -- Пока храним всё в sheet_styles
+    style_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    style_hash TEXT NOT NULL UNIQUE, -- SHA-1 канонического JSON атрибутов (ключ интернирования)
+    style_attributes TEXT NOT NULL -- Сериализованные атрибуты стиля (JSON, ключи отсортированы)
 );
 """
 
 # Таблица для связывания стилей с диапазонами на листах
-# Хранит сериализованные атрибуты стиля (например, JSON)
+# Хранит только ссылку style_id: одинаковые стили разных диапазонов и листов не дублируются
 SQL_CREATE_SHEET_STYLES_TABLE = """
 CREATE TABLE IF NOT EXISTS sheet_styles (
     sheet_id INTEGER NOT NULL,
     range_address TEXT NOT NULL, -- Адрес диапазона, например, "A1:B10"
-    style_attributes TEXT NOT NULL, -- Сериализованные атрибуты стиля (например, JSON)
-    -- Если style_id используется, можно добавить FOREIGN KEY
-    -- style_id INTEGER,
-    -- FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE,
-    -- FOREIGN KEY (style_id) REFERENCES styles (style_id) ON DELETE CASCADE,
-    PRIMARY KEY (sheet_id, range_address)
-    -- Если один диапазон может иметь несколько стилей, нужно убрать PRIMARY KEY
-    -- и сделать отдельную таблицу связей.
+    style_id INTEGER NOT NULL, -- Ссылка на общий словарь стилей 'styles'
+    PRIMARY KEY (sheet_id, range_address),
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE,
+    FOREIGN KEY (style_id) REFERENCES styles (style_id)
 );
 """
 
@@ -145,6 +157,77 @@ CREATE TABLE IF NOT EXISTS project_metadata (
 """
 
 
+# --- Таблица отпечатков для инкрементального импорта ---
+
+# Хэши блоков строк листа (см. storage/fingerprints.py); block = -1 - отпечаток XML листа в файле
+SQL_CREATE_SHEET_FINGERPRINTS_TABLE = """
+CREATE TABLE IF NOT EXISTS sheet_fingerprints (
+    sheet_id INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, block),
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# --- Граф зависимостей формул (см. storage/dependencies.py) ---
+
+# Узлы-формулы: ячейка с формулой и запись в 'formulas'; volatile = 1 - формула с TODAY()/NOW()
+SQL_CREATE_FORMULA_NODES_TABLE = """
+CREATE TABLE IF NOT EXISTS formula_nodes (
+    sheet_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    formula_id INTEGER NOT NULL,
+    volatile INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sheet_id, row, col),
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# Узлы-диапазоны: ячейки (is_range = 0) и прямоугольники, на которые ссылаются формулы
+SQL_CREATE_DEPENDENCY_RANGES_TABLE = """
+CREATE TABLE IF NOT EXISTS dependency_ranges (
+    range_id INTEGER PRIMARY KEY,
+    sheet_id INTEGER NOT NULL,
+    row1 INTEGER NOT NULL,
+    col1 INTEGER NOT NULL,
+    row2 INTEGER NOT NULL,
+    col2 INTEGER NOT NULL,
+    is_range INTEGER NOT NULL,
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE,
+    UNIQUE (sheet_id, row1, col1, row2, col2)
+);
+"""
+
+# Рёбра: формула (sheet_id, row, col) ссылается на диапазон range_id
+SQL_CREATE_FORMULA_PRECEDENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS formula_precedents (
+    sheet_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    range_id INTEGER NOT NULL,
+    PRIMARY KEY (sheet_id, row, col, range_id),
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# Листы, для формул которых граф построен
+SQL_CREATE_FORMULA_GRAPH_SHEETS_TABLE = """
+CREATE TABLE IF NOT EXISTS formula_graph_sheets (
+    sheet_id INTEGER PRIMARY KEY,
+    formulas INTEGER NOT NULL,
+    built_at TEXT NOT NULL,
+    FOREIGN KEY (sheet_id) REFERENCES sheets (sheet_id) ON DELETE CASCADE
+);
+"""
+
+
+# PRAGMA user_version БД, значения ячеек которой уже переведены в типизированное представление
+# (migrate_legacy_cell_values); у БД старых версий user_version = 0
+TYPED_CELL_VALUES_SCHEMA_VERSION = 1
+
+
 def initialize_project_schema(connection: sqlite3.Connection):
     """
     Инициализирует схему таблиц проекта в БД.
@@ -168,8 +251,16 @@ def initialize_project_schema(connection: sqlite3.Connection):
         logger.debug("Создание таблицы 'sheets'...")
         cursor.execute(SQL_CREATE_SHEETS_TABLE)
 
+        logger.debug("Создание таблицы 'cells'...")
+        cursor.execute(SQL_CREATE_CELLS_TABLE)
+
         logger.debug("Создание таблицы 'formulas'...")
         cursor.execute(SQL_CREATE_FORMULAS_TABLE)
+        _add_formula_cached_value_columns(cursor)
+
+        # Таблицы стилей старого формата (атрибуты в каждой строке sheet_styles)
+        # переименовываются до создания новых, данные переносятся ниже
+        has_legacy_styles = _detach_legacy_style_tables(cursor)
 
         logger.debug("Создание таблицы 'styles'...")
         cursor.execute(SQL_CREATE_STYLES_TABLE)
@@ -190,6 +281,15 @@ def initialize_project_schema(connection: sqlite3.Connection):
         logger.debug("Создание таблицы 'project_metadata'...")
         cursor.execute(SQL_CREATE_PROJECT_METADATA_TABLE)
 
+        logger.debug("Создание таблицы 'sheet_fingerprints'...")
+        cursor.execute(SQL_CREATE_SHEET_FINGERPRINTS_TABLE)
+
+        logger.debug("Создание таблиц графа зависимостей формул...")
+        cursor.execute(SQL_CREATE_FORMULA_NODES_TABLE)
+        cursor.execute(SQL_CREATE_DEPENDENCY_RANGES_TABLE)
+        cursor.execute(SQL_CREATE_FORMULA_PRECEDENTS_TABLE)
+        cursor.execute(SQL_CREATE_FORMULA_GRAPH_SHEETS_TABLE)
+
         # --- Создание индексов для оптимизации ---
 
         # Индекс для быстрого поиска листов по project_id
@@ -215,6 +315,23 @@ def initialize_project_schema(connection: sqlite3.Connection):
         logger.debug("Создание индекса для 'edit_history.sheet_id'...")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_edit_history_sheet_id ON edit_history(sheet_id);")
 
+        # Индексы графа зависимостей: зависимые формулы диапазона и поиск диапазонов, содержащих ячейку
+        logger.debug("Создание индексов графа зависимостей формул...")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_formula_dependents ON formula_precedents(range_id, sheet_id, row, col);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_dependency_ranges_area ON dependency_ranges(sheet_id, is_range, col1, col2);")
+
+        # --- Перенос данных из устаревших таблиц raw_data_<лист> ---
+        migrated_cells = migrate_legacy_raw_data_tables(connection)
+        # Перевод значений в типизированное представление сканирует всю таблицу 'cells',
+        # поэтому выполняется один раз (PRAGMA user_version), а не при каждом открытии проекта
+        schema_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version < TYPED_CELL_VALUES_SCHEMA_VERSION or migrated_cells:
+            migrate_legacy_cell_values(connection)
+            if schema_version < TYPED_CELL_VALUES_SCHEMA_VERSION:
+                cursor.execute(f"PRAGMA user_version = {TYPED_CELL_VALUES_SCHEMA_VERSION}")
+        if has_legacy_styles:
+            migrate_legacy_sheet_styles(connection)
+
         connection.commit()
         logger.debug("Commit выполнен. Проверка наличия таблиц...")
         # Принудительная проверка, что таблицы созданы
@@ -232,4 +349,214 @@ def initialize_project_schema(connection: sqlite3.Connection):
         logger.error(f"Неожиданная ошибка при инициализации схемы: {e}", exc_info=True)
         raise  # Повторно вызываем исключение
 
+
+# --- Миграция со старой схемы хранения ячеек ---
+
+def _legacy_raw_data_table_names(sheet_name: str) -> list:
+    """
+    Возвращает возможные имена устаревших таблиц raw_data_<лист> для листа.
+    Исторически raw_data.py и editable_data.py санитизировали имя листа по-разному,
+    поэтому данные одного листа могли оказаться в двух таблицах.
+    Первым идёт имя из raw_data.py (импорт), вторым - из editable_data.py (правки),
+    чтобы при переносе правки пользователя перекрывали импортированные значения.
+
+    Args:
+        sheet_name (str): Имя листа Excel.
+
+    Returns:
+        list: Список уникальных имён таблиц.
+    """
+    # Санитизация из raw_data.py
+    raw_name = re.sub(r'[^\w]', '_', sheet_name)
+    if raw_name and raw_name[0].isdigit():
+        raw_name = f"_{raw_name}"
+    raw_name = raw_name[:50]
+    # Санитизация из editable_data.py
+    edit_name = "".join(c for c in sheet_name if c.isalnum() or c in (' ', '_')).rstrip()
+    edit_name = edit_name.replace(' ', '_')
+
+    names = [f"raw_data_{raw_name}"]
+    if f"raw_data_{edit_name}" not in names:
+        names.append(f"raw_data_{edit_name}")
+    return names
+
+
+def migrate_legacy_raw_data_tables(connection: sqlite3.Connection) -> int:
+    """
+    Переносит данные из устаревших таблиц raw_data_<лист> в единую таблицу 'cells'
+    и удаляет перенесённые таблицы. Таблицы, для которых не найден лист в 'sheets',
+    остаются нетронутыми (с предупреждением в логе).
+    Функция идемпотентна и вызывается из initialize_project_schema.
+    Commit выполняет вызывающая сторона.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+
+    Returns:
+        int: Количество перенесённых ячеек.
+    """
+    # Локальный импорт, чтобы schema не зависела от модулей данных при загрузке
+    from backend.storage.cells import address_to_row_col
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'raw\\_data\\_%' ESCAPE '\\'")
+    legacy_tables = {row[0] for row in cursor.fetchall()}
+    if not legacy_tables:
+        return 0
+
+    logger.info(f"Найдено {len(legacy_tables)} устаревших таблиц raw_data_*. Перенос в таблицу 'cells'...")
+    cursor.execute("SELECT sheet_id, name FROM sheets ORDER BY sheet_id")
+    sheets_list = cursor.fetchall()
+
+    migrated_cells = 0
+    for sheet_id, sheet_name in sheets_list:
+        for table_name in _legacy_raw_data_table_names(sheet_name):
+            if table_name not in legacy_tables:
+                continue
+            cursor.execute(f'SELECT cell_address, value, value_type FROM "{table_name}"')
+            rows_to_insert = []
+            for cell_address, value, value_type in cursor.fetchall():
+                try:
+                    row, col = address_to_row_col(cell_address)
+                except ValueError as ve:
+                    logger.warning(f"Миграция '{table_name}': пропущена ячейка: {ve}")
+                    continue
+                rows_to_insert.append((sheet_id, row, col, value, value_type))
+            cursor.executemany(
+                "INSERT OR REPLACE INTO cells (sheet_id, row, col, value, value_type) VALUES (?, ?, ?, ?, ?)",
+                rows_to_insert
+            )
+            cursor.execute(f'DROP TABLE "{table_name}"')
+            legacy_tables.discard(table_name)
+            migrated_cells += len(rows_to_insert)
+            logger.info(f"Таблица '{table_name}' перенесена в 'cells' для листа '{sheet_name}' (ID: {sheet_id}): {len(rows_to_insert)} ячеек.")
+
+    for table_name in sorted(legacy_tables):
+        logger.warning(f"Для устаревшей таблицы '{table_name}' не найден лист в 'sheets'. Таблица оставлена без изменений.")
+
+    return migrated_cells
+
+
+def migrate_legacy_cell_values(connection: sqlite3.Connection) -> int:
+    """
+    Переводит значения ячеек, сохранённые старыми версиями текстом (числа, логические
+    значения, даты в формате ISO), в типизированное представление (см. cell_values).
+    Функция идемпотентна; initialize_project_schema вызывает её один раз для БД
+    (до TYPED_CELL_VALUES_SCHEMA_VERSION) и после переноса таблиц raw_data_<лист>.
+    Commit выполняет вызывающая сторона.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+
+    Returns:
+        int: Количество преобразованных ячеек.
+    """
+    # Локальный импорт, чтобы schema не зависела от модулей данных при загрузке
+    from backend.storage.cell_values import TYPE_STR, TYPE_NONE, decode_legacy_text, encode_cell_value
+
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT sheet_id, row, col, value, value_type FROM cells "
+        "WHERE typeof(value) = 'text' AND value_type IS NOT NULL AND value_type NOT IN (?, ?)",
+        (TYPE_STR, TYPE_NONE)
+    )
+    rows_to_update = []
+    for sheet_id, row, col, value, value_type in cursor.fetchall():
+        decoded = decode_legacy_text(value, value_type)
+        if isinstance(decoded, str):
+            # Не разобрали - оставляем текстом с честным тегом
+            rows_to_update.append((decoded, TYPE_STR, sheet_id, row, col))
+        else:
+            rows_to_update.append((*encode_cell_value(decoded), sheet_id, row, col))
+
+    if rows_to_update:
+        cursor.executemany(
+            "UPDATE cells SET value = ?, value_type = ? WHERE sheet_id = ? AND row = ? AND col = ?",
+            rows_to_update
+        )
+        logger.info(f"Преобразовано в типизированное представление {len(rows_to_update)} значений ячеек.")
+    return len(rows_to_update)
+
+
+# --- Миграция стилей на интернированный словарь ---
+
+_LEGACY_SHEET_STYLES_TABLE = "sheet_styles_legacy"
+
+
+def _table_columns(cursor: sqlite3.Cursor, table_name: str) -> list:
+    """Возвращает список имён столбцов таблицы (пустой, если таблицы нет)."""
+    cursor.execute(f'PRAGMA table_info("{table_name}")')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _add_formula_cached_value_columns(cursor: sqlite3.Cursor) -> bool:
+    """
+    Добавляет в таблицу 'formulas' БД старого формата столбцы кэшированного результата.
+
+    Args:
+        cursor (sqlite3.Cursor): Курсор активного соединения.
+
+    Returns:
+        bool: True, если столбцы были добавлены.
+    """
+    columns = _table_columns(cursor, "formulas")
+    if "cached_value" in columns:
+        return False
+    logger.info("Добавление столбцов кэшированного результата в таблицу 'formulas'.")
+    cursor.execute("ALTER TABLE formulas ADD COLUMN cached_value")
+    if "cached_value_type" not in columns:
+        cursor.execute("ALTER TABLE formulas ADD COLUMN cached_value_type TEXT")
+    return True
+
+
+def _detach_legacy_style_tables(cursor: sqlite3.Cursor) -> bool:
+    """
+    Готовит БД старого формата к созданию новых таблиц стилей:
+    - 'sheet_styles' со столбцом style_attributes переименовывается в sheet_styles_legacy;
+    - заглушка 'styles' (только style_id) удаляется.
+
+    Args:
+        cursor (sqlite3.Cursor): Курсор активного соединения.
+
+    Returns:
+        bool: True, если есть данные стилей старого формата для переноса.
+    """
+    styles_columns = _table_columns(cursor, "styles")
+    if styles_columns and "style_hash" not in styles_columns:
+        logger.info("Удаление устаревшей таблицы-заглушки 'styles'.")
+        cursor.execute("DROP TABLE styles")
+
+    if "style_attributes" in _table_columns(cursor, "sheet_styles"):
+        logger.info(f"Таблица 'sheet_styles' старого формата переименована в '{_LEGACY_SHEET_STYLES_TABLE}' для переноса.")
+        cursor.execute(f"ALTER TABLE sheet_styles RENAME TO {_LEGACY_SHEET_STYLES_TABLE}")
+    return bool(_table_columns(cursor, _LEGACY_SHEET_STYLES_TABLE))
+
+
+def migrate_legacy_sheet_styles(connection: sqlite3.Connection) -> int:
+    """
+    Переносит стили из таблицы старого формата (JSON атрибутов в каждой строке)
+    в словарь 'styles' и ссылки 'sheet_styles', затем удаляет старую таблицу.
+    Commit выполняет вызывающая сторона.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+
+    Returns:
+        int: Количество перенесённых записей стилей.
+    """
+    # Локальный импорт, чтобы schema не зависела от модулей данных при загрузке
+    from backend.storage.styles import intern_styles, canonicalize_style
+
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT sheet_id, range_address, style_attributes FROM {_LEGACY_SHEET_STYLES_TABLE}")
+    legacy_rows = [(sheet_id, range_address, canonicalize_style(attrs)) for sheet_id, range_address, attrs in cursor.fetchall()]
+    style_ids = intern_styles(connection, [canonical for _, _, canonical in legacy_rows])
+    cursor.executemany(
+        "INSERT OR REPLACE INTO sheet_styles (sheet_id, range_address, style_id) VALUES (?, ?, ?)",
+        [(sheet_id, range_address, style_ids[canonical[0]]) for sheet_id, range_address, canonical in legacy_rows]
+    )
+    cursor.execute(f"DROP TABLE {_LEGACY_SHEET_STYLES_TABLE}")
+    logger.info(f"Перенесено {len(legacy_rows)} записей стилей в словарь 'styles' ({len(style_ids)} уникальных стилей).")
+    return len(legacy_rows)
+
 # Дополнительные функции для работы со схемой (если потребуются) могут быть добавлены здесь
\ No newline at end of file
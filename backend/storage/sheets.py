@@ -4,6 +4,8 @@ import sqlite3
 import logging
 from typing import Dict, Any, Optional, List
 
+from backend.storage.dependencies import invalidate_sheet_dependencies
+
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
@@ -45,6 +47,8 @@ def save_sheet(connection: sqlite3.Connection, project_id: int, sheet_name: str,
                 "INSERT INTO sheets (project_id, name, max_row, max_column) VALUES (?, ?, ?, ?)",
                 (project_id, sheet_name, max_row, max_column)
             )
+            # Ссылки 'Лист!A1' на новый лист в уже разобранных формулах теперь разрешаются
+            invalidate_sheet_dependencies(connection)
             connection.commit()
             new_sheet_id = cursor.lastrowid
             logger.info(f"Создан новый лист '{sheet_name}' с ID {new_sheet_id}.")
@@ -193,19 +197,20 @@ def rename_sheet(connection: sqlite3.Connection, project_id: int, old_name: str,
         rows_affected = cursor.rowcount
 
         if rows_affected > 0:
-            # 2. Обновляем sheet_name в таблице 'sheet_styles'
-            cursor.execute(
-                "UPDATE sheet_styles SET sheet_name = ? WHERE sheet_name = ?",
-                (new_name, old_name)
-            )
-            logger.debug(f"Обновлены стили для листа '{old_name}' -> '{new_name}'.")
+            # Ячейки, формулы, стили и диаграммы ссылаются на лист по sheet_id,
+            # поэтому их обновлять не нужно - достаточно изменить запись в 'sheets'.
 
-            # 3. Обновляем name в таблице 'project_metadata'
+            # 2. Обновляем ключи метаданных листа 'sheet_<имя>_<ключ>' в таблице 'project_metadata'
+            old_prefix = f"sheet_{old_name}_"
+            new_prefix = f"sheet_{new_name}_"
             cursor.execute(
-                "UPDATE project_metadata SET name = ? WHERE name = ?",
-                (new_name, old_name)
+                "UPDATE project_metadata SET key = ? || substr(key, ?) WHERE project_id = ? AND substr(key, 1, ?) = ?",
+                (new_prefix, len(old_prefix) + 1, project_id, len(old_prefix), old_prefix)
             )
-            logger.debug(f"Обновлены метаданные в project_metadata для листа '{old_name}' -> '{new_name}'.")
+            logger.debug(f"Обновлены ключи метаданных в project_metadata для листа '{old_name}' -> '{new_name}'.")
+
+            # 3. Ссылки в формулах указывают на лист по имени - граф зависимостей строится заново
+            invalidate_sheet_dependencies(connection)
 
             connection.commit()
             logger.info(f"Лист '{old_name}' успешно переименован в '{new_name}' в проекте ID {project_id}.")
@@ -2,13 +2,78 @@
 
 import sqlite3
 import logging
-from typing import List, Dict, Any, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Union
 import json
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
-def save_sheet_styles(connection: sqlite3.Connection, sheet_id: int, styles_list: List[Dict[str, Any]]) -> bool:
+# Максимум параметров в одном запросе IN (...) - ниже лимита SQLite по умолчанию
+_IN_BATCH_SIZE = 500
+
+
+def canonicalize_style(style_attributes: Union[Dict[str, Any], str, None]) -> Tuple[str, str]:
+    """
+    Приводит атрибуты стиля к каноническому JSON (ключи отсортированы, без пробелов)
+    и вычисляет его хэш - ключ интернирования в таблице 'styles'.
+
+    Args:
+        style_attributes (Union[Dict[str, Any], str, None]): Словарь атрибутов или JSON-строка.
+
+    Returns:
+        Tuple[str, str]: (style_hash, канонический JSON).
+    """
+    if isinstance(style_attributes, str):
+        try:
+            style_attributes = json.loads(style_attributes)
+        except (TypeError, ValueError):
+            # Не JSON - храним строку как есть, чтобы не потерять данные
+            logger.warning(f"Атрибуты стиля не являются корректным JSON: {style_attributes[:100]!r}")
+            return hashlib.sha1(style_attributes.encode("utf-8")).hexdigest(), style_attributes
+    if style_attributes is None:
+        style_attributes = {}
+    try:
+        canonical = json.dumps(style_attributes, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError) as e:
+        logger.error(f"Ошибка сериализации атрибутов стиля: {e}")
+        canonical = "{}"
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest(), canonical
+
+
+def intern_styles(connection: sqlite3.Connection, canonical_styles: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """
+    Добавляет стили в словарь 'styles' (если их там ещё нет) и возвращает их style_id.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        canonical_styles (Iterable[Tuple[str, str]]): Пары (style_hash, канонический JSON)
+            из canonicalize_style(). Повторы допускаются.
+
+    Returns:
+        Dict[str, int]: Отображение style_hash -> style_id.
+    """
+    unique = dict(canonical_styles)
+    if not unique:
+        return {}
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT OR IGNORE INTO styles (style_hash, style_attributes) VALUES (?, ?)",
+        unique.items()
+    )
+    style_ids: Dict[str, int] = {}
+    hashes = list(unique)
+    for i in range(0, len(hashes), _IN_BATCH_SIZE):
+        batch = hashes[i:i + _IN_BATCH_SIZE]
+        cursor.execute(
+            f"SELECT style_hash, style_id FROM styles WHERE style_hash IN ({', '.join('?' * len(batch))})",
+            batch
+        )
+        style_ids.update(cursor.fetchall())
+    return style_ids
+
+
+def save_sheet_styles(connection: sqlite3.Connection, sheet_id: int, styles_list: List[Dict[str, Any]], replace: bool = True) -> bool:
     """
     Сохраняет стили листа в БД проекта.
 
@@ -18,6 +83,8 @@ def save_sheet_styles(connection: sqlite3.Connection, sheet_id: int, styles_list
         styles_list (List[Dict[str, Any]]): Список словарей с 'style_attributes' и 'range_address'.
                                            'style_attributes' - это словарь или JSON-строка атрибутов стиля.
                                            'range_address' - это строка адреса диапазона (например, 'A1:B10').
+        replace (bool): Удалить существующие стили листа перед вставкой.
+            False - дописать к уже сохранённым (импорт частями).
 
     Returns:
         bool: True, если сохранение успешно, иначе False.
@@ -35,46 +102,49 @@ def save_sheet_styles(connection: sqlite3.Connection, sheet_id: int, styles_list
         
         # Удаляем существующие стили для этого листа, чтобы избежать дубликатов
         # Предполагается, что стили хранятся в таблице 'sheet_styles'
-        cursor.execute("DELETE FROM sheet_styles WHERE sheet_id = ?", (sheet_id,))
-        logger.debug(f"Удалены существующие стили для sheet_id {sheet_id}.")
-
-        # Подготавливаем данные для вставки
-        styles_to_insert = []
+        if replace:
+            cursor.execute("DELETE FROM sheet_styles WHERE sheet_id = ?", (sheet_id,))
+            logger.debug(f"Удалены существующие стили для sheet_id {sheet_id}.")
+
+        # Подготавливаем данные для вставки: атрибуты приводятся к каноническому виду
+        # и интернируются в словарь 'styles', в sheet_styles пишется только style_id.
+        # Одинаковые JSON-строки канонизируются один раз.
+        canonical_cache: Dict[Any, Tuple[str, str]] = {}
+        pending = []
         for style_data in styles_list:
             range_address = style_data.get('range_address')
             style_attributes = style_data.get('style_attributes')
-            
+
             if not range_address:
                 logger.warning("Найдена запись стиля без 'range_address'. Пропущена.")
                 continue
 
-            # Сериализуем атрибуты стиля в JSON, если это словарь
-            if isinstance(style_attributes, dict):
-                try:
-                    style_attributes_json = json.dumps(style_attributes, ensure_ascii=False)
-                except (TypeError, ValueError) as e:
-                    logger.error(f"Ошибка сериализации атрибутов стиля для диапазона {range_address}: {e}")
-                    # Можно либо пропустить, либо сохранить как пустую строку/NULL
-                    style_attributes_json = "{}" # Или None, в зависимости от схемы
-            elif isinstance(style_attributes, str):
-                 # Предполагаем, что это уже корректный JSON
-                 style_attributes_json = style_attributes
+            if isinstance(style_attributes, str):
+                canonical = canonical_cache.get(style_attributes)
+                if canonical is None:
+                    canonical = canonicalize_style(style_attributes)
+                    canonical_cache[style_attributes] = canonical
+            elif isinstance(style_attributes, dict):
+                canonical = canonicalize_style(style_attributes)
             else:
-                 logger.warning(f"Неподдерживаемый тип для 'style_attributes' в диапазоне {range_address}. Тип: {type(style_attributes)}. Пропущен.")
-                 style_attributes_json = "{}" # Или None
+                logger.warning(f"Неподдерживаемый тип для 'style_attributes' в диапазоне {range_address}. Тип: {type(style_attributes)}. Пропущен.")
+                canonical = canonicalize_style({})
 
-            styles_to_insert.append((sheet_id, range_address, style_attributes_json))
+            pending.append((range_address, canonical))
+
+        style_ids = intern_styles(connection, (canonical for _, canonical in pending))
+        styles_to_insert = [(sheet_id, range_address, style_ids[canonical[0]]) for range_address, canonical in pending]
 
         if styles_to_insert:
-            # Вставляем новые стили
-            # Предполагается, что таблица 'sheet_styles' имеет столбцы: sheet_id, range_address, style_attributes
+            # Вставляем ссылки на стили
             cursor.executemany(
-                "INSERT INTO sheet_styles (sheet_id, range_address, style_attributes) VALUES (?, ?, ?)",
+                "INSERT OR REPLACE INTO sheet_styles (sheet_id, range_address, style_id) VALUES (?, ?, ?)",
                 styles_to_insert
             )
             connection.commit()
-            logger.info(f"Сохранено {len(styles_to_insert)} стилей для листа ID {sheet_id}.")
+            logger.info(f"Сохранено {len(styles_to_insert)} стилей для листа ID {sheet_id} ({len(style_ids)} уникальных).")
         else:
+             connection.commit()
              logger.info(f"Нет стилей для сохранения для листа ID {sheet_id}.")
              
         return True
@@ -90,6 +160,8 @@ def save_sheet_styles(connection: sqlite3.Connection, sheet_id: int, styles_list
 def load_sheet_styles(connection: sqlite3.Connection, sheet_id: int) -> List[Dict[str, Any]]:
     """
     Загружает стили и диапазоны для указанного листа.
+    Атрибуты повторяются для каждого диапазона; для больших листов
+    удобнее load_sheet_style_refs(), возвращающая каждый стиль один раз.
 
     Args:
         connection (sqlite3.Connection): Активное соединение с БД проекта.
@@ -106,10 +178,10 @@ def load_sheet_styles(connection: sqlite3.Connection, sheet_id: int) -> List[Dic
     try:
         cursor = connection.cursor()
         
-        # Загружаем стили для этого листа
-        # Предполагается, что таблица 'sheet_styles' имеет столбцы: sheet_id, range_address, style_attributes
+        # Загружаем стили для этого листа (атрибуты - из словаря 'styles')
         cursor.execute(
-            "SELECT range_address, style_attributes FROM sheet_styles WHERE sheet_id = ?",
+            "SELECT ss.range_address, s.style_attributes FROM sheet_styles ss "
+            "JOIN styles s ON s.style_id = ss.style_id WHERE ss.sheet_id = ?",
             (sheet_id,)
         )
         rows = cursor.fetchall()
@@ -133,4 +205,43 @@ def load_sheet_styles(connection: sqlite3.Connection, sheet_id: int) -> List[Dic
         logger.error(f"Неожиданная ошибка при загрузке стилей для листа ID {sheet_id}: {e}", exc_info=True)
         return []
 
+
+def load_sheet_style_refs(connection: sqlite3.Connection, sheet_id: int) -> Dict[str, Any]:
+    """
+    Загружает стили листа в компактном виде: словарь используемых стилей (каждый один раз)
+    и список ссылок диапазон -> style_id.
+
+    Args:
+        connection (sqlite3.Connection): Активное соединение с БД проекта.
+        sheet_id (int): ID листа в БД.
+
+    Returns:
+        Dict[str, Any]: {'styles': {style_id: JSON атрибутов}, 'ranges': [(range_address, style_id), ...]}.
+                        В случае ошибки - пустые 'styles' и 'ranges'.
+    """
+    result: Dict[str, Any] = {"styles": {}, "ranges": []}
+    if not connection:
+        logger.error("Нет активного соединения с БД для загрузки стилей.")
+        return result
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT range_address, style_id FROM sheet_styles WHERE sheet_id = ?",
+            (sheet_id,)
+        )
+        result["ranges"] = cursor.fetchall()
+        cursor.execute(
+            "SELECT style_id, style_attributes FROM styles WHERE style_id IN "
+            "(SELECT DISTINCT style_id FROM sheet_styles WHERE sheet_id = ?)",
+            (sheet_id,)
+        )
+        result["styles"] = dict(cursor.fetchall())
+        logger.debug(f"Загружено {len(result['ranges'])} ссылок на {len(result['styles'])} стилей для листа ID {sheet_id}.")
+        return result
+
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка SQLite при загрузке стилей для листа ID {sheet_id}: {e}")
+        return {"styles": {}, "ranges": []}
+
 # Дополнительные функции для работы со стилями (если потребуются) могут быть добавлены здесь
@@ -0,0 +1,396 @@
+# backend/utils/progress.py
+"""
+Структурированный прогресс длительных задач (импорт, экспорт) с ограничением частоты.
+
+ProgressReporter накапливает обработанные ячейки и байты, считает скорость
+(ячеек/сек, байт/сек) и оценку оставшегося времени и отправляет событие
+ProgressEvent не чаще одного раза за interval секунд. Начало, смена этапа и
+завершение отправляются всегда.
+
+Получатель событий - старый progress_callback(percent, message) или ProgressChannel:
+канал раздаёт события подписчикам (сигналы Qt в GUI, лог в CLI, ProgressEventLog в API)
+и сам вызывается как progress_callback, поэтому проходит через существующие
+сигнатуры AppController/ImportManager без изменений.
+
+Пример:
+    reporter = ProgressReporter(progress_callback, job="xlwings")
+    reporter.start("Открыт файл")
+    reporter.stage("Лист 'Data'", total_cells=n_cells, percent_range=(0, 50))
+    for ...:
+        reporter.advance(cells=1)
+    reporter.finish(True, "Импорт завершён")
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Минимальный интервал между событиями 'progress' (сек.)
+DEFAULT_PROGRESS_INTERVAL = 0.25
+# Вес последнего замера в сглаженной скорости
+_RATE_SMOOTHING = 0.3
+# Сколько последних событий хранит ProgressEventLog по умолчанию
+DEFAULT_EVENT_LOG_SIZE = 200
+
+# Виды событий
+EVENT_START = "start"
+EVENT_STAGE = "stage"
+EVENT_PROGRESS = "progress"
+EVENT_FINISH = "finish"
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} мин {seconds} с"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин"
+
+
+class ProgressEvent:
+    """
+    Событие прогресса задачи.
+
+    kind - 'start', 'stage', 'progress' или 'finish'; percent - общий процент (0-100);
+    скорости и ETA - None, если ещё не измерены. eta_seconds - оценка до конца текущего этапа.
+    """
+
+    __slots__ = (
+        "kind", "percent", "message", "job", "stage",
+        "cells_done", "cells_total", "bytes_done", "bytes_total",
+        "cells_per_second", "bytes_per_second", "eta_seconds", "elapsed_seconds", "success",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        percent: int,
+        message: str,
+        job: str = "",
+        stage: str = "",
+        cells_done: int = 0,
+        cells_total: Optional[int] = None,
+        bytes_done: int = 0,
+        bytes_total: Optional[int] = None,
+        cells_per_second: Optional[float] = None,
+        bytes_per_second: Optional[float] = None,
+        eta_seconds: Optional[float] = None,
+        elapsed_seconds: float = 0.0,
+        success: Optional[bool] = None,
+    ):
+        self.kind = kind
+        self.percent = max(0, min(100, int(percent)))
+        self.message = message
+        self.job = job
+        self.stage = stage
+        self.cells_done = cells_done
+        self.cells_total = cells_total
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.cells_per_second = cells_per_second
+        self.bytes_per_second = bytes_per_second
+        self.eta_seconds = eta_seconds
+        self.elapsed_seconds = elapsed_seconds
+        self.success = success
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Событие в виде словаря (для сигналов Qt и JSON-ответов API)."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def display_message(self) -> str:
+        """Сообщение для строки состояния: текст, счётчики, скорость и ETA."""
+        parts = []
+        if self.cells_total:
+            parts.append(f"{self.cells_done}/{self.cells_total} ячеек")
+        if self.cells_per_second:
+            parts.append(f"{self.cells_per_second:,.0f} яч./с".replace(",", " "))
+        elif self.bytes_per_second:
+            parts.append(f"{self.bytes_per_second / (1024 * 1024):.1f} МБ/с")
+        if self.eta_seconds is not None and self.kind == EVENT_PROGRESS:
+            parts.append(f"осталось ~{_format_seconds(self.eta_seconds)}")
+        return f"{self.message} ({', '.join(parts)})" if parts else self.message
+
+    def __repr__(self) -> str:
+        return f"ProgressEvent({self.kind!r}, {self.percent}, {self.message!r})"
+
+
+class ProgressChannel:
+    """
+    Раздаёт события прогресса подписчикам.
+
+    Вызывается как обычный progress_callback(percent, message): такие вызовы
+    превращаются в события 'progress', поэтому код, ещё не использующий
+    ProgressReporter, тоже доходит до подписчиков в структурированном виде.
+    """
+
+    def __init__(self, *sinks: Callable[[ProgressEvent], None]):
+        """
+        Args:
+            *sinks: Подписчики, принимающие ProgressEvent.
+        """
+        self._sinks: List[Callable[[ProgressEvent], None]] = list(sinks)
+
+    def add_sink(self, sink: Callable[[ProgressEvent], None]):
+        """Добавляет подписчика."""
+        self._sinks.append(sink)
+
+    def publish(self, event: ProgressEvent):
+        """
+        Отправляет событие всем подписчикам. Ошибка подписчика не прерывает задачу.
+
+        Args:
+            event (ProgressEvent): Событие прогресса.
+        """
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                logger.warning(f"Ошибка подписчика прогресса {sink!r}: {e}")
+
+    def __call__(self, percent: int, message: str):
+        self.publish(ProgressEvent(EVENT_PROGRESS, percent, message))
+
+
+def deliver_progress(callback: Optional[Callable[..., None]], event: ProgressEvent):
+    """
+    Доставляет событие получателю: ProgressChannel получает само событие,
+    обычный progress_callback - (percent, message).
+    """
+    if callback is None:
+        return
+    publish = getattr(callback, "publish", None)
+    if publish is not None:
+        publish(event)
+    else:
+        callback(event.percent, event.display_message())
+
+
+class ProgressReporter:
+    """
+    Отправитель прогресса одной задачи с ограничением частоты событий.
+
+    Процент считается по байтам (если задан total_bytes этапа), иначе по ячейкам,
+    и отображается в диапазон процентов этапа percent_range.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[..., None]],
+        job: str = "",
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            callback: progress_callback(percent, message) или ProgressChannel; None - прогресс не нужен.
+            job (str): Имя задачи в событиях.
+            interval (float): Минимальный интервал между событиями 'progress' (сек.).
+            clock (Callable[[], float]): Источник времени (для тестов).
+        """
+        self.callback = callback
+        self.job = job
+        self.interval = interval
+        self._clock = clock
+
+        self._started = clock()
+        self._last_emit: Optional[float] = None
+        self.events_sent = 0
+        self.updates_coalesced = 0
+
+        self.cells_done = 0
+        self.bytes_done = 0
+        # Этап: процентный диапазон, объём работы и выполненная часть
+        self._stage_name = ""
+        self._percent_range: Tuple[float, float] = (0.0, 100.0)
+        self._stage_cells_total: Optional[int] = None
+        self._stage_bytes_total: Optional[int] = None
+        self._stage_cells_done = 0
+        self._stage_bytes_done = 0
+        self._percent = 0.0
+
+        # Сглаженные скорости по интервалам между событиями
+        self._rate_mark: Tuple[float, int, int] = (self._started, 0, 0)
+        self._cells_rate: Optional[float] = None
+        self._bytes_rate: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        """True, если есть получатель событий."""
+        return self.callback is not None
+
+    # --- Расчёт ---
+
+    def _update_rates(self, now: float):
+        mark_time, mark_cells, mark_bytes = self._rate_mark
+        elapsed = now - mark_time
+        if elapsed <= 0:
+            return
+        cells_rate = (self.cells_done - mark_cells) / elapsed
+        bytes_rate = (self.bytes_done - mark_bytes) / elapsed
+        if self.cells_done > mark_cells:
+            self._cells_rate = cells_rate if self._cells_rate is None else (
+                _RATE_SMOOTHING * cells_rate + (1 - _RATE_SMOOTHING) * self._cells_rate)
+        if self.bytes_done > mark_bytes:
+            self._bytes_rate = bytes_rate if self._bytes_rate is None else (
+                _RATE_SMOOTHING * bytes_rate + (1 - _RATE_SMOOTHING) * self._bytes_rate)
+        self._rate_mark = (now, self.cells_done, self.bytes_done)
+
+    def _stage_fraction(self) -> Optional[float]:
+        if self._stage_bytes_total:
+            return min(1.0, self._stage_bytes_done / self._stage_bytes_total)
+        if self._stage_cells_total:
+            return min(1.0, self._stage_cells_done / self._stage_cells_total)
+        return None
+
+    def _eta(self) -> Optional[float]:
+        if self._stage_bytes_total and self._bytes_rate:
+            return max(0.0, (self._stage_bytes_total - self._stage_bytes_done) / self._bytes_rate)
+        if self._stage_cells_total and self._cells_rate:
+            return max(0.0, (self._stage_cells_total - self._stage_cells_done) / self._cells_rate)
+        return None
+
+    def _event(self, kind: str, message: str, success: Optional[bool] = None) -> ProgressEvent:
+        now = self._clock()
+        self._update_rates(now)
+        return ProgressEvent(
+            kind,
+            int(self._percent),
+            message,
+            job=self.job,
+            stage=self._stage_name,
+            cells_done=self._stage_cells_done,
+            cells_total=self._stage_cells_total,
+            bytes_done=self._stage_bytes_done,
+            bytes_total=self._stage_bytes_total,
+            cells_per_second=self._cells_rate,
+            bytes_per_second=self._bytes_rate,
+            eta_seconds=self._eta() if kind == EVENT_PROGRESS else None,
+            elapsed_seconds=now - self._started,
+            success=success,
+        )
+
+    def _emit(self, event: ProgressEvent):
+        self._last_emit = self._clock()
+        self.events_sent += 1
+        deliver_progress(self.callback, event)
+
+    # --- События ---
+
+    def start(self, message: str, percent: float = 0):
+        """Сообщает о начале задачи (отправляется всегда)."""
+        self._percent = percent
+        if self.enabled:
+            self._emit(self._event(EVENT_START, message))
+
+    def stage(
+        self,
+        message: str,
+        total_cells: Optional[int] = None,
+        total_bytes: Optional[int] = None,
+        percent_range: Optional[Tuple[float, float]] = None,
+    ):
+        """
+        Начинает этап задачи (например, лист) и сообщает о нём (отправляется всегда).
+
+        Args:
+            message (str): Описание этапа; используется и в событиях 'progress' этапа.
+            total_cells (Optional[int]): Объём этапа в ячейках.
+            total_bytes (Optional[int]): Объём этапа в байтах (приоритетнее ячеек для процента).
+            percent_range (Optional[Tuple[float, float]]): Диапазон общего процента этапа;
+                по умолчанию - от текущего процента до 100.
+        """
+        self._stage_name = message
+        self._percent_range = percent_range or (self._percent, 100.0)
+        self._percent = self._percent_range[0]
+        self._stage_cells_total = total_cells
+        self._stage_bytes_total = total_bytes
+        self._stage_cells_done = 0
+        self._stage_bytes_done = 0
+        if self.enabled:
+            self._emit(self._event(EVENT_STAGE, message))
+
+    def advance(self, cells: int = 0, bytes_count: int = 0, message: Optional[str] = None, force: bool = False):
+        """
+        Учитывает выполненную работу. Событие 'progress' отправляется, только если
+        с предыдущего события прошло не меньше interval секунд (или force=True).
+
+        Args:
+            cells (int): Обработано ячеек с прошлого вызова.
+            bytes_count (int): Обработано байт с прошлого вызова.
+            message (Optional[str]): Сообщение события; по умолчанию - описание этапа.
+            force (bool): Отправить событие без учёта интервала.
+        """
+        self.cells_done += cells
+        self.bytes_done += bytes_count
+        self._stage_cells_done += cells
+        self._stage_bytes_done += bytes_count
+        fraction = self._stage_fraction()
+        if fraction is not None:
+            low, high = self._percent_range
+            # 100% сообщает только finish()
+            self._percent = min(low + (high - low) * fraction, 99)
+
+        if not self.enabled:
+            return
+        if not force and self._last_emit is not None and self._clock() - self._last_emit < self.interval:
+            self.updates_coalesced += 1
+            return
+        self._emit(self._event(EVENT_PROGRESS, message or self._stage_name))
+
+    def finish(self, success: bool = True, message: Optional[str] = None):
+        """Сообщает о завершении задачи (отправляется всегда, при успехе - 100%)."""
+        if success:
+            self._percent = 100
+        if self.enabled:
+            self._emit(self._event(EVENT_FINISH, message or ("Завершено" if success else "Не удалось"), success=success))
+        logger.debug(
+            f"Прогресс '{self.job}': событий {self.events_sent}, объединено обновлений {self.updates_coalesced}, "
+            f"{self.cells_done} ячеек за {self._clock() - self._started:.2f} с."
+        )
+
+
+# --- Подписчики ---
+
+def logging_progress_sink(target_logger: logging.Logger, level: int = logging.INFO) -> Callable[[ProgressEvent], None]:
+    """
+    Подписчик, пишущий события в лог (для CLI).
+
+    Args:
+        target_logger (logging.Logger): Логгер.
+        level (int): Уровень записей.
+    """
+    def sink(event: ProgressEvent):
+        target_logger.log(level, f"[{event.percent:3d}%] {event.display_message()}")
+    return sink
+
+
+class ProgressEventLog:
+    """
+    Подписчик, сохраняющий последние события в виде словарей (для ответов API).
+    """
+
+    def __init__(self, max_events: int = DEFAULT_EVENT_LOG_SIZE):
+        self._events: deque = deque(maxlen=max_events)
+
+    def __call__(self, event: ProgressEvent):
+        self._events.append(event.to_dict())
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        """Сохранённые события, от старых к новым."""
+        return list(self._events)
+
+    @property
+    def last(self) -> Optional[Dict[str, Any]]:
+        """Последнее событие или None."""
+        return self._events[-1] if self._events else None
+
+# Дополнительные функции прогресса (если потребуются) могут быть добавлены здесь
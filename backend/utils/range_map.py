@@ -0,0 +1,115 @@
+# backend/utils/range_map.py
+"""
+Сопоставление прямоугольных диапазонов ячеек со значениями (стилями, форматами)
+без разворачивания диапазонов в отдельные ячейки.
+
+Используется экспортёром (формат xlsxwriter по ячейке) и Qt-моделью (стиль по ячейке):
+после компактизации стилей диапазон 'A1:F5000' хранится одной записью,
+а поиск значения для ячейки идёт по индексу полос строк.
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Высота полосы строк в индексе: диапазон регистрируется в каждой полосе, которую пересекает
+_BAND_ROWS = 32
+
+_MISSING = object()
+
+
+class RangeMap:
+    """
+    Набор прямоугольников (row_start, col_start, row_end, col_end) со значениями.
+    Поддерживает интерфейс чтения словаря {(row, col): value}: get(), in, items().
+
+    При пересечении диапазонов выигрывает первый добавленный (prefer_last=False)
+    или последний добавленный (prefer_last=True).
+    """
+
+    def __init__(self, prefer_last: bool = False):
+        """
+        Args:
+            prefer_last (bool): Приоритет последнего добавленного диапазона при пересечениях.
+        """
+        self.prefer_last = prefer_last
+        self._rects: List[Tuple[int, int, int, int, Any]] = []
+        self._bands: Dict[int, List[int]] = {}
+        # Одиночные ячейки (несжатые стили) индексируются напрямую, чтобы не удлинять полосы
+        self._cells: Dict[Tuple[int, int], int] = {}
+
+    def add(self, row_start: int, col_start: int, row_end: int, col_end: int, value: Any):
+        """
+        Добавляет диапазон (границы включительно).
+
+        Args:
+            row_start (int): Первая строка.
+            col_start (int): Первый столбец.
+            row_end (int): Последняя строка.
+            col_end (int): Последний столбец.
+            value (Any): Значение для ячеек диапазона.
+        """
+        index = len(self._rects)
+        self._rects.append((row_start, col_start, row_end, col_end, value))
+        if row_start == row_end and col_start == col_end:
+            if self.prefer_last:
+                self._cells[(row_start, col_start)] = index
+            else:
+                self._cells.setdefault((row_start, col_start), index)
+            return
+        for band in range(row_start // _BAND_ROWS, row_end // _BAND_ROWS + 1):
+            self._bands.setdefault(band, []).append(index)
+
+    def _find_index(self, row: int, col: int) -> int:
+        """Возвращает индекс диапазона, определяющего значение ячейки, или -1."""
+        found = self._cells.get((row, col), -1)
+        candidates = self._bands.get(row // _BAND_ROWS)
+        if not candidates:
+            return found
+        ordered = reversed(candidates) if self.prefer_last else candidates
+        for index in ordered:
+            # Диапазоны в полосе упорядочены: дальше только менее приоритетные, чем одиночная ячейка
+            if found >= 0 and (index < found if self.prefer_last else index > found):
+                break
+            r0, c0, r1, c1, _ = self._rects[index]
+            if r0 <= row <= r1 and c0 <= col <= c1:
+                return index
+        return found
+
+    def _find(self, row: int, col: int) -> Any:
+        index = self._find_index(row, col)
+        return _MISSING if index < 0 else self._rects[index][4]
+
+    def get(self, cell: Tuple[int, int], default: Any = None) -> Any:
+        """Возвращает значение для ячейки (row, col) или default."""
+        value = self._find(*cell)
+        return default if value is _MISSING else value
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        return self._find(*cell) is not _MISSING
+
+    def __len__(self) -> int:
+        """Количество диапазонов (не ячеек)."""
+        return len(self._rects)
+
+    def __bool__(self) -> bool:
+        return bool(self._rects)
+
+    def ranges(self) -> List[Tuple[int, int, int, int, Any]]:
+        """Возвращает диапазоны в порядке добавления."""
+        return list(self._rects)
+
+    def cell_count(self) -> int:
+        """Количество ячеек, покрытых диапазонами (с учётом пересечений как отдельных)."""
+        return sum((r1 - r0 + 1) * (c1 - c0 + 1) for r0, c0, r1, c1, _ in self._rects)
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int], Any]]:
+        """
+        Перебирает ячейки всех диапазонов с итоговым значением (с учётом приоритета),
+        каждую ячейку - один раз. Разворачивание выполняется лениво.
+        """
+        # Ячейка выдаётся только тем диапазоном, который для неё «выигрывает»,
+        # поэтому пересечения не дают повторов и не требуют множества просмотренных ячеек
+        for index, (r0, c0, r1, c1, value) in enumerate(self._rects):
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    if self._find_index(r, c) == index:
+                        yield (r, c), value
@@ -0,0 +1,89 @@
+# backend/utils/row_block_cache.py
+"""
+Кэш значений ячеек листа, подгружаемых из БД блоками строк по запросу.
+
+Используется Qt-моделями таблицы: представление запрашивает только видимые ячейки,
+поэтому в память читается окно из нескольких блоков, а не весь лист.
+Индексы строк и столбцов 0-based, как в QModelIndex.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+# Высота блока строк, читаемого одним запросом
+DEFAULT_BLOCK_ROWS = 256
+# Сколько последних прочитанных блоков держать в памяти
+DEFAULT_MAX_BLOCKS = 64
+
+
+class RowBlockCache:
+    """
+    Значения ячеек {(row, col): value}, читаемые блоками по block_rows строк.
+    Блок загружается при первом обращении к любой его ячейке; при превышении
+    max_blocks вытесняется блок, к которому дольше всего не обращались.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[int, int], Iterable[Tuple[int, int, Any]]],
+        block_rows: int = DEFAULT_BLOCK_ROWS,
+        max_blocks: int = DEFAULT_MAX_BLOCKS,
+    ):
+        """
+        Args:
+            loader (Callable[[int, int], Iterable[Tuple[int, int, Any]]]): Функция чтения
+                строк row_start..row_end (включительно), возвращающая (row, col, value).
+            block_rows (int): Количество строк в блоке.
+            max_blocks (int): Максимальное число блоков в памяти.
+        """
+        self._loader = loader
+        self.block_rows = block_rows
+        self.max_blocks = max_blocks
+        self._blocks: "OrderedDict[int, Dict[Tuple[int, int], Any]]" = OrderedDict()
+
+    def _block(self, row: int) -> Dict[Tuple[int, int], Any]:
+        """Возвращает блок, содержащий строку row, при необходимости читая его."""
+        key = row // self.block_rows
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+            return block
+        row_start = key * self.block_rows
+        block = {(r, c): value for r, c, value in self._loader(row_start, row_start + self.block_rows - 1)}
+        self._blocks[key] = block
+        if len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def get(self, row: int, col: int, default: Any = None) -> Any:
+        """
+        Возвращает значение ячейки.
+
+        Args:
+            row (int): Индекс строки (0-based).
+            col (int): Индекс столбца (0-based).
+            default (Any): Значение для пустой ячейки.
+
+        Returns:
+            Any: Значение ячейки или default.
+        """
+        return self._block(row).get((row, col), default)
+
+    def set(self, row: int, col: int, value: Any):
+        """
+        Обновляет значение ячейки в загруженном блоке.
+        Значение должно быть уже записано в БД: незагруженный (или вытесненный)
+        блок прочитает его оттуда при следующем обращении.
+
+        Args:
+            row (int): Индекс строки (0-based).
+            col (int): Индекс столбца (0-based).
+            value (Any): Новое значение.
+        """
+        block = self._blocks.get(row // self.block_rows)
+        if block is not None:
+            block[(row, col)] = value
+
+    def clear(self):
+        """Сбрасывает все загруженные блоки."""
+        self._blocks.clear()
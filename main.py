@@ -13,6 +13,7 @@ from pathlib import Path
 
 # Добавляем директорию backend в путь поиска модулей
 from backend.utils.logger import get_logger
+from backend.utils.progress import ProgressChannel, logging_progress_sink
 # Импортируем AppController для интеграции
 from backend.core.app_controller import create_app_controller
 # ProjectManager больше не импортируем напрямую, так как AppController его использует
@@ -132,7 +133,12 @@ def export_results_cli(export_type: str, output_path: str, project_path: str) ->
 
         # Вызываем экспорт через контроллер
         logger.debug(f"[export_results_cli] Вызов app_controller.export_results(type={export_type}, path={output_path})")
-        success = app_controller.export_results(export_type=export_type, output_path=output_path)
+        # Прогресс экспорта пишется в лог (не чаще DEFAULT_PROGRESS_INTERVAL)
+        success = app_controller.export_results(
+            export_type=export_type,
+            output_path=output_path,
+            progress_callback=ProgressChannel(logging_progress_sink(logger)),
+        )
         logger.debug(f"[export_results_cli] app_controller.export_results вернул: {success}")
 
         if success:
@@ -0,0 +1,144 @@
+# scripts/benchmark_style_ranges.py
+"""
+Бенчмарк компактизации стилей: сравнивает хранение стилей «по ячейке»
+(одна запись sheet_styles на адрес) и «по диапазонам» (StyleRangeCompactor).
+
+Для синтетического листа (шапка, чередующиеся полосы строк, отдельно оформленные
+столбцы) измеряются:
+- число записей в sheet_styles и размер файла БД;
+- время сохранения стилей;
+- время загрузки стилей (load_sheet_style_refs);
+- время построения карты форматов экспортёра (build_cell_format_map) и поиска формата по всем ячейкам.
+
+Запуск из корня проекта:
+    python scripts/benchmark_style_ranges.py --rows 20000 --cols 12
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Корень проекта в sys.path, чтобы импортировать backend.*
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import xlsxwriter
+
+from backend.analyzer.logic_documentation import StyleRangeCompactor
+from backend.exporter.excel.xlsxwriter_exporter import build_cell_format_map
+from backend.storage.base import ProjectDBStorage
+
+
+def _make_styles():
+    """Несколько типичных стилей: шапка, две полосы «зебры», денежный и датовый столбцы."""
+    return {
+        "header": json.dumps({"font": {"b": True, "sz": 12}, "fill": {"patternType": "solid", "fgColor": {"rgb": "FFD9D9D9"}}}, sort_keys=True),
+        "band_a": json.dumps({"font": {"sz": 11}}, sort_keys=True),
+        "band_b": json.dumps({"font": {"sz": 11}, "fill": {"patternType": "solid", "fgColor": {"rgb": "FFF2F2F2"}}}, sort_keys=True),
+        "money": json.dumps({"font": {"sz": 11}, "number_format": "#,##0.00"}, sort_keys=True),
+        "date": json.dumps({"font": {"sz": 11}, "number_format": "DD.MM.YYYY"}, sort_keys=True),
+    }
+
+
+def _iter_styled_cells(rows: int, cols: int, styles: dict):
+    """Перебирает (row, col, style_json) в порядке строк, 1-based."""
+    for row in range(1, rows + 1):
+        for col in range(1, cols + 1):
+            if row == 1:
+                key = "header"
+            elif col == 3:
+                key = "money"
+            elif col == 4:
+                key = "date"
+            else:
+                # Полосы по 5 строк
+                key = "band_a" if (row // 5) % 2 == 0 else "band_b"
+            yield row, col, styles[key]
+
+
+def _per_cell_styles(rows: int, cols: int, styles: dict) -> list:
+    from openpyxl.utils import get_column_letter
+    return [
+        {"range_address": f"{get_column_letter(col)}{row}", "style_attributes": style_json}
+        for row, col, style_json in _iter_styled_cells(rows, cols, styles)
+    ]
+
+
+def _compacted_styles(rows: int, cols: int, styles: dict) -> list:
+    compactor = StyleRangeCompactor()
+    for row, col, style_json in _iter_styled_cells(rows, cols, styles):
+        compactor.add(style_json, row, col)
+    return [{"range_address": address, "style_attributes": style_json} for style_json, address in compactor.finish()]
+
+
+def _run_case(name: str, styles_list: list, rows: int, cols: int, work_dir: str) -> dict:
+    db_path = os.path.join(work_dir, f"{name}.db")
+    storage = ProjectDBStorage(db_path)
+    storage.initialize_project_tables()
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="Bench", max_row=rows, max_column=cols)
+
+    t0 = time.perf_counter()
+    with storage.bulk_session():
+        storage.save_sheet_styles(sheet_id, styles_list)
+    save_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    style_refs = storage.load_sheet_style_refs(sheet_id)
+    load_s = time.perf_counter() - t0
+
+    workbook = xlsxwriter.Workbook(os.path.join(work_dir, f"{name}.xlsx"), {"in_memory": True})
+    t0 = time.perf_counter()
+    format_map = build_cell_format_map(workbook, style_refs)
+    map_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    missing = sum(1 for r in range(rows) for c in range(cols) if format_map.get((r, c)) is None)
+    lookup_s = time.perf_counter() - t0
+    workbook.close()
+
+    storage.close_pool()
+    return {
+        "case": name,
+        "sheet_styles_rows": len(style_refs["ranges"]),
+        "unique_styles": len(style_refs["styles"]),
+        "db_kb": os.path.getsize(db_path) // 1024,
+        "save_s": save_s,
+        "load_s": load_s,
+        "format_map_s": map_s,
+        "lookup_all_s": lookup_s,
+        "cells_without_format": missing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк компактизации стилей в диапазоны.")
+    parser.add_argument("--rows", type=int, default=20000, help="Число строк листа")
+    parser.add_argument("--cols", type=int, default=12, help="Число столбцов листа")
+    args = parser.parse_args()
+
+    styles = _make_styles()
+    with tempfile.TemporaryDirectory() as work_dir:
+        t0 = time.perf_counter()
+        per_cell = _per_cell_styles(args.rows, args.cols, styles)
+        per_cell_prep = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        compacted = _compacted_styles(args.rows, args.cols, styles)
+        compact_prep = time.perf_counter() - t0
+
+        results = [
+            dict(_run_case("per_cell", per_cell, args.rows, args.cols, work_dir), prepare_s=per_cell_prep),
+            dict(_run_case("compacted", compacted, args.rows, args.cols, work_dir), prepare_s=compact_prep),
+        ]
+
+    print(f"Лист {args.rows} x {args.cols} ({args.rows * args.cols} ячеек со стилем)")
+    columns = ["case", "sheet_styles_rows", "unique_styles", "db_kb", "prepare_s", "save_s", "load_s", "format_map_s", "lookup_all_s", "cells_without_format"]
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(f"{result[c]:.3f}" if isinstance(result[c], float) else str(result[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# scripts/benchmark_xlwings_importer.py
+"""
+Бенчмарк COM-вызовов xlwings-импортёра на поддельном xlwings (tests/fake_xlwings.py).
+
+Генерирует книгу (по умолчанию 2000 строк x 12 столбцов: шапка жирным, столбец дат,
+заливка блока, объединённые ячейки, формулы), импортирует её через
+import_all_from_excel_xlwings и отдельно извлекает стили листа, затем печатает число
+COM-вызовов по свойствам и время. Excel не нужен - скрипт работает на Linux.
+
+    python scripts/benchmark_xlwings_importer.py [--rows 2000] [--cols 12] [--file book.xlsx]
+
+В реальном Excel каждый COM-вызов - межпроцессный вызов (десятки-сотни микросекунд),
+поэтому время импорта определяется их числом.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Корень проекта в sys.path, чтобы импортировать backend.* и tests.fake_xlwings
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import openpyxl
+from openpyxl.styles import Font, PatternFill
+
+from tests import fake_xlwings
+
+fake_xlwings.install()
+
+from backend.importer import xlwings_importer  # noqa: E402 - после подмены xlwings
+from backend.storage.base import ProjectDBStorage  # noqa: E402
+
+
+def make_workbook(path: str, rows: int, cols: int):
+    """Книга с типичным оформлением: шапка, даты, заливка, объединения, формулы."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    bold = Font(bold=True)
+    for col in range(1, cols + 1):
+        cell = sheet.cell(row=1, column=col, value=f"Столбец {col}")
+        cell.font = bold
+    fill = PatternFill("solid", fgColor="FFFF00")
+    start = datetime.date(2024, 1, 1)
+    for row in range(2, rows + 1):
+        sheet.cell(row=row, column=1, value=row)
+        date_cell = sheet.cell(row=row, column=2, value=start + datetime.timedelta(days=row))
+        date_cell.number_format = "DD.MM.YYYY"
+        for col in range(3, cols):
+            sheet.cell(row=row, column=col, value=row * col)
+        sheet.cell(row=row, column=cols, value=f"=A{row}*2")
+        if row <= 50:
+            for col in range(3, 6):
+                sheet.cell(row=row, column=col).fill = fill
+    sheet.merge_cells(start_row=rows + 2, start_column=1, end_row=rows + 2, end_column=4)
+    sheet.cell(row=rows + 2, column=1, value="Итого")
+    workbook.save(path)
+
+
+def _report(title: str, seconds: float):
+    calls = fake_xlwings.COM_CALLS
+    top = ", ".join(f"{name}={count}" for name, count in calls.most_common(6))
+    print(f"{title}: {fake_xlwings.total_com_calls()} COM-вызовов за {seconds:.2f} с ({top})")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--file", help="Существующая книга вместо сгенерированной")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_path = args.file
+        if not file_path:
+            file_path = os.path.join(work_dir, "xlwings_bench.xlsx")
+            make_workbook(file_path, args.rows, args.cols)
+        storage = ProjectDBStorage(os.path.join(work_dir, "project.db"))
+        storage.initialize_project_tables()
+
+        fake_xlwings.reset_com_calls()
+        started = time.perf_counter()
+        ok = xlwings_importer.import_all_from_excel_xlwings(storage, file_path)
+        _report(f"Импорт ({'успешно' if ok else 'ошибка'})", time.perf_counter() - started)
+
+        book = fake_xlwings.App().books.open(file_path)
+        for sheet in book.sheets:
+            fake_xlwings.reset_com_calls()
+            started = time.perf_counter()
+            styles = xlwings_importer._extract_styles_from_xlwings_sheet(sheet, 1)
+            _report(f"Стили листа '{sheet.name}' ({len(styles)} записей)", time.perf_counter() - started)
+        storage.release_thread_connections()
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+# tests/conftest.py
+"""
+Общие фикстуры тестов.
+"""
+
+import types
+
+import pytest
+
+from backend.storage.base import ProjectDBStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Хранилище нового проекта во временной БД (соединения пула закрываются после теста)."""
+    project_storage = ProjectDBStorage(str(tmp_path / "project.db"))
+    assert project_storage.initialize_project_tables()
+    yield project_storage
+    project_storage.disconnect()
+    project_storage.close_pool()
+
+
+@pytest.fixture
+def data_manager(storage):
+    """DataManager поверх хранилища проекта (без GUI и остальных менеджеров AppController)."""
+    from backend.core.controller.data_manager import DataManager
+    return DataManager(types.SimpleNamespace(storage=storage))
@@ -0,0 +1,414 @@
+# tests/fake_xlwings.py
+"""
+Поддельный модуль xlwings для запуска xlwings-импортёра без Excel (Linux, CI).
+
+Книга читается через openpyxl, а объекты App/Book/Sheet/Range и COM-объекты Range.api
+повторяют ту часть API xlwings/Excel, которую использует backend/importer/xlwings_importer.py:
+- Range.value (скаляр / список / список списков, options(ndim=2)), Range.formula, address,
+  merge_area, rows.count/columns.count;
+- Range.api: NumberFormat, Font, Interior, Borders, HorizontalAlignment, VerticalAlignment,
+  MergeCells, MergeArea. Как и в Excel, свойство диапазона с разными значениями
+  у ячеек возвращает None (COM Null), MergeCells - True/False/None.
+
+Каждое обращение к свойству, которое в настоящем xlwings уходит в Excel через COM,
+считается в COM_CALLS (по имени свойства): по счётчикам видно число межпроцессных вызовов.
+
+Используется тестами (tests/test_xlwings_importer.py) и scripts/benchmark_xlwings_importer.py:
+    from tests import fake_xlwings
+    fake_xlwings.install()          # sys.modules['xlwings'] = fake_xlwings
+    from backend.importer.xlwings_importer import import_all_from_excel_xlwings
+    fake_xlwings.reset_com_calls()
+    ...
+    print(fake_xlwings.total_com_calls())
+"""
+
+import sys
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+# Счётчики COM-вызовов по имени свойства
+COM_CALLS: Counter = Counter()
+
+# Константы Excel
+XL_NONE = -4142
+XL_CONTINUOUS = 1
+XL_GENERAL = 1
+XL_BOTTOM = -4107
+_HORIZONTAL = {"general": 1, "left": -4131, "center": -4108, "right": -4152, "fill": 5, "justify": -4130,
+               "centerContinuous": 7, "distributed": -4117}
+_VERTICAL = {"top": -4160, "center": -4108, "bottom": -4107, "justify": -4130, "distributed": -4117}
+# Белый цвет Excel (BGR) - цвет заливки ячейки без заливки
+_NO_FILL_COLOR = 16777215
+
+
+def install():
+    """Подменяет модуль xlwings этим модулем (до импорта xlwings_importer)."""
+    sys.modules["xlwings"] = sys.modules[__name__]
+
+
+def reset_com_calls():
+    """Обнуляет счётчики COM-вызовов."""
+    COM_CALLS.clear()
+
+
+def total_com_calls() -> int:
+    """Общее число COM-вызовов с последнего сброса."""
+    return sum(COM_CALLS.values())
+
+
+def _com(name: str):
+    COM_CALLS[name] += 1
+
+
+def _excel_color(color) -> Optional[int]:
+    """Цвет openpyxl 'AARRGGBB' -> число Excel (BGR); тема/индекс -> None."""
+    rgb = getattr(color, "rgb", None)
+    if not isinstance(rgb, str) or len(rgb) < 6:
+        return None
+    red, green, blue = int(rgb[-6:-4], 16), int(rgb[-4:-2], 16), int(rgb[-2:], 16)
+    return red + (green << 8) + (blue << 16)
+
+
+def _address(row: int, col: int) -> str:
+    return f"${get_column_letter(col)}${row}"
+
+
+class _CellProps:
+    """Свойства одной ячейки в терминах Excel."""
+
+    __slots__ = ("number_format", "font", "interior", "borders", "horizontal", "vertical")
+
+    def __init__(self, cell):
+        self.number_format = cell.number_format or "General"
+        font = cell.font
+        self.font = {
+            "Name": font.name or "Calibri",
+            "Size": float(font.sz) if font.sz else 11.0,
+            "Bold": bool(font.b),
+            "Italic": bool(font.i),
+            "Color": _excel_color(font.color) or 0,
+        }
+        fill = cell.fill
+        if fill is not None and fill.fill_type:
+            self.interior = {"Color": _excel_color(fill.fgColor) or 0, "Pattern": XL_CONTINUOUS}
+        else:
+            self.interior = {"Color": _NO_FILL_COLOR, "Pattern": XL_NONE}
+        has_border = any(getattr(cell.border, side).style for side in ("left", "right", "top", "bottom"))
+        self.borders = {"LineStyle": XL_CONTINUOUS if has_border else XL_NONE, "Color": 0}
+        self.horizontal = _HORIZONTAL.get(cell.alignment.horizontal or "general", XL_GENERAL)
+        self.vertical = _VERTICAL.get(cell.alignment.vertical or "bottom", XL_BOTTOM)
+
+
+class _SheetModel:
+    """Данные листа: значения, формулы, свойства ячеек, объединения."""
+
+    def __init__(self, formula_ws, value_ws):
+        self.name = formula_ws.title
+        self.min_row, self.min_col = formula_ws.min_row, formula_ws.min_column
+        self.max_row, self.max_col = formula_ws.max_row, formula_ws.max_column
+        self.values: Dict[Tuple[int, int], Any] = {}
+        self.formulas: Dict[Tuple[int, int], str] = {}
+        self.props: Dict[Tuple[int, int], _CellProps] = {}
+        for row in formula_ws.iter_rows():
+            for cell in row:
+                key = (cell.row, cell.column)
+                if isinstance(cell.value, str) and cell.value.startswith("="):
+                    self.formulas[key] = cell.value
+                self.props[key] = _CellProps(cell)
+        for row in value_ws.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    self.values[(cell.row, cell.column)] = cell.value
+        # Ячейка -> границы объединённой области (r1, c1, r2, c2)
+        self.merged: Dict[Tuple[int, int], Tuple[int, int, int, int]] = {}
+        for merged_range in formula_ws.merged_cells.ranges:
+            bounds = (merged_range.min_row, merged_range.min_col, merged_range.max_row, merged_range.max_col)
+            for r in range(bounds[0], bounds[2] + 1):
+                for c in range(bounds[1], bounds[3] + 1):
+                    self.merged[(r, c)] = bounds
+        self.charts = [_Chart(getattr(chart, "title", None) or f"Chart {i + 1}") for i, chart in enumerate(formula_ws._charts)]
+        self._default_props = None
+
+    def cell_props(self, row: int, col: int) -> _CellProps:
+        props = self.props.get((row, col))
+        if props is None:
+            if self._default_props is None:
+                self._default_props = _CellProps(openpyxl.Workbook().active["A1"])
+            props = self._default_props
+        return props
+
+    def formula_text(self, row: int, col: int) -> str:
+        if (row, col) in self.formulas:
+            return self.formulas[(row, col)]
+        value = self.values.get((row, col))
+        return "" if value is None else str(value)
+
+
+class _Chart:
+    def __init__(self, name):
+        self.name = str(name)
+
+
+class _Count:
+    def __init__(self, count: int):
+        self.count = count
+
+
+def _uniform(values):
+    """Общее значение или None (COM Null), если значения различаются."""
+    first = values[0]
+    for value in values[1:]:
+        if value != first:
+            return None
+    return first
+
+
+class _ComObject:
+    """COM-объект с набором свойств, вычисляемых по ячейкам диапазона (Font, Interior, Borders)."""
+
+    def __init__(self, kind: str, rng: "Range", getter):
+        self._kind = kind
+        self._rng = rng
+        self._getter = getter
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        _com(f"{self._kind}.{name}")
+        return _uniform([self._getter(props)[name] for props in self._rng._cell_props()])
+
+
+class _RangeApi:
+    """Range.api - COM-объект Excel Range."""
+
+    def __init__(self, rng: "Range"):
+        self._rng = rng
+
+    def _uniform_prop(self, name, getter):
+        _com(name)
+        return _uniform([getter(props) for props in self._rng._cell_props()])
+
+    @property
+    def NumberFormat(self):
+        return self._uniform_prop("NumberFormat", lambda props: props.number_format)
+
+    @property
+    def HorizontalAlignment(self):
+        return self._uniform_prop("HorizontalAlignment", lambda props: props.horizontal)
+
+    @property
+    def VerticalAlignment(self):
+        return self._uniform_prop("VerticalAlignment", lambda props: props.vertical)
+
+    @property
+    def Font(self):
+        _com("Font")
+        return _ComObject("Font", self._rng, lambda props: props.font)
+
+    @property
+    def Interior(self):
+        _com("Interior")
+        return _ComObject("Interior", self._rng, lambda props: props.interior)
+
+    @property
+    def Borders(self):
+        _com("Borders")
+        return _ComObject("Borders", self._rng, lambda props: props.borders)
+
+    @property
+    def MergeCells(self):
+        _com("MergeCells")
+        merged = [(r, c) in self._rng._model.merged for r, c in self._rng._coords()]
+        if all(merged):
+            return True
+        return False if not any(merged) else None
+
+    @property
+    def MergeArea(self):
+        _com("MergeArea")
+        return self._rng._merge_area_range().api
+
+    @property
+    def Address(self):
+        _com("Address")
+        return self._rng._address()
+
+
+class Range:
+    """Диапазон xlwings (прямоугольник ячеек листа)."""
+
+    def __init__(self, sheet: "Sheet", row: int, col: int, last_row: int, last_col: int, ndim: Optional[int] = None):
+        self.sheet = sheet
+        self._model = sheet._model
+        self._bounds = (row, col, last_row, last_col)
+        self._ndim = ndim
+
+    def _coords(self):
+        row, col, last_row, last_col = self._bounds
+        for r in range(row, last_row + 1):
+            for c in range(col, last_col + 1):
+                yield r, c
+
+    def _cell_props(self) -> List[_CellProps]:
+        return [self._model.cell_props(r, c) for r, c in self._coords()]
+
+    def _address(self) -> str:
+        row, col, last_row, last_col = self._bounds
+        if (row, col) == (last_row, last_col):
+            return _address(row, col)
+        return f"{_address(row, col)}:{_address(last_row, last_col)}"
+
+    def _merge_area_range(self) -> "Range":
+        row, col = self._bounds[0], self._bounds[1]
+        bounds = self._model.merged.get((row, col))
+        if bounds is None:
+            return Range(self.sheet, row, col, row, col)
+        return Range(self.sheet, *bounds)
+
+    def _shape(self, matrix):
+        """Форма результата как в xlwings: скаляр, список (одна строка/столбец) или список списков."""
+        if self._ndim == 2:
+            return matrix
+        if len(matrix) == 1 and len(matrix[0]) == 1:
+            return matrix[0][0]
+        if len(matrix) == 1:
+            return matrix[0]
+        if len(matrix[0]) == 1:
+            return [row[0] for row in matrix]
+        return matrix
+
+    def _matrix(self, getter):
+        row, col, last_row, last_col = self._bounds
+        return [[getter(r, c) for c in range(col, last_col + 1)] for r in range(row, last_row + 1)]
+
+    def options(self, ndim: Optional[int] = None, **kwargs) -> "Range":
+        return Range(self.sheet, *self._bounds, ndim=ndim)
+
+    @property
+    def row(self) -> int:
+        _com("Row")
+        return self._bounds[0]
+
+    @property
+    def column(self) -> int:
+        _com("Column")
+        return self._bounds[1]
+
+    @property
+    def rows(self) -> _Count:
+        _com("Rows.Count")
+        return _Count(self._bounds[2] - self._bounds[0] + 1)
+
+    @property
+    def columns(self) -> _Count:
+        _com("Columns.Count")
+        return _Count(self._bounds[3] - self._bounds[1] + 1)
+
+    @property
+    def count(self) -> int:
+        _com("Count")
+        row, col, last_row, last_col = self._bounds
+        return (last_row - row + 1) * (last_col - col + 1)
+
+    @property
+    def value(self):
+        _com("Value")
+        return self._shape(self._matrix(lambda r, c: self._model.values.get((r, c))))
+
+    @property
+    def formula(self):
+        _com("Formula")
+        matrix = self._matrix(self._model.formula_text)
+        if len(matrix) == 1 and len(matrix[0]) == 1:
+            return matrix[0][0]
+        # COM возвращает формулы многоячеечного диапазона кортежем кортежей
+        return tuple(tuple(row) for row in matrix)
+
+    @property
+    def address(self) -> str:
+        _com("Address")
+        return self._address()
+
+    @property
+    def merge_area(self) -> "Range":
+        _com("MergeArea")
+        return self._merge_area_range()
+
+    @property
+    def api(self) -> _RangeApi:
+        return _RangeApi(self)
+
+
+class Sheet:
+    """Лист книги xlwings."""
+
+    def __init__(self, model: _SheetModel):
+        self._model = model
+        self.name = model.name
+
+    @property
+    def used_range(self) -> Range:
+        _com("UsedRange")
+        model = self._model
+        return Range(self, model.min_row, model.min_col, model.max_row, model.max_col)
+
+    def range(self, first, second=None) -> Range:
+        """sheet.range(row, col), sheet.range((r1, c1), (r2, c2)) или sheet.range('A1')."""
+        _com("Range")
+        if isinstance(first, str):
+            from openpyxl.utils.cell import range_boundaries
+            min_col, min_row, max_col, max_row = range_boundaries(first.replace("$", ""))
+            return Range(self, min_row, min_col, max_row or min_row, max_col or min_col)
+        if isinstance(first, tuple):
+            last = second if second is not None else first
+            return Range(self, first[0], first[1], last[0], last[1])
+        return Range(self, first, second, first, second)
+
+    @property
+    def charts(self) -> List[_Chart]:
+        _com("Charts")
+        return list(self._model.charts)
+
+
+class _BookApi:
+    """Workbook COM-объект: свойства документа не заданы (как у новой книги)."""
+
+    def BuiltinDocumentProperties(self, name):
+        _com("BuiltinDocumentProperties")
+        raise KeyError(name)
+
+
+class Book:
+    """Книга xlwings (только чтение)."""
+
+    def __init__(self, path: str):
+        formula_wb = openpyxl.load_workbook(path, data_only=False)
+        value_wb = openpyxl.load_workbook(path, data_only=True)
+        self.sheets = [Sheet(_SheetModel(formula_wb[name], value_wb[name])) for name in formula_wb.sheetnames]
+        self.fullname = path
+        self.name = path.replace("\\", "/").rsplit("/", 1)[-1]
+        self.api = _BookApi()
+
+    def close(self):
+        pass
+
+
+class _Books:
+    def open(self, path: str, update_links: bool = False, read_only: bool = False, **kwargs) -> Book:
+        return Book(path)
+
+
+class App:
+    """Приложение Excel (без процесса Excel)."""
+
+    def __init__(self, visible: bool = False, **kwargs):
+        self.visible = visible
+        self.books = _Books()
+
+    def quit(self):
+        pass
+
+# Дополнительные части поддельного xlwings (если потребуются) могут быть добавлены здесь
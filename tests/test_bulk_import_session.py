@@ -0,0 +1,44 @@
+# tests/test_bulk_import_session.py
+"""
+Сессия массовой записи импорта: импорт, вернувший False, не фиксирует частичную запись.
+"""
+
+import pytest
+
+from backend.core.app_controller_data_import import _in_bulk_session
+
+
+def test_failed_import_rolls_back_session(storage):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    assert storage.save_sheet_formulas(sheet_id, [{"cell_address": "A1", "formula": "=1+1"}])
+
+    @_in_bulk_session
+    def failing_import(storage, file_path, options=None):
+        storage.save_sheet_formulas(sheet_id, [{"cell_address": "B1", "formula": object()}])
+        return False
+
+    assert failing_import(storage, "book.xlsx") is False
+    assert [item["cell_address"] for item in storage.load_sheet_formulas(sheet_id)] == ["A1"]
+
+
+def test_failed_parallel_import_rolls_back(storage, tmp_path, monkeypatch):
+    openpyxl = pytest.importorskip("openpyxl")
+    from backend.core.parallel_import import import_sheets_in_parallel
+
+    path = tmp_path / "book.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "S"
+    for row in range(1, 50):
+        sheet.cell(row=row, column=1, value=row)
+        sheet.cell(row=row, column=2, value=f"=A{row}*2")
+    workbook.save(path)
+
+    assert import_sheets_in_parallel(storage, str(path), {"max_workers": 1})
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    assert len(storage.load_sheet_formulas(sheet_id)) == 49
+
+    # Повторный импорт падает на записи ячеек - очистка формул листа не должна зафиксироваться
+    monkeypatch.setattr(storage, "save_sheet_cells", lambda *args, **kwargs: False)
+    assert import_sheets_in_parallel(storage, str(path), {"max_workers": 1}) is False
+    assert len(storage.load_sheet_formulas(sheet_id)) == 49
@@ -0,0 +1,55 @@
+# tests/test_cell_input.py
+"""
+Текст, введённый в ячейку в GUI: разбор в типизированное значение (parse_input_value)
+и его хранение после правки через DataManager.
+"""
+
+import datetime
+
+import pytest
+
+from backend.storage.cell_values import parse_input_value
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("7", 7),
+    ("-3", -3),
+    ("1.5", 1.5),
+    ("1,5", 1.5),
+    ("1 000", 1000),
+    ("15%", 0.15),
+    ("1e3", 1000.0),
+    ("TRUE", True),
+    ("ложь", False),
+    ("15.01.2024", datetime.datetime(2024, 1, 15)),
+    ("2024-01-15 00:00:00", datetime.datetime(2024, 1, 15)),
+    ("09:30", datetime.time(9, 30)),
+    ("=SUM(A1:A5)", "=SUM(A1:A5)"),
+    ("'007", "007"),
+    ("1_0", "1_0"),
+    ("nan", "nan"),
+    ("12-5", "12-5"),
+    ("текст", "текст"),
+    ("", None),
+])
+def test_parse_input_value(text, expected):
+    value = parse_input_value(text)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+def test_typed_text_round_trip(storage, data_manager):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    storage.save_sheet_formulas(sheet_id, [{"cell_address": "B1", "formula": "=SUM(A1:A5)"}])
+
+    for address, text in [("A1", "7"), ("A2", "20"), ("A3", "TRUE"), ("C1", "15.01.2024"), ("C2", "'42")]:
+        assert data_manager.update_cell_value("S", address, text)
+
+    cells = {(row, col): (value, value_type) for row, col, value, value_type in storage.load_cells(sheet_id)}
+    assert cells[(1, 1)] == (7, "int")
+    assert cells[(2, 1)] == (20, "int")
+    assert cells[(3, 1)] == (True, "bool")
+    assert cells[(1, 3)] == (datetime.datetime(2024, 1, 15), "datetime")
+    assert cells[(2, 3)] == ("42", "str")
+    # Логические значения в диапазоне SUM не суммируются, как в Excel
+    assert storage.load_sheet_formula_values(sheet_id)["B1"] == 27
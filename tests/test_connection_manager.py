@@ -0,0 +1,18 @@
+# tests/test_connection_manager.py
+"""
+Пул соединений: незавершённая транзакция писателя не должна попадать в следующую запись.
+"""
+
+
+def test_failed_write_is_rolled_back_before_next_write(storage):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    assert storage.save_sheet_formulas(sheet_id, [{"cell_address": "A1", "formula": "=1+1"}])
+
+    # DELETE выполняется, затем вставка падает на неподдерживаемом типе параметра
+    assert not storage.save_sheet_formulas(sheet_id, [{"cell_address": "B1", "formula": object()}])
+
+    with storage._pool().writer() as connection:
+        assert not connection.in_transaction
+
+    assert storage.save_project_metadata(1, {"project_name": "p"})
+    assert [item["cell_address"] for item in storage.load_sheet_formulas(sheet_id)] == ["A1"]
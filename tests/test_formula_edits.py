@@ -0,0 +1,87 @@
+# tests/test_formula_edits.py
+"""
+Правка ячеек с формулами через DataManager: значение поверх формулы, ввод новой формулы,
+пакетные результаты калькуляторов столбцов и пересчёт зависящих от них формул.
+"""
+
+import datetime
+
+import pytest
+
+from backend.core.formula_calculators import apply_age_formula_to_column, calculate_age_string
+
+
+@pytest.fixture
+def sheet_id(storage):
+    """Лист 'S': A1:A3 = 1, 2, 3; B1 = A1+A2, C1 = B1+5, D1 = SUM(B:B)."""
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    storage.save_sheet_cells(sheet_id, [(row, 1, row, None) for row in range(1, 4)])
+    storage.save_sheet_formulas(sheet_id, [
+        {"cell_address": "B1", "formula": "=A1+A2", "cached_value": 3},
+        {"cell_address": "C1", "formula": "=B1+5", "cached_value": 8},
+        {"cell_address": "D1", "formula": "=SUM(B:B)", "cached_value": 3},
+    ])
+    return sheet_id
+
+
+def test_value_over_formula_recalculates_dependents(storage, data_manager, sheet_id):
+    assert data_manager.update_cell_value("S", "B1", 100)
+
+    values = storage.load_sheet_formula_values(sheet_id)
+    assert "B1" not in values
+    assert values["C1"] == 105
+    assert values["D1"] == 100
+    assert sorted(item["cell_address"] for item in storage.load_sheet_formulas(sheet_id)) == ["C1", "D1"]
+
+    # Бывшая формула больше не зависит от A1
+    assert data_manager.update_cell_value("S", "A1", 50)
+    assert storage.load_sheet_formula_values(sheet_id)["C1"] == 105
+
+
+def test_entered_formula_is_registered_and_evaluated(storage, data_manager, sheet_id):
+    assert data_manager.update_cell_value("S", "B1", "=A3*3")
+
+    values = storage.load_sheet_formula_values(sheet_id)
+    assert values["B1"] == 9
+    assert values["C1"] == 14
+    assert values["D1"] == 9
+
+    # Новая формула попала в граф зависимостей
+    assert data_manager.update_cell_value("S", "A3", 10)
+    values = storage.load_sheet_formula_values(sheet_id)
+    assert (values["B1"], values["C1"], values["D1"]) == (30, 35, 30)
+
+
+def test_batch_over_formulas(storage, data_manager, sheet_id):
+    assert data_manager.update_cells_batch("S", [(1, 2, 7), (2, 2, "=B1*2")], "вставка")
+
+    values = storage.load_sheet_formula_values(sheet_id)
+    assert values["B2"] == 14
+    assert values["C1"] == 12
+    assert values["D1"] == 21
+
+
+def test_values_only_batch_drops_overwritten_formula(storage, data_manager, sheet_id):
+    assert data_manager.update_cells_batch("S", [(1, 2, 10), (5, 2, "=не формула")], "расчёт", values_only=True)
+
+    assert sorted(item["cell_address"] for item in storage.load_sheet_formulas(sheet_id)) == ["C1", "D1"]
+    values = storage.load_sheet_formula_values(sheet_id)
+    assert values["C1"] == 15
+    assert values["D1"] == 10
+
+
+def test_age_column_writes_preencoded_strings(storage, data_manager):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="A")
+    starts = [datetime.datetime(1990, 5, 15), datetime.datetime(2000, 1, 31), None]
+    end = datetime.datetime(2024, 1, 1)
+    storage.save_sheet_cells(sheet_id, [(row, 1, start, None) for row, start in enumerate(starts, start=3)])
+    storage.save_sheet_cells(sheet_id, [(row, 3, end, None) for row in range(3, 6)])
+    storage.save_sheet_formulas(sheet_id, [{"cell_address": "G3", "formula": "=LEN(F3)"}])
+
+    assert apply_age_formula_to_column(data_manager, "A", "A3", "C3", "F")
+
+    results = {row: (value, value_type) for row, value, value_type in storage.load_cells(sheet_id, col0=6, col1=6, columns=("row", "value", "value_type"))}
+    assert results[3] == (calculate_age_string(starts[0], end), "str")
+    assert results[4] == (calculate_age_string(starts[1], end), "str")
+    # Зависимая формула пересчитана по записанной строке
+    assert storage.load_sheet_formula_values(sheet_id)["G3"] == len(results[3][0])
@@ -0,0 +1,138 @@
+# tests/test_formula_engine.py
+"""
+Движок формул (FormulaEngine) и функции Excel: вычисление, распространение ошибок,
+циклические ссылки и запись результатов в 'formulas'.
+"""
+
+import datetime
+
+import pytest
+
+from backend.core.formula_engine import FormulaEngine
+from backend.core.formula_functions import ERROR_DIV0, ERROR_NA, ERROR_REF, ERROR_VALUE
+
+
+@pytest.fixture
+def sheets(storage):
+    """Листы 'Данные' (значения разных типов) и 'Итоги'."""
+    data = storage.save_sheet(project_id=1, sheet_name="Данные")
+    totals = storage.save_sheet(project_id=1, sheet_name="Итоги")
+    storage.save_sheet_cells(data, [
+        (1, 1, 10, None), (2, 1, 20, None), (3, 1, "30", None), (4, 1, True, None),
+        (5, 1, "текст", None), (6, 1, "#N/A", "error"),
+        (1, 2, datetime.date(1990, 5, 15), None), (2, 2, datetime.datetime(2024, 3, 1), None),
+        (1, 3, 2.5, None), (2, 3, -2.5, None),
+    ])
+    return data, totals
+
+
+@pytest.fixture
+def engine(storage, sheets):
+    return FormulaEngine(storage)
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=SUM(A1:A5)", 30),
+    ("=SUM(A:A)", ERROR_NA),
+    ("=PRODUCT(A1:A2)", 200),
+    ("=AVERAGE(A1:A3)", 15),
+    ("=MIN(A1:A2,C2)", -2.5),
+    ("=MAX(A1:A5)", 20),
+    ("=COUNT(A1:A6)", 2),
+    ("=COUNTA(A1:A6)", 6),
+    ("=COUNTBLANK(A1:A8)", 2),
+    ("=A1+A3", 40),
+    ("=A1+A5", ERROR_VALUE),
+    ("=-2^2", 4),
+    ("=5%*200", 10),
+    ("=ROUND(C1,0)+ROUND(C2,0)", 0),
+    ("=ROUND(1234.5678,-2)", 1200),
+    ("=ROUNDUP(1.21,1)", 1.3),
+    ("=INT(-2.5)", -3),
+    ("=MOD(-3,2)", 1),
+    ("=SQRT(-1)", "#NUM!"),
+    ("=IF(A1>5,\"big\",\"small\")", "big"),
+    ("=IFERROR(A6,\"нет\")", "нет"),
+    ("=AND(A4,A1>5)", True),
+    ("=ISNUMBER(A3)", False),
+    ("=ISBLANK(A9)", True),
+    ("=A1&\" шт\"", "10 шт"),
+    ("=UPPER(LEFT(A5,3))", "ТЕК"),
+    ("=MID(\"абвгд\",2,3)", "бвг"),
+    ("=SUBSTITUTE(\"a-b-c\",\"-\",\"+\")", "a+b+c"),
+    ("=LEN(\"абв\")+TRUE", 4),
+    ("=VALUE(\"1,5\")", ERROR_VALUE),
+    ("=\"a\"<\"B\"", True),
+    ("=YEAR(B1)&\"-\"&MONTH(B2)", "1990-3"),
+    ("=DATEDIF(B1,B2,\"Y\")", 33),
+    ("=DATE(2024,14,0)", datetime.date(2025, 1, 31)),
+])
+def test_functions(engine, formula, expected):
+    result = engine.evaluate_formula("Данные", formula, "H1")
+    if isinstance(expected, str) and expected.startswith("#"):
+        assert str(result) == expected
+    elif isinstance(expected, datetime.date):
+        # Даты - серийные номера Excel; тип результата учитывается при записи
+        assert result == (expected - datetime.date(1899, 12, 30)).days
+    else:
+        assert result == expected
+
+
+def test_error_propagation(engine):
+    assert engine.evaluate_formula("Данные", "=A1/0") is ERROR_DIV0
+    assert engine.evaluate_formula("Данные", "=SUM(A1,1/0)+1") is ERROR_DIV0
+    assert engine.evaluate_formula("Данные", "=#REF!+1") is ERROR_REF
+    assert engine.evaluate_formula("Данные", "=IFERROR(#REF!,7)") == 7
+
+
+def test_unknown_sheet_and_function(engine):
+    with pytest.raises(ValueError):
+        engine.evaluate_formula("Нет листа", "=1")
+    with pytest.raises(ValueError):
+        engine.evaluate_formula("Данные", "=FOO(A1)")
+
+
+def test_cross_sheet_recalculation(storage, sheets, engine):
+    data, totals = sheets
+    storage.save_sheet_formulas(data, [
+        {"cell_address": "D1", "formula": "=SUM(A1:A5)"},
+        {"cell_address": "D2", "formula": "=D1*2"},
+        {"cell_address": "D3", "formula": "=Итоги!A1+1"},
+    ])
+    storage.save_sheet_formulas(totals, [
+        {"cell_address": "A1", "formula": "=SUM(Данные!D1,Данные!D2)"},
+        {"cell_address": "A2", "formula": "='Данные'!A1*10"},
+    ])
+
+    result = engine.recalculate()
+
+    assert result.success
+    assert (result.evaluated, result.written, result.cyclic, result.unsupported) == (5, 5, 0, 0)
+    assert storage.load_sheet_formula_values(data) == {"D1": 30, "D2": 60, "D3": 91}
+    assert storage.load_sheet_formula_values(totals) == {"A1": 90, "A2": 100}
+
+
+def test_cycles_and_unsupported_keep_cached_values(storage, sheets, engine):
+    data, _ = sheets
+    storage.save_sheet_formulas(data, [
+        {"cell_address": "D1", "formula": "=D2+1", "cached_value": "old"},
+        {"cell_address": "D2", "formula": "=D1+1", "cached_value": "old"},
+        {"cell_address": "D3", "formula": "=FOO(A1)", "cached_value": "old"},
+        {"cell_address": "D4", "formula": "=A1/0", "cached_value": "old"},
+        {"cell_address": "D5", "formula": "=D4+1", "cached_value": "old"},
+    ])
+
+    result = engine.recalculate()
+
+    assert (result.evaluated, result.cyclic, result.unsupported, result.error_results) == (2, 2, 1, 2)
+    assert set(result.problems) == {"Данные!D1", "Данные!D2", "Данные!D3"}
+    values = storage.load_sheet_formula_values(data)
+    assert values["D1"] == values["D2"] == values["D3"] == "old"
+    assert values["D4"] == values["D5"] == "#DIV/0!"
+
+
+def test_dates_written_with_type(storage, sheets, engine):
+    data, _ = sheets
+    storage.save_sheet_formulas(data, [{"cell_address": "D1", "formula": "=DATE(2024,1,15)"}])
+    engine.recalculate()
+    assert storage.load_sheet_formula_values(data)["D1"] == datetime.date(2024, 1, 15)
@@ -0,0 +1,110 @@
+# tests/test_formula_graph.py
+"""
+Граф зависимостей формул (FormulaDependencyGraph): построение, поиск зависимых формул
+и выборочный пересчёт после правки ячеек.
+"""
+
+import pytest
+
+from backend.core.formula_engine import FormulaEngine
+from backend.core.formula_graph import FormulaDependencyGraph
+
+
+@pytest.fixture
+def sheets(storage):
+    """
+    Лист 'Данные': A1:A10 = 1..10, B1:B10 = 10..100,
+    C1:C10 = A+B, D1 = SUM(C1:C10), D2 = D1*2, E1 = SUM(B:B), F1 = $A$1*100.
+    Лист 'Итоги': A1 = Данные!D2+1, A2 = A1+Данные!A5.
+    """
+    data = storage.save_sheet(project_id=1, sheet_name="Данные")
+    totals = storage.save_sheet(project_id=1, sheet_name="Итоги")
+    storage.save_sheet_cells(data, [(row, 1, row, None) for row in range(1, 11)] + [(row, 2, row * 10, None) for row in range(1, 11)])
+    storage.save_sheet_formulas(data, [{"cell_address": f"C{row}", "formula": f"=A{row}+B{row}"} for row in range(1, 11)] + [
+        {"cell_address": "D1", "formula": "=SUM(C1:C10)"},
+        {"cell_address": "D2", "formula": "=D1*2"},
+        {"cell_address": "E1", "formula": "=SUM(B:B)"},
+        {"cell_address": "F1", "formula": "=$A$1*100"},
+    ])
+    storage.save_sheet_formulas(totals, [
+        {"cell_address": "A1", "formula": "=Данные!D2+1"},
+        {"cell_address": "A2", "formula": "=A1+Данные!A5"},
+    ])
+    FormulaEngine(storage).recalculate()
+    return data, totals
+
+
+@pytest.fixture
+def graph(storage, sheets):
+    return FormulaDependencyGraph(storage)
+
+
+def test_graph_is_built_once(storage, sheets, graph):
+    data, totals = sheets
+    assert graph.ensure_built() == 2
+    assert storage.load_dependency_graph_sheets() == {data: 14, totals: 2}
+    assert graph.ensure_built() == 0
+
+
+def test_single_cell_and_range_dependents(sheets, graph):
+    data, totals = sheets
+    # A1 -> C1 (ячейка) и F1 ($A$1), далее D1, D2 и 'Итоги'
+    assert set(graph.dependents([(data, 1, 1)])) == {
+        (data, 1, 3), (data, 1, 6), (data, 1, 4), (data, 2, 4), (totals, 1, 1), (totals, 2, 1),
+    }
+    # B7 входит в столбец B:B (E1)
+    assert (data, 1, 5) in graph.dependents([(data, 7, 2)])
+    # Ячейка вне ссылок формул
+    assert graph.dependents([(data, 50, 7)]) == []
+
+
+def test_chained_and_cross_sheet_dependents(sheets, graph):
+    data, totals = sheets
+    assert set(graph.dependents([(data, 1, 4)])) == {(data, 2, 4), (totals, 1, 1), (totals, 2, 1)}
+    assert set(graph.dependents([(data, 5, 1)])) >= {(data, 5, 3), (totals, 2, 1)}
+    assert graph.dependents([(totals, 2, 1)]) == []
+
+
+def test_partial_recalculation_matches_full(storage, sheets, data_manager):
+    data, totals = sheets
+    assert data_manager.update_cell_value("Данные", "A1", 100)
+    assert data_manager.update_cell_value("Данные", "B7", 1000)
+
+    partial = (storage.load_sheet_formula_values(data), storage.load_sheet_formula_values(totals))
+    assert partial[0]["C1"] == 110
+    assert partial[0]["F1"] == 10000
+    assert partial[0]["E1"] == 1480
+    assert partial[1]["A1"] == 2 * (sum(range(1, 11)) + 99 + 550 + 930) + 1
+
+    FormulaEngine(storage).recalculate()
+    assert (storage.load_sheet_formula_values(data), storage.load_sheet_formula_values(totals)) == partial
+
+
+def test_recalculate_dependents_without_dependents(graph, sheets):
+    data, _ = sheets
+    assert graph.recalculate_dependents([(data, 50, 7)]) is None
+
+
+def test_saving_formulas_invalidates_sheet_graph(storage, sheets, graph, data_manager):
+    data, totals = sheets
+    graph.ensure_built()
+
+    storage.save_sheet_formulas(totals, [{"cell_address": "B1", "formula": "=Данные!A2*3"}])
+    assert storage.load_dependency_graph_sheets() == {data: 14}
+
+    # Граф листа строится заново при следующем обращении: зависимости - по новым формулам
+    assert set(graph.dependents([(data, 2, 1)])) == {(data, 2, 3), (data, 1, 4), (data, 2, 4), (totals, 1, 2)}
+    assert data_manager.update_cell_value("Данные", "A2", 7)
+    assert storage.load_sheet_formula_values(totals) == {"B1": 21}
+
+
+def test_sheet_created_by_raw_data_resets_graph(storage):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="A")
+    storage.save_sheet_formulas(sheet_id, [{"cell_address": "A1", "formula": "=B!A1*2"}])
+    graph = FormulaDependencyGraph(storage)
+    graph.ensure_built()
+
+    # Лист 'B' создаётся записью ячеек, а не save_sheet
+    assert storage.save_sheet_raw_data("B", [{"cell_address": "A1", "value": 5}])
+    b_id = storage.save_sheet(project_id=1, sheet_name="B")
+    assert graph.dependents([(b_id, 1, 1)], include_volatile=False) == [(sheet_id, 1, 1)]
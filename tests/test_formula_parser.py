@@ -0,0 +1,119 @@
+# tests/test_formula_parser.py
+"""
+Разбор формул (formula_parser): приоритет операторов, ссылки и кэш форм формул.
+"""
+
+import pytest
+
+from backend.core import formula_parser
+from backend.core.formula_parser import (
+    MAX_COLS,
+    MAX_ROWS,
+    Binary,
+    Call,
+    FormulaSyntaxError,
+    Literal,
+    Percent,
+    Reference,
+    Unary,
+    compile_formula,
+    formula_cache_info,
+)
+
+
+def _dump(node):
+    """AST в виде вложенных кортежей для сравнения."""
+    if isinstance(node, Literal):
+        return node.value
+    if isinstance(node, Unary):
+        return (node.op, _dump(node.operand))
+    if isinstance(node, Percent):
+        return ("%", _dump(node.operand))
+    if isinstance(node, Binary):
+        return (node.op, _dump(node.left), _dump(node.right))
+    if isinstance(node, Call):
+        return (node.name, *(_dump(arg) for arg in node.args))
+    return type(node).__name__
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=1+2*3", ("+", 1, ("*", 2, 3))),
+    ("=(1+2)*3", ("*", ("+", 1, 2), 3)),
+    ("=2^3^2", ("^", ("^", 2, 3), 2)),
+    # Унарный минус связывает сильнее степени, как в Excel: -2^2 = 4
+    ("=-2^2", ("^", ("-", 2), 2)),
+    ("=1-2-3", ("-", ("-", 1, 2), 3)),
+    ("=1&2+3", ("&", 1, ("+", 2, 3))),
+    ("=1+2>3", (">", ("+", 1, 2), 3)),
+    ("=5%*200", ("*", ("%", 5), 200)),
+    ("=sum(1,2)", ("SUM", 1, 2)),
+    ("=_xlfn.CONCAT(1,2)", ("CONCAT", 1, 2)),
+])
+def test_operator_precedence(formula, expected):
+    assert _dump(compile_formula(formula).root) == expected
+
+
+@pytest.mark.parametrize("formula", ["=1+", "=SUM(1,2", "=(1))", "=1 2"])
+def test_syntax_errors(formula):
+    with pytest.raises(FormulaSyntaxError):
+        compile_formula(formula)
+
+
+def test_relative_and_absolute_references():
+    compiled = compile_formula("=A1+$B1+C$2+$D$3", 5, 5)
+    assert compiled.references_at(5, 5) == [
+        Reference(None, 1, 1, 1, 1),
+        Reference(None, 1, 2, 1, 2),
+        Reference(None, 2, 3, 2, 3),
+        Reference(None, 3, 4, 3, 4),
+    ]
+    # Та же формула, протянутая на строку вниз и столбец вправо
+    assert compiled.references_at(6, 6) == [
+        Reference(None, 2, 2, 2, 2),
+        Reference(None, 2, 2, 2, 2),
+        Reference(None, 2, 4, 2, 4),
+        Reference(None, 3, 4, 3, 4),
+    ]
+
+
+def test_reference_outside_sheet_resolves_to_none():
+    compiled = compile_formula("=A1*2", 2, 2)
+    assert compiled.references_at(1, 1) == [None]
+
+
+def test_cross_sheet_and_whole_column_references():
+    compiled = compile_formula("=SUM(Данные!A:A)+'Лист 2'!B2+SUM(3:3)", 1, 1)
+    first, second, third = compiled.references_at(1, 1)
+    assert first == Reference("Данные", 1, 1, MAX_ROWS, 1)
+    assert second == Reference("Лист 2", 2, 2, 2, 2)
+    assert third == Reference(None, 3, 1, 3, MAX_COLS)
+    assert [template.is_range for template in compiled.references] == [True, False, True]
+
+
+def test_filled_formulas_share_compiled_template():
+    compiled = compile_formula("=A1*2+SUM($B$1:B1)", 1, 3)
+    info = formula_cache_info()
+    assert compile_formula("=A7*2+SUM($B$1:B7)", 7, 3) is compiled
+    assert formula_cache_info()["shapes"] == info["shapes"]
+    # Другие смещения ссылок - другая формула
+    assert compile_formula("=A1*2+SUM($B$1:B1)", 7, 3) is not compiled
+
+
+def test_shape_cache_keeps_non_reference_fragments():
+    # 'LOG10' похоже на адрес, но это имя функции: форма формулы его не сдвигает
+    first = compile_formula("=LOG10(A1)", 1, 2)
+    second = compile_formula("=LOG10(A2)", 2, 2)
+    assert second is first
+    assert first.functions == ["LOG10"]
+    assert compile_formula('="A1"&A1', 1, 2).references_at(1, 2) == [Reference(None, 1, 1, 1, 1)]
+    assert _dump(compile_formula('="A1"&A2', 2, 2).root)[1] == "A1"
+
+
+def test_shape_cache_matches_full_parse():
+    formula_parser._SHAPES.clear()
+    for row in range(1, 30):
+        text = f"=IF($A{row}>B{row + 1},Q1!C{row},D$1)&\"E{row}\""
+        expected = formula_parser._compile_tokens(formula_parser.tokenize(text, row, 4))
+        compiled = compile_formula(text, row, 4)
+        assert _dump(compiled.root) == _dump(expected.root)
+        assert compiled.references_at(row, 4) == expected.references_at(row, 4)
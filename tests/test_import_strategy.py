@@ -0,0 +1,47 @@
+# tests/test_import_strategy.py
+"""
+Автоматический выбор способа импорта (backend/core/import_strategy.py): книга, которая
+помещается в память, не читается из XML, если при этом теряются оформление или объединения.
+"""
+
+from pathlib import Path
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from openpyxl.styles import Font
+
+from backend.core.import_strategy import choose_import_plan
+
+ROWS = 12_000
+COLUMNS = 5
+
+
+def _make_workbook(path: Path, bold_header: bool = False, merged_header: bool = False) -> Path:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append([f"Столбец {col}" for col in range(1, COLUMNS + 1)])
+    for row in range(ROWS):
+        sheet.append([row * COLUMNS + col for col in range(COLUMNS)])
+    if bold_header:
+        for cell in sheet[1]:
+            cell.font = Font(bold=True)
+    if merged_header:
+        sheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=2)
+    workbook.save(path)
+    return path
+
+
+def test_plain_book_is_read_from_xml(tmp_path):
+    plan = choose_import_plan(str(_make_workbook(tmp_path / "plain.xlsx")), {"memory_limit_mb": 512})
+    assert plan.strategy in ("xml", "xml_parallel")
+    assert plan.skipped == []
+
+
+@pytest.mark.parametrize("bold_header, merged_header", [(True, True), (True, False), (False, True)])
+def test_formatted_book_that_fits_keeps_openpyxl(tmp_path, bold_header, merged_header):
+    path = _make_workbook(tmp_path / "formatted.xlsx", bold_header, merged_header)
+    plan = choose_import_plan(str(path), {"memory_limit_mb": 512})
+    assert plan.strategy == "openpyxl"
+    assert plan.skipped == []
@@ -0,0 +1,53 @@
+# tests/test_schema_migrations.py
+"""
+Миграции схемы БД проекта: перевод значений ячеек, сохранённых старыми версиями текстом,
+выполняется один раз, а не при каждом открытии проекта.
+"""
+
+import sqlite3
+
+from backend.storage import schema
+
+
+def _insert_legacy_text(db_path: str, sheet_id: int):
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "INSERT OR REPLACE INTO cells (sheet_id, row, col, value, value_type) VALUES (?, 1, 1, '42', 'int')",
+        (sheet_id,)
+    )
+    connection.commit()
+    connection.close()
+
+
+def _stored(db_path: str):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute("SELECT typeof(value), value FROM cells WHERE row = 1 AND col = 1").fetchone()
+    finally:
+        connection.close()
+
+
+def test_legacy_cell_values_are_migrated_once(storage):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    storage.close_pool()
+
+    # БД старой версии: текстовое значение и user_version = 0
+    _insert_legacy_text(storage.db_path, sheet_id)
+    connection = sqlite3.connect(storage.db_path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.close()
+
+    assert storage.initialize_project_tables()
+    assert _stored(storage.db_path) == ("integer", 42)
+
+    # Повторное открытие: миграция уже выполнена, таблица 'cells' не сканируется
+    storage.close_pool()
+    _insert_legacy_text(storage.db_path, sheet_id)
+    assert storage.initialize_project_tables()
+    assert _stored(storage.db_path) == ("text", "42")
+
+    connection = sqlite3.connect(storage.db_path)
+    try:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == schema.TYPED_CELL_VALUES_SCHEMA_VERSION
+    finally:
+        connection.close()
@@ -0,0 +1,82 @@
+# tests/test_viewport_reads.py
+"""
+Чтение листа по частям: окно просмотра Qt-моделей (RowBlockCache поверх
+DataManager.load_sheet_cells) и блоки строк при экспорте в xlsxwriter.
+"""
+
+import openpyxl
+
+from backend.exporter.excel import xlsxwriter_exporter
+from backend.utils.row_block_cache import RowBlockCache
+
+
+def _fill_sheet(storage, rows, cols=3):
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="S")
+    assert storage.save_sheet_cells(sheet_id, [
+        (row, col, row * 10 + col, None) for row in range(1, rows + 1) for col in range(1, cols + 1)
+    ])
+    return sheet_id
+
+
+def test_cache_reads_only_visible_blocks(storage, data_manager):
+    _fill_sheet(storage, rows=1000)
+    assert data_manager.get_sheet_extent("S") == (1000, 3)
+
+    loaded = []
+
+    def loader(row_start, row_end):
+        loaded.append((row_start, row_end))
+        return [(row - 1, col - 1, value) for row, col, value in data_manager.load_sheet_cells("S", row_start + 1, row_end + 1)]
+
+    cache = RowBlockCache(loader, block_rows=100, max_blocks=2)
+    assert cache.get(0, 0) == 11
+    assert cache.get(99, 2) == 1003
+    assert cache.get(150, 1) == 1512
+    assert cache.get(150, 5) is None
+    assert loaded == [(0, 99), (100, 199)]
+
+    # Третий блок вытесняет тот, к которому дольше всего не обращались
+    assert cache.get(999, 0) == 10001
+    cache.get(150, 0)
+    assert loaded == [(0, 99), (100, 199), (900, 999)]
+    cache.get(0, 0)
+    assert loaded[-1] == (0, 99)
+
+
+def test_cache_set_updates_loaded_block(storage, data_manager):
+    _fill_sheet(storage, rows=10)
+    cache = RowBlockCache(lambda row_start, row_end: [
+        (row - 1, col - 1, value) for row, col, value in data_manager.load_sheet_cells("S", row_start + 1, row_end + 1)
+    ], block_rows=4)
+    assert cache.get(1, 1) == 22
+    cache.set(1, 1, "новое")
+    assert cache.get(1, 1) == "новое"
+    cache.clear()
+    assert cache.get(1, 1) == 22
+
+
+def test_export_reads_sheet_in_chunks(storage, tmp_path, monkeypatch):
+    sheet_id = _fill_sheet(storage, rows=25)
+    storage.save_sheet_formulas(sheet_id, [{"cell_address": "D1", "formula": "=SUM(A1:C1)"}])
+    storage.disconnect()
+    storage.close_pool()
+
+    chunks = []
+    load_cells = xlsxwriter_exporter.ProjectDBStorage.load_cells
+
+    def counting_load_cells(self, sheet_id, row0=1, col0=1, row1=None, col1=None, columns=None, decode=True):
+        chunks.append((row0, row1))
+        return load_cells(self, sheet_id, row0, col0, row1, col1, columns, decode)
+
+    monkeypatch.setattr(xlsxwriter_exporter, "EXPORT_CHUNK_ROWS", 10)
+    monkeypatch.setattr(xlsxwriter_exporter.ProjectDBStorage, "load_cells", counting_load_cells)
+    monkeypatch.setattr(xlsxwriter_exporter, "_export_charts_for_sheet", lambda *args: None)
+
+    output = tmp_path / "out.xlsx"
+    assert xlsxwriter_exporter.export_project_xlsxwriter(tmp_path / "project.db", output)
+    assert chunks == [(1, 10), (11, 20), (21, 30)]
+
+    sheet = openpyxl.load_workbook(output)["S"]
+    assert sheet["A1"].value == 11
+    assert sheet["C25"].value == 253
+    assert sheet["D1"].value == "=SUM(A1:C1)"
@@ -0,0 +1,173 @@
+# tests/test_xlsx_fast_reader.py
+"""
+Совпадение быстрого чтения XML (backend/importer/xlsx_fast_reader.py) с openpyxl.
+
+Для каждой книги сравниваются:
+- значения и формулы (openpyxl, data_only=False) с (value/formula) из FastXlsxReader;
+- кэшированные результаты формул (openpyxl, data_only=True) с value из FastXlsxReader;
+- содержимое БД после import_raw_data_from_excel / import_formulas_from_excel
+  и import_raw_values_only_from_excel с fast_reader=True и fast_reader=False.
+
+Проверяются tests/fixtures/test_sample.xlsx и сгенерированная книга с датами, логическими
+значениями, ошибками, общими формулами и форматированным текстом.
+"""
+
+import datetime
+import re
+import sqlite3
+import zipfile
+from pathlib import Path
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+
+from backend.core.app_controller_data_import import import_formulas_from_excel, import_raw_data_from_excel, import_raw_values_only_from_excel
+from backend.importer.xlsx_fast_reader import FastXlsxReader
+from backend.storage.base import ProjectDBStorage
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def _make_shared_formulas(path: Path, part_name: str):
+    """
+    Переписывает формулы столбца B в общую формулу (t="shared"), как её сохраняет Excel:
+    текст только у первой ячейки, остальные ссылаются на неё по si.
+    openpyxl общие формулы не записывает, поэтому XML правится напрямую.
+    """
+    with zipfile.ZipFile(path) as archive:
+        parts = {name: archive.read(name) for name in archive.namelist()}
+    xml = parts[part_name].decode("utf-8")
+
+    def replace(match):
+        row = int(match.group(1))
+        if row == 1:
+            return f'<c r="B1"{match.group(2)}><f t="shared" ref="B1:B50" si="0">A1*2</f>'
+        return f'<c r="B{row}"{match.group(2)}><f t="shared" si="0"/>'
+
+    xml, replaced = re.subn(r'<c r="B(\d+)"([^>]*)><f>A\1\*2</f>', replace, xml)
+    assert replaced, f"В {part_name} не найдены формулы для преобразования в общие."
+    parts[part_name] = xml.encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+
+
+@pytest.fixture(scope="module")
+def sample_workbook(tmp_path_factory) -> Path:
+    """Книга с типами значений, которые разбирает быстрый путь."""
+    path = tmp_path_factory.mktemp("fast_reader") / "fast_reader_sample.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Типы"
+    sheet.append(["int", "float", "str", "bool", "date", "datetime", "time", "error"])
+    sheet.append([42, 3.25, "текст", True, datetime.date(2024, 1, 15), datetime.datetime(2024, 1, 15, 10, 30), datetime.time(8, 15), "#N/A"])
+    sheet["H2"].data_type = "e"
+    sheet["A3"] = CellRichText(["обычный ", TextBlock(InlineFont(b=True), "жирный")])
+    sheet["B3"] = -1.5e-7
+    sheet["C3"] = "=A2*2"
+    sheet["D3"] = '=IF(A2>0,"да","нет")'
+
+    formulas = workbook.create_sheet("Формулы")
+    for row in range(1, 51):
+        formulas.cell(row=row, column=1, value=row)
+        formulas.cell(row=row, column=2, value=f"=A{row}*2")
+        formulas.cell(row=row, column=3, value=f"=SUM($A$1:A{row})")
+    workbook.save(path)
+    _make_shared_formulas(path, "xl/worksheets/sheet2.xml")
+    return path
+
+
+@pytest.fixture(params=["fixture", "sample"])
+def workbook_path(request, sample_workbook) -> Path:
+    return FIXTURES_DIR / "test_sample.xlsx" if request.param == "fixture" else sample_workbook
+
+
+def _openpyxl_cells(file_path: Path, data_only: bool) -> dict:
+    workbook = openpyxl.load_workbook(file_path, data_only=data_only)
+    result = {}
+    for sheet in workbook.worksheets:
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    result[(sheet.title, cell.row, cell.column)] = cell.value
+    return result
+
+
+def _fast_cells(file_path: Path, data_only: bool) -> dict:
+    result = {}
+    with FastXlsxReader(str(file_path)) as reader:
+        for sheet_name in reader.sheetnames:
+            for row, col, value, formula in reader.iter_cells(sheet_name):
+                current = value if data_only else (formula if formula is not None else value)
+                if current is not None:
+                    result[(sheet_name, row, col)] = current
+    return result
+
+
+def _differences(expected: dict, actual: dict) -> list:
+    """Расхождения по значению или типу (форматированный текст openpyxl быстрый путь возвращает строкой)."""
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(set(expected) | set(actual), key=str)
+        if (str(expected.get(key)) != str(actual.get(key)) or type(expected.get(key)) is not type(actual.get(key)))
+        and not (isinstance(expected.get(key), CellRichText) and str(expected.get(key)) == actual.get(key))
+    ]
+
+
+def _import_dump(file_path: Path, work_dir: Path, fast_reader: bool, values_only: bool) -> dict:
+    mode = f"{'fast' if fast_reader else 'openpyxl'}_{'values' if values_only else 'formulas'}"
+    db_path = str(work_dir / f"{mode}.db")
+    storage = ProjectDBStorage(db_path)
+    storage.initialize_project_tables()
+    options = {"fast_reader": fast_reader}
+    if values_only:
+        assert import_raw_values_only_from_excel(storage, str(file_path), options)
+    else:
+        assert import_raw_data_from_excel(storage, str(file_path), options)
+        assert import_formulas_from_excel(storage, str(file_path), options)
+    storage.close_pool()
+    connection = sqlite3.connect(db_path)
+    try:
+        return {
+            "cells": {(sheet, row, col): (value, value_type) for sheet, row, col, value, value_type in connection.execute(
+                "SELECT s.name, c.row, c.col, c.value, c.value_type FROM cells c JOIN sheets s USING (sheet_id)")},
+            "formulas": {(sheet, address): formula for sheet, address, formula in connection.execute(
+                "SELECT s.name, f.cell_address, f.formula FROM formulas f JOIN sheets s USING (sheet_id)")},
+        }
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("data_only", [False, True], ids=["formulas", "cached"])
+def test_reader_matches_openpyxl(workbook_path, data_only):
+    expected = _openpyxl_cells(workbook_path, data_only)
+    assert expected
+    assert _differences(expected, _fast_cells(workbook_path, data_only)) == []
+
+
+def test_reader_value_types(sample_workbook):
+    with FastXlsxReader(str(sample_workbook)) as reader:
+        row = {col: value for row, col, value, _ in reader.iter_cells("Типы") if row == 2}
+        shared = {row: formula for row, col, _, formula in reader.iter_cells("Формулы") if col == 2}
+    assert row == {
+        1: 42, 2: 3.25, 3: "текст", 4: True,
+        5: datetime.datetime(2024, 1, 15), 6: datetime.datetime(2024, 1, 15, 10, 30),
+        7: datetime.time(8, 15), 8: "#N/A",
+    }
+    assert type(row[4]) is bool
+    # Общая формула разворачивается для каждой ячейки диапазона
+    assert shared[1] == "=A1*2" and shared[50] == "=A50*2"
+
+
+@pytest.mark.parametrize("values_only", [False, True], ids=["formulas", "values-only"])
+def test_import_matches_openpyxl(workbook_path, tmp_path, values_only):
+    via_openpyxl = _import_dump(workbook_path, tmp_path, False, values_only)
+    via_fast = _import_dump(workbook_path, tmp_path, True, values_only)
+    assert via_openpyxl["cells"]
+    for table in ("cells", "formulas"):
+        assert _differences(via_openpyxl[table], via_fast[table]) == []
@@ -0,0 +1,122 @@
+# tests/test_xlwings_importer.py
+"""
+xlwings-импортёр на поддельном xlwings (tests/fake_xlwings.py) - без Excel.
+
+Проверяется, что содержимое БД совпадает с импортом через openpyxl и что число
+COM-вызовов определяется числом однородных блоков листа, а не числом его строк.
+"""
+
+import datetime
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+from openpyxl.styles import Font, PatternFill
+
+from backend.core.app_controller_data_import import import_all_data_from_excel
+from backend.storage.base import ProjectDBStorage
+from backend.storage.cells import row_col_to_address
+from tests import fake_xlwings
+
+
+@pytest.fixture(scope="module")
+def xlwings_importer():
+    """xlwings_importer, импортированный поверх поддельного xlwings (настоящий возвращается после тестов)."""
+    previous = sys.modules.get("xlwings")
+    fake_xlwings.install()
+    from backend.importer import xlwings_importer
+    yield importlib.reload(xlwings_importer)
+    if previous is None:
+        sys.modules.pop("xlwings", None)
+    else:
+        sys.modules["xlwings"] = previous
+
+
+def _make_workbook(path: Path, rows: int, cols: int = 8) -> Path:
+    """Шапка жирным, столбец дат, заливка блока, формулы и объединённая строка итогов."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    for col in range(1, cols + 1):
+        sheet.cell(row=1, column=col, value=f"Столбец {col}").font = Font(bold=True)
+    fill = PatternFill("solid", fgColor="FFFF00")
+    start = datetime.date(2024, 1, 1)
+    for row in range(2, rows + 1):
+        sheet.cell(row=row, column=1, value=row)
+        sheet.cell(row=row, column=2, value=start + datetime.timedelta(days=row)).number_format = "DD.MM.YYYY"
+        for col in range(3, cols):
+            sheet.cell(row=row, column=col, value=row * col)
+        sheet.cell(row=row, column=cols, value=f"=A{row}*2")
+        if row <= 50:
+            for col in range(3, 6):
+                sheet.cell(row=row, column=col).fill = fill
+    sheet.merge_cells(start_row=rows + 2, start_column=1, end_row=rows + 2, end_column=4)
+    sheet.cell(row=rows + 2, column=1, value="Итого")
+    workbook.save(path)
+    return path
+
+
+def _db_contents(storage: ProjectDBStorage):
+    """
+    Значения ячеек без формул, формулы и объединения листа.
+    Значение ячейки с формулой у импортёров разное (openpyxl пишет текст формулы,
+    xlwings - результат), поэтому такие ячейки сравниваются только по формулам.
+    """
+    sheet_id = storage.save_sheet(project_id=1, sheet_name="Data")
+    formulas = sorted((item["cell_address"], item["formula"]) for item in storage.load_sheet_formulas(sheet_id))
+    formula_cells = {address for address, _ in formulas}
+    values = [
+        (row, col, value) for row, col, value in storage.load_cells(sheet_id, columns=("row", "col", "value"))
+        if row_col_to_address(row, col) not in formula_cells
+    ]
+    return values, formulas, sorted(storage.load_sheet_merged_cells(sheet_id))
+
+
+def _import_xlwings(xlwings_importer, db_path: Path, book: Path):
+    storage = ProjectDBStorage(str(db_path))
+    assert storage.initialize_project_tables()
+    fake_xlwings.reset_com_calls()
+    assert xlwings_importer.import_all_from_excel_xlwings(storage, str(book))
+    calls = fake_xlwings.total_com_calls()
+    try:
+        return _db_contents(storage), calls
+    finally:
+        storage.close_pool()
+
+
+def test_matches_openpyxl_import(xlwings_importer, tmp_path):
+    book = _make_workbook(tmp_path / "book.xlsx", rows=120)
+    xlwings_contents, _ = _import_xlwings(xlwings_importer, tmp_path / "xlwings.db", book)
+
+    storage = ProjectDBStorage(str(tmp_path / "openpyxl.db"))
+    assert storage.initialize_project_tables()
+    assert import_all_data_from_excel(storage, str(book))
+    try:
+        openpyxl_contents = _db_contents(storage)
+    finally:
+        storage.close_pool()
+
+    assert xlwings_contents == openpyxl_contents
+
+
+def test_com_calls_do_not_grow_with_rows(xlwings_importer, tmp_path):
+    _, small = _import_xlwings(xlwings_importer, tmp_path / "small.db", _make_workbook(tmp_path / "small.xlsx", rows=300))
+    _, large = _import_xlwings(xlwings_importer, tmp_path / "large.db", _make_workbook(tmp_path / "large.xlsx", rows=2000))
+    # Чтение значений и формул идёт блоками строк: в 6,7 раза больше строк - лишь несколько новых блоков
+    assert large < small * 1.3
+
+
+def test_failed_import_rolls_back(xlwings_importer, tmp_path, monkeypatch):
+    storage = ProjectDBStorage(str(tmp_path / "project.db"))
+    assert storage.initialize_project_tables()
+    monkeypatch.setattr(storage, "save_sheet_formulas", lambda *args, **kwargs: False)
+    try:
+        assert xlwings_importer.import_all_from_excel_xlwings(storage, str(_make_workbook(tmp_path / "book.xlsx", rows=20))) is False
+        assert storage.load_all_sheets_metadata(1) == []
+    finally:
+        storage.close_pool()